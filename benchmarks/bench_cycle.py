@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark di un ciclo completo (run_cycle senza rete) per backend JSON (core.jsoncodec).
+
+Ciclo misurato, su fixture e ledger sintetici:
+  save fixtures (latest / previous / history), odds (stub), predictions,
+  consensus, value alerts + history, build_or_update_roi (ledger JSON completo)
+Ogni backend installato (stdlib, orjson, msgspec) è misurato con artefatti
+indentati e compatti (JSON_COMPACT_ARTIFACTS=1); tempo = migliore di --repeat.
+La colonna `vs stdlib` è il rapporto rispetto a stdlib indentato (= prima del codec).
+
+Uso:
+  PYTHONPATH=src python benchmarks/bench_cycle.py
+  PYTHONPATH=src python benchmarks/bench_cycle.py --picks 200000 --fixtures 2000 --repeat 5
+  PYTHONPATH=src python benchmarks/bench_cycle.py --out cycle.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+FLAGS = {
+    "API_FOOTBALL_KEY": "bench",
+    "ENABLE_ODDS_INGESTION": "1",
+    "ENABLE_PREDICTIONS": "1",
+    "ENABLE_PREDICTIONS_USE_ODDS": "1",
+    "ENABLE_CONSENSUS": "1",
+    "ENABLE_VALUE_ALERTS": "1",
+    "ENABLE_VALUE_HISTORY": "1",
+    "ENABLE_ROI_TRACKING": "1",
+    "ENABLE_ROI_TIMELINE": "1",
+    "ENABLE_CLV_CAPTURE": "1",
+    "ROI_LEDGER_MAX_AGE_DAYS": "0",
+    "ROI_LEDGER_MAX_PICKS": "0",
+}
+
+STAGES = ("fixtures", "odds", "predictions", "consensus", "value_alerts", "roi")
+
+
+def _setup_env(data_dir: Path) -> None:
+    for k, v in FLAGS.items():
+        os.environ.setdefault(k, v)
+    os.environ["BET_DATA_DIR"] = str(data_dir)
+
+
+def _fixtures(n: int, seed: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        live = rnd.random() < 0.2
+        out.append({
+            "fixture_id": 5_000_000 + i,
+            "league_id": rnd.randint(1, 40),
+            "season": 2025,
+            "date_utc": (now + timedelta(hours=rnd.randint(-3, 96))).isoformat(),
+            "home_team": f"Home {i} Città",
+            "away_team": f"Away {i} Società",
+            "status": rnd.choice(("1H", "HT", "2H")) if live else "NS",
+            "home_score": rnd.randint(0, 3) if live else None,
+            "away_score": rnd.randint(0, 3) if live else None,
+        })
+    return out
+
+
+def _run_cycle(fixtures: List[Dict[str, Any]]) -> Dict[str, float]:
+    from analytics.roi import build_or_update_roi
+    from consensus.pipeline import run_consensus_pipeline
+    from core.persistence import save_history_snapshot, save_latest_fixtures, save_previous_fixtures
+    from odds.pipeline import run_odds_pipeline
+    from predictions.pipeline import run_baseline_predictions
+    from predictions.value_alerts import build_value_alerts, write_value_alerts
+    from predictions.value_history import append_value_history
+
+    def fixtures_stage() -> None:
+        save_previous_fixtures(fixtures)
+        save_latest_fixtures(fixtures)
+        save_history_snapshot(fixtures)
+
+    def alerts_stage() -> None:
+        alerts = build_value_alerts()
+        write_value_alerts(alerts)
+        append_value_history(alerts)
+
+    steps: Dict[str, Callable[[], Any]] = {
+        "fixtures": fixtures_stage,
+        "odds": lambda: run_odds_pipeline(fixtures, provider_name="stub"),
+        "predictions": lambda: run_baseline_predictions(fixtures),
+        "consensus": run_consensus_pipeline,
+        "value_alerts": alerts_stage,
+        "roi": lambda: build_or_update_roi(fixtures),
+    }
+    out: Dict[str, float] = {}
+    for name, fn in steps.items():
+        t0 = time.perf_counter()
+        fn()
+        out[name] = time.perf_counter() - t0
+    return out
+
+
+def run_variant(backend: str, compact: bool, args: argparse.Namespace, work: Path) -> Dict[str, Any]:
+    from core import jsoncodec
+    from core.config import _reset_settings_cache_for_tests, get_settings
+    from analytics.roi import save_ledger
+    from analytics.roi_synthetic import generate_ledger
+
+    os.environ["JSON_COMPACT_ARTIFACTS"] = "1" if compact else "0"
+    jsoncodec.set_backend(backend)
+    _reset_settings_cache_for_tests()
+    s = get_settings()
+    fixtures = _fixtures(args.fixtures, args.seed)
+    ledger = generate_ledger(args.picks, seed=args.seed)
+
+    best: Dict[str, float] = {}
+    for _ in range(max(1, args.repeat)):
+        data_dir = Path(tempfile.mkdtemp(dir=work))
+        os.environ["BET_DATA_DIR"] = str(data_dir)
+        _reset_settings_cache_for_tests()
+        base = data_dir / s.roi_dir
+        base.mkdir(parents=True)
+        save_ledger(base, [dict(p) for p in ledger])
+        times = _run_cycle(fixtures)
+        times["total"] = sum(times.values())
+        for k, v in times.items():
+            best[k] = min(best.get(k, float("inf")), v)
+        shutil.rmtree(data_dir, ignore_errors=True)
+    ledger_bytes = len(jsoncodec.dumps(ledger, pretty=not compact))
+    return {
+        "backend": jsoncodec.backend(),
+        "compact": compact,
+        "ledger_mb": round(ledger_bytes / 1e6, 2),
+        "stages": {k: round(v, 6) for k, v in best.items()},
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark ciclo completo per backend JSON")
+    ap.add_argument("--picks", type=int, default=50_000, help="Pick nel ledger ROI")
+    ap.add_argument("--fixtures", type=int, default=500, help="Fixture del ciclo")
+    ap.add_argument("--repeat", type=int, default=3, help="Esecuzioni per variante (si tiene la migliore)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", type=Path, help="Scrive anche i risultati grezzi in JSON")
+    args = ap.parse_args()
+
+    from core import jsoncodec
+
+    work = Path(tempfile.mkdtemp(prefix="cycle_bench_"))
+    try:
+        _setup_env(work)
+        backends = [b for b in jsoncodec.BACKENDS if jsoncodec.resolve_backend(b) == b]
+        variants = []
+        for backend in sorted(backends, key=lambda b: b != "stdlib"):
+            for compact in (False, True):
+                print(f"running {backend} compact={int(compact)} ...", file=sys.stderr)
+                variants.append(run_variant(backend, compact, args, work))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        jsoncodec.set_backend(None)
+
+    ref = variants[0]["stages"]["total"]
+    print(f"\n== {args.picks:,} picks, {args.fixtures:,} fixtures ==")
+    print(f"{'backend':<10}{'compact':>8}{'ledger MB':>11}" + "".join(f"{s:>13}" for s in STAGES) + f"{'total':>10}{'vs stdlib':>11}")
+    for v in variants:
+        st = v["stages"]
+        print(
+            f"{v['backend']:<10}{int(v['compact']):>8}{v['ledger_mb']:>11}"
+            + "".join(f"{st[s]:>13.4f}" for s in STAGES)
+            + f"{st['total']:>10.4f}{round(st['total'] / ref, 2) if ref else '-':>11}"
+        )
+    if args.out:
+        meta = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "picks": args.picks,
+            "fixtures": args.fixtures,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        }
+        args.out.write_text(json.dumps({"meta": meta, "variants": variants}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
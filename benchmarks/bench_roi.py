@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Benchmark analytics.roi su ledger sintetici (analytics.roi_synthetic).
+
+Stadi misurati per ogni dimensione:
+  generate, compute_metrics, prune_ledger, csv_export, build_or_update_roi
+  + tempi per blocco del motore fused (rows, contribs, core, series, accumulatori registrati)
+Tempo = migliore di --repeat esecuzioni; memoria = picco RSS aggiuntivo per stadio
+(processo figlio, Linux) oppure picco tracemalloc con --memory tracemalloc.
+
+Uso:
+  PYTHONPATH=src python benchmarks/bench_roi.py                       # 10k,100k vs baseline
+  PYTHONPATH=src python benchmarks/bench_roi.py --sizes 10000,100000,1000000
+  PYTHONPATH=src python benchmarks/bench_roi.py --save-baseline       # aggiorna baselines/roi.json
+  PYTHONPATH=src python benchmarks/bench_roi.py --check --tolerance 1.5   # exit 1 se regressione
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_FILE = BENCH_DIR / "baselines" / "roi.json"
+
+# tutti i blocchi opzionali attivi: il benchmark misura il caso peggiore
+FLAGS = {
+    "API_FOOTBALL_KEY": "bench",
+    "ENABLE_ROI_TRACKING": "1",
+    "ENABLE_ROI_LEAGUE_BREAKDOWN": "1",
+    "ENABLE_ROI_TIME_BUCKETS": "1",
+    "ENABLE_ROI_ROR": "1",
+    "ENABLE_ROI_EDGE_CLV_CORR": "1",
+    "ENABLE_ROI_STAKE_ADVISORY": "1",
+    "ENABLE_ROI_AGING_BUCKETS": "1",
+    "ENABLE_ROI_CLV_BUCKETS": "1",
+    "ENABLE_ROI_KELLY_EFFECT": "1",
+    "ENABLE_ROI_PAYOUT_MOMENTS": "1",
+    "ENABLE_ROI_MARKET_PLACEHOLDER": "1",
+    "ENABLE_ROI_PROFIT_BUCKETS": "1",
+    "ENABLE_ROI_MONTECARLO": "1",
+    "ENABLE_ROI_REGIME": "1",
+    "ROI_REGIME_VERSION": "m1",
+    "ENABLE_ROI_CSV_EXPORT": "1",
+    "ENABLE_CLV_CAPTURE": "1",
+    "ROI_MC_SEED": "7",
+    "ROI_LEDGER_MAX_AGE_DAYS": "0",
+    "ROI_LEDGER_MAX_PICKS": "0",
+}
+
+STAGES = ("generate", "compute_metrics", "prune_ledger", "csv_export", "build_or_update_roi")
+# sotto questa soglia le differenze sono rumore
+_CHECK_MIN_SEC = 0.005
+
+
+def _setup_env(data_dir: Path) -> None:
+    for k, v in FLAGS.items():
+        os.environ.setdefault(k, v)
+    os.environ["BET_DATA_DIR"] = str(data_dir)
+
+
+def _best_of(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn() if setup is None else fn(arg)  # type: ignore[call-arg]
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_mb(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> float:
+    """Picco heap Python dello stadio (tracemalloc: esatto ma ~10x più lento)."""
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn() if setup is None else fn(arg)  # type: ignore[call-arg]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def _proc_status_kb(key: str) -> int:
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _rss_supported() -> bool:
+    if not hasattr(os, "fork"):
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> float:
+    """
+    Picco RSS aggiuntivo dello stadio, in un processo figlio (fork) così i
+    blocchi liberati da uno stadio non vengono riusati dal successivo.
+    VmHWM viene azzerato (clear_refs=5) dopo il setup: conta solo lo stadio.
+    """
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - processo figlio
+        os.close(r)
+        try:
+            arg = setup() if setup else None
+            with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+                f.write("5")
+            start = _proc_status_kb("VmRSS")
+            fn() if setup is None else fn(arg)  # type: ignore[call-arg]
+            os.write(w, str(max(0, _proc_status_kb("VmHWM") - start)).encode())
+        finally:
+            os._exit(0)
+    os.close(w)
+    with os.fdopen(r, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    return round(int(data or b"0") / 1024, 2)
+
+
+def _block_timings(ledger: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Tempo per blocco del motore fused sulle stesse _Row: add() misurato per
+    accumulatore, con la stessa selezione di compute_blocks_fused (_scanned: i
+    blocchi a colonne leggono l'indice quantili, misurato come "quantiles"),
+    poi finalize() sommato al blocco.
+    """
+    from core.config import get_settings
+    from analytics.roi import _assemble_metrics
+    from analytics.roi_engine import (
+        _REGISTRY, _ContribsAcc, _CoreAcc, _Row, _ScanContext, _scanned, _SeriesAcc, block_name,
+    )
+
+    s = get_settings()
+    out_t: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    rows = [_Row(p) for p in ledger]
+    out_t["rows"] = time.perf_counter() - t0
+
+    ctx = _ScanContext()
+    out: Dict[str, Any] = {"market_placeholder": {}}
+    accs: List[Tuple[str, Any]] = [("contribs", _ContribsAcc(s)), ("core", _CoreAcc(s)), ("series", _SeriesAcc(s))]
+    accs += [(block_name(cls), cls(s)) for cls in _REGISTRY if cls.enabled(s)]
+    names = {id(acc): name for name, acc in accs}
+    scanned = _scanned([acc for name, acc in accs if name != "series"], ctx, index=s.enable_roi_profit_distribution)
+    for acc in scanned:
+        t0 = time.perf_counter()
+        add = acc.add
+        for r in rows:
+            add(r)
+        out_t[names.get(id(acc), "quantiles")] = time.perf_counter() - t0
+    # ordine di finalize come compute_blocks_fused (series legge ctx.series di core)
+    for name, acc in accs:
+        t0 = time.perf_counter()
+        acc.finalize(ctx, out)
+        out_t[name] = out_t.get(name, 0.0) + time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _assemble_metrics(out)
+    out_t["assemble"] = time.perf_counter() - t0
+    return {k: round(v, 6) for k, v in out_t.items()}
+
+
+def _cycle_inputs(data_dir: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """value_alerts.json con 50 alert nuovi + fixture: 50 NS e fino a 200 FT su pick aperte."""
+    alerts_dir = data_dir / "value_alerts"
+    alerts_dir.mkdir(parents=True, exist_ok=True)
+    new_ids = [9_000_000 + i for i in range(50)]
+    alerts = [
+        {"source": "prediction", "value_type": "prediction_value", "fixture_id": fid,
+         "value_side": "home_win", "value_edge": 0.08}
+        for fid in new_ids
+    ]
+    (alerts_dir / "value_alerts.json").write_text(json.dumps({"count": len(alerts), "alerts": alerts}), encoding="utf-8")
+    open_ids = [p["fixture_id"] for p in ledger if not p.get("settled")][:200]
+    fixtures = [{"fixture_id": fid, "status": "NS", "home_score": None, "away_score": None} for fid in new_ids]
+    fixtures += [{"fixture_id": fid, "status": "FT", "home_score": 1, "away_score": 0} for fid in open_ids]
+    return fixtures
+
+
+def run_size(n: int, repeat: int, memory: str, seed: int) -> Dict[str, Any]:
+    from core.config import _reset_settings_cache_for_tests, get_settings, settings_with_overrides
+    from analytics.roi import _prune_ledger, _write_roi_csv_export, build_or_update_roi, compute_metrics, save_ledger
+    from analytics.roi_synthetic import generate_ledger
+
+    work = Path(tempfile.mkdtemp(prefix="roi_bench_"))
+    try:
+        _setup_env(work)
+        _reset_settings_cache_for_tests()
+        s = get_settings()
+        base = work / s.roi_dir
+        base.mkdir(parents=True, exist_ok=True)
+        prune_settings = settings_with_overrides({"ROI_LEDGER_MAX_AGE_DAYS": "330"}, base=s)
+
+        t0 = time.perf_counter()
+        ledger = generate_ledger(n, seed=seed)
+        times: Dict[str, float] = {"generate": time.perf_counter() - t0}
+        metrics: Dict[str, Any] = {}
+
+        def fresh_base() -> Path:
+            b = Path(tempfile.mkdtemp(dir=work)) / "roi"
+            b.mkdir()
+            return b
+
+        def prune(b: Path) -> None:
+            _prune_ledger(b, list(ledger), settings=prune_settings)
+
+        def cycle_setup() -> List[Dict[str, Any]]:
+            shutil.rmtree(base, ignore_errors=True)
+            base.mkdir(parents=True)
+            save_ledger(base, [dict(p) for p in ledger])
+            return _cycle_inputs(work, ledger)
+
+        def csv_setup() -> Dict[str, Any]:
+            if not metrics:
+                metrics.update(compute_metrics(ledger))
+            return metrics
+
+        stage_fns: Dict[str, Tuple[Callable[..., Any], Optional[Callable[[], Any]]]] = {
+            "compute_metrics": (lambda: compute_metrics(ledger), None),
+            "prune_ledger": (prune, fresh_base),
+            "csv_export": (lambda m: _write_roi_csv_export(list(ledger), m), csv_setup),
+            "build_or_update_roi": (build_or_update_roi, cycle_setup),
+        }
+
+        # memoria prima dei tempi: i figli partono da un heap non ancora "scaldato" dagli stadi
+        peaks: Dict[str, float] = {}
+        if memory == "rss":
+            for name, (fn, setup) in stage_fns.items():
+                peaks[name] = _peak_rss_mb(fn, setup)
+        elif memory == "tracemalloc":
+            peaks["generate"] = _peak_mb(lambda: generate_ledger(n, seed=seed))
+            for name, (fn, setup) in stage_fns.items():
+                peaks[name] = _peak_mb(fn, setup)
+
+        for name, (fn, setup) in stage_fns.items():
+            times[name] = _best_of(fn, repeat, setup)
+        blocks = _block_timings(ledger)
+
+        stages = {
+            name: {"sec": round(times[name], 6), **({"peak_mb": peaks[name]} if name in peaks else {})}
+            for name in STAGES
+        }
+        return {"picks": n, "repeat": repeat, "memory": memory, "stages": stages, "blocks": blocks}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _meta(seed: int) -> Dict[str, Any]:
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+    }
+
+
+def _ratio(cur: float, ref: Optional[float]) -> Optional[float]:
+    if not ref:
+        return None
+    return round(cur / ref, 2)
+
+
+def _report(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Stampa la tabella e ritorna le regressioni (stadi e blocchi) oltre la tolleranza."""
+    regressions: List[Tuple[str, float]] = []
+    base_sizes = baseline.get("sizes", {})
+    for size, res in results["sizes"].items():
+        ref = base_sizes.get(size, {})
+        print(f"\n== {int(size):,} picks ==")
+        print(f"{'stage':<24}{'sec':>10}{'peak MB':>10}{'baseline':>10}{'ratio':>8}   (memoria: {res.get('memory')})")
+        for name, st in res["stages"].items():
+            ref_sec = ref.get("stages", {}).get(name, {}).get("sec")
+            r = _ratio(st["sec"], ref_sec)
+            print(
+                f"{name:<24}{st['sec']:>10.4f}{st.get('peak_mb', ''):>10}"
+                f"{(f'{ref_sec:.4f}' if ref_sec else '-'):>10}{(r if r is not None else '-'):>8}"
+            )
+            if r is not None and name != "generate" and st["sec"] >= _CHECK_MIN_SEC:
+                regressions.append((f"{size}:{name}", r))
+        print(f"{'block':<24}{'sec':>10}{'':>10}{'baseline':>10}{'ratio':>8}")
+        for name, sec in res["blocks"].items():
+            ref_sec = ref.get("blocks", {}).get(name)
+            r = _ratio(sec, ref_sec)
+            print(f"{name:<24}{sec:>10.4f}{'':>10}{(f'{ref_sec:.4f}' if ref_sec else '-'):>10}{(r if r is not None else '-'):>8}")
+            if r is not None and sec >= _CHECK_MIN_SEC:
+                regressions.append((f"{size}:block:{name}", r))
+    return [f"{k} x{r}" for k, r in regressions]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark ROI analytics")
+    ap.add_argument("--sizes", default="10000,100000", help="Dimensioni ledger (es. 10000,100000,1000000)")
+    ap.add_argument("--repeat", type=int, default=3, help="Esecuzioni per stadio (si tiene la migliore)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument(
+        "--memory",
+        choices=("auto", "rss", "tracemalloc", "none"),
+        default="auto",
+        help="Picco memoria per stadio: rss (fork + VmHWM, Linux), tracemalloc (esatto, lento), none",
+    )
+    ap.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    ap.add_argument("--save-baseline", action="store_true", help="Aggiorna il baseline con i risultati")
+    ap.add_argument("--check", action="store_true", help="Exit 1 se uno stadio/blocco supera la tolleranza")
+    ap.add_argument("--tolerance", type=float, default=1.5, help="Rapporto massimo vs baseline con --check")
+    ap.add_argument("--out", type=Path, help="Scrive anche i risultati grezzi in JSON")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    memory = args.memory
+    if memory == "auto":
+        memory = "rss" if _rss_supported() else "none"
+    if memory == "rss" and not _rss_supported():
+        ap.error("--memory rss richiede Linux (/proc/self/clear_refs) e os.fork")
+    results: Dict[str, Any] = {"meta": _meta(args.seed), "sizes": {}}
+    for n in sizes:
+        print(f"running {n:,} picks ...", file=sys.stderr)
+        results["sizes"][str(n)] = run_size(n, args.repeat, memory, args.seed)
+
+    baseline: Dict[str, Any] = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    flagged = [r for r in _report(results, baseline) if float(r.rsplit("x", 1)[1]) > args.tolerance]
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        merged = {"meta": results["meta"], "sizes": {**baseline.get("sizes", {}), **results["sizes"]}}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(merged, indent=2) + "\n", encoding="utf-8")
+        print(f"\nbaseline aggiornato: {args.baseline}")
+    if flagged:
+        print(f"\nregressioni (> x{args.tolerance}): " + ", ".join(flagged))
+        if args.check:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
 from typing import Any, Dict, cast
 from datetime import datetime, timezone
 
+from core import generations
 from core.config import get_settings
+from core.diff import diff_fixtures_detailed, summarize_delta
+from core.fingerprints import diff_with_fingerprints, discard_state
 from core.logging import get_logger
-from core.persistence import save_latest_fixtures
+from core.metrics import write_last_delta_event
+from core.persistence import load_latest_fixtures, rotate_history, save_history_snapshot, save_latest_fixtures
 from core.models import FixtureDataset
 
 from providers.api_football.fixtures_provider import ApiFootballFixturesProvider
@@ -21,7 +24,7 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _build_scoreboard(fixtures: FixtureDataset, live_ids: set[int]) -> Dict[str, Any]:
+def _build_scoreboard(fixtures: FixtureDataset, live_ids: set[int], delta: Dict[str, Any]) -> Dict[str, Any]:
     now = _now_iso()
     total = len(fixtures)
     live_count = len(live_ids)
@@ -41,19 +44,15 @@ def _build_scoreboard(fixtures: FixtureDataset, live_ids: set[int]) -> Dict[str,
         "total": total,
         "live_count": live_count,
         "upcoming_count_next_24h": upcoming_24,
-        "recent_delta": {"added": total, "removed": 0, "modified": 0},
-        "change_breakdown": {"score_change": 0, "status_change": 0, "both": 0, "other": 0},
+        "recent_delta": {
+            "added": len(delta["added"]),
+            "removed": len(delta["removed"]),
+            "modified": len(delta["modified"]),
+        },
+        "change_breakdown": delta["change_breakdown"],
     }
 
 
-def _write_json_atomic(path: Path, data: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as fh:
-        json.dump(data, fh, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
-
-
 def _is_truthy(val: str | None) -> bool:
     if not val:
         return False
@@ -122,21 +121,48 @@ def main() -> None:
         fixtures = cast(FixtureDataset, list(by_id.values()))
         live_ids = {int(f.get("fixture_id")) for f in live}
 
-    # Persist fixtures_latest
-    save_latest_fixtures(fixtures)
-
-    # Scoreboard
-    scoreboard = _build_scoreboard(fixtures, live_ids)
-    _write_json_atomic(base / "scoreboard.json", scoreboard)
-
-    # Last run metrics (compat)
-    last_run = {
-        "summary": {"added": len(fixtures), "removed": 0, "modified": 0, "total_new": len(fixtures)},
-        "change_breakdown": {"score_change": 0, "status_change": 0, "both": 0, "other": 0},
-        "fetch_stats": {"attempts": 1, "retries": 0, "latency_ms": 0.0, "last_status": 200},
-        "total_fixtures": len(fixtures),
-    }
-    _write_json_atomic(base / "metrics" / "last_run.json", last_run)
+    # fixtures, scoreboard e last_run pubblicati insieme (ENABLE_GENERATIONS)
+    with generations.begin_generation(base):
+        if settings.enable_fingerprint_diff:
+            # Delta contro il fetch precedente: fingerprint persistiti in data/diff,
+            # rilette solo le fixture cambiate (fixtures_latest solo al primo run)
+            delta = diff_with_fingerprints(
+                fixtures,
+                compare_keys=settings.delta_compare_keys,
+                base=base,
+                previous=load_latest_fixtures,
+            )
+        else:
+            discard_state(base)
+            delta = diff_fixtures_detailed(
+                load_latest_fixtures(), fixtures, compare_keys=settings.delta_compare_keys
+            )
+        summary = summarize_delta(delta["added"], delta["removed"], delta["modified"], len(fixtures))
+
+        # Persist fixtures_latest
+        save_latest_fixtures(fixtures)
+
+        # Ultimo delta non vuoto
+        if summary["added"] or summary["removed"] or summary["modified"]:
+            write_last_delta_event(delta)
+
+        # Scoreboard
+        scoreboard = _build_scoreboard(fixtures, live_ids, delta)
+        generations.write_artifact(base / "scoreboard.json", scoreboard)
+
+        # Last run metrics (compat)
+        last_run = {
+            "summary": summary,
+            "change_breakdown": delta["change_breakdown"],
+            "fetch_stats": {"attempts": 1, "retries": 0, "latency_ms": 0.0, "last_status": 200},
+            "total_fixtures": len(fixtures),
+        }
+        generations.write_artifact(base / "metrics" / "last_run.json", last_run)
+
+    # History (HISTORY_MODE=full: file per snapshot con rotazione; delta: solo i cambi)
+    if settings.enable_history and fixtures:
+        save_history_snapshot(fixtures)
+        rotate_history(settings.history_max)
 
     log.info("fetch_complete", extra={"provider": provider_src, "fixtures": len(fixtures)})
 
@@ -16,6 +16,13 @@ except Exception:
 
 import requests
 
+# Rate limiter condiviso con gli altri cron (core.ratelimit), opzionale fuori dal repo
+try:
+    sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+    from core import ratelimit
+except Exception:
+    ratelimit = None
+
 # Fuzzy optional
 try:
     from rapidfuzz import fuzz
@@ -72,7 +79,11 @@ def load_fixtures(data_dir: Path) -> List[Dict[str, Any]]:
 def fetch_sport_odds(session: requests.Session, api_key: str, sport_key: str, regions: str) -> List[Dict[str, Any]]:
     url = f"{API_BASE}/sports/{sport_key}/odds"
     params = {"apiKey": api_key, "regions": regions, "markets": MARKETS, "oddsFormat": ODDS_FORMAT}
+    if ratelimit is not None:
+        ratelimit.acquire("odds_api")
     r = session.get(url, params=params, timeout=30)
+    if ratelimit is not None:
+        ratelimit.update_from_headers("odds_api", r.headers)
     if not r.ok:
         sys.stderr.write(f"[odds] HTTP {r.status_code} {r.url} {r.text[:300]}\n")
         r.raise_for_status()
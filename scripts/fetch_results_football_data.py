@@ -114,5 +114,12 @@ def main():
 
     print(f"[fdo-res] Scritti {cnt} risultati in {out_file}")
 
+    # Settlement ROI del backlog in un'unica chiamata (richiede src nel PYTHONPATH)
+    if os.environ.get("SETTLE_ROI", "").strip().lower() in ("1", "true", "yes", "on"):
+        from analytics.roi import settle_results_batch
+        records = [json.loads(line) for line in out_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+        settled = settle_results_batch(records)
+        print(f"[fdo-res] Pick ROI settled: {settled}")
+
 if __name__ == "__main__":
     main()
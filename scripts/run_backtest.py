@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Backtest ROI su history/fixtures_*.json + value_history + odds.
+
+Esempi:
+  python scripts/run_backtest.py --param ROI_MIN_EDGE=0.03,0.05,0.08 --param ENABLE_KELLY_STAKING=0,1
+  python scripts/run_backtest.py --grid grid.json --workers 8 --start 2025-08-01
+(grid.json: {"ROI_MIN_EDGE": [0.03, 0.05], "KELLY_EDGE_CAP": [0.05, 0.1]})
+
+Output: tabella comparativa su stdout (uso interattivo, come gli altri script
+CLI); eventi ed errori passano da get_logger. Le righe marcate con "*" hanno
+un edge minimo sotto la soglia con cui è stata registrata value_history
+(risultati troncati, vedi analytics.roi_backtest).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from core.logging import get_logger
+from analytics.roi_backtest import run_backtest
+
+log = get_logger("scripts.run_backtest")
+
+
+def _parse_params(specs: List[str]) -> Dict[str, List[Any]]:
+    grid: Dict[str, List[Any]] = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or not name.strip():
+            raise SystemExit(f"--param non valido: {spec!r} (atteso NOME=v1,v2,...)")
+        grid[name.strip()] = [v.strip() for v in values.split(",") if v.strip()]
+    return grid
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Backtest ROI con griglia di parametri")
+    ap.add_argument("--grid", type=Path, help="File JSON {ENV_NAME: [valori]}")
+    ap.add_argument("--param", action="append", default=[], help="NOME=v1,v2 (ripetibile)")
+    ap.add_argument("--workers", type=int, default=None, help="Processi (default ROI_BACKTEST_WORKERS, 0 = cpu)")
+    ap.add_argument("--data-dir", type=Path, default=None, help="Default BET_DATA_DIR")
+    ap.add_argument("--start", help="Primo giorno (YYYY-MM-DD)")
+    ap.add_argument("--end", help="Ultimo giorno (YYYY-MM-DD)")
+    ap.add_argument("--top", type=int, default=20, help="Righe stampate")
+    args = ap.parse_args()
+
+    grid: Dict[str, List[Any]] = {}
+    if args.grid:
+        grid.update(json.loads(args.grid.read_text(encoding="utf-8")))
+    grid.update(_parse_params(args.param))
+
+    report = run_backtest(grid, workers=args.workers, data_dir=args.data_dir, start=args.start, end=args.end)
+    print(
+        f"cycles={report['cycles']} configs={report['configs']} "
+        f"workers={report['workers']} elapsed={report['elapsed_sec']}s"
+    )
+    for i, row in enumerate(report["results"][: args.top], start=1):
+        st = row["stats"]
+        mark = "*" if row.get("below_recorded_threshold") else " "
+        print(
+            f"{i:>3}{mark} profit={st['profit_units']:>9} yield={st['yield']:>9} "
+            f"picks={st['picks']:>5} max_dd={st['max_drawdown']:>8} {row['params']}"
+        )
+    truncated = sum(1 for r in report["results"] if r.get("below_recorded_threshold"))
+    if truncated:
+        log.warning(
+            "backtest_configs_below_recorded_threshold",
+            extra={"configs": truncated, "recorded_min_edge": report["recorded_min_edge"]},
+        )
+    if report.get("table_path"):
+        print(f"tabella: {report['table_path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
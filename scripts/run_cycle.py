@@ -3,9 +3,10 @@ from pathlib import Path
 from typing import List, Dict, Any
 from datetime import datetime, timezone, timedelta
 
+from core import generations
 from core.config import _reset_settings_cache_for_tests, get_settings
 from core.logging import get_logger
-from providers.api_football.fixtures_provider import ApiFootballFixturesProvider
+from providers.api_football.async_client import fetch_fixtures_concurrently
 from predictions.pipeline import run_baseline_predictions
 from analytics.roi import build_or_update_roi
 
@@ -38,49 +39,55 @@ def main() -> int:
         },
     )
 
-    provider = ApiFootballFixturesProvider()
-
-    # 1) Oggi (lega+season se presenti)
-    fixtures: List[Dict[str, Any]] = provider.fetch_fixtures(
-        date=_iso_today(),
-        league_id=settings.default_league_id,
-        season=settings.default_season,
+    # Richieste lega/data eseguite in parallelo (API_FOOTBALL_MAX_CONCURRENCY,
+    # budget condiviso API_FOOTBALL_RPM): ogni passo dura ~ la richiesta più lenta
+    def fetch(queries: List[Dict[str, Any]], step: str) -> List[Dict[str, Any]]:
+        result = fetch_fixtures_concurrently(queries)
+        log.info("fetch_step", extra={"fetch_stats": {"step": step, "queries": len(queries), **result["stats"]}})
+        return result["fixtures"]
+
+    # 1) Oggi (lega+season se presenti; API_FOOTBALL_LEAGUE_IDS = più leghe insieme)
+    leagues = settings.api_football_league_ids or [settings.default_league_id]
+    fixtures: List[Dict[str, Any]] = fetch(
+        [{"date": _iso_today(), "league_id": lg, "season": settings.default_season} for lg in leagues],
+        "today",
     )
 
     # 2) Fallback: oggi tutte le leghe
     if not fixtures:
         log.warning("no_fixtures_today_for_league_season -> try ALL leagues today")
-        fixtures = provider.fetch_fixtures(date=_iso_today(), league_id=None, season=None)
+        fixtures = fetch([{"date": _iso_today(), "league_id": None, "season": None}], "today_all")
 
-    # 3) Fallback: prossimi 7 giorni tutte le leghe (aggregazione e dedup)
+    # 3) Fallback: prossimi 7 giorni tutte le leghe (aggregazione e dedup per fixture_id)
     if not fixtures:
         log.warning("still_no_fixtures_today -> try next 7 days ALL leagues")
-        agg: Dict[int, Dict[str, Any]] = {}
-        for d in range(1, 8):
-            day = (datetime.now(timezone.utc) + timedelta(days=d)).strftime("%Y-%m-%d")
-            chunk = provider.fetch_fixtures(date=day, league_id=None, season=None)
-            for rec in chunk or []:
-                fid = rec.get("fixture_id")
-                if fid is not None and fid not in agg:
-                    agg[fid] = rec
-        fixtures = list(agg.values())
+        now = datetime.now(timezone.utc)
+        fixtures = fetch(
+            [
+                {"date": (now + timedelta(days=d)).strftime("%Y-%m-%d"), "league_id": None, "season": None}
+                for d in range(1, 8)
+            ],
+            "next_7_days",
+        )
 
     if not fixtures:
         log.warning("still_no_fixtures_after_7d_fallback")
 
-    # 4) Predictions
-    try:
-        run_baseline_predictions(fixtures)
-    except Exception as e:  # pragma: no cover
-        log.error("predictions_failed %s", e)
-
-    # 5) ROI update
-    try:
-        build_or_update_roi(fixtures)
-    except Exception as e:  # pragma: no cover
-        log.error("roi_update_failed %s", e)
-
-    log.info("cycle_complete")
+    # predictions + ROI pubblicati insieme (ENABLE_GENERATIONS)
+    with generations.begin_generation(base):
+        # 4) Predictions
+        try:
+            run_baseline_predictions(fixtures)
+        except Exception as e:  # pragma: no cover
+            log.error("predictions_failed %s", e)
+
+        # 5) ROI update
+        try:
+            build_or_update_roi(fixtures)
+        except Exception as e:  # pragma: no cover
+            log.error("roi_update_failed %s", e)
+
+    log.info("cycle_complete", extra={"generation": generations.generation_id(base)})
     return 0
 
 
@@ -1,21 +1,26 @@
 from __future__ import annotations
 
 import csv
-import json
 import math
 import os
-import random
 import re
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 from statistics import mean, pstdev
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from core.config import get_settings
+from core import generations, jsoncodec
+from core.config import Settings, get_settings
+from core.fixture_record import API_FOOTBALL_PROVIDER, FOOTBALL_DATA_PROVIDER
 from core.logging import get_logger
+from analytics.roi_montecarlo import simulate_equity_paths
+from analytics.roi_profiling import profile_section, profiling_session
 
 logger = get_logger("analytics.roi")
 
+# Spazi id di fixture_id: fixture normalizzate senza campo "provider" sono API-Football
+DEFAULT_FIXTURE_PROVIDER = API_FOOTBALL_PROVIDER
+
 # ============================================================
 # Time / I/O Helpers
 # ============================================================
@@ -41,20 +46,18 @@ def _load_json(path: Path) -> Any:
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(path)
     except Exception:
         return None
 
 
-def _save_json_atomic(path: Path, payload: Any) -> None:
-    tmp = path.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+def _save_json_atomic(path: Path, payload: Any, machine: bool = False) -> None:
+    """`machine`: artefatto letto solo dal codice (compatto con JSON_COMPACT_ARTIFACTS)."""
+    jsoncodec.write_json_atomic(path, payload, machine=machine)
 
 
 def _append_jsonl(path: Path, record: Dict[str, Any]) -> None:
-    line = json.dumps(record, ensure_ascii=False)
+    line = jsoncodec.dumps_str(record)
     with path.open("a", encoding="utf-8") as f:
         f.write(line + "\n")
 
@@ -87,7 +90,7 @@ def load_fixtures_map(fixtures: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any
 def load_value_alerts() -> List[Dict[str, Any]]:
     s = get_settings()
     base = Path(s.bet_data_dir or "data")
-    path = base / s.value_alerts_dir / "value_alerts.json"
+    path = generations.artifact_path(base / s.value_alerts_dir / "value_alerts.json")
     raw = _load_json(path)
     if not raw:
         return []
@@ -105,7 +108,7 @@ def load_value_alerts() -> List[Dict[str, Any]]:
 def load_predictions_index() -> Dict[int, Dict[str, Any]]:
     s = get_settings()
     base = Path(s.bet_data_dir or "data")
-    path = base / s.predictions_dir / "latest_predictions.json"
+    path = generations.artifact_path(base / s.predictions_dir / "latest_predictions.json")
     raw = _load_json(path)
     if not raw:
         return {}
@@ -122,7 +125,7 @@ def load_predictions_index() -> Dict[int, Dict[str, Any]]:
 def load_consensus_index() -> Dict[int, Dict[str, Any]]:
     s = get_settings()
     base = Path(s.bet_data_dir or "data")
-    path = base / s.consensus_dir / "consensus.json"
+    path = generations.artifact_path(base / s.consensus_dir / "consensus.json")
     raw = _load_json(path)
     if not raw:
         return {}
@@ -139,7 +142,7 @@ def load_consensus_index() -> Dict[int, Dict[str, Any]]:
 def load_odds_latest_index() -> Dict[int, Dict[str, Any]]:
     s = get_settings()
     base = Path(s.bet_data_dir or "data")
-    path = base / s.odds_dir / "odds_latest.json"
+    path = generations.artifact_path(base / s.odds_dir / "odds_latest.json")
     raw = _load_json(path)
     if not raw:
         return {}
@@ -156,25 +159,121 @@ def load_odds_latest_index() -> Dict[int, Dict[str, Any]]:
 def load_ledger(base: Path) -> List[Dict[str, Any]]:
     p = base / "ledger.json"
     raw = _load_json(p)
-    if isinstance(raw, list):
-        return [d for d in raw if isinstance(d, dict)]
-    return []
+    ledger = [d for d in raw if isinstance(d, dict)] if isinstance(raw, list) else []
+    return _replay_ledger_journal(base, ledger)
 
 
 def load_ledger_archive(base: Path) -> List[Dict[str, Any]]:
+    """Pick archiviate: ledger_archive.json (layout monolitico) + partizioni mensili."""
     p = base / "ledger_archive.json"
     raw = _load_json(p)
-    if isinstance(raw, list):
-        return [d for d in raw if isinstance(d, dict)]
-    return []
+    archive = [d for d in raw if isinstance(d, dict)] if isinstance(raw, list) else []
+    if get_settings().enable_roi_archive_partitions:
+        from analytics.roi_archive import load_archive
+        archive.extend(load_archive(base))
+    return archive
 
 
 def save_ledger(base: Path, ledger: List[Dict[str, Any]]) -> None:
-    _save_json_atomic(base / "ledger.json", ledger)
+    """Riscrittura completa (snapshot base): il journal viene assorbito e rimosso."""
+    _save_json_atomic(base / "ledger.json", ledger, machine=True)
+    _ledger_journal_path(base).unlink(missing_ok=True)
+
+
+# ============================================================
+# Ledger journal (append-only)
+#
+# ledger.json resta lo snapshot base; le pick nuove e i settlement del
+# ciclo vengono appesi a ledger_journal.jsonl. load_ledger = base + replay.
+# Oltre ROI_LEDGER_JOURNAL_MAX_BYTES il journal viene compattato nella base.
+# Il replay è idempotente (add di chiave esistente ignorato, settle =
+# update dei campi), quindi un crash tra riscrittura base e rimozione del
+# journal non duplica pick.
+# ============================================================
+
+_JOURNAL_SETTLE_FIELDS = ("settled", "result", "payout", "settled_at", "closing_decimal_odds", "clv_pct")
+
+
+def _ledger_journal_path(base: Path) -> Path:
+    return base / get_settings().roi_ledger_journal_file
+
+
+def _replay_ledger_journal(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    path = _ledger_journal_path(base)
+    if not path.exists():
+        return ledger
+    index = {(p.get("fixture_id"), p.get("source")): p for p in ledger}
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                rec = jsoncodec.loads(line)
+            except Exception:
+                # riga troncata (crash durante append): ignorata
+                continue
+            if not isinstance(rec, dict):
+                continue
+            op = rec.get("op")
+            if op == "add":
+                pick = rec.get("pick")
+                if not isinstance(pick, dict):
+                    continue
+                key = (pick.get("fixture_id"), pick.get("source"))
+                if key in index:
+                    continue
+                ledger.append(pick)
+                index[key] = pick
+            elif op == "settle":
+                target = index.get((rec.get("fixture_id"), rec.get("source")))
+                fields = rec.get("fields")
+                if target is not None and isinstance(fields, dict):
+                    target.update(fields)
+    return ledger
+
+
+def save_ledger_changes(
+    base: Path,
+    ledger: List[Dict[str, Any]],
+    created: List[Dict[str, Any]],
+    settled: List[Dict[str, Any]],
+    rewrite: bool = False,
+) -> None:
+    """
+    Persistenza del ciclo: con ENABLE_ROI_LEDGER_JOURNAL appende solo le
+    modifiche (I/O proporzionale ai delta), altrimenti riscrittura completa.
+    `rewrite` forza lo snapshot completo (es. ledger potato / riordinato).
+    """
+    s = get_settings()
+    if not s.enable_roi_ledger_journal or rewrite or not (base / "ledger.json").exists():
+        save_ledger(base, ledger)
+        return
+    path = _ledger_journal_path(base)
+    lines = [jsoncodec.dumps_str({"op": "add", "pick": p}) for p in created]
+    for p in settled:
+        lines.append(jsoncodec.dumps_str({
+            "op": "settle",
+            "fixture_id": p.get("fixture_id"),
+            "source": p.get("source"),
+            "fields": {k: p[k] for k in _JOURNAL_SETTLE_FIELDS if k in p},
+        }))
+    if lines:
+        prefix = ""
+        if path.exists() and path.stat().st_size > 0:
+            with path.open("rb") as f:
+                f.seek(-1, os.SEEK_END)
+                # riga troncata da un crash: chiusa prima di appendere
+                if f.read(1) != b"\n":
+                    prefix = "\n"
+        with path.open("a", encoding="utf-8") as f:
+            f.write(prefix + "\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    if path.exists() and path.stat().st_size >= s.roi_ledger_journal_max_bytes:
+        save_ledger(base, ledger)
+        logger.info("ledger_journal_compacted", extra={"picks": len(ledger)})
 
 
 def save_ledger_archive(base: Path, archive: List[Dict[str, Any]]) -> None:
-    _save_json_atomic(base / "ledger_archive.json", archive)
+    _save_json_atomic(base / "ledger_archive.json", archive, machine=True)
 
 
 # ============================================================
@@ -513,8 +612,12 @@ def _risk_metrics(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
     s = get_settings()
     if not s.enable_roi_risk_metrics:
         return {}
-    settled = [p for p in ledger if p.get("settled")]
-    if len(settled) < 3:
+    contribs = [_profit_contribution(p) for p in ledger if p.get("settled")]
+    return _risk_metrics_from_contribs(contribs)
+
+
+def _risk_metrics_from_contribs(contribs: List[float]) -> Dict[str, Any]:
+    if len(contribs) < 3:
         return {
             "sharpe_like": None,
             "sortino_like": None,
@@ -522,7 +625,6 @@ def _risk_metrics(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
             "downside_stddev": None,
             "equity_vol": {},
         }
-    contribs = [_profit_contribution(p) for p in settled]
     mean_profit = mean(contribs)
     variance = pstdev(contribs) if len(contribs) > 1 else 0.0
     sharpe = mean_profit / variance if variance > 0 else None
@@ -765,8 +867,8 @@ def _find_decimal_odds(
     return 2.0, "fallback"
 
 
-def _build_snapshot(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    s = get_settings()
+def _build_snapshot(entry: Dict[str, Any], settings: Optional[Settings] = None) -> Optional[Dict[str, Any]]:
+    s = settings or get_settings()
     if not s.enable_roi_odds_snapshot:
         return None
     market = entry.get("market")
@@ -807,6 +909,18 @@ def _append_timeline(base: Path, metrics: Dict[str, Any]) -> None:
         "yield": metrics.get("yield"),
         "hit_rate": metrics.get("hit_rate"),
     }
+    if s.enable_roi_timeline_store:
+        from analytics.roi_timeline import append_timeline_record, update_daily_rollup
+
+        try:
+            append_timeline_record(history_path, record)
+        except Exception as exc:
+            logger.error("append_timeline_failed %s", exc)
+        try:
+            update_daily_rollup(daily_path, record)
+        except Exception as exc:
+            logger.error("save_daily_failed %s", exc)
+        return
     try:
         _append_jsonl(history_path, record)
     except Exception as exc:
@@ -847,21 +961,33 @@ def _equity_curve_settled(ledger: List[Dict[str, Any]]) -> List[float]:
     return eq
 
 
-def _equity_volatility(equity: List[float], windows: List[int]) -> Dict[str, float]:
+def _series_frozen_points(ledger: List[Dict[str, Any]]) -> int:
+    """
+    Punti iniziali della equity curve (ordinata per created_at) che nessuna pick
+    aperta può più precedere: created_at < created_at della pick aperta più vecchia.
+    """
+    open_keys = [p.get("created_at") or "" for p in ledger if not p.get("settled")]
+    settled = [p.get("created_at") or "" for p in ledger if p.get("settled")]
+    if not open_keys:
+        return len(settled)
+    oldest = min(open_keys)
+    return sum(1 for c in settled if c < oldest)
+
+
+def _equity_volatility(equity: List[float], windows: List[int], index: Any = None) -> Dict[str, float]:
+    """
+    Deviazione standard degli ultimi w incrementi di equity per ogni finestra.
+    `index`: RollingIndex già costruito sulla stessa curva (motore fused),
+    altrimenti viene costruito qui; ogni finestra è O(1) sulle somme prefisse.
+    """
     out: Dict[str, float] = {}
     if not equity or len(equity) < 2:
         return out
-    increments = [equity[i] - equity[i - 1] for i in range(1, len(equity))]
-    if not increments:
-        return out
+    if index is None:
+        from analytics.roi_rolling import RollingIndex
+        index = RollingIndex.from_equity(equity)
     for w in windows:
-        slice_inc = increments[-w:] if len(increments) > w else increments
-        if len(slice_inc) > 1:
-            m = sum(slice_inc) / len(slice_inc)
-            var = sum((x - m) ** 2 for x in slice_inc) / len(slice_inc)
-            out[f"w{w}"] = round(math.sqrt(var), 6)
-        else:
-            out[f"w{w}"] = 0.0
+        out[f"w{w}"] = round(index.volatility(w), 6)
     return out
 
 
@@ -869,11 +995,12 @@ def _equity_volatility(equity: List[float], windows: List[int]) -> Dict[str, flo
 # Profit distribution
 # ============================================================
 
-def _profit_distribution(contribs: List[float]) -> Dict[str, Any]:
+def _profit_distribution(contribs: List[float], sorted_contribs: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """`sorted_contribs`: contributi già ordinati (indice quantili del motore fused)."""
     s = get_settings()
     if not s.enable_roi_profit_distribution or not contribs:
         return {}
-    arr = sorted(contribs)
+    arr = sorted_contribs if sorted_contribs is not None else sorted(contribs)
 
     def pct(p: float) -> float:
         k = int(round(p * (len(arr) - 1)))
@@ -1273,6 +1400,10 @@ def _payout_moments(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
     if not s.enable_roi_payout_moments:
         return {}
     contribs = [_profit_contribution(p) for p in ledger if p.get("settled")]
+    return _payout_moments_from_contribs(contribs)
+
+
+def _payout_moments_from_contribs(contribs: List[float]) -> Dict[str, Any]:
     if len(contribs) < 5:
         return {}
     n = len(contribs)
@@ -1311,10 +1442,21 @@ def _archive_stats(base: Path) -> Dict[str, Any]:
     s = get_settings()
     if not s.enable_roi_archive_stats:
         return {}
-    archive = load_ledger_archive(base)
-    if not archive:
-        return {}
-    stats = _compute_profit_and_stats(archive)
+    if s.enable_roi_archive_partitions:
+        # totali dal manifest, senza leggere i segmenti
+        from analytics.roi_archive import archive_totals
+        stats = archive_totals(base)
+        legacy = _load_json(base / "ledger_archive.json")
+        if isinstance(legacy, list) and legacy:
+            # layout monolitico non ancora migrato (migrazione al primo prune)
+            stats = _compute_profit_and_stats(load_ledger_archive(base))
+        if not stats["picks"]:
+            return {}
+    else:
+        archive = load_ledger_archive(base)
+        if not archive:
+            return {}
+        stats = _compute_profit_and_stats(archive)
     return {
         "archived_picks": stats["picks"],
         "archived_settled": stats["settled"],
@@ -1328,32 +1470,20 @@ def _montecarlo_equity_sim(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
     s = get_settings()
     if not s.enable_roi_montecarlo:
         return {}
-    settled = [p for p in ledger if p.get("settled")]
-    if len(settled) < 10:
+    contribs_all = [_profit_contribution(p) for p in ledger if p.get("settled")]
+    return _montecarlo_from_contribs(contribs_all)
+
+
+def _montecarlo_from_contribs(contribs_all: List[float]) -> Dict[str, Any]:
+    s = get_settings()
+    if len(contribs_all) < 10:
         return {}
     window = s.roi_mc_window
-    contribs = [_profit_contribution(p) for p in settled][-window:]
+    contribs = contribs_all[-window:]
     if not contribs:
         return {}
     runs = max(10, s.roi_mc_runs)
-    final_equities: List[float] = []
-    for _ in range(runs):
-        sample = [random.choice(contribs) for __ in range(len(contribs))]
-        equity = sum(sample)
-        final_equities.append(equity)
-    final_equities.sort()
-
-    def pct(arr: List[float], p: float) -> float:
-        k = int(round(p * (len(arr) - 1)))
-        return arr[k]
-
-    return {
-        "runs": runs,
-        "sample_size": len(contribs),
-        "p05_final_equity": round(pct(final_equities, 0.05), 6),
-        "p50_final_equity": round(pct(final_equities, 0.50), 6),
-        "p95_final_equity": round(pct(final_equities, 0.95), 6),
-    }
+    return simulate_equity_paths(contribs, runs, seed=s.roi_mc_seed, chunk=s.roi_mc_chunk)
 
 
 def _profit_buckets(ledger: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -1588,6 +1718,39 @@ def _regime_apply_smoothing(raw_mom: float, prev_smooth: Optional[float], s) ->
     return alpha * raw_mom + (1 - alpha) * prev_smooth
 
 
+def _regime_hold(
+    prev_label: Optional[str], hold_counter: int, label_raw: str, min_hold: int
+) -> Tuple[str, int, bool]:
+    """Hold logic: (label finale, hold_counter, changed)."""
+    if prev_label and prev_label != label_raw:
+        if hold_counter + 1 < min_hold:
+            # Manteniamo precedente
+            return prev_label, hold_counter + 1, False
+        # Accettiamo cambio
+        return label_raw, 0, True
+    # Continuazione stato (reset se stabile) o primo stato
+    return label_raw, 0, prev_label != label_raw
+
+
+def _regime_durations(history: List[Dict[str, Any]]) -> Dict[str, int]:
+    # Durations (primitive): approssimate contando occorrenze consecutive.
+    durations: Dict[str, int] = {}
+    last_label = None
+    streak = 0
+    for h in history:
+        lab = h.get("label")
+        if lab == last_label:
+            streak += 1
+        else:
+            if last_label is not None:
+                durations[last_label] = max(durations.get(last_label, 0), streak)
+            last_label = lab
+            streak = 1
+    if last_label is not None:
+        durations[last_label] = max(durations.get(last_label, 0), streak)
+    return durations
+
+
 def _regime_block_stub(equity_curve: List[float], s) -> Dict[str, Any]:
     if not equity_curve or len(equity_curve) < 5:
         return {"label": "neutral", "confidence": 0.1, "drawdown_pct": 0.0, "volatility": 0.0}
@@ -1643,28 +1806,10 @@ def _regime_block_m1(base: Path, equity_curve: List[float], s) -> Dict[str, Any]
 
     label_raw, conf_raw = _regime_classify_m1(feat, s, smooth_mom)
 
-    # Hold logic
     prev_label = prev_state.get("label")
-    hold_counter = prev_state.get("hold_counter", 0)
-    changed = False
-    label_final = label_raw
-
-    if prev_label and prev_label != label_raw:
-        if hold_counter + 1 < s.roi_regime_min_hold:
-            # Manteniamo precedente
-            label_final = prev_label
-            hold_counter += 1
-        else:
-            # Accettiamo cambio
-            changed = True
-            hold_counter = 0
-    else:
-        # Continuazione stato o nessun prev
-        if prev_label == label_raw:
-            hold_counter = 0  # reset se stabile
-        else:
-            changed = True  # primo stato
-            hold_counter = 0
+    label_final, hold_counter, changed = _regime_hold(
+        prev_label, prev_state.get("hold_counter", 0), label_raw, s.roi_regime_min_hold
+    )
 
     now_ts = _now_iso()
     history = prev_state.get("history", []) if s.enable_roi_regime_persistence else []
@@ -1678,23 +1823,7 @@ def _regime_block_m1(base: Path, equity_curve: List[float], s) -> Dict[str, Any]
         if len(history) > max_hist:
             history = history[-max_hist:]
 
-    # Durations (primitive)
-    durations: Dict[str, int] = {}
-    if history:
-        # We approximate duration by counting consecutive occurrences.
-        last_label = None
-        streak = 0
-        for h in history:
-            lab = h.get("label")
-            if lab == last_label:
-                streak += 1
-            else:
-                if last_label is not None:
-                    durations[last_label] = max(durations.get(last_label, 0), streak)
-                last_label = lab
-                streak = 1
-        if last_label is not None:
-            durations[last_label] = max(durations.get(last_label, 0), streak)
+    durations = _regime_durations(history)
 
     regime_block = {
         "label": label_final,
@@ -1737,15 +1866,22 @@ def _regime_block_m1(base: Path, equity_curve: List[float], s) -> Dict[str, Any]
     return regime_block
 
 
-def _regime_block(base: Path, equity_curve: List[float]) -> Dict[str, Any]:
+def _regime_block(
+    base: Path, equity_curve: List[float], settled: Optional[int] = None, frozen: Optional[int] = None
+) -> Dict[str, Any]:
     """
-    Wrapper che seleziona stub o m1.
+    Wrapper che seleziona stub o m1 (online con ENABLE_ROI_REGIME_ONLINE).
+    `settled`: punti settled totali (equity_curve può essere la sola coda).
+    `frozen`: punti iniziali che nessuna pick aperta può più precedere.
     """
     s = get_settings()
     if not s.enable_roi_regime:
         return {}
     version = s.roi_regime_version
     if version == "m1":
+        if s.enable_roi_regime_online:
+            from analytics.roi_regime import regime_block_online
+            return regime_block_online(base, equity_curve, s, settled, frozen)
         return _regime_block_m1(base, equity_curve, s)
     return _regime_block_stub(equity_curve, s)
 
@@ -1754,12 +1890,17 @@ def _regime_block(base: Path, equity_curve: List[float]) -> Dict[str, Any]:
 # Pruning / Archive
 # ============================================================
 
-def _prune_ledger(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    s = get_settings()
+def _prune_ledger(
+    base: Path, ledger: List[Dict[str, Any]], settings: Optional[Settings] = None
+) -> List[Dict[str, Any]]:
+    s = settings or get_settings()
     if s.roi_ledger_max_picks <= 0 and s.roi_ledger_max_age_days <= 0:
         return ledger
     archive_enabled = s.enable_roi_ledger_archive
-    archive = load_ledger_archive(base) if archive_enabled else []
+    partitioned = archive_enabled and s.enable_roi_archive_partitions
+    # layout monolitico: l'archivio intero viene riletto e riscritto ad ogni prune
+    archive = load_ledger_archive(base) if archive_enabled and not partitioned else []
+    archived: List[Dict[str, Any]] = []
     ledger.sort(key=lambda p: p.get("created_at") or "")
     original_len = len(ledger)
 
@@ -1776,7 +1917,7 @@ def _prune_ledger(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, An
                 kept.append(p)
         ledger = kept
         if archive_enabled and removed:
-            archive.extend(removed)
+            archived.extend(removed)
 
     # Count pruning
     if s.roi_ledger_max_picks > 0 and len(ledger) > s.roi_ledger_max_picks:
@@ -1784,9 +1925,15 @@ def _prune_ledger(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, An
         removed = ledger[:overflow]
         ledger = ledger[overflow:]
         if archive_enabled and removed:
-            archive.extend(removed)
-
-    if archive_enabled and archive:
+            archived.extend(removed)
+
+    if partitioned:
+        from analytics.roi_archive import append_to_archive, migrate_legacy_archive
+        migrate_legacy_archive(base)
+        if archived:
+            append_to_archive(base, archived)
+    elif archive_enabled and archived:
+        archive.extend(archived)
         save_ledger_archive(base, archive)
     if len(ledger) != original_len:
         logger.info(
@@ -1794,7 +1941,7 @@ def _prune_ledger(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, An
             extra={
                 "before": original_len,
                 "after": len(ledger),
-                "archived": len(archive) if archive_enabled else 0,
+                "archived": len(archived) if partitioned else len(archive),
             },
         )
     return ledger
@@ -1804,62 +1951,139 @@ def _prune_ledger(base: Path, ledger: List[Dict[str, Any]]) -> List[Dict[str, An
 # Metrics assembly
 # ============================================================
 
-def compute_metrics(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _legacy_blocks(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Motore legacy: un helper per blocco, ognuno riscansiona il ledger.
+    Mantenuto come riferimento (ROI_METRICS_ENGINE=legacy) per verificare il motore fused.
+    """
     global_stats = _compute_profit_and_stats(ledger)
 
     pred_picks = [p for p in ledger if p.get("source") == "prediction"]
     cons_picks = [p for p in ledger if p.get("source") == "consensus"]
     merged_picks = [p for p in ledger if p.get("source") == "merged"]
-    pred_stats = _compute_profit_and_stats(pred_picks)
-    cons_stats = _compute_profit_and_stats(cons_picks)
-    merged_stats = _compute_profit_and_stats(merged_picks)
 
-    legacy_roll = _legacy_single_rolling(ledger)
     rolling_multi = _rolling_window_stats_multi(ledger)
-    eq = _equity_stats(ledger)
-    streaks = _streak_stats(ledger)
     clv_base = _clv_aggregate(ledger)
-    clv_block = _finalize_clv_block(clv_base, global_stats["yield"]) if clv_base else {}
-    risk = _risk_metrics(ledger)
-    stake_bd = _stake_breakdown(ledger)
-    source_bd = _source_breakdown(ledger)
-    latency = _latency_metrics(ledger)
     deciles = _edge_deciles(ledger)
-    deciles = _enhance_deciles(deciles, ledger)
-    league_bd = _league_breakdown(ledger)
-    time_bd = _time_buckets(ledger)
-    edge_buckets = _edge_buckets(ledger)
-    profit_norm = _profit_normalizations(ledger)
 
-    equity_curve = _equity_curve_settled(ledger)
+    return {
+        "global_stats": global_stats,
+        "pred_stats": _compute_profit_and_stats(pred_picks),
+        "cons_stats": _compute_profit_and_stats(cons_picks),
+        "merged_stats": _compute_profit_and_stats(merged_picks),
+        "legacy_roll": _legacy_single_rolling(ledger),
+        "rolling_multi": rolling_multi,
+        "eq": _equity_stats(ledger),
+        "streaks": _streak_stats(ledger),
+        "clv_block": _finalize_clv_block(clv_base, global_stats["yield"]) if clv_base else {},
+        "risk": _risk_metrics(ledger),
+        "stake_bd": _stake_breakdown(ledger),
+        "source_bd": _source_breakdown(ledger),
+        "latency": _latency_metrics(ledger),
+        "deciles": _enhance_deciles(deciles, ledger),
+        "league_bd": _league_breakdown(ledger),
+        "time_bd": _time_buckets(ledger),
+        "edge_buckets": _edge_buckets(ledger),
+        "profit_norm": _profit_normalizations(ledger),
+        "equity_curve": _equity_curve_settled(ledger),
+        "series_frozen": _series_frozen_points(ledger),
+        "profit_distribution": _profit_distribution(
+            [_profit_contribution(p) for p in ledger if p.get("settled")]
+        ),
+        "risk_of_ruin": _risk_of_ruin_approx(ledger),
+        "source_eff": _compute_source_efficiency(ledger),
+        "edge_clv_corr": _edge_clv_corr(ledger),
+        "aging_b": _aging_buckets_stats(ledger),
+        "side_bd": _side_breakdown(ledger),
+        "clv_buckets": _clv_buckets_distribution(ledger),
+        "hit_rate_multi": _hit_rate_multi(rolling_multi),
+        "kelly_eff": _kelly_effectiveness(ledger),
+        "payout_mom": _payout_moments(ledger),
+        "profit_buckets": _profit_buckets(ledger),
+        "montecarlo_block": _montecarlo_equity_sim(ledger),
+        "market_placeholder": _market_placeholder_block(ledger),
+    }
+
+
+def compute_metrics(ledger: List[Dict[str, Any]], state: Any = None) -> Dict[str, Any]:
+    """
+    `state`: RoiAggregateState opzionale (ENABLE_ROI_INCREMENTAL); i blocchi
+    ricavabili dagli aggregati persistiti non vengono ricalcolati dal ledger.
+    Con ENABLE_ROI_LAZY_BLOCKS le sezioni lazy non sono calcolate né incluse
+    (analytics.roi_blocks.resolve_blocks).
+    """
+    s = get_settings()
+    lazy: set = set()
+    if s.enable_roi_lazy_blocks:
+        from analytics.roi_blocks import lazy_engine_keys
+        lazy = lazy_engine_keys(s)
+    if s.roi_metrics_engine == "legacy":
+        with profile_section("blocks", "legacy"):
+            blocks = _legacy_blocks(ledger)
+    else:
+        from analytics.roi_engine import compute_blocks_fused
+        preset = None
+        if state is not None:
+            from analytics.roi_state import incremental_supported
+            if incremental_supported(s):
+                preset = state.blocks(s)
+        blocks = compute_blocks_fused(ledger, preset=preset, skip=lazy)
+    with profile_section("blocks", "assemble"):
+        metrics = _assemble_metrics(blocks)
+    if lazy:
+        from analytics.roi_blocks import strip_lazy
+        strip_lazy(metrics, s)
+    return metrics
+
+
+def _assemble_metrics(blocks: Dict[str, Any]) -> Dict[str, Any]:
     s = get_settings()
+    global_stats = blocks["global_stats"]
+    pred_stats = blocks["pred_stats"]
+    cons_stats = blocks["cons_stats"]
+    merged_stats = blocks["merged_stats"]
+    legacy_roll = blocks["legacy_roll"]
+    rolling_multi = blocks["rolling_multi"]
+    eq = blocks["eq"]
+    streaks = blocks["streaks"]
+    clv_block = blocks["clv_block"]
+    risk = blocks["risk"]
+    stake_bd = blocks["stake_bd"]
+    source_bd = blocks["source_bd"]
+    latency = blocks["latency"]
+    deciles = blocks["deciles"]
+    league_bd = blocks["league_bd"]
+    time_bd = blocks["time_bd"]
+    edge_buckets = blocks["edge_buckets"]
+    profit_norm = blocks["profit_norm"]
+
+    equity_curve = blocks["equity_curve"]
     equity_vol = {}
     if s.enable_roi_equity_vol:
-        equity_vol = _equity_volatility(equity_curve, s.roi_equity_vol_windows)
+        equity_vol = _equity_volatility(equity_curve, s.roi_equity_vol_windows, blocks.get("rolling_index"))
     if isinstance(risk.get("equity_vol"), dict):
         risk["equity_vol"].update(equity_vol)
     else:
         risk["equity_vol"] = equity_vol
 
-    contribs_all = [_profit_contribution(p) for p in ledger if p.get("settled")]
-    profit_distribution = _profit_distribution(contribs_all)
-    risk_of_ruin = _risk_of_ruin_approx(ledger)
-    source_eff = _compute_source_efficiency(ledger)
-    edge_clv_corr = _edge_clv_corr(ledger)
-    aging_b = _aging_buckets_stats(ledger)
-    side_bd = _side_breakdown(ledger)
-    clv_buckets = _clv_buckets_distribution(ledger)
-    hit_rate_multi = _hit_rate_multi(rolling_multi)
-
-    kelly_eff = _kelly_effectiveness(ledger)
-    payout_mom = _payout_moments(ledger)
-    profit_buckets = _profit_buckets(ledger)
-    montecarlo_block = _montecarlo_equity_sim(ledger)
-    market_placeholder = _market_placeholder_block(ledger)
+    profit_distribution = blocks["profit_distribution"]
+    risk_of_ruin = blocks["risk_of_ruin"]
+    source_eff = blocks["source_eff"]
+    edge_clv_corr = blocks["edge_clv_corr"]
+    aging_b = blocks["aging_b"]
+    side_bd = blocks["side_bd"]
+    clv_buckets = blocks["clv_buckets"]
+    hit_rate_multi = blocks["hit_rate_multi"]
+
+    kelly_eff = blocks["kelly_eff"]
+    payout_mom = blocks["payout_mom"]
+    profit_buckets = blocks["profit_buckets"]
+    montecarlo_block = blocks["montecarlo_block"]
+    market_placeholder = blocks["market_placeholder"]
     archive_block = _archive_stats(Path(s.bet_data_dir or "data") / s.roi_dir)
 
     base = Path(s.bet_data_dir or "data") / s.roi_dir
-    regime_block = _regime_block(base, equity_curve)
+    regime_block = _regime_block(base, equity_curve, global_stats["settled"], blocks.get("series_frozen"))
 
     metrics_version = "2.0"
     if s.enable_roi_regime and s.roi_regime_version == "m1":
@@ -1975,7 +2199,18 @@ def compute_metrics(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
 
 
 def save_metrics(base: Path, metrics: Dict[str, Any]) -> None:
-    _save_json_atomic(base / "roi_metrics.json", metrics)
+    # artefatto pubblicato: nella generazione del ciclo se ENABLE_GENERATIONS
+    generations.write_artifact(base / "roi_metrics.json", metrics)
+
+
+def _save_timings(base: Path, metrics: Dict[str, Any], timings: Dict[str, Any]) -> None:
+    """
+    ENABLE_ROI_PROFILING: riscrive roi_metrics.json con la sezione `_timings`
+    a fine ciclo (dopo timeline ed export, che non devono vederla).
+    """
+    metrics["_timings"] = timings
+    save_metrics(base, metrics)
+    logger.info("roi_profiling", extra={"total_sec": timings.get("total_sec")})
 
 
 # ============================================================
@@ -1985,7 +2220,7 @@ def save_metrics(base: Path, metrics: Dict[str, Any]) -> None:
 def _read_effective_threshold() -> Optional[float]:
     s = get_settings()
     base = Path(s.bet_data_dir or "data")
-    path = base / s.value_alerts_dir / "value_alerts.json"
+    path = generations.artifact_path(base / s.value_alerts_dir / "value_alerts.json")
     raw = _load_json(path)
     if not raw:
         return None
@@ -2142,17 +2377,63 @@ def build_or_update_roi(fixtures: List[Dict[str, Any]]) -> None:
     base = Path(s.bet_data_dir or "data") / s.roi_dir
     base.mkdir(parents=True, exist_ok=True)
 
-    ledger = load_ledger(base)
-    ledger = _prune_ledger(base, ledger)
-    ledger_index = {
-        (p.get("fixture_id"), p.get("source")): p
-        for p in ledger
-        if p.get("fixture_id")
-    }
-
-    fixtures_map = load_fixtures_map(fixtures)
-    alerts = load_value_alerts()
+    with profiling_session() as prof:
+        with profile_section("stages", "load"):
+            ledger = load_ledger(base)
+        loaded_len = len(ledger)
+        with profile_section("stages", "prune"):
+            ledger = _prune_ledger(base, ledger)
+        pruned = len(ledger) != loaded_len
+        ledger_index, open_index = _build_ledger_indexes(ledger)
+
+        with profile_section("stages", "alerts"):
+            fixtures_map = load_fixtures_map(fixtures)
+            odds_latest_index = load_odds_latest_index()
+            created_picks = _create_picks(
+                ledger,
+                ledger_index,
+                open_index,
+                load_value_alerts(),
+                fixtures_map,
+                load_predictions_index(),
+                load_consensus_index(),
+                odds_latest_index,
+                _now_iso(),
+            )
 
+        with profile_section("stages", "settlement"):
+            finished = {
+                fid: (fx.get("home_score"), fx.get("away_score"))
+                for fid, fx in fixtures_map.items()
+                if fx.get("status") == "FT"
+            }
+            settled_picks = _settle_open_picks(open_index, finished, odds_latest_index)
+        metrics = _persist_and_publish(base, ledger, created_picks, settled_picks, pruned)
+        if prof is not None:
+            _save_timings(base, metrics, prof.result())
+
+
+def _create_picks(
+    ledger: List[Dict[str, Any]],
+    ledger_index: Dict[Tuple[Any, Any], Dict[str, Any]],
+    open_index: Dict[int, List[Dict[str, Any]]],
+    alerts: List[Dict[str, Any]],
+    fixtures_map: Dict[int, Dict[str, Any]],
+    predictions_index: Dict[int, Dict[str, Any]],
+    consensus_index: Dict[int, Dict[str, Any]],
+    odds_latest_index: Dict[int, Dict[str, Any]],
+    now_ts: str,
+    today_count: Optional[int] = None,
+    settings: Optional[Settings] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Alert → pick per un ciclo, tutto in memoria: nuove pick appese a ledger e
+    indici. Condiviso da build_or_update_roi e dal backtest (analytics.roi_backtest).
+    today_count: pick già create nel giorno di now_ts, se il chiamante lo tiene
+    aggiornato (evita la scansione del ledger per il rate limit giornaliero).
+    settings: Settings esplicite (override del backtest), default get_settings().
+    """
+    s = settings or get_settings()
     if s.merged_dedup_enable:
         merged_pairs = {
             (a.get("fixture_id"), a.get("value_side"))
@@ -2173,18 +2454,17 @@ def build_or_update_roi(fixtures: List[Dict[str, Any]]) -> None:
     include_merged = s.roi_include_merged
     default_stake_units = s.roi_stake_units
 
-    predictions_index = load_predictions_index()
-    consensus_index = load_consensus_index()
-    odds_latest_index = load_odds_latest_index()
-
-    now_ts = _now_iso()
+    created_picks: List[Dict[str, Any]] = []
     today = now_ts[:10]
     daily_limit = s.roi_max_new_picks_per_day
     rate_limit_strict = s.roi_rate_limit_strict
-    existing_today = sum(
-        1 for p in ledger
-        if isinstance(p.get("created_at"), str) and p["created_at"][:10] == today
-    )
+    if today_count is not None:
+        existing_today = today_count
+    else:
+        existing_today = sum(
+            1 for p in ledger
+            if isinstance(p.get("created_at"), str) and p["created_at"][:10] == today
+        )
 
     accepted_sources = {"prediction"}
     if include_consensus:
@@ -2277,7 +2557,7 @@ def build_or_update_roi(fixtures: List[Dict[str, Any]]) -> None:
         snapshot_block = None
         entry = odds_latest_index.get(fid)
         if entry:
-            snapshot_block = _build_snapshot(entry)
+            snapshot_block = _build_snapshot(entry, s)
 
         pick = {
             "created_at": now_ts,
@@ -2301,60 +2581,146 @@ def build_or_update_roi(fixtures: List[Dict[str, Any]]) -> None:
 
         if fx and fx.get("league_id") is not None:
             pick["league_id"] = fx.get("league_id")
+        if fx:
+            # spazio id di fixture_id (settlement da risultati di altri provider)
+            pick["provider"] = fx.get("provider") or DEFAULT_FIXTURE_PROVIDER
 
         if snapshot_block:
             pick.update(snapshot_block)
 
         ledger.append(pick)
         ledger_index[key] = pick
+        open_index.setdefault(fid, []).append(pick)
+        created_picks.append(pick)
         existing_today += 1
+    return created_picks
+
 
-    enable_clv = s.enable_clv_capture
+def _build_ledger_indexes(
+    ledger: List[Dict[str, Any]],
+) -> Tuple[Dict[Tuple[Any, Any], Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]:
+    """
+    Un solo passaggio sul ledger:
+    - ledger_index: (fixture_id, source) -> pick (dedup creazione)
+    - open_index: fixture_id -> pick aperte (settlement come join con i risultati)
+    """
+    ledger_index: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    open_index: Dict[int, List[Dict[str, Any]]] = {}
     for p in ledger:
-        if p.get("settled"):
-            continue
         fid = p.get("fixture_id")
-        if not isinstance(fid, int):
-            continue
-        fx = fixtures_map.get(fid)
-        if not fx or fx.get("status") != "FT":
-            continue
-        outcome = _outcome_from_scores(fx.get("home_score"), fx.get("away_score"))
+        if fid:
+            ledger_index[(fid, p.get("source"))] = p
+        if not p.get("settled") and isinstance(fid, int):
+            open_index.setdefault(fid, []).append(p)
+    return ledger_index, open_index
+
+
+def _pick_provider(p: Dict[str, Any]) -> str:
+    """Spazio id del fixture_id della pick (pick senza tag: API-Football)."""
+    return p.get("provider") or DEFAULT_FIXTURE_PROVIDER
+
+
+def _settle_open_picks(
+    open_index: Dict[int, List[Dict[str, Any]]],
+    finished: Dict[int, Tuple[Any, Any]],
+    odds_latest_index: Dict[int, Dict[str, Any]],
+    settled_at: Optional[str] = None,
+    provider: Optional[str] = None,
+    settings: Optional[Settings] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Join tra risultati finali (fixture_id -> (home_score, away_score)) e
+    pick aperte. Le pick settled vengono rimosse da open_index.
+    `provider`: spazio id dei risultati; solo le pick dello stesso provider
+    vengono settled (None = stesso feed che ha creato le pick, nessun filtro).
+    """
+    enable_clv = (settings or get_settings()).enable_clv_capture
+    if len(finished) <= len(open_index):
+        fids = [fid for fid in finished if fid in open_index]
+    else:
+        fids = [fid for fid in open_index if fid in finished]
+    settled: List[Dict[str, Any]] = []
+    for fid in fids:
+        home_score, away_score = finished[fid]
+        outcome = _outcome_from_scores(home_score, away_score)
         if not outcome:
             continue
-        side = p.get("side")
-        stake = float(p.get("stake", 1.0))
-        decimal_odds = float(p.get("decimal_odds", 2.0))
-        if side == outcome:
-            p["result"] = "win"
-            p["payout"] = round(decimal_odds * stake, 6)
+        picks = open_index.pop(fid)
+        if provider is not None:
+            other = [p for p in picks if _pick_provider(p) != provider]
+            if other:
+                open_index[fid] = other
+                picks = [p for p in picks if _pick_provider(p) == provider]
+        for p in picks:
+            _apply_settlement(p, outcome, odds_latest_index.get(fid) if enable_clv else None, settled_at)
+            settled.append(p)
+    return settled
+
+
+def _apply_settlement(
+    p: Dict[str, Any],
+    outcome: str,
+    closing_entry: Optional[Dict[str, Any]],
+    settled_at: Optional[str] = None,
+) -> None:
+    side = p.get("side")
+    stake = float(p.get("stake", 1.0))
+    decimal_odds = float(p.get("decimal_odds", 2.0))
+    if side == outcome:
+        p["result"] = "win"
+        p["payout"] = round(decimal_odds * stake, 6)
+    else:
+        p["result"] = "loss"
+        p["payout"] = 0.0
+    p["settled"] = True
+    p["settled_at"] = settled_at or _now_iso()
+
+    if closing_entry:
+        market = closing_entry.get("market")
+        if isinstance(market, dict):
+            closing_odds = market.get(side)
+            if isinstance(closing_odds, (int, float)) and closing_odds > 1.01:
+                p["closing_decimal_odds"] = round(float(closing_odds), 6)
+                try:
+                    clv_pct = (float(closing_odds) - decimal_odds) / decimal_odds
+                except ZeroDivisionError:
+                    clv_pct = 0.0
+                p["clv_pct"] = round(clv_pct, 6)
+
+
+def _persist_and_publish(
+    base: Path,
+    ledger: List[Dict[str, Any]],
+    created_picks: List[Dict[str, Any]],
+    settled_picks: List[Dict[str, Any]],
+    pruned: bool,
+) -> Dict[str, Any]:
+    s = get_settings()
+    with profile_section("stages", "save"):
+        save_ledger_changes(base, ledger, created_picks, settled_picks, rewrite=pruned)
+    state = None
+    if s.enable_roi_incremental:
+        from analytics.roi_state import update_aggregate_state
+        with profile_section("stages", "state"):
+            state = update_aggregate_state(base, ledger, created_picks, settled_picks, pruned=pruned)
+    with profile_section("stages", "metrics"):
+        metrics = compute_metrics(ledger, state=state)
+    if s.enable_roi_lazy_blocks:
+        from analytics.roi_blocks import lazy_block_names, publish_ledger_version
+        metrics["ledger_version"] = publish_ledger_version(ledger, created_picks, settled_picks, pruned)
+        metrics["lazy_blocks"] = lazy_block_names(s)
+    with profile_section("stages", "save"):
+        save_metrics(base, metrics)
+    with profile_section("stages", "timeline"):
+        _append_timeline(base, metrics)
+    with profile_section("stages", "exports"):
+        if s.enable_roi_stream_export:
+            from analytics.roi_export import write_stream_export
+            write_stream_export(base, ledger, created_picks, settled_picks, rebuild=pruned)
         else:
-            p["result"] = "loss"
-            p["payout"] = 0.0
-        p["settled"] = True
-        p["settled_at"] = _now_iso()
-
-        if enable_clv:
-            closing_entry = odds_latest_index.get(fid)
-            if closing_entry:
-                market = closing_entry.get("market")
-                if isinstance(market, dict):
-                    closing_odds = market.get(side)
-                    if isinstance(closing_odds, (int, float)) and closing_odds > 1.01:
-                        p["closing_decimal_odds"] = round(float(closing_odds), 6)
-                        try:
-                            clv_pct = (float(closing_odds) - decimal_odds) / decimal_odds
-                        except ZeroDivisionError:
-                            clv_pct = 0.0
-                        p["clv_pct"] = round(clv_pct, 6)
-
-    save_ledger(base, ledger)
-    metrics = compute_metrics(ledger)
-    save_metrics(base, metrics)
-    _append_timeline(base, metrics)
-    _write_roi_csv_export(ledger, metrics)
-    _export_schema_if_enabled(base, metrics)
-    _compact_export(base, metrics)
+            _write_roi_csv_export(ledger, metrics)
+        _export_schema_if_enabled(base, metrics)
+        _compact_export(base, metrics)
 
     logger.info(
         "roi_updated",
@@ -2365,6 +2731,73 @@ def build_or_update_roi(fixtures: List[Dict[str, Any]]) -> None:
             "version": metrics.get("metrics_version"),
         },
     )
+    return metrics
+
+
+def _result_entry(rec: Dict[str, Any]) -> Optional[Tuple[str, int, Tuple[Any, Any]]]:
+    """
+    Normalizza un risultato finale in (provider, fixture_id, punteggio):
+    record di history/results.jsonl (football-data: id / status FINISHED /
+    fullTime → id football-data.org) o fixture normalizzata (fixture_id /
+    status FT / home_score, away_score; provider dal campo "provider").
+    """
+    if "fullTime" in rec:
+        fid = rec.get("id")
+        if not isinstance(fid, int) or rec.get("status") not in (None, "FINISHED", "FT"):
+            return None
+        ft = rec.get("fullTime") or {}
+        return FOOTBALL_DATA_PROVIDER, fid, (ft.get("home"), ft.get("away"))
+    fid = rec.get("fixture_id")
+    if not isinstance(fid, int) or rec.get("status") != "FT":
+        return None
+    return rec.get("provider") or DEFAULT_FIXTURE_PROVIDER, fid, (rec.get("home_score"), rec.get("away_score"))
+
+
+def settle_results_batch(results: List[Dict[str, Any]]) -> int:
+    """
+    Settlement di un batch di risultati finali (es. backlog da
+    scripts/fetch_results_football_data.py) senza passare per il ciclo
+    completo: nessuna nuova pick, metriche ricalcolate una sola volta.
+    Il join è per (provider, fixture_id): un id football-data.org non
+    settla mai una pick creata da fixture API-Football (e viceversa).
+    Ritorna il numero di pick settled.
+    """
+    s = get_settings()
+    if not s.enable_roi_tracking:
+        return 0
+    base = Path(s.bet_data_dir or "data") / s.roi_dir
+    if not (base / "ledger.json").exists():
+        return 0
+
+    finished: Dict[str, Dict[int, Tuple[Any, Any]]] = {}
+    for rec in results:
+        if isinstance(rec, dict):
+            entry = _result_entry(rec)
+            if entry:
+                finished.setdefault(entry[0], {})[entry[1]] = entry[2]
+
+    with profiling_session() as prof:
+        with profile_section("stages", "load"):
+            ledger = load_ledger(base)
+        _, open_index = _build_ledger_indexes(ledger)
+        with profile_section("stages", "settlement"):
+            odds_index = load_odds_latest_index()
+            settled_picks = []
+            for provider, by_id in finished.items():
+                settled_picks.extend(_settle_open_picks(open_index, by_id, odds_index, provider=provider))
+        if settled_picks:
+            metrics = _persist_and_publish(base, ledger, [], settled_picks, pruned=False)
+            if prof is not None:
+                _save_timings(base, metrics, prof.result())
+    logger.info(
+        "roi_results_batch_settled",
+        extra={
+            "results": sum(len(v) for v in finished.values()),
+            "settled": len(settled_picks),
+            "open_left": len(open_index),
+        },
+    )
+    return len(settled_picks)
 
 
 # ============================================================
@@ -2376,7 +2809,7 @@ def load_roi_summary() -> Optional[Dict[str, Any]]:
     if not s.enable_roi_tracking:
         return None
     base = Path(s.bet_data_dir or "data") / s.roi_dir
-    metrics = _load_json(base / "roi_metrics.json")
+    metrics = _load_json(generations.artifact_path(base / "roi_metrics.json"))
     if not metrics:
         return None
     return metrics
@@ -2405,7 +2838,7 @@ def load_roi_timeline_raw() -> List[Dict[str, Any]]:
             if not line:
                 continue
             try:
-                rec = json.loads(line)
+                rec = jsoncodec.loads(line)
                 if isinstance(rec, dict):
                     out.append(rec)
             except Exception:
@@ -2415,12 +2848,52 @@ def load_roi_timeline_raw() -> List[Dict[str, Any]]:
     return out
 
 
+def query_roi_timeline(
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Record timeline ordinati per ts, filtrati per giorno (YYYY-MM-DD) e troncati agli ultimi `limit`."""
+    s = get_settings()
+    if not s.enable_roi_tracking or not s.enable_roi_timeline:
+        return []
+    base = Path(s.bet_data_dir or "data") / s.roi_dir
+    if s.enable_roi_timeline_store:
+        from analytics.roi_timeline import query_timeline
+
+        try:
+            return query_timeline(base / s.roi_timeline_file, start_day, end_day, limit)
+        except Exception as exc:
+            logger.error("timeline_query_failed %s", exc)
+            return []
+    raw = load_roi_timeline_raw()
+    raw.sort(key=lambda r: str(r.get("ts") or ""))
+    out: List[Dict[str, Any]] = []
+    for r in raw:
+        ts = r.get("ts")
+        if not ts or not isinstance(ts, str):
+            continue
+        day = ts[:10]
+        try:
+            datetime.strptime(day, "%Y-%m-%d")
+        except Exception:
+            continue
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        out.append(r)
+    return out[-limit:] if limit is not None else out
+
+
 def load_roi_daily() -> Dict[str, Any]:
     s = get_settings()
     if not s.enable_roi_tracking or not s.enable_roi_timeline:
         return {}
     base = Path(s.bet_data_dir or "data") / s.roi_dir
     path = base / s.roi_daily_file
+    if s.enable_roi_timeline_store:
+        from analytics.roi_timeline import load_daily_rollup
+
+        return load_daily_rollup(path)
     data = _load_json(path)
     if isinstance(data, dict):
         return data
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from core import jsoncodec
+from core.config import get_settings
+from core.logging import get_logger
+from analytics.roi import _load_json, _save_json_atomic
+from analytics.roi_engine import _Row, _StatsAcc
+
+logger = get_logger("analytics.roi_archive")
+
+# ============================================================
+# Archivio ledger partizionato per mese (created_at)
+#
+#   <roi>/archive/2025-01/seg-00001.json   segmenti immutabili (scritti una volta)
+#   <roi>/archive/manifest.json            conteggi / profitti per partizione
+#
+# Ogni prune scrive un nuovo segmento per ogni mese toccato: nessun file
+# esistente viene riletto o riscritto, quindi l'I/O è proporzionale alle
+# pick archiviate nel ciclo. Il manifest (piccolo) basta per i totali
+# storici (archive_stats) senza leggere i segmenti.
+# ledger_archive.json monolitico (layout precedente) viene migrato al primo prune.
+# ============================================================
+
+ARCHIVE_MANIFEST_VERSION = 1
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def _archive_dir(base: Path) -> Path:
+    return base / get_settings().roi_archive_dir
+
+
+def _manifest_path(base: Path) -> Path:
+    return _archive_dir(base) / "manifest.json"
+
+
+def _partition_key(p: Dict[str, Any]) -> str:
+    created = p.get("created_at")
+    if isinstance(created, str) and _MONTH_RE.match(created[:7]):
+        return created[:7]
+    return "unknown"
+
+
+def load_archive_manifest(base: Path) -> Dict[str, Any]:
+    raw = _load_json(_manifest_path(base))
+    if isinstance(raw, dict) and raw.get("version") == ARCHIVE_MANIFEST_VERSION:
+        return raw
+    return {"version": ARCHIVE_MANIFEST_VERSION, "partitions": {}}
+
+
+def _stats_fields(acc: _StatsAcc) -> Dict[str, Any]:
+    return {k: getattr(acc, k) for k in _StatsAcc.__slots__}
+
+
+def _acc_from_fields(fields: Dict[str, Any]) -> _StatsAcc:
+    return _StatsAcc.from_list([fields.get(k, 0) for k in _StatsAcc.__slots__])
+
+
+def append_to_archive(
+    base: Path,
+    picks: Iterable[Dict[str, Any]],
+    manifest_extra: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    Scrive le pick potate in nuovi segmenti mensili e aggiorna il manifest.
+    `manifest_extra`: chiavi salvate nello stesso update atomico del manifest.
+    Ritorna le pick archiviate.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for p in picks:
+        groups.setdefault(_partition_key(p), []).append(p)
+    if not groups and not manifest_extra:
+        return 0
+
+    manifest = load_archive_manifest(base)
+    manifest.update(manifest_extra or {})
+    partitions: Dict[str, Any] = manifest.setdefault("partitions", {})
+    total = 0
+    for month in sorted(groups):
+        rows = groups[month]
+        part_dir = _archive_dir(base) / month
+        part_dir.mkdir(parents=True, exist_ok=True)
+        entry = partitions.setdefault(month, {"segments": [], "stats": _stats_fields(_StatsAcc())})
+        seq = len(entry["segments"]) + 1
+        # segmenti orfani (crash prima dell'update del manifest) non vengono sovrascritti
+        while (part_dir / f"seg-{seq:05d}.json").exists():
+            seq += 1
+        name = f"seg-{seq:05d}.json"
+        _save_json_atomic(part_dir / name, rows, machine=True)
+
+        acc = _acc_from_fields(entry["stats"])
+        for p in rows:
+            acc.add(_Row(p))
+        entry["segments"].append(name)
+        entry["stats"] = _stats_fields(acc)
+        created = sorted(c for c in (p.get("created_at") for p in rows) if isinstance(c, str))
+        if created:
+            first, last = entry.get("first_created_at"), entry.get("last_created_at")
+            entry["first_created_at"] = min(created[0], first) if first else created[0]
+            entry["last_created_at"] = max(created[-1], last) if last else created[-1]
+        total += len(rows)
+
+    _save_json_atomic(_manifest_path(base), manifest, machine=True)
+    return total
+
+
+def load_archive_partition(base: Path, month: str) -> List[Dict[str, Any]]:
+    entry = load_archive_manifest(base)["partitions"].get(month)
+    if not entry:
+        return []
+    out: List[Dict[str, Any]] = []
+    for name in entry["segments"]:
+        raw = _load_json(_archive_dir(base) / month / name)
+        if isinstance(raw, list):
+            out.extend(d for d in raw if isinstance(d, dict))
+    return out
+
+
+def load_archive(base: Path, months: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Pick archiviate (tutte o solo i mesi richiesti), in ordine di partizione."""
+    partitions = load_archive_manifest(base)["partitions"]
+    keys = sorted(partitions) if months is None else [m for m in sorted(set(months)) if m in partitions]
+    out: List[Dict[str, Any]] = []
+    for month in keys:
+        out.extend(load_archive_partition(base, month))
+    return out
+
+
+def archive_totals(base: Path) -> Dict[str, Any]:
+    """Statistiche aggregate dell'archivio dal solo manifest (stesse chiavi di _compute_profit_and_stats)."""
+    acc = _StatsAcc()
+    for entry in load_archive_manifest(base)["partitions"].values():
+        part = _acc_from_fields(entry.get("stats") or {})
+        for k in _StatsAcc.__slots__:
+            setattr(acc, k, getattr(acc, k) + getattr(part, k))
+    return acc.stats()
+
+
+def migrate_legacy_archive(base: Path) -> int:
+    """
+    Sposta ledger_archive.json (monolitico) nelle partizioni mensili. Idempotente:
+    il manifest registra l'hash del file migrato nello stesso salvataggio dei
+    segmenti, un crash prima del rename non riappende le stesse pick al rerun.
+    Un file legacy diverso (es. riscritto con ENABLE_ROI_ARCHIVE_PARTITIONS
+    spento dopo una migrazione) viene migrato di nuovo, non scartato.
+    """
+    legacy = base / "ledger_archive.json"
+    try:
+        data = legacy.read_bytes()
+        raw = jsoncodec.loads(data)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(raw, list):
+        return 0
+    digest = hashlib.sha256(data).hexdigest()
+    done = load_archive_manifest(base).get("legacy_migrated")
+    if isinstance(done, dict) and done.get("sha256") == digest:
+        moved = 0
+    else:
+        rows = [d for d in raw if isinstance(d, dict)]
+        moved = append_to_archive(
+            base,
+            rows,
+            manifest_extra={"legacy_migrated": {"picks": len(rows), "sha256": digest, "size": len(data)}},
+        )
+    legacy.replace(legacy.with_name("ledger_archive.json.migrated"))
+    logger.info("roi_archive_migrated", extra={"picks": moved})
+    return moved
+
+
+__all__ = [
+    "ARCHIVE_MANIFEST_VERSION",
+    "append_to_archive",
+    "archive_totals",
+    "load_archive",
+    "load_archive_manifest",
+    "load_archive_partition",
+    "migrate_legacy_archive",
+]
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import csv
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import jsoncodec
+from core.config import Settings, get_settings, settings_with_overrides
+from core.logging import get_logger
+from core.persistence import HISTORY_DIR_NAME
+from analytics.roi import (
+    _compute_profit_and_stats,
+    _create_picks,
+    _equity_stats,
+    _load_json,
+    _now_iso,
+    _save_json_atomic,
+    _settle_open_picks,
+)
+from predictions.value_alerts import compute_value_alerts
+
+logger = get_logger("analytics.roi_backtest")
+
+# ============================================================
+# Backtest ROI (replay in memoria della history)
+#
+# Ogni snapshot history/fixtures_*.json è un ciclo. Per ciascun ciclo:
+#   - alert: ultimo batch value_history_*.jsonl con ts <= ciclo, ripassato da
+#     compute_value_alerts (soglia, dynamic threshold, merged/dedup)
+#   - pick: _create_picks (stessa logica di build_or_update_roi)
+#   - settlement: fixture FT dello snapshot via _settle_open_picks
+#   - quote: entry odds/odds*.json con fetched_at <= ciclo (ultima per fixture)
+#
+# Limiti noti: value_history registra solo gli alert che avevano superato la
+# soglia live, quindi soglie più basse di quella usata in produzione non
+# generano alert nuovi: run_backtest segnala (warning + "below_recorded_threshold"
+# nei risultati) le configurazioni il cui edge minimo scende sotto
+# VALUE_ALERT_MIN_EDGE corrente, assunto come soglia di registrazione.
+# La probabilità modello (per Kelly) è ricostruita come implied normalizzata
+# + edge, come in compute_value_block.
+#
+# Una griglia di parametri (nomi ENV → valori) viene distribuita su un process
+# pool: i cicli sono preparati una volta nel processo padre e inviati a ogni
+# worker all'avvio; ogni configurazione costruisce una copia di Settings con i
+# propri override (settings_with_overrides, stesso parsing di from_env) passata
+# esplicitamente a alert / pick / settlement: os.environ non viene toccato.
+# ============================================================
+
+_SNAPSHOT_RE = re.compile(r"^fixtures_(\d{8}_\d{6}_\d{6})(?:_\d+)?\.json$")
+
+_WORKER_CYCLES: List["BacktestCycle"] = []
+
+
+class BacktestCycle:
+    __slots__ = ("ts", "fixtures_map", "finished", "preds", "consensus", "preds_index", "cons_index", "odds")
+
+    def __init__(self, ts: str, fixtures: List[Dict[str, Any]]) -> None:
+        self.ts = ts
+        self.fixtures_map: Dict[int, Dict[str, Any]] = {
+            f["fixture_id"]: f for f in fixtures if isinstance(f.get("fixture_id"), int)
+        }
+        self.finished: Dict[int, Tuple[Any, Any]] = {
+            fid: (fx.get("home_score"), fx.get("away_score"))
+            for fid, fx in self.fixtures_map.items()
+            if fx.get("status") == "FT"
+        }
+        self.preds: List[Dict[str, Any]] = []
+        self.consensus: List[Dict[str, Any]] = []
+        self.preds_index: Dict[int, Dict[str, Any]] = {}
+        self.cons_index: Dict[int, Dict[str, Any]] = {}
+        self.odds: Dict[int, Dict[str, Any]] = {}
+
+
+def _snapshot_ts(name: str) -> Optional[str]:
+    m = _SNAPSHOT_RE.match(name)
+    if not m:
+        return None
+    dt = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S_%f").replace(tzinfo=timezone.utc)
+    return dt.isoformat()
+
+
+def _load_value_history(path_dir: Path) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Batch di alert per ts (una append_value_history = un batch), ordinati."""
+    batches: Dict[str, List[Dict[str, Any]]] = {}
+    for path in sorted(path_dir.glob("value_history_*.jsonl")):
+        try:
+            lines = path.read_bytes().splitlines()
+        except Exception:
+            continue
+        for line in lines:
+            try:
+                rec = jsoncodec.loads(line)
+            except Exception:
+                continue
+            if isinstance(rec, dict) and isinstance(rec.get("ts"), str):
+                batches.setdefault(rec["ts"], []).append(rec)
+    return sorted(batches.items())
+
+
+def _load_odds_entries(odds_dir: Path) -> List[Tuple[str, Dict[str, Any]]]:
+    out: List[Tuple[str, Dict[str, Any]]] = []
+    for path in sorted(odds_dir.glob("odds*.json")):
+        raw = _load_json(path)
+        entries = raw.get("entries") if isinstance(raw, dict) else None
+        if not isinstance(entries, list):
+            continue
+        for e in entries:
+            if isinstance(e, dict) and isinstance(e.get("fixture_id"), int):
+                out.append((str(e.get("fetched_at") or ""), e))
+    out.sort(key=lambda t: t[0])
+    return out
+
+
+def _implied(market: Dict[str, Any]) -> Dict[str, float]:
+    inv = {k: 1.0 / v for k, v in market.items() if isinstance(v, (int, float)) and v > 1.0}
+    total = sum(inv.values())
+    return {k: v / total for k, v in inv.items()} if total > 0 else {}
+
+
+def _attach_candidates(cycle: BacktestCycle, batch: List[Dict[str, Any]]) -> None:
+    """Ricostruisce predictions / consensus minimi dagli alert registrati."""
+    for rec in batch:
+        fid = rec.get("fixture_id")
+        side = rec.get("value_side")
+        source = rec.get("source")
+        if not isinstance(fid, int) or not isinstance(side, str) or source not in ("prediction", "consensus"):
+            continue
+        try:
+            edge = float(rec.get("value_edge"))
+        except (TypeError, ValueError):
+            continue
+        value = {"active": True, "value_side": side, "value_edge": edge}
+        entry: Dict[str, Any] = {"fixture_id": fid}
+        market = (cycle.odds.get(fid) or {}).get("market")
+        prob: Dict[str, float] = {}
+        if isinstance(market, dict):
+            implied = _implied(market)
+            if side in implied:
+                prob[side] = round(min(0.999999, max(0.0, implied[side] + edge)), 6)
+            entry["odds"] = {"odds_original": market}
+        if source == "prediction":
+            entry.update(value=value, prob=prob, model_version=rec.get("model_version"))
+            cycle.preds.append(entry)
+            cycle.preds_index[fid] = entry
+        else:
+            entry.update(consensus_value=value, blended_prob=prob)
+            cycle.consensus.append(entry)
+            cycle.cons_index[fid] = entry
+
+
+def load_backtest_cycles(
+    data_dir: Optional[Path] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> List[BacktestCycle]:
+    """Prepara i cicli di replay (snapshot history + alert + quote), filtrati per giorno [start, end]."""
+    s = get_settings()
+    data_dir = Path(data_dir or s.bet_data_dir or "data")
+    snapshots: List[Tuple[str, Path]] = []
+    hdir = data_dir / HISTORY_DIR_NAME
+    if hdir.exists():
+        for p in hdir.iterdir():
+            ts = _snapshot_ts(p.name)
+            if ts and (not start or ts[:10] >= start) and (not end or ts[:10] <= end):
+                snapshots.append((ts, p))
+    snapshots.sort()
+
+    batches = _load_value_history(data_dir / s.value_history_dir)
+    odds_entries = _load_odds_entries(data_dir / s.odds_dir)
+
+    cycles: List[BacktestCycle] = []
+    running_odds: Dict[int, Dict[str, Any]] = {}
+    bi = oi = 0
+    current_batch: List[Dict[str, Any]] = []
+    for ts, path in snapshots:
+        raw = _load_json(path)
+        if not isinstance(raw, list):
+            continue
+        while oi < len(odds_entries) and odds_entries[oi][0] <= ts:
+            e = odds_entries[oi][1]
+            running_odds[e["fixture_id"]] = e
+            oi += 1
+        while bi < len(batches) and batches[bi][0] <= ts:
+            current_batch = batches[bi][1]
+            bi += 1
+        cycle = BacktestCycle(ts, [f for f in raw if isinstance(f, dict)])
+        cycle.odds = {fid: running_odds[fid] for fid in cycle.fixtures_map if fid in running_odds}
+        _attach_candidates(cycle, current_batch)
+        cycles.append(cycle)
+    logger.info(
+        "roi_backtest_cycles_loaded",
+        extra={"cycles": len(cycles), "alert_batches": len(batches), "odds_entries": len(odds_entries)},
+    )
+    return cycles
+
+
+def _summary(ledger: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stats = _compute_profit_and_stats(ledger)
+    equity = _equity_stats(ledger)
+    clv = [float(p["clv_pct"]) for p in ledger if p.get("settled") and isinstance(p.get("clv_pct"), (int, float))]
+    stakes = [float(p.get("stake", 0.0)) for p in ledger]
+    stats.update(
+        max_drawdown=equity["max_drawdown"],
+        peak_profit=equity["peak_profit"],
+        avg_stake=round(sum(stakes) / len(stakes), 6) if stakes else 0.0,
+        avg_clv_pct=round(sum(clv) / len(clv), 6) if clv else None,
+    )
+    return stats
+
+
+def replay_cycles(cycles: List[BacktestCycle], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Replay completo di una configurazione; ritorna le statistiche finali del ledger simulato."""
+    s = settings_with_overrides(overrides or {})
+    ledger: List[Dict[str, Any]] = []
+    ledger_index: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    open_index: Dict[int, List[Dict[str, Any]]] = {}
+    day_counts: Dict[str, int] = {}
+    for c in cycles:
+        alerts, _ = compute_value_alerts(c.preds, c.consensus, settings=s)
+        alerts = [a for a in alerts if a.get("fixture_id") is not None and a.get("value_edge") is not None]
+        day = c.ts[:10]
+        created = _create_picks(
+            ledger, ledger_index, open_index, alerts,
+            c.fixtures_map, c.preds_index, c.cons_index, c.odds, c.ts,
+            today_count=day_counts.get(day, 0),
+            settings=s,
+        )
+        day_counts[day] = day_counts.get(day, 0) + len(created)
+        _settle_open_picks(open_index, c.finished, c.odds, settled_at=c.ts, settings=s)
+    return _summary(ledger)
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """{"ROI_MIN_EDGE": [0.03, 0.05], ...} → lista di override (prodotto cartesiano)."""
+    keys = sorted(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def _edge_floor(s: Settings) -> float:
+    """Edge minimo con cui una configurazione può creare pick (soglia alert e ROI_MIN_EDGE)."""
+    return max(s.value_alert_min_edge, s.roi_min_edge)
+
+
+def _below_recorded_threshold(overrides: Dict[str, Any], recorded: float) -> bool:
+    return _edge_floor(settings_with_overrides(overrides)) < recorded
+
+
+def _init_worker(cycles: List[BacktestCycle]) -> None:
+    global _WORKER_CYCLES
+    _WORKER_CYCLES = cycles
+
+
+def _run_config(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    return replay_cycles(_WORKER_CYCLES, overrides)
+
+
+def _write_table(out_dir: Path, stamp: str, report: Dict[str, Any]) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _save_json_atomic(out_dir / f"backtest_{stamp}.json", report)
+    params = report["params"]
+    stat_keys = [k for k in report["results"][0]["stats"]] if report["results"] else []
+    csv_path = out_dir / f"backtest_{stamp}.csv"
+    with csv_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank"] + params + stat_keys + ["below_recorded_threshold"])
+        for i, row in enumerate(report["results"], start=1):
+            writer.writerow(
+                [i] + [row["params"].get(k) for k in params] + [row["stats"].get(k) for k in stat_keys]
+                + [int(row["below_recorded_threshold"])]
+            )
+    return csv_path
+
+
+def run_backtest(
+    grid: Dict[str, List[Any]],
+    workers: Optional[int] = None,
+    data_dir: Optional[Path] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    write: bool = True,
+) -> Dict[str, Any]:
+    """
+    Esegue la griglia e ritorna la tabella comparativa (ordinata per profit).
+    Con write=True salva backtest_<ts>.json / .csv in <roi>/<ROI_BACKTEST_DIR>.
+    """
+    s = get_settings()
+    cycles = load_backtest_cycles(data_dir, start, end)
+    configs = expand_grid(grid) or [{}]
+    # value_history contiene solo alert sopra la soglia live: sotto non c'è nulla da replayare
+    recorded = s.value_alert_min_edge
+    truncated = [cfg for cfg in configs if _below_recorded_threshold(cfg, recorded)]
+    if truncated:
+        logger.warning(
+            "roi_backtest_below_recorded_threshold",
+            extra={"recorded_min_edge": recorded, "configs": len(truncated), "example": truncated[0]},
+        )
+    n_workers = workers if workers is not None else s.roi_backtest_workers
+    if n_workers <= 0:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers, len(configs))
+
+    started = datetime.now(timezone.utc)
+    if n_workers <= 1:
+        stats = [replay_cycles(cycles, cfg) for cfg in configs]
+    else:
+        chunk = max(1, len(configs) // (n_workers * 4))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(cycles,)) as pool:
+            stats = list(pool.map(_run_config, configs, chunksize=chunk))
+    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+
+    results: List[Dict[str, Any]] = [
+        {"params": cfg, "stats": st, "below_recorded_threshold": cfg in truncated}
+        for cfg, st in zip(configs, stats)
+    ]
+    results.sort(key=lambda r: (r["stats"]["profit_units"], r["stats"]["yield"]), reverse=True)
+    report = {
+        "generated_at": _now_iso(),
+        "cycles": len(cycles),
+        "first_cycle": cycles[0].ts if cycles else None,
+        "last_cycle": cycles[-1].ts if cycles else None,
+        "configs": len(configs),
+        "workers": n_workers,
+        "elapsed_sec": round(elapsed, 3),
+        "params": sorted(grid),
+        "recorded_min_edge": recorded,
+        "results": results,
+    }
+    if write:
+        out_dir = Path(data_dir or s.bet_data_dir or "data") / s.roi_dir / s.roi_backtest_dir
+        stamp = started.strftime("%Y%m%d_%H%M%S")
+        report["table_path"] = str(_write_table(out_dir, stamp, report))
+    logger.info(
+        "roi_backtest_done",
+        extra={"cycles": len(cycles), "configs": len(configs), "workers": n_workers, "elapsed_sec": report["elapsed_sec"]},
+    )
+    return report
+
+
+__all__ = [
+    "BacktestCycle",
+    "expand_grid",
+    "load_backtest_cycles",
+    "replay_cycles",
+    "run_backtest",
+]
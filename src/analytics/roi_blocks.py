@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from core import jsoncodec
+from core.config import get_settings
+from core.logging import get_logger
+from analytics.roi import (
+    _load_json,
+    _now_iso,
+    _sanitize_metrics,
+    _save_json_atomic,
+    load_ledger,
+    load_roi_summary,
+)
+
+logger = get_logger("analytics.roi_blocks")
+
+# ============================================================
+# Blocchi metriche lazy (ENABLE_ROI_LAZY_BLOCKS)
+#
+# Ogni sezione di roi_metrics.json ha un nome pubblico (`/roi?blocks=...`).
+# Le sezioni core restano calcolate dalla pipeline; quelle in ROI_LAZY_BLOCKS
+# vengono saltate dal motore fused e calcolate alla prima richiesta API con un
+# passaggio sul ledger limitato ai soli accumulatori necessari.
+#
+#   roi/blocks/manifest.json   ledger_version corrente + elenco lazy
+#   roi/blocks/<nome>.json     blocco calcolato {ledger_version, data}
+#
+# ledger_version è una catena di hash: ogni ciclo che modifica il ledger
+# (pick create, settled, pruning) deriva la nuova versione dalla precedente e
+# dalle sole modifiche (O(modifiche)); il primo ciclo hasha l'intero ledger.
+# La cache di un blocco vale finché la versione in roi_metrics.json non cambia.
+# Il manifest registra anche la firma (mtime/size) di ledger e journal con cui
+# la versione è stata pubblicata: un blocco viene salvato solo se il ledger
+# letto corrisponde ancora a quella versione (vedi VersionedCache).
+# ============================================================
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _clv_render(b: Dict[str, Any]) -> Dict[str, Any]:
+    clv = b["clv_block"]
+    return {
+        "clv": clv,
+        "avg_clv_pct": clv.get("avg_clv_pct"),
+        "median_clv_pct": clv.get("median_clv_pct"),
+        "clv_positive_rate": clv.get("clv_positive_rate"),
+        "clv_realized_edge": clv.get("clv_realized_edge"),
+        "realized_clv_win_avg": clv.get("realized_clv_win_avg"),
+        "realized_clv_loss_avg": clv.get("realized_clv_loss_avg"),
+    }
+
+
+def _renamed(**keys: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Render per blocchi copiati 1:1 (chiave metrics = chiave blocco engine)."""
+    def render(b: Dict[str, Any]) -> Dict[str, Any]:
+        return {out_key: b[block_key] for out_key, block_key in keys.items()}
+    return render
+
+
+# nome pubblico → (chiavi blocco engine, render in chiavi di roi_metrics.json)
+LAZY_BLOCKS: Dict[str, Tuple[Tuple[str, ...], Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "clv": (("clv_block",), _clv_render),
+    "latency": (("latency", "aging_b"), _renamed(latency="latency", aging_buckets="aging_b")),
+    "deciles": (("deciles",), _renamed(edge_deciles="deciles")),
+    "edge_buckets": (("edge_buckets",), _renamed(edge_buckets="edge_buckets")),
+    "clv_buckets": (("clv_buckets",), _renamed(clv_buckets="clv_buckets")),
+    "profit_buckets": (("profit_buckets",), _renamed(profit_buckets="profit_buckets")),
+    "league": (("league_bd",), _renamed(league_breakdown="league_bd")),
+    "time_buckets": (("time_bd",), _renamed(time_buckets="time_bd")),
+    "source_efficiency": (("source_eff",), _renamed(source_efficiency="source_eff")),
+    "edge_clv_corr": (("edge_clv_corr",), _renamed(edge_clv_corr="edge_clv_corr")),
+    "kelly": (("kelly_eff",), _renamed(kelly_effectiveness="kelly_eff")),
+    "montecarlo": (("montecarlo_block",), _renamed(montecarlo="montecarlo_block")),
+}
+
+# nome pubblico → chiavi di roi_metrics.json (sezioni sempre precalcolate + lazy)
+SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "summary": (
+        "total_picks", "settled_picks", "open_picks", "wins", "losses",
+        "profit_units", "yield", "hit_rate",
+    ),
+    "sources": tuple(
+        f"{k}_{src}"
+        for src in ("prediction", "consensus", "merged")
+        for k in ("picks", "settled", "open", "wins", "losses", "profit_units", "yield", "hit_rate")
+    ) + ("source_breakdown",),
+    "equity": (
+        "peak_profit", "max_drawdown", "max_drawdown_pct",
+        "current_drawdown", "current_drawdown_pct", "equity_points",
+    ),
+    "streaks": ("current_win_streak", "current_loss_streak", "longest_win_streak", "longest_loss_streak"),
+    "rolling": (
+        "rolling_window_size", "picks_rolling", "settled_rolling", "profit_units_rolling",
+        "yield_rolling", "hit_rate_rolling", "peak_profit_rolling", "max_drawdown_rolling",
+        "rolling_multi", "hit_rate_multi",
+    ),
+    "risk": ("risk", "risk_of_ruin_approx", "profit_distribution", "profit_per_pick", "profit_per_unit_staked"),
+    "payout": ("payout_moments",),
+    "stake": ("stake_breakdown", "stake_advisory"),
+    "side": ("side_breakdown", "market_placeholder"),
+    "regime": ("regime",),
+    "anomalies": ("anomalies",),
+    "archive": ("archive_stats",),
+    "clv": (
+        "clv", "avg_clv_pct", "median_clv_pct", "clv_positive_rate", "clv_realized_edge",
+        "realized_clv_win_avg", "realized_clv_loss_avg",
+    ),
+    "latency": ("latency", "aging_buckets"),
+    "deciles": ("edge_deciles",),
+    "edge_buckets": ("edge_buckets",),
+    "clv_buckets": ("clv_buckets",),
+    "profit_buckets": ("profit_buckets",),
+    "league": ("league_breakdown",),
+    "time_buckets": ("time_buckets",),
+    "source_efficiency": ("source_efficiency",),
+    "edge_clv_corr": ("edge_clv_corr",),
+    "kelly": ("kelly_effectiveness",),
+    "montecarlo": ("montecarlo",),
+}
+
+# chiavi sempre incluse nella risposta per sezioni
+BASE_KEYS = ("metrics_version", "generated_at", "ledger_version")
+
+def lazy_block_names(s=None) -> List[str]:
+    """Blocchi lazy attivi (ROI_LAZY_BLOCKS filtrato sui nomi noti; vuoto se disabilitato)."""
+    s = s or get_settings()
+    if not s.enable_roi_lazy_blocks:
+        return []
+    return [n for n in dict.fromkeys(s.roi_lazy_blocks) if n in LAZY_BLOCKS]
+
+
+def lazy_engine_keys(s=None) -> Set[str]:
+    return {k for n in lazy_block_names(s) for k in LAZY_BLOCKS[n][0]}
+
+
+def strip_lazy(metrics: Dict[str, Any], s=None) -> Dict[str, Any]:
+    """Rimuove da metrics le sezioni lazy (servite da resolve_blocks)."""
+    for n in lazy_block_names(s):
+        for k in SECTIONS[n]:
+            metrics.pop(k, None)
+    return metrics
+
+
+# ------------------------------------------------------------
+# Cache versionata (blocchi lazy, RollingIndex, QuantileIndex)
+# ------------------------------------------------------------
+
+def ledger_signature(base: Path) -> Tuple[Any, ...]:
+    """(mtime_ns, size) di ledger.json e del journal: cambia a ogni scrittura del ledger."""
+    s = get_settings()
+    sig: List[Any] = []
+    for p in (base / "ledger.json", base / s.roi_ledger_journal_file):
+        try:
+            st = p.stat()
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+class VersionedCache:
+    """
+    Valori derivati dal ledger, per chiave e validi per una versione dei dati:
+    memoria del processo, poi `load(key, version)` (es. file), altrimenti
+    `build` sotto lock (richieste concorrenti dello stesso processo non
+    ricalcolano).
+    `current()` è la versione dei dati sorgente in quel momento: il risultato
+    viene memorizzato (e passato a `save`) solo se current() == version prima
+    e dopo il build. Un build che ha letto un ledger già cambiato (ciclo o
+    altro processo concorrente) viene restituito al chiamante ma non finisce
+    in cache: nessuna voce porta una versione diversa da quella letta, e un
+    processo in ritardo non sovrascrive il file di un blocco più recente.
+    """
+
+    def __init__(
+        self,
+        load: Optional[Callable[[str, Any], Any]] = None,
+        save: Optional[Callable[[str, Any, Any], None]] = None,
+    ) -> None:
+        self._memo: Dict[str, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+        self._load = load
+        self._save = save
+
+    def clear(self) -> None:
+        self._memo.clear()
+
+    def _lookup(self, key: str, version: Any) -> Any:
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] == version:
+            return memo[1]
+        if self._load is not None:
+            value = self._load(key, version)
+            if value is not None:
+                self._memo[key] = (version, value)
+                return value
+        return None
+
+    def get_many(
+        self,
+        keys: Iterable[str],
+        version: Any,
+        build: Callable[[List[str]], Dict[str, Any]],
+        current: Callable[[], Any],
+    ) -> Dict[str, Any]:
+        """Valori per `keys`; le chiavi mancanti sono costruite insieme da build(mancanti)."""
+        out: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self._lookup(key, version)
+            if value is None:
+                missing.append(key)
+            else:
+                out[key] = value
+        if not missing:
+            return out
+        with self._lock:
+            # un'altra richiesta può averle costruite nel frattempo
+            todo = []
+            for key in missing:
+                value = self._lookup(key, version)
+                if value is None:
+                    todo.append(key)
+                else:
+                    out[key] = value
+            if todo:
+                fresh = current() == version
+                built = build(todo)
+                fresh = fresh and current() == version
+                for key in todo:
+                    out[key] = built[key]
+                    if fresh:
+                        self._memo[key] = (version, built[key])
+                        if self._save is not None:
+                            self._save(key, version, built[key])
+                if not fresh:
+                    logger.info("roi_cache_stale_build", extra={"keys": todo})
+        return out
+
+    def get(self, key: str, version: Any, build: Callable[[], Any], current: Callable[[], Any]) -> Any:
+        return self.get_many([key], version, lambda keys: {key: build()}, current)[key]
+
+
+# ------------------------------------------------------------
+# Versione ledger
+# ------------------------------------------------------------
+
+def _cache_dir(s=None) -> Path:
+    s = s or get_settings()
+    return Path(s.bet_data_dir or "data") / s.roi_dir / s.roi_block_cache_dir
+
+
+def _ledger_dir(s=None) -> Path:
+    s = s or get_settings()
+    return Path(s.bet_data_dir or "data") / s.roi_dir
+
+
+def _digest(prev: str, payload: Any) -> str:
+    h = hashlib.sha1(prev.encode("utf-8"))
+    h.update(jsoncodec.dumps(payload, sort_keys=True, default=str))
+    return h.hexdigest()
+
+
+def publish_ledger_version(
+    ledger: List[Dict[str, Any]],
+    created_picks: List[Dict[str, Any]],
+    settled_picks: List[Dict[str, Any]],
+    pruned: bool,
+) -> str:
+    """
+    Nuova ledger_version dopo un ciclo (aggiorna il manifest). Senza modifiche la
+    versione resta invariata e la cache dei blocchi lazy resta valida.
+    """
+    s = get_settings()
+    cache_dir = _cache_dir(s)
+    manifest = _load_json(cache_dir / MANIFEST_FILE)
+    if not isinstance(manifest, dict):
+        manifest = {}
+    prev = manifest.get("ledger_version")
+    if not prev:
+        version = _digest("", ledger)
+    elif created_picks or settled_picks or pruned:
+        version = _digest(prev, {
+            "picks": len(ledger),
+            "pruned": pruned,
+            "created": created_picks,
+            "settled": settled_picks,
+        })
+    else:
+        version = prev
+    sig = _sig_json(ledger_signature(_ledger_dir(s)))
+    if version != prev or manifest.get("lazy") != lazy_block_names(s) or manifest.get("ledger_sig") != sig:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _save_json_atomic(cache_dir / MANIFEST_FILE, {
+            "ledger_version": version,
+            "ledger_sig": sig,
+            "updated_at": _now_iso(),
+            "picks": len(ledger),
+            "lazy": lazy_block_names(s),
+        }, machine=True)
+    return version
+
+
+def _sig_json(sig: Tuple[Any, ...]) -> List[Any]:
+    return [list(x) if x is not None else None for x in sig]
+
+
+def current_ledger_version(s=None) -> Optional[str]:
+    """
+    ledger_version pubblicata, se ledger e journal su disco sono ancora quelli
+    con cui è stata pubblicata; None durante un ciclo in corso (ledger già
+    salvato, manifest non ancora aggiornato) o con manifest senza firma.
+    """
+    s = s or get_settings()
+    manifest = _load_json(_cache_dir(s) / MANIFEST_FILE)
+    if not isinstance(manifest, dict) or manifest.get("ledger_sig") != _sig_json(ledger_signature(_ledger_dir(s))):
+        return None
+    return manifest.get("ledger_version")
+
+
+# ------------------------------------------------------------
+# Risoluzione on-demand
+# ------------------------------------------------------------
+
+def _load_block(key: str, version: Any) -> Optional[Dict[str, Any]]:
+    raw = _load_json(Path(key))
+    if isinstance(raw, dict) and raw.get("ledger_version") == version and isinstance(raw.get("data"), dict):
+        return raw["data"]
+    return None
+
+
+def _save_block(key: str, version: Any, data: Dict[str, Any]) -> None:
+    path = Path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _save_json_atomic(path, {
+        "ledger_version": version,
+        "block": path.stem,
+        "computed_at": _now_iso(),
+        "data": data,
+    }, machine=True)
+
+
+# chiave = path del file del blocco (<roi>/blocks/<nome>.json)
+_BLOCKS = VersionedCache(load=_load_block, save=_save_block)
+
+
+def _compute_lazy(names: List[str], metrics: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    from analytics.roi_engine import compute_blocks_subset
+
+    s = get_settings()
+    keys = {k for n in names for k in LAZY_BLOCKS[n][0]}
+    global_stats = {"settled": metrics.get("settled_picks") or 0, "yield": metrics.get("yield") or 0.0}
+    ledger = load_ledger(_ledger_dir(s))
+    blocks = compute_blocks_subset(ledger, keys, global_stats)
+    logger.info("roi_lazy_blocks_computed", extra={"blocks": names, "picks": len(ledger)})
+    return {n: _sanitize_metrics(LAZY_BLOCKS[n][1](blocks)) for n in names}
+
+
+def resolve_blocks(names: Iterable[str], metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Chiavi di roi_metrics.json per le sezioni richieste. Le sezioni lazy sono
+    lette dalla cache (memoria → file) o calcolate insieme in un solo passaggio.
+    ValueError per nomi sconosciuti.
+    """
+    names = list(dict.fromkeys(n.strip().lower() for n in names if n and n.strip()))
+    unknown = [n for n in names if n not in SECTIONS]
+    if unknown:
+        raise ValueError(f"blocchi sconosciuti: {', '.join(unknown)}")
+    if metrics is None:
+        metrics = load_roi_summary() or {}
+
+    s = get_settings()
+    lazy = set(lazy_block_names(s))
+    version = metrics.get("ledger_version")
+    cache_dir = _cache_dir(s)
+    out: Dict[str, Any] = {}
+    paths: Dict[str, str] = {}
+    for n in names:
+        # metriche pubblicate prima di ENABLE_ROI_LAZY_BLOCKS: sezioni già complete
+        if n in lazy and version:
+            paths[str(cache_dir / f"{n}.json")] = n
+        else:
+            out.update({k: metrics[k] for k in SECTIONS[n] if k in metrics})
+    if paths:
+        def build(keys: List[str]) -> Dict[str, Any]:
+            computed = _compute_lazy([paths[k] for k in keys], metrics)
+            return {k: computed[paths[k]] for k in keys}
+
+        blocks = _BLOCKS.get_many(list(paths), version, build, lambda: current_ledger_version(s))
+        for data in blocks.values():
+            out.update(data)
+    return out
+
+
+__all__ = [
+    "BASE_KEYS",
+    "LAZY_BLOCKS",
+    "SECTIONS",
+    "VersionedCache",
+    "current_ledger_version",
+    "lazy_block_names",
+    "lazy_engine_keys",
+    "ledger_signature",
+    "publish_ledger_version",
+    "resolve_blocks",
+    "strip_lazy",
+]
@@ -0,0 +1,1142 @@
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type
+
+from core.config import get_settings
+from analytics.roi import (
+    _finalize_clv_block,
+    _hit_rate_multi,
+    _montecarlo_from_contribs,
+    _parse_dt,
+    _parse_numeric_range,
+    _payout_moments_from_contribs,
+    _profit_distribution,
+    _risk_metrics_from_contribs,
+)
+from analytics.roi_profiling import active_profiler, profile_section
+from analytics.roi_quantiles import QuantileIndex, RangeTotals
+from analytics.roi_rolling import RollingIndex
+
+# ============================================================
+# Fused single-pass metrics engine
+#
+# Il ledger viene percorso UNA sola volta: ogni pick è convertita in una
+# _Row (coercizioni float / parse timestamp fatte una volta) e passata a
+# tutti gli accumulatori registrati. I blocchi che lavorano sulla serie
+# settled ordinata per created_at condividono un unico sort.
+# L'output di compute_blocks_fused è identico a roi._legacy_blocks.
+# ============================================================
+
+_SOURCES = ("prediction", "consensus", "merged")
+_SIDES = ("home_win", "draw", "away_win")
+_TIME_BUCKETS = ("h00_05", "h06_11", "h12_17", "h18_23")
+_EMPTY_BUCKET = {"picks": 0, "settled": 0, "profit_units": 0.0, "yield": 0.0, "hit_rate": 0.0}
+
+_UNSET = object()
+
+
+class _Row:
+    """
+    Vista pre-calcolata di una pick. Le conversioni replicano esattamente
+    quelle degli helper legacy (stake default 1.0 per le statistiche,
+    0.0 per _profit_contribution).
+    """
+
+    __slots__ = (
+        "pick", "settled", "result", "source", "side", "league_id", "stake_strategy",
+        "created_at", "stake1", "stake0", "payout", "contrib", "edge", "clv",
+        "_created_dt", "_settled_dt",
+    )
+
+    def __init__(self, p: Dict[str, Any]) -> None:
+        self.pick = p
+        self.settled = bool(p.get("settled"))
+        self.result = p.get("result")
+        self.source = p.get("source")
+        self.side = p.get("side")
+        self.league_id = p.get("league_id")
+        self.stake_strategy = p.get("stake_strategy")
+        self.created_at = p.get("created_at")
+        edge = p.get("edge")
+        self.edge = edge if isinstance(edge, (int, float)) else None
+        clv = p.get("clv_pct")
+        self.clv = clv if isinstance(clv, (int, float)) else None
+        self._created_dt = _UNSET
+        self._settled_dt = _UNSET
+        if self.settled:
+            self.stake1 = float(p.get("stake", 1.0))
+            self.stake0 = float(p.get("stake", 0.0))
+            if self.result == "win":
+                self.payout = float(p.get("payout", 0.0))
+                self.contrib = round(self.payout - self.stake0, 6)
+            elif self.result == "loss":
+                self.payout = 0.0
+                self.contrib = round(-self.stake0, 6)
+            else:
+                self.payout = 0.0
+                self.contrib = 0.0
+        else:
+            self.stake1 = 0.0
+            self.stake0 = 0.0
+            self.payout = 0.0
+            self.contrib = 0.0
+
+    def created_dt(self) -> Optional[datetime]:
+        if self._created_dt is _UNSET:
+            self._created_dt = _parse_dt(self.created_at)
+        return self._created_dt  # type: ignore[return-value]
+
+    def settled_dt(self) -> Optional[datetime]:
+        if self._settled_dt is _UNSET:
+            self._settled_dt = _parse_dt(self.pick.get("settled_at"))
+        return self._settled_dt  # type: ignore[return-value]
+
+
+class _StatsAcc:
+    """Equivalente incrementale di roi._compute_profit_and_stats."""
+
+    __slots__ = ("picks", "settled", "wins", "losses", "profit", "stake", "win_profit")
+
+    def __init__(self) -> None:
+        self.picks = 0
+        self.settled = 0
+        self.wins = 0
+        self.losses = 0
+        self.profit = 0.0
+        self.stake = 0.0
+        self.win_profit = 0.0
+
+    def add(self, r: _Row) -> None:
+        self.picks += 1
+        if r.settled:
+            self.settle(r)
+
+    def settle(self, r: _Row) -> None:
+        """Contributo di settlement di una pick già conteggiata in `picks`."""
+        self.settled += 1
+        self.stake += r.stake1
+        if r.result == "win":
+            self.wins += 1
+            gain = r.payout - r.stake1
+            self.profit += gain
+            self.win_profit += gain
+        elif r.result == "loss":
+            self.losses += 1
+            self.profit -= r.stake1
+
+    def stats(self) -> Dict[str, Any]:
+        yield_pct = (self.profit / self.stake) if self.stake > 0 else 0.0
+        hit_rate = (self.wins / self.settled) if self.settled else 0.0
+        return {
+            "picks": self.picks,
+            "settled": self.settled,
+            "open": self.picks - self.settled,
+            "wins": self.wins,
+            "losses": self.losses,
+            "profit_units": round(self.profit, 6),
+            "yield": round(yield_pct, 6),
+            "hit_rate": round(hit_rate, 6),
+            "stake_sum": round(self.stake, 6),
+        }
+
+    def to_list(self) -> List[Any]:
+        return [getattr(self, k) for k in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: List[Any]) -> "_StatsAcc":
+        acc = cls()
+        for k, v in zip(cls.__slots__, values):
+            setattr(acc, k, v)
+        return acc
+
+
+def _risk_of_ruin(g: _StatsAcc) -> Optional[float]:
+    if g.settled < 30:
+        return None
+    win_rate = g.wins / g.settled
+    if win_rate <= 0 or win_rate >= 1:
+        return None
+    avg_win = g.win_profit / g.wins if g.wins else 0.0
+    if avg_win <= 0:
+        return None
+    avg_stake = g.stake / g.settled
+    edge = (avg_win * win_rate) - (1 - win_rate)
+    if edge <= 0:
+        return 1.0
+    capital_units = 50.0
+    ratio = edge / avg_win if avg_win > 0 else 0.0
+    base = max(0.01, 1 - ratio)
+    approx = base ** (capital_units / max(0.1, avg_stake))
+    return round(min(max(approx, 0.0), 1.0), 6)
+
+
+class _SeriesState:
+    """
+    Stato cumulativo della serie settled ordinata (equity, drawdown, streak).
+    Riprendibile: roi_state lo persiste e continua ad applicare punti.
+    """
+
+    __slots__ = ("running", "max_peak", "max_dd", "points", "cw", "cl", "lw", "ll", "last")
+
+    def __init__(self) -> None:
+        self.running = 0.0
+        self.max_peak = 0.0
+        self.max_dd = 0.0
+        self.points = 0
+        self.cw = 0
+        self.cl = 0
+        self.lw = 0
+        self.ll = 0
+        self.last: Optional[str] = None
+
+    def push(self, contrib: float, result: Optional[str]) -> float:
+        running = self.running = self.running + contrib
+        if running > self.max_peak:
+            self.max_peak = running
+        dd = self.max_peak - running
+        if dd > self.max_dd:
+            self.max_dd = dd
+        self.points += 1
+        if result == "win":
+            self.cw += 1
+            self.cl = 0
+            if self.cw > self.lw:
+                self.lw = self.cw
+        elif result == "loss":
+            self.cl += 1
+            self.cw = 0
+            if self.cl > self.ll:
+                self.ll = self.cl
+        else:
+            self.cw = 0
+            self.cl = 0
+        self.last = result
+        return running
+
+    def to_list(self) -> List[Any]:
+        return [getattr(self, k) for k in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: List[Any]) -> "_SeriesState":
+        st = cls()
+        for k, v in zip(cls.__slots__, values):
+            setattr(st, k, v)
+        return st
+
+
+# ============================================================
+# Registry
+# ============================================================
+
+class BlockAccumulator:
+    """
+    Accumulatore per-blocco.
+    - enabled(s): se False il blocco non riceve pick e finalize non viene chiamato
+    - add(row): chiamato per ogni pick durante l'unico passaggio sul ledger
+    - finalize(ctx, out): scrive i propri blocchi in `out` (chiavi di roi._legacy_blocks)
+    - provides: chiavi scritte; se già presenti nel preset (stato incrementale) il blocco è saltato
+    - columns: colonne dell'indice quantili (ctx.quantiles) lette in finalize; gli
+      accumulatori con colonne non ricevono pick, le raccoglie l'indice condiviso
+    """
+
+    provides: Tuple[str, ...] = ()
+    columns: Tuple[str, ...] = ()
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return True
+
+    def __init__(self, s) -> None:
+        self.s = s
+
+    def add(self, r: _Row) -> None:  # pragma: no cover - interfaccia
+        pass
+
+    def finalize(self, ctx: "_ScanContext", out: Dict[str, Any]) -> None:  # pragma: no cover
+        pass
+
+    def disabled_output(self, out: Dict[str, Any]) -> None:
+        pass
+
+
+_REGISTRY: List[Type[BlockAccumulator]] = []
+
+
+def register_block(cls: Type[BlockAccumulator]) -> Type[BlockAccumulator]:
+    _REGISTRY.append(cls)
+    return cls
+
+
+def block_name(acc: Any) -> str:
+    """Nome breve di un accumulatore (classe o istanza): _EdgeDecilesAcc → EdgeDeciles."""
+    cls = acc if isinstance(acc, type) else type(acc)
+    name = cls.__name__.lstrip("_")
+    return name[:-3] if name.endswith("Acc") else name
+
+
+class _ScanContext:
+    """Stato condiviso tra accumulatori (contributi settled, serie ordinata, conteggio settled, indice quantili)."""
+
+    def __init__(self, skip: Optional[Set[str]] = None) -> None:
+        self.settled = 0
+        self.contribs: List[float] = []
+        self.series: List[_Row] = []
+        self.quantiles = QuantileIndex()
+        self.series_frozen = 0
+        # blocchi lazy (analytics.roi_blocks): non calcolati nel ciclo
+        self.skip: Set[str] = skip or set()
+
+
+# ============================================================
+# Core: global / source / contribs / serie settled
+# ============================================================
+
+class _ContribsAcc(BlockAccumulator):
+    """Contributi settled in ordine ledger: risk, distribuzione, momenti payout, Monte Carlo."""
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.contribs: List[float] = []
+
+    @staticmethod
+    def needed(s) -> bool:
+        return (
+            s.enable_roi_risk_metrics
+            or s.enable_roi_profit_distribution
+            or s.enable_roi_payout_moments
+            or s.enable_roi_montecarlo
+        )
+
+    def add(self, r: _Row) -> None:
+        if r.settled:
+            self.contribs.append(r.contrib)
+
+    def finalize(self, ctx: "_ScanContext", out: Dict[str, Any]) -> None:
+        s = self.s
+        contribs = ctx.contribs = self.contribs
+        out["risk"] = _risk_metrics_from_contribs(contribs) if s.enable_roi_risk_metrics else {}
+        if s.enable_roi_profit_distribution:
+            out["profit_distribution"] = _profit_distribution(contribs, ctx.quantiles.column("contrib").values)
+        else:
+            out["profit_distribution"] = {}
+        out["payout_mom"] = _payout_moments_from_contribs(contribs) if s.enable_roi_payout_moments else {}
+        mc = s.enable_roi_montecarlo and "montecarlo_block" not in ctx.skip
+        out["montecarlo_block"] = _montecarlo_from_contribs(contribs) if mc else {}
+
+
+class _CoreAcc(BlockAccumulator):
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.glob = _StatsAcc()
+        self.by_source = {src: _StatsAcc() for src in _SOURCES}
+        self.settled_rows: List[_Row] = []
+        self.oldest_open: Optional[str] = None
+
+    def add(self, r: _Row) -> None:
+        self.glob.add(r)
+        acc = self.by_source.get(r.source) if isinstance(r.source, str) else None
+        if acc is not None:
+            acc.add(r)
+        if r.settled:
+            self.settled_rows.append(r)
+        else:
+            key = r.created_at or ""
+            if self.oldest_open is None or key < self.oldest_open:
+                self.oldest_open = key
+
+    def finalize(self, ctx: "_ScanContext", out: Dict[str, Any]) -> None:
+        s = self.s
+        global_stats = self.glob.stats()
+        out["global_stats"] = global_stats
+        out["pred_stats"] = self.by_source["prediction"].stats()
+        out["cons_stats"] = self.by_source["consensus"].stats()
+        out["merged_stats"] = self.by_source["merged"].stats()
+        ctx.settled = self.glob.settled
+        # sort stabile come negli helper legacy
+        ctx.series = sorted(self.settled_rows, key=lambda x: x.created_at or "")
+        # punti iniziali che nessuna pick aperta può più precedere (regime online)
+        if self.oldest_open is None:
+            ctx.series_frozen = len(ctx.series)
+        else:
+            ctx.series_frozen = bisect_left(ctx.series, self.oldest_open, key=lambda x: x.created_at or "")
+
+        if s.enable_roi_source_breakdown:
+            out["source_bd"] = {
+                src: acc.stats() for src, acc in self.by_source.items() if acc.picks
+            }
+        else:
+            out["source_bd"] = {}
+
+        out["profit_norm"] = _profit_norm(sum(ctx.contribs), len(ctx.contribs), self.glob.stake)
+        out["risk_of_ruin"] = _risk_of_ruin(self.glob) if s.enable_roi_ror else None
+
+
+def _profit_norm(total_profit: float, n: int, stake_sum: float) -> Dict[str, Any]:
+    if not n:
+        return {"profit_per_pick": 0.0, "profit_per_unit_staked": 0.0}
+    return {
+        "profit_per_pick": round(total_profit / n, 6),
+        "profit_per_unit_staked": round(total_profit / stake_sum, 6) if stake_sum > 0 else 0.0,
+    }
+
+
+class _SeriesAcc(BlockAccumulator):
+    """Equity, streak, equity curve e rolling sulla serie settled ordinata (un solo loop)."""
+
+    def finalize(self, ctx: "_ScanContext", out: Dict[str, Any]) -> None:
+        st = _SeriesState()
+        push = st.push
+        equity = [push(r.contrib, r.result) for r in ctx.series]
+        _series_blocks(self.s, st, ctx.series, equity, out)
+        out["series_frozen"] = ctx.series_frozen
+
+
+def _series_blocks(s, st: _SeriesState, tail: List[Any], equity: List[float], out: Dict[str, Any]) -> None:
+    """
+    Scrive eq/streaks/equity_curve/rolling a partire dallo stato cumulativo `st`
+    e dalla coda della serie (`tail`: oggetti con contrib/stake1/result, almeno
+    lunga quanto la finestra più ampia). `equity` è la curva allineata a `tail`.
+    """
+    out["equity_curve"] = equity
+    if st.points:
+        peak_profit = round(st.max_peak, 6)
+        max_drawdown = round(st.max_dd, 6)
+        current_drawdown = round(st.max_peak - st.running, 6)
+        out["eq"] = {
+            "peak_profit": peak_profit,
+            "max_drawdown": max_drawdown,
+            "max_drawdown_pct": round(max_drawdown / peak_profit, 6) if peak_profit > 0 else 0.0,
+            "current_drawdown": current_drawdown,
+            "current_drawdown_pct": round(current_drawdown / peak_profit, 6) if peak_profit > 0 else 0.0,
+            "equity_points": st.points,
+        }
+        out["streaks"] = {
+            "current_win_streak": st.cw if st.last == "win" else 0,
+            "current_loss_streak": st.cl if st.last == "loss" else 0,
+            "longest_win_streak": st.lw,
+            "longest_loss_streak": st.ll,
+        }
+    else:
+        out["eq"] = {
+            "peak_profit": 0.0,
+            "max_drawdown": 0.0,
+            "max_drawdown_pct": 0.0,
+            "current_drawdown": 0.0,
+            "current_drawdown_pct": 0.0,
+            "equity_points": 0,
+        }
+        out["streaks"] = {
+            "current_win_streak": 0,
+            "current_loss_streak": 0,
+            "longest_win_streak": 0,
+            "longest_loss_streak": 0,
+        }
+
+    # indice a somme prefisse condiviso: rolling qui, volatilità in roi._assemble_metrics
+    idx = out["rolling_index"] = RollingIndex.from_rows(tail, equity=equity)
+    window = s.roi_rolling_window
+    roll = idx.window_stats(window)
+    peak, mdd = idx.drawdown(window)
+    out["legacy_roll"] = {
+        "rolling_window_size": window,
+        "picks_rolling": roll["picks"],
+        "settled_rolling": roll["picks"],
+        "profit_units_rolling": roll["profit_units"],
+        "yield_rolling": roll["yield"],
+        "hit_rate_rolling": roll["hit_rate"],
+        "peak_profit_rolling": round(peak, 6),
+        "max_drawdown_rolling": round(mdd, 6),
+    }
+
+    rolling_multi: Dict[str, Any] = {}
+    for w in s.roi_rolling_windows:
+        row = idx.window_stats(w)
+        peak, mdd = idx.drawdown(w)
+        row["peak_profit"] = round(peak, 6)
+        row["max_drawdown"] = round(mdd, 6)
+        rolling_multi[f"w{w}"] = row
+    out["rolling_multi"] = rolling_multi
+    out["hit_rate_multi"] = _hit_rate_multi(rolling_multi)
+
+
+# ============================================================
+# Blocchi per-pick
+# ============================================================
+
+class _GroupStatsAcc(BlockAccumulator):
+    """Base per breakdown a gruppi (stake, lega, lato, fascia oraria)."""
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.groups: Dict[Any, _StatsAcc] = {}
+
+    def _group(self, key: Any) -> _StatsAcc:
+        acc = self.groups.get(key)
+        if acc is None:
+            acc = self.groups[key] = _StatsAcc()
+        return acc
+
+
+@register_block
+class _StakeBreakdownAcc(_GroupStatsAcc):
+    provides = ("stake_bd",)
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_stake_breakdown
+
+    def add(self, r: _Row) -> None:
+        if r.stake_strategy in ("kelly", "fixed"):
+            self._group(r.stake_strategy).add(r)
+
+    def finalize(self, ctx, out) -> None:
+        res: Dict[str, Any] = {}
+        for k in ("kelly", "fixed"):
+            if k in self.groups:
+                res[k] = self.groups[k].stats()
+        out["stake_bd"] = res
+
+    def disabled_output(self, out) -> None:
+        out["stake_bd"] = {}
+
+
+@register_block
+class _LeagueAcc(_GroupStatsAcc):
+    provides = ("league_bd",)
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_league_breakdown
+
+    def add(self, r: _Row) -> None:
+        if r.league_id is not None:
+            self._group(r.league_id).add(r)
+
+    def finalize(self, ctx, out) -> None:
+        rows: List[Dict[str, Any]] = []
+        for lg, acc in self.groups.items():
+            stats = acc.stats()
+            rows.append({
+                "league_id": lg,
+                "picks": stats["picks"],
+                "settled": stats["settled"],
+                "profit_units": stats["profit_units"],
+                "yield": stats["yield"],
+                "hit_rate": stats["hit_rate"],
+            })
+        rows.sort(key=lambda r: r["picks"], reverse=True)
+        out["league_bd"] = rows[: self.s.roi_league_max]
+
+    def disabled_output(self, out) -> None:
+        out["league_bd"] = []
+
+
+@register_block
+class _TimeBucketsAcc(_GroupStatsAcc):
+    provides = ("time_bd",)
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_time_buckets
+
+    def add(self, r: _Row) -> None:
+        c = r.created_dt()
+        if not c:
+            return
+        h = c.hour
+        if 0 <= h <= 5:
+            key = "h00_05"
+        elif 6 <= h <= 11:
+            key = "h06_11"
+        elif 12 <= h <= 17:
+            key = "h12_17"
+        else:
+            key = "h18_23"
+        self._group(key).add(r)
+
+    def finalize(self, ctx, out) -> None:
+        out["time_bd"] = {
+            k: self.groups[k].stats() if k in self.groups else dict(_EMPTY_BUCKET)
+            for k in _TIME_BUCKETS
+        }
+
+    def disabled_output(self, out) -> None:
+        out["time_bd"] = {}
+
+
+@register_block
+class _SideAcc(_GroupStatsAcc):
+    provides = ("side_bd", "market_placeholder")
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_side_breakdown
+
+    def add(self, r: _Row) -> None:
+        if r.side in _SIDES:
+            self._group(r.side).add(r)
+
+    def finalize(self, ctx, out) -> None:
+        side_bd = {
+            k: self.groups[k].stats() if k in self.groups else dict(_EMPTY_BUCKET)
+            for k in _SIDES
+        }
+        out["side_bd"] = side_bd
+        if self.s.enable_roi_market_placeholder:
+            out["market_placeholder"] = {
+                "markets": {"1X2": {k: dict(v) for k, v in side_bd.items()}},
+                "note": "placeholder multi-market",
+            }
+
+    def disabled_output(self, out) -> None:
+        out["side_bd"] = {}
+        if self.s.enable_roi_market_placeholder:
+            out["market_placeholder"] = {"markets": {"1X2": {}}, "note": "placeholder multi-market"}
+
+
+@register_block
+class _ClvAggregateAcc(BlockAccumulator):
+    provides = ("clv_block",)
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_clv_aggregate
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.clvs: List[float] = []
+        self.wins: List[float] = []
+        self.losses: List[float] = []
+
+    def add(self, r: _Row) -> None:
+        if not r.settled or r.clv is None:
+            return
+        v = float(r.clv)
+        self.clvs.append(v)
+        if r.result == "win":
+            self.wins.append(v)
+        elif r.result == "loss":
+            self.losses.append(v)
+
+    def finalize(self, ctx, out) -> None:
+        global_yield = out["global_stats"]["yield"]
+        base: Dict[str, Optional[float]]
+        if not self.clvs:
+            base = {
+                "avg_clv_pct": None,
+                "median_clv_pct": None,
+                "realized_clv_win_avg": None,
+                "realized_clv_loss_avg": None,
+                "clv_positive_rate": None,
+                "clv_realized_edge": None,
+            }
+            out["clv_block"] = _finalize_clv_block(base, global_yield)
+            return
+        clvs = sorted(self.clvs)
+        m = len(clvs)
+        avg = sum(clvs) / m
+        median = clvs[m // 2] if m % 2 == 1 else (clvs[m // 2 - 1] + clvs[m // 2]) / 2
+        positive = sum(1 for v in clvs if v > 0)
+        base = {
+            "avg_clv_pct": round(avg, 6),
+            "median_clv_pct": round(median, 6),
+            "realized_clv_win_avg": round(sum(self.wins) / len(self.wins), 6) if self.wins else None,
+            "realized_clv_loss_avg": round(sum(self.losses) / len(self.losses), 6) if self.losses else None,
+            "clv_positive_rate": round(positive / m, 6),
+        }
+        out["clv_block"] = _finalize_clv_block(base, global_yield)
+
+    def disabled_output(self, out) -> None:
+        out["clv_block"] = {}
+
+
+@register_block
+class _LatencyAgingAcc(BlockAccumulator):
+    """Latenza media di settlement e aging buckets condividono il parse created/settled."""
+    provides = ("latency", "aging_b")
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_latency_metrics or s.enable_roi_aging_buckets
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.dur_sum = 0.0
+        self.dur_n = 0
+        self.days: Dict[int, int] = {}
+
+    def add(self, r: _Row) -> None:
+        if not r.settled:
+            return
+        c = r.created_dt()
+        se = r.settled_dt()
+        if not c or not se:
+            return
+        secs = (se - c).total_seconds()
+        self.dur_sum += secs
+        self.dur_n += 1
+        d = int(secs // 86400)
+        self.days[d] = self.days.get(d, 0) + 1
+
+    def finalize(self, ctx, out) -> None:
+        s = self.s
+        if s.enable_roi_latency_metrics:
+            if not self.dur_n:
+                out["latency"] = {"avg_settlement_latency_sec": None}
+            else:
+                out["latency"] = {"avg_settlement_latency_sec": round(self.dur_sum / self.dur_n, 2)}
+        else:
+            out["latency"] = {}
+        aging: Dict[str, Any] = {}
+        if s.enable_roi_aging_buckets and ctx.settled:
+            total = sum(self.days.values())
+            for bucket in s.roi_aging_buckets:
+                cum = sum(v for d, v in self.days.items() if d <= bucket)
+                aging[str(bucket)] = {"picks": cum, "pct": round(cum / total, 6) if total > 0 else 0.0}
+        out["aging_b"] = aging
+
+    def disabled_output(self, out) -> None:
+        out["latency"] = {}
+        out["aging_b"] = {}
+
+
+@register_block
+class _EdgeDecilesAcc(BlockAccumulator):
+    provides = ("deciles",)
+    columns = ("edge",)
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_edge_deciles
+
+    def finalize(self, ctx, out) -> None:
+        # i decili sono slice contigue della colonna edge ordinata: min/max sono
+        # gli estremi della slice, profit e stats (enhance) differenze di prefissi
+        col = ctx.quantiles.column("edge")
+        deciles = []
+        for d, a, b in col.decile_spans():
+            tot = col.totals(a, b)
+            st = tot.stats()
+            deciles.append({
+                "decile": d,
+                "edge_min": col.values[a],
+                "edge_max": col.values[b - 1],
+                "picks": tot.picks,
+                "profit_units": round(tot.contrib, 6),
+                "hit_rate": st["hit_rate"],
+                "yield": st["yield"],
+            })
+        out["deciles"] = deciles
+
+    def disabled_output(self, out) -> None:
+        out["deciles"] = []
+
+
+def _edge_spec_bounds(spec: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    if not spec or "-" not in spec:
+        return None
+    left, right = spec.split("-", 1)
+    return (float(left) if left else None, float(right) if right else None)
+
+
+def _numeric_spec_bounds(spec: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    if not spec or "-" not in spec:
+        return None
+    left_v, right_v = _parse_numeric_range(spec)
+    if left_v is None and right_v is None:
+        return None
+    return (left_v, right_v)
+
+
+class _RangeBucketsAcc(BlockAccumulator):
+    """
+    Base per bucket a range configurabili [left, right) sulla colonna ordinata
+    dell'indice quantili: due bisect + differenze di prefissi per bucket. Le spec
+    sono parse solo con colonna non vuota (come negli helper legacy).
+    """
+
+    key = ""
+    column = ""
+    parser: Callable[[str], Optional[Tuple[Optional[float], Optional[float]]]] = staticmethod(_numeric_spec_bounds)
+
+    def raw_specs(self) -> List[str]:  # pragma: no cover - override
+        return []
+
+    def finalize(self, ctx, out) -> None:
+        col = ctx.quantiles.column(self.column)
+        if not len(col):
+            out[self.key] = []
+            return
+        specs = []
+        for spec in self.raw_specs():
+            spec = spec.strip()
+            bounds = self.parser(spec)
+            if bounds is not None:
+                specs.append((spec, bounds))
+        totals = col.range_totals([b for _, b in specs])
+        out[self.key] = [self.row(spec, tot) for (spec, _), tot in zip(specs, totals)]
+
+    def row(self, spec: str, tot: RangeTotals) -> Dict[str, Any]:  # pragma: no cover - override
+        return {}
+
+    def disabled_output(self, out) -> None:
+        out[self.key] = []
+
+
+@register_block
+class _EdgeBucketsAcc(_RangeBucketsAcc):
+    provides = ("edge_buckets",)
+    columns = ("edge",)
+    key = "edge_buckets"
+    column = "edge"
+    parser = staticmethod(_edge_spec_bounds)
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return bool(s.roi_edge_buckets)
+
+    def raw_specs(self) -> List[str]:
+        return self.s.roi_edge_buckets
+
+    def row(self, spec: str, tot: RangeTotals) -> Dict[str, Any]:
+        if not tot.picks:
+            return {"range": spec, "picks": 0, "settled": 0, "profit_units": 0.0, "yield": 0.0, "hit_rate": 0.0}
+        st = tot.stats()
+        return {
+            "range": spec,
+            "picks": st["picks"],
+            "settled": st["settled"],
+            "profit_units": st["profit_units"],
+            "yield": st["yield"],
+            "hit_rate": st["hit_rate"],
+        }
+
+
+@register_block
+class _ClvBucketsAcc(_RangeBucketsAcc):
+    provides = ("clv_buckets",)
+    columns = ("clv",)
+    key = "clv_buckets"
+    column = "clv"
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_clv_buckets
+
+    def raw_specs(self) -> List[str]:
+        return self.s.roi_clv_buckets
+
+    def row(self, spec: str, tot: RangeTotals) -> Dict[str, Any]:
+        if not tot.picks:
+            return {"range": spec, "picks": 0, "profit_units": 0.0, "yield": 0.0}
+        st = tot.stats()
+        return {"range": spec, "picks": st["picks"], "profit_units": st["profit_units"], "yield": st["yield"]}
+
+
+@register_block
+class _ProfitBucketsAcc(_RangeBucketsAcc):
+    provides = ("profit_buckets",)
+    columns = ("contrib",)
+    key = "profit_buckets"
+    column = "contrib"
+
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_profit_buckets
+
+    def raw_specs(self) -> List[str]:
+        return self.s.roi_profit_buckets
+
+    def row(self, spec: str, tot: RangeTotals) -> Dict[str, Any]:
+        if not tot.picks:
+            return {"range": spec, "picks": 0, "profit_units": 0.0, "avg_profit": 0.0}
+        return {
+            "range": spec,
+            "picks": tot.picks,
+            "profit_units": round(tot.contrib, 6),
+            "avg_profit": round(tot.contrib / tot.picks, 6),
+        }
+
+
+@register_block
+class _SourceEfficiencyAcc(BlockAccumulator):
+    provides = ("source_eff",)
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_source_efficiency
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.contribs: Dict[str, List[float]] = {src: [] for src in _SOURCES}
+
+    def add(self, r: _Row) -> None:
+        if r.settled and r.source in self.contribs:
+            self.contribs[r.source].append(r.contrib)
+
+    def finalize(self, ctx, out) -> None:
+        res: Dict[str, Any] = {}
+        for src, contribs in self.contribs.items():
+            if not contribs:
+                continue
+            avg = sum(contribs) / len(contribs)
+            if len(contribs) > 1:
+                var = sum((x - avg) ** 2 for x in contribs) / len(contribs)
+                std = math.sqrt(var) if var > 0 else 0.0
+            else:
+                std = 0.0
+            eff = avg / std if std > 0 else None
+            res[src] = {
+                "eff_index": round(eff, 6) if eff is not None else None,
+                "avg_profit_per_pick": round(avg, 6),
+                "stddev_profit_per_pick": round(std, 6),
+                "settled": len(contribs),
+            }
+        out["source_eff"] = res
+
+    def disabled_output(self, out) -> None:
+        out["source_eff"] = {}
+
+
+@register_block
+class _EdgeClvCorrAcc(BlockAccumulator):
+    provides = ("edge_clv_corr",)
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_edge_clv_corr
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+
+    def add(self, r: _Row) -> None:
+        if r.settled and r.edge is not None and r.clv is not None:
+            self.xs.append(float(r.edge))
+            self.ys.append(float(r.clv))
+
+    def finalize(self, ctx, out) -> None:
+        xs, ys = self.xs, self.ys
+        if len(xs) < 10:
+            out["edge_clv_corr"] = {"pearson_r": None, "n": len(xs)}
+            return
+        mx = sum(xs) / len(xs)
+        my = sum(ys) / len(ys)
+        num = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+        denx = math.sqrt(sum((x - mx) ** 2 for x in xs))
+        deny = math.sqrt(sum((y - my) ** 2 for y in ys))
+        r = None if denx <= 0 or deny <= 0 else num / (denx * deny)
+        out["edge_clv_corr"] = {"pearson_r": round(r, 6) if r is not None else None, "n": len(xs)}
+
+    def disabled_output(self, out) -> None:
+        out["edge_clv_corr"] = {}
+
+
+@register_block
+class _KellyEffectAcc(BlockAccumulator):
+    provides = ("kelly_eff",)
+    @classmethod
+    def enabled(cls, s) -> bool:
+        return s.enable_roi_kelly_effect
+
+    def __init__(self, s) -> None:
+        super().__init__(s)
+        self.base_units = s.kelly_base_units if s.kelly_base_units > 0 else 1.0
+        self.n = 0
+        self.actual = 0.0
+        self.baseline = 0.0
+        self.stake0 = 0.0
+
+    def add(self, r: _Row) -> None:
+        if not r.settled or r.stake_strategy != "kelly":
+            return
+        self.n += 1
+        self.actual += r.contrib
+        self.stake0 += r.stake0
+        if r.stake1 > 0:
+            self.baseline += (r.contrib / r.stake1) * self.base_units
+
+    def finalize(self, ctx, out) -> None:
+        if not self.n:
+            out["kelly_eff"] = {}
+            return
+        uplift_pct = None
+        if self.baseline != 0:
+            uplift_pct = (self.actual - self.baseline) / abs(self.baseline)
+        out["kelly_eff"] = {
+            "kelly_picks": self.n,
+            "actual_profit_units": round(self.actual, 6),
+            "baseline_fixed_units": self.base_units,
+            "baseline_profit_units": round(self.baseline, 6),
+            "uplift_pct": round(uplift_pct, 6) if uplift_pct is not None else None,
+            "avg_actual_stake": round(self.stake0 / self.n, 6),
+        }
+
+    def disabled_output(self, out) -> None:
+        out["kelly_eff"] = {}
+
+
+# ============================================================
+# Entry point
+# ============================================================
+
+def compute_blocks_fused(
+    ledger: List[Dict[str, Any]],
+    preset: Optional[Dict[str, Any]] = None,
+    skip: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Calcola tutti i blocchi di compute_metrics con un solo passaggio sul ledger.
+    Ritorna lo stesso dict di roi._legacy_blocks.
+
+    `preset`: blocchi già calcolati dallo stato aggregato incrementale
+    (analytics.roi_state): core/serie e gli accumulatori i cui `provides` sono
+    coperti vengono saltati; il passaggio sul ledger avviene solo se resta
+    almeno un blocco che ne ha bisogno.
+
+    `skip`: chiavi dei blocchi lazy; gli accumulatori interamente coperti non
+    ricevono pick e scrivono solo il placeholder di disabled_output.
+    """
+    s = get_settings()
+    ctx = _ScanContext(skip)
+    out: Dict[str, Any] = {"market_placeholder": {}}
+    core: Optional[_CoreAcc] = None
+    series: Optional[_SeriesAcc] = None
+    contribs: Optional[_ContribsAcc] = None
+    if preset is None:
+        core = _CoreAcc(s)
+        series = _SeriesAcc(s)
+        contribs = _ContribsAcc(s)
+    else:
+        out.update(preset)
+        ctx.settled = preset["global_stats"]["settled"]
+        if _ContribsAcc.needed(s):
+            contribs = _ContribsAcc(s)
+
+    active: List[BlockAccumulator] = []
+    disabled: List[BlockAccumulator] = []
+    for cls in _REGISTRY:
+        if preset is not None and cls.provides and all(k in preset for k in cls.provides):
+            continue
+        if cls.provides and all(k in ctx.skip for k in cls.provides):
+            disabled.append(cls(s))
+            continue
+        (active if cls.enabled(s) else disabled).append(cls(s))
+
+    scanned = _scanned(
+        [a for a in (contribs, core) if a is not None] + active,
+        ctx,
+        index=contribs is not None and s.enable_roi_profit_distribution,
+    )
+    prof = active_profiler()
+    if scanned and prof is not None:
+        _profiled_scan(prof, ledger, scanned)
+    elif scanned:
+        adders = [a.add for a in scanned]
+        for p in ledger:
+            row = _Row(p)
+            for add in adders:
+                add(row)
+
+    if contribs is not None:
+        with profile_section("blocks", "Contribs"):
+            contribs.finalize(ctx, out)
+    else:
+        out["risk"] = {}
+        out["profit_distribution"] = {}
+        out["payout_mom"] = {}
+        out["montecarlo_block"] = {}
+    if core is not None:
+        with profile_section("blocks", "Core"):
+            core.finalize(ctx, out)
+    if series is not None:
+        with profile_section("blocks", "Series"):
+            series.finalize(ctx, out)
+    for acc in active:
+        with profile_section("blocks", block_name(acc)):
+            acc.finalize(ctx, out)
+    for acc in disabled:
+        acc.disabled_output(out)
+    return out
+
+
+def _scanned(accs: List[Any], ctx: _ScanContext, index: bool = False) -> List[Any]:
+    """
+    Accumulatori che ricevono le pick: quelli basati sull'indice quantili sono
+    sostituiti da un'unica raccolta delle settled in ctx.quantiles (`index`:
+    raccolta richiesta anche senza accumulatori a colonne, es. profit_distribution).
+    """
+    uses_index = index or any(a.columns for a in accs)
+    scanned = [a for a in accs if not a.columns]
+    if uses_index:
+        scanned.append(ctx.quantiles)
+    return scanned
+
+
+def _profiled_scan(prof, ledger: List[Dict[str, Any]], scanned: List[BlockAccumulator]) -> None:
+    """
+    Passaggio sul ledger con tempo di add() per accumulatore (ENABLE_ROI_PROFILING).
+    Due perf_counter per riga e blocco: solo in sessione di profiling; le allocazioni
+    della scansione sono attribuite allo stage/blocco "scan" nel suo insieme.
+    """
+    clock = time.perf_counter
+    adders = [a.add for a in scanned]
+    spent = [0.0] * len(adders)
+    rows_sec = 0.0
+    with prof.section("blocks", "scan"):
+        for p in ledger:
+            t0 = clock()
+            row = _Row(p)
+            t1 = clock()
+            rows_sec += t1 - t0
+            for i, add in enumerate(adders):
+                add(row)
+                t2 = clock()
+                spent[i] += t2 - t1
+                t1 = t2
+    prof.add_time("blocks", "rows", rows_sec)
+    for acc, sec in zip(scanned, spent):
+        prof.add_time("blocks", block_name(acc), sec)
+
+
+def compute_blocks_subset(
+    ledger: List[Dict[str, Any]],
+    keys: Set[str],
+    global_stats: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Solo i blocchi in `keys` (calcolo on-demand dei blocchi lazy): un passaggio
+    sul ledger con i soli accumulatori che li forniscono. `global_stats` (almeno
+    settled / yield) arriva dalle metriche già pubblicate invece che da _CoreAcc.
+    "montecarlo_block" si ricava dai contributi settled.
+    """
+    s = get_settings()
+    ctx = _ScanContext()
+    ctx.settled = int(global_stats.get("settled") or 0)
+    out: Dict[str, Any] = {"global_stats": global_stats}
+    active: List[BlockAccumulator] = []
+    disabled: List[BlockAccumulator] = []
+    for cls in _REGISTRY:
+        if any(k in keys for k in cls.provides):
+            (active if cls.enabled(s) else disabled).append(cls(s))
+    contribs = _ContribsAcc(s) if "montecarlo_block" in keys and s.enable_roi_montecarlo else None
+
+    scanned = _scanned(active + ([contribs] if contribs is not None else []), ctx)
+    if scanned:
+        adders = [a.add for a in scanned]
+        for p in ledger:
+            row = _Row(p)
+            for add in adders:
+                add(row)
+    for acc in active:
+        acc.finalize(ctx, out)
+    for acc in disabled:
+        acc.disabled_output(out)
+    if "montecarlo_block" in keys:
+        out["montecarlo_block"] = _montecarlo_from_contribs(contribs.contribs) if contribs is not None else {}
+    del out["global_stats"]
+    return out
+
+
+__all__ = ["BlockAccumulator", "block_name", "register_block", "compute_blocks_fused", "compute_blocks_subset"]
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.config import get_settings
+from core.logging import get_logger
+from analytics.roi import _load_json, _now_iso, _profit_contribution, _save_json_atomic
+
+try:  # opzionale: export colonnare Parquet / Arrow IPC
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    pa = None
+    pa_ipc = None
+    pq = None
+
+logger = get_logger("analytics.roi_export")
+
+# ============================================================
+# Export ROI in streaming (ENABLE_ROI_STREAM_EXPORT)
+#
+# Alternativa a roi_export.csv (riscritto per intero ad ogni ciclo, con le
+# metriche globali ripetute su ogni riga). Layout in roi/<ROI_EXPORT_DIR>/:
+#   manifest.json          formato, colonne, part, ultimo export_seq
+#   part-000001.<ext>      al massimo ROI_EXPORT_CHUNK_ROWS righe ciascuna
+# Formati: parquet / arrow (IPC) con pyarrow installato, altrimenti csv.gz
+# (auto = parquet se disponibile). Ogni ciclo appende solo le pick create o
+# settled nel ciclo: una pick compare come riga aperta e poi come riga settled;
+# la versione corrente è quella con export_seq massimo per (fixture_id, source).
+# Il primo export (o dopo pruning / cambio formato / cicli persi) riscrive i
+# part scorrendo il ledger a blocchi: la memoria resta limitata a un part.
+# La coda csv.gz cresce aggiungendo membri gzip (troncata alla dimensione del
+# manifest prima di appendere, così un crash a metà non la corrompe); la coda
+# colonnare viene riscritta finché non raggiunge ROI_EXPORT_CHUNK_ROWS.
+# ============================================================
+
+MANIFEST_FILE = "manifest.json"
+
+# (colonna, tipo): int / float / str / bool
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("export_seq", "int"),
+    ("fixture_id", "int"),
+    ("source", "str"),
+    ("value_type", "str"),
+    ("side", "str"),
+    ("league_id", "int"),
+    ("edge", "float"),
+    ("stake", "float"),
+    ("stake_strategy", "str"),
+    ("decimal_odds", "float"),
+    ("kelly_fraction", "float"),
+    ("kelly_fraction_capped", "float"),
+    ("kelly_prob", "float"),
+    ("kelly_b", "float"),
+    ("settled", "bool"),
+    ("result", "str"),
+    ("payout", "float"),
+    ("created_at", "str"),
+    ("settled_at", "str"),
+    ("profit_contribution", "float"),
+    ("closing_decimal_odds", "float"),
+    ("clv_pct", "float"),
+)
+COLUMN_NAMES = [c for c, _ in COLUMNS]
+_EXT = {"parquet": "parquet", "arrow": "arrow", "csv.gz": "csv.gz"}
+
+
+def resolve_format(requested: Optional[str] = None) -> str:
+    """Formato effettivo: parquet / arrow solo con pyarrow, altrimenti csv.gz."""
+    fmt = requested or get_settings().roi_export_format
+    if fmt == "csv.gz":
+        return fmt
+    if pa is None:
+        if fmt != "auto":
+            logger.warning("roi_export_pyarrow_missing", extra={"requested": fmt})
+        return "csv.gz"
+    return "arrow" if fmt == "arrow" else "parquet"
+
+
+# ------------------------------------------------------------
+# Righe
+# ------------------------------------------------------------
+
+def _coerce(v: Any, kind: str) -> Any:
+    if v is None:
+        return None
+    try:
+        if kind == "float":
+            return float(v)
+        if kind == "int":
+            return int(v)
+        if kind == "bool":
+            return bool(v)
+        return str(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(seq: int, p: Dict[str, Any]) -> Tuple[Any, ...]:
+    derived = {
+        "export_seq": seq,
+        "profit_contribution": _profit_contribution(p),
+        "settled": p.get("settled") is True,
+    }
+    return tuple(
+        _coerce(derived[name] if name in derived else p.get(name), kind)
+        for name, kind in COLUMNS
+    )
+
+
+def _chunks(rows: Iterable[Tuple[Any, ...]], size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ------------------------------------------------------------
+# Part
+# ------------------------------------------------------------
+
+def _csv_bytes(rows: List[Tuple[Any, ...]], header: bool) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(COLUMN_NAMES)
+    writer.writerows(rows)
+    return gzip.compress(buf.getvalue().encode("utf-8"))
+
+
+def _arrow_table(rows: List[Tuple[Any, ...]]):
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "bool": pa.bool_()}
+    cols = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    return pa.table({
+        name: pa.array(list(values), type=types[kind])
+        for (name, kind), values in zip(COLUMNS, cols)
+    })
+
+
+def _write_table(path: Path, fmt: str, table) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        pq.write_table(table, tmp, compression="zstd")
+    else:
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _read_table(path: Path, fmt: str):
+    if fmt == "parquet":
+        return pq.read_table(path)
+    with pa.memory_map(str(path), "r") as source:
+        return pa_ipc.open_file(source).read_all()
+
+
+def _write_part(path: Path, fmt: str, rows: List[Tuple[Any, ...]]) -> int:
+    if fmt == "csv.gz":
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(_csv_bytes(rows, header=True))
+        os.replace(tmp, path)
+    else:
+        _write_table(path, fmt, _arrow_table(rows))
+    return path.stat().st_size
+
+
+def _extend_part(path: Path, fmt: str, size: int, rows: List[Tuple[Any, ...]]) -> int:
+    """Aggiunge righe al part in coda; ritorna la nuova dimensione in byte."""
+    if fmt == "csv.gz":
+        with path.open("r+b") as f:
+            # byte oltre il manifest = append interrotto da un crash
+            f.truncate(size)
+            f.seek(size)
+            f.write(_csv_bytes(rows, header=False))
+            f.flush()
+            os.fsync(f.fileno())
+        return path.stat().st_size
+    table = pa.concat_tables([_read_table(path, fmt), _arrow_table(rows)])
+    _write_table(path, fmt, table)
+    return path.stat().st_size
+
+
+# ------------------------------------------------------------
+# Export del ciclo
+# ------------------------------------------------------------
+
+def export_dir(base: Optional[Path] = None) -> Path:
+    s = get_settings()
+    base = base or Path(s.bet_data_dir or "data") / s.roi_dir
+    return base / s.roi_export_dir
+
+
+def _load_manifest(out_dir: Path) -> Optional[Dict[str, Any]]:
+    raw = _load_json(out_dir / MANIFEST_FILE)
+    if not isinstance(raw, dict) or not isinstance(raw.get("parts"), list):
+        return None
+    return raw
+
+
+def _settled_count(ledger: List[Dict[str, Any]]) -> int:
+    return sum(1 for p in ledger if p.get("settled"))
+
+
+def _needs_rebuild(manifest: Optional[Dict[str, Any]], fmt: str, include_open: bool,
+                   ledger: List[Dict[str, Any]], created: List[Dict[str, Any]],
+                   settled: List[Dict[str, Any]]) -> bool:
+    if manifest is None:
+        return True
+    if manifest.get("format") != fmt or manifest.get("columns") != COLUMN_NAMES:
+        return True
+    if manifest.get("include_open") != include_open:
+        return True
+    # cicli non esportati (export disattivato / crash): i delta non bastano
+    if manifest.get("ledger_picks", -1) + len(created) != len(ledger):
+        return True
+    newly_settled = sum(1 for p in settled if p.get("settled"))
+    return manifest.get("ledger_settled", -1) + newly_settled != _settled_count(ledger)
+
+
+def write_stream_export(
+    base: Path,
+    ledger: List[Dict[str, Any]],
+    created: List[Dict[str, Any]],
+    settled: List[Dict[str, Any]],
+    rebuild: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Appende all'export le pick create / settled nel ciclo (o lo ricostruisce).
+    `rebuild`: ledger potato o riordinato. Ritorna il manifest aggiornato.
+    """
+    s = get_settings()
+    if not s.enable_roi_stream_export:
+        return None
+    out_dir = export_dir(base)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fmt = resolve_format(s.roi_export_format)
+    include_open = s.roi_csv_include_open
+    manifest = _load_manifest(out_dir)
+
+    full = rebuild or _needs_rebuild(manifest, fmt, include_open, ledger, created, settled)
+    if full:
+        old = [p.get("file") for p in (manifest or {}).get("parts", []) if isinstance(p, dict)]
+        for name in old:
+            if name:
+                (out_dir / name).unlink(missing_ok=True)
+        manifest = {
+            "format": fmt,
+            "columns": COLUMN_NAMES,
+            "include_open": include_open,
+            "last_seq": 0,
+            "rows": 0,
+            "parts": [],
+        }
+        picks: Iterable[Dict[str, Any]] = ledger
+    else:
+        seen = set()
+        changed = []
+        for p in list(created) + list(settled):
+            if id(p) not in seen:
+                seen.add(id(p))
+                changed.append(p)
+        picks = changed
+    if not include_open:
+        picks = (p for p in picks if p.get("settled"))
+
+    start_seq = manifest["last_seq"]
+    rows = (_row(start_seq + i + 1, p) for i, p in enumerate(picks))
+    parts: List[Dict[str, Any]] = manifest["parts"]
+    chunk_rows = s.roi_export_chunk_rows
+    appended = 0
+
+    if parts and parts[-1]["rows"] < chunk_rows:
+        tail = parts[-1]
+        chunk = list(islice(rows, chunk_rows - tail["rows"]))
+        if chunk:
+            tail["bytes"] = _extend_part(out_dir / tail["file"], fmt, tail["bytes"], chunk)
+            tail["rows"] += len(chunk)
+            tail["seq_to"] = chunk[-1][0]
+            appended += len(chunk)
+    for chunk in _chunks(rows, chunk_rows):
+        name = f"part-{len(parts) + 1:06d}.{_EXT[fmt]}"
+        parts.append({
+            "file": name,
+            "rows": len(chunk),
+            "seq_from": chunk[0][0],
+            "seq_to": chunk[-1][0],
+            "bytes": _write_part(out_dir / name, fmt, chunk),
+        })
+        appended += len(chunk)
+
+    if not full and not appended:
+        return manifest
+    manifest["last_seq"] = start_seq + appended
+    manifest["rows"] += appended
+    manifest["ledger_picks"] = len(ledger)
+    manifest["ledger_settled"] = _settled_count(ledger)
+    manifest["updated_at"] = _now_iso()
+    _save_json_atomic(out_dir / MANIFEST_FILE, manifest, machine=True)
+    logger.info(
+        "roi_stream_export_written",
+        extra={"rows": appended, "full": full, "format": fmt, "parts": len(parts)},
+    )
+    return manifest
+
+
+def iter_export_rows(base: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+    """Righe dell'export (ordine export_seq), un part alla volta. csv.gz: valori stringa."""
+    out_dir = export_dir(base)
+    manifest = _load_manifest(out_dir)
+    if manifest is None:
+        return
+    fmt = manifest.get("format")
+    for part in manifest["parts"]:
+        path = out_dir / part["file"]
+        if fmt == "csv.gz":
+            with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+                yield from islice(csv.DictReader(f), part["rows"])
+        else:
+            yield from _read_table(path, fmt).to_pylist()
+
+
+__all__ = [
+    "COLUMNS",
+    "COLUMN_NAMES",
+    "export_dir",
+    "iter_export_rows",
+    "resolve_format",
+    "write_stream_export",
+]
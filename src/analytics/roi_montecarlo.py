@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import random
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence
+
+try:  # opzionale: bootstrap vettoriale a blocchi
+    import numpy as np
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    np = None
+
+# ============================================================
+# Monte Carlo equity (bootstrap dei contributi settled)
+#
+# Ogni run ricampiona con reinserimento un intero percorso di equity
+# (len(contribs) passi) e ne misura: equity finale, max drawdown, quota di
+# passi sotto il picco ("time under water") e tratto sott'acqua più lungo.
+# Con NumPy i run sono generati a blocchi di `chunk` righe (memoria
+# limitata a chunk × len(contribs) float); senza NumPy si usano
+# random.choices / itertools.accumulate (loop interni in C).
+# Il picco parte da 0.0 come in _equity_stats.
+# ============================================================
+
+
+def _pct(arr: List[float], p: float) -> float:
+    k = int(round(p * (len(arr) - 1)))
+    return arr[k]
+
+
+def _dist(values: List[float]) -> Dict[str, float]:
+    values.sort()
+    return {
+        "p05": round(_pct(values, 0.05), 6),
+        "p50": round(_pct(values, 0.50), 6),
+        "p95": round(_pct(values, 0.95), 6),
+    }
+
+
+def _simulate_numpy(contribs: Sequence[float], runs: int, seed: int, chunk: int) -> Dict[str, List[float]]:
+    rng = np.random.default_rng(seed)
+    arr = np.asarray(contribs, dtype=np.float64)
+    n = len(arr)
+    finals: List[float] = []
+    max_dds: List[float] = []
+    uw_pcts: List[float] = []
+    uw_longest: List[float] = []
+    done = 0
+    while done < runs:
+        b = min(chunk, runs - done)
+        paths = np.cumsum(arr[rng.integers(0, n, size=(b, n))], axis=1)
+        peaks = np.maximum(np.maximum.accumulate(paths, axis=1), 0.0)
+        dd = peaks - paths
+        under = dd > 0
+        cur = np.zeros(b, dtype=np.int64)
+        longest = np.zeros(b, dtype=np.int64)
+        for j in range(n):
+            cur = (cur + 1) * under[:, j]
+            np.maximum(longest, cur, out=longest)
+        finals.extend(paths[:, -1].tolist())
+        max_dds.extend(dd.max(axis=1).tolist())
+        uw_pcts.extend((under.sum(axis=1) / n).tolist())
+        uw_longest.extend(longest.astype(np.float64).tolist())
+        done += b
+    return {"final": finals, "max_dd": max_dds, "uw_pct": uw_pcts, "uw_longest": uw_longest}
+
+
+def _simulate_python(contribs: Sequence[float], runs: int, rng: random.Random) -> Dict[str, List[float]]:
+    n = len(contribs)
+    choices = rng.choices
+    finals: List[float] = []
+    max_dds: List[float] = []
+    uw_pcts: List[float] = []
+    uw_longest: List[float] = []
+    for _ in range(runs):
+        path = list(accumulate(choices(contribs, k=n)))
+        peak = 0.0
+        max_dd = 0.0
+        under = 0
+        cur = 0
+        longest = 0
+        for eq in path:
+            if eq > peak:
+                peak = eq
+            dd = peak - eq
+            if dd > 0:
+                under += 1
+                cur += 1
+                if dd > max_dd:
+                    max_dd = dd
+                if cur > longest:
+                    longest = cur
+            else:
+                cur = 0
+        finals.append(path[-1])
+        max_dds.append(max_dd)
+        uw_pcts.append(under / n)
+        uw_longest.append(float(longest))
+    return {"final": finals, "max_dd": max_dds, "uw_pct": uw_pcts, "uw_longest": uw_longest}
+
+
+def simulate_equity_paths(
+    contribs: Sequence[float],
+    runs: int,
+    seed: Optional[int] = None,
+    chunk: int = 10_000,
+) -> Dict[str, Any]:
+    """
+    Bootstrap di `runs` percorsi di equity. `seed` None → generatore derivato
+    dal modulo random globale (random.seed resta efficace nei test).
+    """
+    contribs = list(contribs)
+    if not contribs or runs <= 0:
+        return {}
+    if seed is None:
+        seed = random.getrandbits(64)
+    if np is not None:
+        raw = _simulate_numpy(contribs, runs, seed, max(1, chunk))
+        engine = "numpy"
+    else:
+        raw = _simulate_python(contribs, runs, random.Random(seed))
+        engine = "python"
+    finals = _dist(raw["final"])
+    return {
+        "runs": runs,
+        "sample_size": len(contribs),
+        "engine": engine,
+        "p05_final_equity": finals["p05"],
+        "p50_final_equity": finals["p50"],
+        "p95_final_equity": finals["p95"],
+        "max_drawdown": _dist(raw["max_dd"]),
+        "time_under_water": {
+            "pct": _dist(raw["uw_pct"]),
+            "longest": _dist(raw["uw_longest"]),
+        },
+    }
+
+
+__all__ = ["simulate_equity_paths"]
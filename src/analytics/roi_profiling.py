@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.config import get_settings
+
+# ============================================================
+# Profiling ROI (debug)
+#
+# Con ENABLE_ROI_PROFILING=1 build_or_update_roi / settle_results_batch aprono
+# una sessione: ogni stage del ciclo (load, prune, alerts, settlement, save,
+# metrics, timeline, exports) e ogni blocco metriche registrano il tempo, e con
+# ENABLE_ROI_PROFILING_ALLOC=1 anche l'allocazione netta e il picco (tracemalloc,
+# costoso: solo per diagnosi). Il risultato finisce in roi_metrics.json["_timings"]
+# e il Prometheus exporter lo trasforma in istogrammi.
+# Sessione disattiva → profile_section() è un nullcontext condiviso (costo nullo).
+# Nessuna dipendenza da analytics.roi: importabile a livello modulo da roi/roi_engine.
+# ============================================================
+
+_NULL = nullcontext()
+_ACTIVE: Optional["RoiProfiler"] = None
+
+
+class _Frame:
+    __slots__ = ("start", "peak")
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.peak = start
+
+
+class RoiProfiler:
+    """Raccoglie sezioni annidate `kind`/`name` (stesse chiavi → tempi sommati)."""
+
+    def __init__(self, track_alloc: bool = False) -> None:
+        self.track_alloc = track_alloc
+        self.started = time.perf_counter()
+        self.sections: Dict[str, Dict[str, Dict[str, Any]]] = {"stages": {}, "blocks": {}}
+        self._stack: List[_Frame] = []
+
+    def _record(self, kind: str, name: str) -> Dict[str, Any]:
+        rec = self.sections.setdefault(kind, {}).get(name)
+        if rec is None:
+            rec = {"sec": 0.0, "calls": 0}
+            if self.track_alloc:
+                rec["alloc_bytes"] = 0
+                rec["peak_bytes"] = 0
+            self.sections[kind][name] = rec
+        return rec
+
+    def add_time(self, kind: str, name: str, seconds: float) -> None:
+        """Tempo misurato fuori da section() (es. add() per riga nel motore fused)."""
+        self._record(kind, name)["sec"] += seconds
+
+    @contextmanager
+    def section(self, kind: str, name: str) -> Iterator[None]:
+        frame: Optional[_Frame] = None
+        if self.track_alloc and tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # il picco visto finora appartiene alla sezione esterna
+                outer = self._stack[-1]
+                outer.peak = max(outer.peak, peak)
+            tracemalloc.reset_peak()
+            frame = _Frame(cur)
+            self._stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            rec = self._record(kind, name)
+            rec["sec"] += elapsed
+            rec["calls"] += 1
+            if frame is not None:
+                cur, peak = tracemalloc.get_traced_memory()
+                frame.peak = max(frame.peak, peak)
+                self._stack.pop()
+                if self._stack:
+                    outer = self._stack[-1]
+                    outer.peak = max(outer.peak, frame.peak)
+                rec["alloc_bytes"] += cur - frame.start
+                rec["peak_bytes"] = max(rec["peak_bytes"], frame.peak - frame.start)
+
+    def result(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "run_ts": datetime.now(timezone.utc).isoformat(),
+            "total_sec": round(time.perf_counter() - self.started, 6),
+            "alloc_tracking": self.track_alloc,
+        }
+        for kind, recs in self.sections.items():
+            out[kind] = {
+                name: {k: (round(v, 6) if isinstance(v, float) else v) for k, v in rec.items()}
+                for name, rec in recs.items()
+            }
+        return out
+
+
+def active_profiler() -> Optional[RoiProfiler]:
+    return _ACTIVE
+
+
+def profile_section(kind: str, name: str):
+    prof = _ACTIVE
+    if prof is None:
+        return _NULL
+    return prof.section(kind, name)
+
+
+@contextmanager
+def profiling_session() -> Iterator[Optional[RoiProfiler]]:
+    """
+    Apre una sessione se ENABLE_ROI_PROFILING è attivo e nessuna è già aperta.
+    Ritorna il profiler solo al proprietario della sessione (None altrimenti):
+    le sezioni annidate confluiscono comunque nella sessione esterna.
+    """
+    global _ACTIVE
+    s = get_settings()
+    if not s.enable_roi_profiling or _ACTIVE is not None:
+        yield None
+        return
+    started_tracing = False
+    if s.enable_roi_profiling_alloc and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    _ACTIVE = RoiProfiler(track_alloc=s.enable_roi_profiling_alloc)
+    try:
+        yield _ACTIVE
+    finally:
+        _ACTIVE = None
+        if started_tracing:
+            tracemalloc.stop()
+
+
+__all__ = ["RoiProfiler", "active_profiler", "profile_section", "profiling_session"]
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.config import get_settings
+from analytics.roi import load_ledger
+from analytics.roi_blocks import VersionedCache, ledger_signature
+
+try:  # opzionale: searchsorted vettoriale sui bordi dei bucket
+    import numpy as np
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    np = None
+
+# ============================================================
+# Indice quantili (colonne numeriche ordinate)
+#
+# Le pick settled vengono raccolte una volta per ciclo; ogni colonna numerica
+# (edge, clv, contrib) è ordinata al primo uso e condivisa da tutte le
+# statistiche a bucket: decili edge, edge/clv/profit buckets, distribuzione
+# profitto. Accanto ai valori ordinati ci sono le somme prefisse (nello stesso
+# ordine) di profit / stake / wins / losses / contributi, quindi le statistiche
+# di un range [left, right) sono due bisect + differenze di prefissi: O(log n)
+# per bucket, indipendentemente dal numero di pick.
+# Valori NaN esclusi (non ordinabili). Con numpy i bordi di tutti i bucket sono
+# cercati in un'unica searchsorted.
+# Le somme di un range sono differenze di prefissi accumulati in ordine di
+# valore, non la somma in ordine ledger del motore legacy: su ledger molto
+# grandi (~1M pick) profit_units / avg_profit / yield possono differire
+# dal legacy sull'ultima cifra arrotondata (1e-6). Accettato: ricalcolare la
+# somma nell'ordine legacy toglierebbe il costo O(log n) per bucket.
+# ============================================================
+
+Bounds = Tuple[Optional[float], Optional[float]]
+
+# nome colonna → attributo di _Row
+COLUMNS = {"edge": "edge", "clv": "clv", "contrib": "contrib"}
+
+
+class RangeTotals:
+    __slots__ = ("picks", "wins", "losses", "profit", "stake", "contrib")
+
+    def __init__(self, picks: int, wins: int, losses: int, profit: float, stake: float, contrib: float) -> None:
+        self.picks = picks
+        self.wins = wins
+        self.losses = losses
+        self.profit = profit
+        self.stake = stake
+        self.contrib = contrib
+
+    def stats(self) -> Dict[str, Any]:
+        """Stesse chiavi (e arrotondamenti) di roi._compute_profit_and_stats su pick settled."""
+        yield_pct = (self.profit / self.stake) if self.stake > 0 else 0.0
+        hit_rate = (self.wins / self.picks) if self.picks else 0.0
+        return {
+            "picks": self.picks,
+            "settled": self.picks,
+            "open": 0,
+            "wins": self.wins,
+            "losses": self.losses,
+            "profit_units": round(self.profit, 6),
+            "yield": round(yield_pct, 6),
+            "hit_rate": round(hit_rate, 6),
+            "stake_sum": round(self.stake, 6),
+        }
+
+
+class SortedColumn:
+    __slots__ = ("n", "values", "_profit", "_stake", "_wins", "_losses", "_contrib", "_np")
+
+    def __init__(self, pairs: Iterable[Tuple[float, Any]]) -> None:
+        """`pairs`: (valore, riga settled con stake1 / payout / result / contrib)."""
+        pairs = [pv for pv in pairs if pv[0] == pv[0]]
+        pairs.sort(key=itemgetter(0))
+        n = self.n = len(pairs)
+        self.values = array("d", [v for v, _ in pairs])
+        profit = self._profit = array("d", [0.0]) * (n + 1)
+        stake = self._stake = array("d", [0.0]) * (n + 1)
+        contrib = self._contrib = array("d", [0.0]) * (n + 1)
+        wins = self._wins = array("q", [0]) * (n + 1)
+        losses = self._losses = array("q", [0]) * (n + 1)
+        pr = st = co = 0.0
+        w = lo = 0
+        for i, (_, r) in enumerate(pairs):
+            st += r.stake1
+            co += r.contrib
+            if r.result == "win":
+                w += 1
+                pr += r.payout - r.stake1
+            elif r.result == "loss":
+                lo += 1
+                pr -= r.stake1
+            profit[i + 1] = pr
+            stake[i + 1] = st
+            contrib[i + 1] = co
+            wins[i + 1] = w
+            losses[i + 1] = lo
+        self._np = None
+
+    def __len__(self) -> int:
+        return self.n
+
+    # ---------------- ricerca ----------------
+
+    def positions(self, points: Sequence[float]) -> List[int]:
+        """bisect_left di ogni punto (numpy: una sola searchsorted)."""
+        if np is not None and len(points) > 1 and self.n:
+            if self._np is None:
+                self._np = np.frombuffer(self.values, dtype=np.float64)
+            return np.searchsorted(self._np, np.asarray(points, dtype=np.float64), side="left").tolist()
+        return [bisect_left(self.values, p) for p in points]
+
+    def spans(self, ranges: Sequence[Bounds]) -> List[Tuple[int, int]]:
+        """Slice [i, j) dei valori in [left, right) per ogni range (None = aperto)."""
+        points = [b for lr in ranges for b in lr if b is not None]
+        pos = iter(self.positions(points))
+        out: List[Tuple[int, int]] = []
+        for left, right in ranges:
+            i = next(pos) if left is not None else 0
+            j = next(pos) if right is not None else self.n
+            out.append((i, max(i, j)))
+        return out
+
+    def totals(self, i: int, j: int) -> RangeTotals:
+        return RangeTotals(
+            j - i,
+            self._wins[j] - self._wins[i],
+            self._losses[j] - self._losses[i],
+            self._profit[j] - self._profit[i],
+            self._stake[j] - self._stake[i],
+            self._contrib[j] - self._contrib[i],
+        )
+
+    def range_totals(self, ranges: Sequence[Bounds]) -> List[RangeTotals]:
+        return [self.totals(i, j) for i, j in self.spans(ranges)]
+
+    def histogram(self, edges: Sequence[float]) -> List[int]:
+        """Conteggi tra bordi consecutivi (bin [e_k, e_k+1))."""
+        pos = self.positions(list(edges))
+        return [b - a for a, b in zip(pos, pos[1:])]
+
+    # ---------------- quantili ----------------
+
+    def quantile(self, p: float) -> Optional[float]:
+        """Valore al rank int(round(p*(n-1))) (stessa regola di roi._profit_distribution)."""
+        if not self.n:
+            return None
+        k = int(round(min(max(p, 0.0), 1.0) * (self.n - 1)))
+        return self.values[k]
+
+    def decile_spans(self) -> List[Tuple[int, int, int]]:
+        """
+        (decile, i, j) dei decili non vuoti: il bordo d è il valore al rank
+        int(d*n/10)-1 e un valore appartiene al primo decile con bordo >= valore
+        (come roi._edge_deciles); con meno di 5 valori un solo decile.
+        """
+        n = self.n
+        if not n:
+            return []
+        if n < 5:
+            return [(1, 0, n)]
+        values = self.values
+        out: List[Tuple[int, int, int]] = []
+        start = 0
+        for d in range(1, 11):
+            end = n if d == 10 else bisect_right(values, values[min(n - 1, int(d * n / 10) - 1)])
+            if end > start:
+                out.append((d, start, end))
+                start = end
+        return out
+
+
+class QuantileIndex:
+    """Pick settled del ciclo; le colonne sono ordinate al primo column(nome)."""
+
+    __slots__ = ("rows", "_columns")
+
+    def __init__(self, rows: Optional[List[Any]] = None) -> None:
+        self.rows: List[Any] = rows if rows is not None else []
+        self._columns: Dict[str, SortedColumn] = {}
+
+    def add(self, r: Any) -> None:
+        if r.settled:
+            self.rows.append(r)
+
+    def column(self, name: str) -> SortedColumn:
+        col = self._columns.get(name)
+        if col is None:
+            attr = COLUMNS[name]
+            pairs = []
+            for r in self.rows:
+                v = getattr(r, attr)
+                if v is not None:
+                    pairs.append((float(v), r))
+            col = self._columns[name] = SortedColumn(pairs)
+        return col
+
+
+# ------------------------------------------------------------
+# Indice per l'API (bucket arbitrari senza riscansione)
+# ------------------------------------------------------------
+
+_CACHE = VersionedCache()
+
+
+def load_quantile_index() -> QuantileIndex:
+    """QuantileIndex delle pick settled correnti, ricostruito solo se ledger o journal cambiano."""
+    from analytics.roi_engine import _Row
+
+    s = get_settings()
+    base = Path(s.bet_data_dir or "data") / s.roi_dir
+
+    def build() -> QuantileIndex:
+        index = QuantileIndex([_Row(p) for p in load_ledger(base) if p.get("settled")])
+        # colonne ordinate nel build (sotto lock): richieste concorrenti non ripetono il sort
+        for name in COLUMNS:
+            index.column(name)
+        return index
+
+    return _CACHE.get(str(base), ledger_signature(base), build, lambda: ledger_signature(base))
+
+
+def bucket_stats(col: SortedColumn, specs: Sequence[Tuple[str, Bounds]]) -> List[Dict[str, Any]]:
+    """Statistiche per range `spec` → bounds [left, right) (API /roi/buckets)."""
+    out: List[Dict[str, Any]] = []
+    for (spec, _), tot in zip(specs, col.range_totals([b for _, b in specs])):
+        st = tot.stats()
+        out.append({
+            "range": spec,
+            "picks": st["picks"],
+            "wins": st["wins"],
+            "losses": st["losses"],
+            "profit_units": st["profit_units"],
+            "avg_profit": round(tot.contrib / tot.picks, 6) if tot.picks else 0.0,
+            "yield": st["yield"],
+            "hit_rate": st["hit_rate"],
+        })
+    return out
+
+
+def quantiles(col: SortedColumn, ps: Iterable[float]) -> Dict[str, Optional[float]]:
+    out: Dict[str, Optional[float]] = {}
+    for p in ps:
+        v = col.quantile(p)
+        out[f"p{p * 100:g}"] = round(v, 6) if v is not None and math.isfinite(v) else v
+    return out
+
+
+__all__ = [
+    "COLUMNS",
+    "QuantileIndex",
+    "RangeTotals",
+    "SortedColumn",
+    "bucket_stats",
+    "load_quantile_index",
+    "quantiles",
+]
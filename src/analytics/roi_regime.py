@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import copy
+import math
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from core.logging import get_logger
+from analytics.roi import (
+    _load_json,
+    _now_iso,
+    _regime_classify_m1,
+    _regime_durations,
+    _regime_hold,
+    _regime_load_state,
+    _regime_save_state,
+    _regime_state_path,
+    _save_json_atomic,
+)
+
+logger = get_logger("analytics.roi_regime")
+
+# ============================================================
+# Regime M1 online (ENABLE_ROI_REGIME_ONLINE)
+#
+# Invece di ricalcolare le feature sulla finestra ad ogni ciclo, lo stato
+# persistito (chiave "online" di ROI_REGIME_STATE_FILE) viene aggiornato per
+# ogni NUOVO punto settled della equity curve:
+#   - finestra scorrevole degli ultimi ROI_REGIME_LOOKBACK punti con somme
+#     scorrevoli (incrementi, quadrati, valori assoluti, Σy / Σxy per lo slope,
+#     finestre momentum) e massimo scorrevole (deque monotona) per il drawdown
+#   - momentum smussato, media / varianza esponenziali degli incrementi,
+#     classificazione e hold logic applicati punto per punto
+# Costo per ciclo O(nuovi settlement) (+ O(lookback) per ricaricare la finestra).
+# Lo stato è funzione della sola sequenza dei punti: replay_regime() sulla curva
+# completa deve dare lo stesso stato (ROI_REGIME_ONLINE_VALIDATE lo verifica ad
+# ogni ciclo e in caso di scostamento adotta il replay).
+# La curva è ordinata per created_at: una pick aperta che chiude si inserisce
+# a metà serie. Come in analytics.roi_state lo stato persistito contiene solo
+# il prefisso congelato (punti con created_at < pick aperta più vecchia); il
+# suffix successivo viene ripiegato ad ogni ciclo su una copia dello stato.
+# Se il prefisso non prosegue quello già piegato (pruning, reset) lo stato
+# viene ricostruito con un replay; history e changed_at persistiti restano:
+# history registra solo i cambi reali della label pubblicata.
+# ============================================================
+
+ONLINE_STATE_VERSION = 1
+# ultimi punti confrontati per riconoscere la prosecuzione della curva
+_MATCH_POINTS = 8
+_TOL = 1e-9
+
+
+class RegimeOnline:
+    """Stato online M1: finestra scorrevole + statistiche smussate + hold logic."""
+
+    def __init__(self, s) -> None:
+        self.lookback = max(2, s.roi_regime_lookback)
+        self.mom_windows: List[int] = list(s.roi_regime_momentum_windows)
+        self.points = 0
+        self.window: Deque[float] = deque()
+        self.smooth_momentum: Optional[float] = None
+        self.ew_mean = 0.0
+        self.ew_var = 0.0
+        self.ew_n = 0
+        self.label: Optional[str] = None
+        self.label_raw: Optional[str] = None
+        self.confidence: Optional[float] = None
+        self.hold_counter = 0
+        self.changes: List[Dict[str, Any]] = []
+        self._reset_sums()
+
+    # ---------------- finestra ----------------
+
+    def _reset_sums(self) -> None:
+        self._incs: Deque[float] = deque()
+        self._s1 = 0.0
+        self._s2 = 0.0
+        self._sabs = 0.0
+        self._sy = 0.0
+        self._sxy = 0.0
+        self._mom = {w: 0.0 for w in self.mom_windows}
+        self._max: Deque[Tuple[int, float]] = deque()
+        self._offset = 0  # indice assoluto di window[0]
+
+    def _append(self, y: float) -> None:
+        win = self.window
+        if len(win) == self.lookback:
+            y0 = win.popleft()
+            self._sxy -= self._sy - y0
+            self._sy -= y0
+            self._offset += 1
+            m0 = len(self._incs)
+            x0 = self._incs.popleft()
+            self._s1 -= x0
+            self._s2 -= x0 * x0
+            self._sabs -= abs(x0)
+            for w in self.mom_windows:
+                # finestra momentum più ampia degli incrementi: x0 ne faceva parte
+                if m0 <= w:
+                    self._mom[w] -= x0
+            if self._max and self._max[0][0] < self._offset:
+                self._max.popleft()
+        if win:
+            x = y - win[-1]
+            incs = self._incs
+            incs.append(x)
+            self._s1 += x
+            self._s2 += x * x
+            self._sabs += abs(x)
+            m = len(incs)
+            for w in self.mom_windows:
+                self._mom[w] += x
+                if m > w:
+                    self._mom[w] -= incs[m - 1 - w]
+        self._sxy += len(win) * y
+        self._sy += y
+        win.append(y)
+        idx = self._offset + len(win) - 1
+        while self._max and self._max[-1][1] <= y:
+            self._max.pop()
+        self._max.append((idx, y))
+
+    def features(self) -> Dict[str, Any]:
+        """Stesse feature di roi._regime_features sulla finestra corrente."""
+        n = len(self.window)
+        m = len(self._incs)
+        if n < 2 or not m:
+            return {}
+        avg_inc = self._s1 / m
+        norm_momentum = avg_inc / (self._sabs / m + 1e-9)
+        vol = math.sqrt(max(0.0, self._s2 / m - avg_inc * avg_inc)) if m > 1 else 0.0
+        current = self.window[-1]
+        peak = self._max[0][1]
+        dd_pct = (peak - current) / peak if peak > 0 else 0.0
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        denom = n * sum_xx - sum_x * sum_x
+        slope = (n * self._sxy - sum_x * self._sy) / denom if denom != 0 else 0.0
+        return {
+            "lookback_points": n,
+            "increments": m,
+            "avg_increment": avg_inc,
+            "norm_momentum": norm_momentum,
+            "volatility": vol,
+            "drawdown_pct": dd_pct,
+            "slope": slope,
+            "momentum_windows": {f"m_w{w}": self._mom[w] / min(w, m) for w in self.mom_windows},
+        }
+
+    # ---------------- aggiornamento ----------------
+
+    def push(self, equity: float, s, now: Optional[str] = None) -> None:
+        prev = self.window[-1] if self.window else None
+        self._append(equity)
+        self.points += 1
+        if prev is not None:
+            # media / varianza esponenziali degli incrementi (stesso alpha dello smoothing)
+            x = equity - prev
+            a = s.roi_regime_smooth_alpha
+            if self.ew_n == 0:
+                self.ew_mean = x
+                self.ew_var = 0.0
+            else:
+                d = x - self.ew_mean
+                self.ew_mean += a * d
+                self.ew_var = (1 - a) * (self.ew_var + a * d * d)
+            self.ew_n += 1
+
+        feat = self.features()
+        if not feat or feat["lookback_points"] < s.roi_regime_min_points:
+            return
+        raw = feat["norm_momentum"]
+        a = s.roi_regime_smooth_alpha
+        self.smooth_momentum = raw if self.smooth_momentum is None else a * raw + (1 - a) * self.smooth_momentum
+        label_raw, conf = _regime_classify_m1(feat, s, self.smooth_momentum)
+        label, hold, changed = _regime_hold(self.label, self.hold_counter, label_raw, s.roi_regime_min_hold)
+        self.label, self.label_raw, self.confidence, self.hold_counter = label, label_raw, conf, hold
+        if changed:
+            self.changes.append({"changed_at": now or _now_iso(), "label": label, "point": self.points})
+
+    def matches(self, curve: List[float], settled: int) -> bool:
+        """La curva (ultimi len(curve) di `settled` punti) prosegue quella già piegata?"""
+        new = settled - self.points
+        if new < 0 or new > len(curve):
+            return False
+        k = min(_MATCH_POINTS, len(self.window), len(curve) - new)
+        if k < min(_MATCH_POINTS, len(self.window)):
+            # la curva non copre più gli ultimi punti piegati
+            return False
+        end = len(curve) - new
+        tail = list(self.window)[-k:] if k else []
+        return all(math.isclose(a, b, rel_tol=0.0, abs_tol=_TOL) for a, b in zip(tail, curve[end - k:end]))
+
+    # ---------------- serializzazione ----------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": ONLINE_STATE_VERSION,
+            "lookback": self.lookback,
+            "momentum_windows": self.mom_windows,
+            "points": self.points,
+            "window": list(self.window),
+            "smooth_momentum": self.smooth_momentum,
+            "ew_mean": self.ew_mean,
+            "ew_var": self.ew_var,
+            "ew_n": self.ew_n,
+            "label": self.label,
+            "label_raw": self.label_raw,
+            "confidence": self.confidence,
+            "hold_counter": self.hold_counter,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Any, s) -> Optional["RegimeOnline"]:
+        if not isinstance(raw, dict) or raw.get("version") != ONLINE_STATE_VERSION:
+            return None
+        st = cls(s)
+        if raw.get("lookback") != st.lookback or raw.get("momentum_windows") != st.mom_windows:
+            return None
+        window = raw.get("window") or []
+        # somme ricalcolate dalla finestra (nessuna deriva tra un ciclo e l'altro)
+        for y in window[-st.lookback:]:
+            st._append(float(y))
+        st.points = int(raw.get("points") or 0)
+        st._offset = st.points - len(st.window)
+        st._max = deque((i + st._offset, y) for i, y in st._max)
+        st.smooth_momentum = raw.get("smooth_momentum")
+        st.ew_mean = float(raw.get("ew_mean") or 0.0)
+        st.ew_var = float(raw.get("ew_var") or 0.0)
+        st.ew_n = int(raw.get("ew_n") or 0)
+        st.label = raw.get("label")
+        st.label_raw = raw.get("label_raw")
+        st.confidence = raw.get("confidence")
+        st.hold_counter = int(raw.get("hold_counter") or 0)
+        return st
+
+
+def replay_regime(equity_curve: List[float], s) -> RegimeOnline:
+    """Stato online ricostruito da zero piegando l'intera curva (validazione / rebuild)."""
+    st = RegimeOnline(s)
+    now = _now_iso()
+    for y in equity_curve:
+        st.push(y, s, now)
+    return st
+
+
+def regime_drift(a: RegimeOnline, b: RegimeOnline) -> List[str]:
+    """Campi in cui due stati online differiscono (vuoto = equivalenti)."""
+    diffs = []
+    for key in ("points", "label", "label_raw", "hold_counter", "ew_n"):
+        if getattr(a, key) != getattr(b, key):
+            diffs.append(key)
+    for key in ("smooth_momentum", "ew_mean", "ew_var", "confidence"):
+        x, y = getattr(a, key), getattr(b, key)
+        if (x is None) != (y is None) or (x is not None and not math.isclose(x, y, rel_tol=1e-9, abs_tol=_TOL)):
+            diffs.append(key)
+    if len(a.window) != len(b.window) or any(
+        not math.isclose(x, y, rel_tol=0.0, abs_tol=_TOL) for x, y in zip(a.window, b.window)
+    ):
+        diffs.append("window")
+    return diffs
+
+
+def regime_block_online(
+    base: Path,
+    equity_curve: List[float],
+    s,
+    settled: Optional[int] = None,
+    frozen: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Blocco regime M1 aggiornato con i soli punti nuovi. `settled`: numero totale
+    di punti settled (la curva può essere la sola coda, stato incrementale).
+    `frozen`: punti iniziali che nessuna pick aperta può più precedere; solo
+    questi entrano nello stato persistito, il resto è rigiocato su una copia.
+    """
+    if not equity_curve:
+        return {}
+    total = settled if settled is not None else len(equity_curve)
+    frozen = total if frozen is None else max(0, min(frozen, total))
+    # la curva copre i punti [total - len(curve), total): il suffix non congelato
+    # è sempre nella coda (stato incrementale: coda >= suffix + lookback)
+    cut = max(0, len(equity_curve) - (total - frozen))
+    head, suffix = equity_curve[:cut], equity_curve[cut:]
+    prev_state = _regime_load_state(base, s) if s.enable_roi_regime_persistence else _load_online_only(base, s)
+    st = RegimeOnline.from_dict(prev_state.get("online"), s)
+    prev_label = prev_state.get("label", st.label if st is not None else None)
+
+    rebuilt = False
+    if st is None or not st.matches(head, frozen):
+        st = replay_regime(head, s)
+        st.points = frozen
+        rebuilt = True
+    else:
+        now = _now_iso()
+        for y in head[len(head) - (frozen - st.points):]:
+            st.push(y, s, now)
+
+    if s.roi_regime_online_validate and not rebuilt and len(head) == frozen:
+        ref = replay_regime(head, s)
+        drift = regime_drift(st, ref)
+        if drift:
+            logger.warning("regime_online_drift", extra={"fields": drift, "points": frozen})
+            st = ref
+
+    # stato persistito = prefisso congelato; il suffix si ripiega ad ogni ciclo
+    live = copy.deepcopy(st)
+    now = _now_iso()
+    for y in suffix:
+        live.push(y, s, now)
+
+    # transizioni reali della label pubblicata: changed_at resta fermo finché la label non cambia
+    changed_at = prev_state.get("changed_at")
+    history = list(prev_state.get("history") or []) if s.enable_roi_regime_persistence else []
+    if live.label is not None and live.label != prev_label:
+        changed_at = now
+        if s.enable_roi_regime_persistence:
+            history.append({"changed_at": now, "label": live.label})
+            history = history[-max(1, s.roi_regime_history_max):]
+
+    feat = live.features()
+    if live.label is None:
+        block: Dict[str, Any] = {
+            "label": "neutral",
+            "confidence": 0.1,
+            "reason": "insufficient_points",
+            "features": feat,
+        }
+    else:
+        block = {
+            "label": live.label,
+            "confidence": live.confidence,
+            "label_raw": live.label_raw,
+            "drawdown_pct": round(feat["drawdown_pct"], 6),
+            "volatility": round(feat["volatility"], 6),
+            "momentum_raw": round(feat["norm_momentum"], 6),
+            "momentum_smooth": round(live.smooth_momentum, 6),
+            "slope": round(feat["slope"], 6),
+            "hold_counter": live.hold_counter,
+            "min_hold": s.roi_regime_min_hold,
+            "features": {
+                "lookback_points": feat["lookback_points"],
+                "momentum_windows": {k: round(v, 6) for k, v in feat["momentum_windows"].items()},
+                "ew_mean_increment": round(live.ew_mean, 6),
+                "ew_volatility": round(math.sqrt(max(0.0, live.ew_var)), 6),
+            },
+            "version": "m1",
+            "online": True,
+            "points": live.points,
+        }
+        if prev_label:
+            block["label_prev"] = prev_label
+        if changed_at:
+            block["changed_at"] = changed_at
+
+    state: Dict[str, Any] = {"online": st.to_dict(), "label": live.label, "changed_at": changed_at}
+    if s.enable_roi_regime_persistence:
+        block["history"] = history
+        block["durations_max_streak"] = _regime_durations(history)
+        state.update({
+            "smooth_momentum": live.smooth_momentum,
+            "hold_counter": live.hold_counter,
+            "history": history,
+        })
+        _regime_save_state(base, s, state)
+    else:
+        # lo stato online va comunque persistito (senza history)
+        try:
+            _save_json_atomic(_regime_state_path(base, s), state)
+        except Exception as exc:
+            logger.error("regime_state_save_failed %s", exc)
+    return block
+
+
+def _load_online_only(base: Path, s) -> Dict[str, Any]:
+    raw = _load_json(_regime_state_path(base, s))
+    return raw if isinstance(raw, dict) else {}
+
+
+__all__ = ["RegimeOnline", "regime_block_online", "regime_drift", "replay_regime"]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import math
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from core.config import get_settings
+from analytics.roi import load_ledger
+from analytics.roi_blocks import VersionedCache, ledger_signature
+
+# ============================================================
+# Rolling engine a somme prefisse
+#
+# Sulla serie settled ordinata per created_at:
+#   profit[i], stake[i], wins[i]     somme dei primi i punti
+#   inc[i], inc_sq[i]                somme (e quadrati) degli incrementi di
+#                                    equity, traslati di `shift` (media globale)
+#                                    per limitare la cancellazione numerica
+# Profit / yield / hit rate / volatilità di una finestra "ultimi w punti"
+# sono differenze di due prefissi (O(1)); picco e max drawdown della
+# finestra restano una scansione O(w) (non decomponibili in prefissi).
+# Gli incrementi sono le differenze della curva equity passata (o della
+# somma progressiva dei contributi), come in roi._equity_volatility.
+# ============================================================
+
+
+class RollingIndex:
+    __slots__ = ("n", "contribs", "_profit", "_stake", "_wins", "_inc", "_inc_sq", "_shift")
+
+    def __init__(
+        self,
+        contribs: Sequence[float],
+        stakes: Sequence[float],
+        wins: Sequence[bool],
+        equity: Optional[Sequence[float]] = None,
+    ) -> None:
+        n = self.n = len(contribs)
+        self.contribs = array("d", contribs)
+        profit = self._profit = array("d", [0.0]) * (n + 1)
+        stake = self._stake = array("d", [0.0]) * (n + 1)
+        won = self._wins = array("q", [0]) * (n + 1)
+        p = st = 0.0
+        w = 0
+        for i in range(n):
+            p += contribs[i]
+            st += stakes[i]
+            w += 1 if wins[i] else 0
+            profit[i + 1] = p
+            stake[i + 1] = st
+            won[i + 1] = w
+
+        if equity is None:
+            equity = self._profit[1:]
+        incs = [equity[i] - equity[i - 1] for i in range(1, len(equity))]
+        shift = self._shift = (sum(incs) / len(incs)) if incs else 0.0
+        inc = self._inc = array("d", [0.0]) * (len(incs) + 1)
+        inc_sq = self._inc_sq = array("d", [0.0]) * (len(incs) + 1)
+        a = b = 0.0
+        for i, x in enumerate(incs):
+            d = x - shift
+            a += d
+            b += d * d
+            inc[i + 1] = a
+            inc_sq[i + 1] = b
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any], equity: Optional[Sequence[float]] = None) -> "RollingIndex":
+        """Righe con contrib / stake1 / result (roi_engine._Row, roi_state._Point)."""
+        rows = list(rows)
+        return cls(
+            [r.contrib for r in rows],
+            [r.stake1 for r in rows],
+            [r.result == "win" for r in rows],
+            equity=equity,
+        )
+
+    @classmethod
+    def from_equity(cls, equity: Sequence[float]) -> "RollingIndex":
+        """Solo volatilità (blocchi legacy: è disponibile la sola curva equity)."""
+        return cls([], [], [], equity=equity)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def window(self, w: int) -> Tuple[int, float, float, int]:
+        """(picks, profit, stake, wins) degli ultimi min(w, n) punti."""
+        n = self.n
+        a = n - min(w, n)
+        return n - a, self._profit[n] - self._profit[a], self._stake[n] - self._stake[a], self._wins[n] - self._wins[a]
+
+    def window_stats(self, w: int) -> Dict[str, Any]:
+        k, profit, stake, wins = self.window(w)
+        return {
+            "picks": k,
+            "profit_units": round(profit, 6),
+            "yield": round((profit / stake) if stake > 0 else 0.0, 6),
+            "hit_rate": round(wins / k if k else 0.0, 6),
+        }
+
+    def drawdown(self, w: int) -> Tuple[float, float]:
+        """(picco, max drawdown) dell'equity ripartita da 0 sugli ultimi w punti: O(w)."""
+        running = peak = max_dd = 0.0
+        for i in range(self.n - min(w, self.n), self.n):
+            running += self.contribs[i]
+            if running > peak:
+                peak = running
+            dd = peak - running
+            if dd > max_dd:
+                max_dd = dd
+        return peak, max_dd
+
+    def volatility(self, w: int) -> float:
+        """Deviazione standard (popolazione) degli ultimi w incrementi di equity."""
+        m = len(self._inc) - 1
+        if m < 1:
+            return 0.0
+        k = min(w, m)
+        if k < 2:
+            return 0.0
+        a = m - k
+        s1 = self._inc[m] - self._inc[a]
+        s2 = self._inc_sq[m] - self._inc_sq[a]
+        mean = s1 / k
+        return math.sqrt(max(0.0, s2 / k - mean * mean))
+
+
+# ------------------------------------------------------------
+# Indice per l'API (finestre arbitrarie senza costo nel ciclo)
+# ------------------------------------------------------------
+
+_CACHE = VersionedCache()
+
+
+def load_rolling_index() -> RollingIndex:
+    """RollingIndex della serie settled corrente, ricostruito solo se ledger o journal cambiano."""
+    from analytics.roi_engine import _Row
+
+    s = get_settings()
+    base = Path(s.bet_data_dir or "data") / s.roi_dir
+
+    def build() -> RollingIndex:
+        rows = [_Row(p) for p in load_ledger(base) if p.get("settled")]
+        rows.sort(key=lambda r: r.created_at or "")
+        return RollingIndex.from_rows(rows)
+
+    return _CACHE.get(str(base), ledger_signature(base), build, lambda: ledger_signature(base))
+
+
+def rolling_windows(idx: RollingIndex, windows: Iterable[int], drawdown: bool = False) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for w in windows:
+        row = idx.window_stats(w)
+        row["volatility"] = round(idx.volatility(w), 6)
+        if drawdown:
+            peak, mdd = idx.drawdown(w)
+            row["peak_profit"] = round(peak, 6)
+            row["max_drawdown"] = round(mdd, 6)
+        out[f"w{w}"] = row
+    return out
+
+
+__all__ = ["RollingIndex", "load_rolling_index", "rolling_windows"]
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+from bisect import insort
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import get_settings
+from core.logging import get_logger
+from analytics.roi import _load_json, _save_json_atomic
+from analytics.roi_engine import (
+    _LeagueAcc,
+    _Row,
+    _SeriesState,
+    _SideAcc,
+    _SIDES,
+    _SOURCES,
+    _StakeBreakdownAcc,
+    _StatsAcc,
+    _profit_norm,
+    _risk_of_ruin,
+    _series_blocks,
+)
+
+logger = get_logger("analytics.roi_state")
+
+# ============================================================
+# Stato aggregato incrementale (ENABLE_ROI_INCREMENTAL)
+#
+# Persistito accanto a ledger.json. Contiene contatori e somme (globali,
+# per source / side / stake strategy / lega), lo stato cumulativo della
+# serie settled (equity, drawdown, streak) e la coda della serie.
+#
+# La serie è ordinata per created_at: una pick aperta può ancora inserirsi
+# nel mezzo. Per questo la serie è divisa in:
+#   - parte "congelata": punti con chiave < min chiave delle pick aperte,
+#     già piegati in _SeriesState (+ ultimi tail_size punti per le rolling)
+#   - "suffix": punti settled successivi alla pick aperta più vecchia,
+#     rigiocati ad ogni calcolo (tipicamente pochi)
+# Ogni ciclo applica solo le pick create / settled nel ciclo; se lo stato
+# manca, ha versione diversa o non è coerente col ledger (conteggio, ultima
+# pick, pick aperte ancora aperte nel ledger) → rebuild completo.
+# ============================================================
+
+ROI_STATE_VERSION = 1
+
+
+def _state_path(base: Path) -> Path:
+    return base / get_settings().roi_state_file
+
+
+def _pick_key(p: Dict[str, Any]) -> str:
+    return f"{p.get('fixture_id')}|{p.get('source')}"
+
+
+def _tail_size(s) -> int:
+    sizes = [1, s.roi_rolling_window, s.roi_regime_lookback]
+    sizes.extend(s.roi_rolling_windows)
+    if s.roi_equity_vol_windows:
+        sizes.append(max(s.roi_equity_vol_windows) + 1)
+    return max(sizes)
+
+
+def incremental_supported(s) -> bool:
+    """Il regime stub usa l'intera equity curve: non ricavabile dalla sola coda."""
+    return not (s.enable_roi_regime and s.roi_regime_version != "m1")
+
+
+class _Point:
+    __slots__ = ("contrib", "stake1", "result", "equity")
+
+    def __init__(self, contrib: float, stake1: float, result: Optional[str], equity: float) -> None:
+        self.contrib = contrib
+        self.stake1 = stake1
+        self.result = result
+        self.equity = equity
+
+
+class RoiAggregateState:
+    """
+    Aggregati del ledger aggiornabili per delta.
+    Punti serie: [created_at, seq, contrib, stake1, result] (+ equity nella coda congelata);
+    `seq` è la posizione di inserimento nel ledger e risolve i pari merito su created_at.
+    """
+
+    def __init__(self, tail_size: int) -> None:
+        self.tail_size = tail_size
+        self.picks = 0
+        self.next_seq = 0
+        self.head_key: Optional[str] = None
+        self.trackable = True
+        self.glob = _StatsAcc()
+        self.by_source: Dict[str, _StatsAcc] = {}
+        self.by_side: Dict[str, _StatsAcc] = {}
+        self.by_stake: Dict[str, _StatsAcc] = {}
+        self.by_league: Dict[Any, _StatsAcc] = {}
+        self.contrib_sum = 0.0
+        self.open: Dict[str, List[Any]] = {}
+        self.frozen = _SeriesState()
+        self.frozen_tail: List[List[Any]] = []
+        self.suffix: List[List[Any]] = []
+
+    # ---------------- tallies ----------------
+
+    def _tallies(self, r: _Row) -> List[_StatsAcc]:
+        accs = [self.glob]
+        for groups, key, ok in (
+            (self.by_source, r.source, r.source in _SOURCES),
+            (self.by_side, r.side, r.side in _SIDES),
+            (self.by_stake, r.stake_strategy, r.stake_strategy in ("kelly", "fixed")),
+            (self.by_league, r.league_id, r.league_id is not None),
+        ):
+            if not ok:
+                continue
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = _StatsAcc()
+            accs.append(acc)
+        return accs
+
+    # ---------------- build / delta ----------------
+
+    @classmethod
+    def rebuild(cls, ledger: List[Dict[str, Any]], s) -> "RoiAggregateState":
+        st = cls(_tail_size(s))
+        entries: List[List[Any]] = []
+        for seq, p in enumerate(ledger):
+            r = _Row(p)
+            for acc in st._tallies(r):
+                acc.add(r)
+            if r.settled:
+                st.contrib_sum += r.contrib
+                entries.append([r.created_at or "", seq, r.contrib, r.stake1, r.result])
+            else:
+                key = _pick_key(p)
+                if key in st.open:
+                    st.trackable = False
+                st.open[key] = [r.created_at or "", seq]
+        st.picks = st.next_seq = len(ledger)
+        st.head_key = _pick_key(ledger[-1]) if ledger else None
+        entries.sort(key=lambda e: e[0])
+        st.suffix = entries
+        st._advance()
+        return st
+
+    def apply(
+        self,
+        ledger: List[Dict[str, Any]],
+        created: List[Dict[str, Any]],
+        settled: List[Dict[str, Any]],
+    ) -> bool:
+        """Applica i delta del ciclo. False → stato non coerente, serve rebuild."""
+        if not self.trackable or self.picks + len(created) != len(ledger):
+            return False
+        prev = len(ledger) - len(created) - 1
+        if (_pick_key(ledger[prev]) if prev >= 0 else None) != self.head_key:
+            return False
+
+        for p in created:
+            r = _Row(p)
+            key = _pick_key(p)
+            if r.settled or key in self.open:
+                return False
+            for acc in self._tallies(r):
+                acc.picks += 1
+            self.open[key] = [r.created_at or "", self.next_seq]
+            self.next_seq += 1
+            self.picks += 1
+
+        last_frozen = self.frozen_tail[-1][:2] if self.frozen_tail else None
+        for p in settled:
+            pos = self.open.pop(_pick_key(p), None)
+            if pos is None or (last_frozen is not None and pos <= last_frozen):
+                return False
+            r = _Row(p)
+            for acc in self._tallies(r):
+                acc.settle(r)
+            self.contrib_sum += r.contrib
+            insort(self.suffix, [pos[0], pos[1], r.contrib, r.stake1, r.result])
+
+        # crash tra salvataggio ledger e stato: pick ancora aperte nello stato
+        # ma già settled (o spostate) nel ledger → O(open), rebuild se divergono
+        for key, pos in self.open.items():
+            seq = pos[1]
+            if seq >= len(ledger) or _pick_key(ledger[seq]) != key or ledger[seq].get("settled"):
+                return False
+
+        self.head_key = _pick_key(ledger[-1]) if ledger else None
+        self._advance(keep_new=True)
+        return True
+
+    def _advance(self, keep_new: bool = False) -> None:
+        """
+        Congela i punti della serie che nessuna pick aperta può più precedere.
+        `keep_new`: i punti appena congelati restano nella coda oltre tail_size
+        (il regime online li piega nel ciclo stesso, analytics.roi_regime).
+        """
+        boundary = min(self.open.values()) if self.open else None
+        n = 0
+        for e in self.suffix:
+            if boundary is not None and e[:2] >= boundary:
+                break
+            equity = self.frozen.push(e[2], e[4])
+            self.frozen_tail.append(e + [equity])
+            n += 1
+        if n:
+            del self.suffix[:n]
+            keep = self.tail_size + (n if keep_new else 0)
+            if len(self.frozen_tail) > keep:
+                del self.frozen_tail[: len(self.frozen_tail) - keep]
+
+    # ---------------- blocchi ----------------
+
+    def blocks(self, s) -> Dict[str, Any]:
+        """Blocchi di compute_metrics ricavabili dallo stato (preset per compute_blocks_fused)."""
+        out: Dict[str, Any] = {}
+        empty = _StatsAcc()
+        out["global_stats"] = self.glob.stats()
+        out["pred_stats"] = self.by_source.get("prediction", empty).stats()
+        out["cons_stats"] = self.by_source.get("consensus", empty).stats()
+        out["merged_stats"] = self.by_source.get("merged", empty).stats()
+        if s.enable_roi_source_breakdown:
+            out["source_bd"] = {
+                src: self.by_source[src].stats()
+                for src in _SOURCES
+                if src in self.by_source and self.by_source[src].picks
+            }
+        else:
+            out["source_bd"] = {}
+        out["profit_norm"] = _profit_norm(self.contrib_sum, self.glob.settled, self.glob.stake)
+        out["risk_of_ruin"] = _risk_of_ruin(self.glob) if s.enable_roi_ror else None
+
+        series = _SeriesState.from_list(self.frozen.to_list())
+        tail = [_Point(e[2], e[3], e[4], e[5]) for e in self.frozen_tail]
+        for e in self.suffix:
+            tail.append(_Point(e[2], e[3], e[4], series.push(e[2], e[4])))
+        _series_blocks(s, series, tail, [pt.equity for pt in tail], out)
+        # prefisso della curva definitivo per il regime online: come nel motore fused,
+        # i punti con lo stesso created_at della pick aperta più vecchia restano fuori
+        frozen = self.frozen.points
+        if self.open:
+            oldest = min(self.open.values())[0]
+            frozen -= sum(1 for e in self.frozen_tail if e[0] >= oldest)
+        out["series_frozen"] = frozen
+
+        for cls, groups in (
+            (_StakeBreakdownAcc, self.by_stake),
+            (_LeagueAcc, self.by_league),
+            (_SideAcc, self.by_side),
+        ):
+            acc = cls(s)
+            acc.groups = dict(groups)
+            if cls.enabled(s):
+                acc.finalize(None, out)
+            else:
+                acc.disabled_output(out)
+        return out
+
+    # ---------------- persistenza ----------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": ROI_STATE_VERSION,
+            "tail_size": self.tail_size,
+            "picks": self.picks,
+            "next_seq": self.next_seq,
+            "head_key": self.head_key,
+            "trackable": self.trackable,
+            "global": self.glob.to_list(),
+            "by_source": {k: v.to_list() for k, v in self.by_source.items()},
+            "by_side": {k: v.to_list() for k, v in self.by_side.items()},
+            "by_stake": {k: v.to_list() for k, v in self.by_stake.items()},
+            # lista per preservare tipo (int) e ordine di prima comparsa delle leghe
+            "by_league": [[k, v.to_list()] for k, v in self.by_league.items()],
+            "contrib_sum": self.contrib_sum,
+            "open": self.open,
+            "frozen": self.frozen.to_list(),
+            "frozen_tail": self.frozen_tail,
+            "suffix": self.suffix,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "RoiAggregateState":
+        st = cls(int(raw["tail_size"]))
+        st.picks = int(raw["picks"])
+        st.next_seq = int(raw["next_seq"])
+        st.head_key = raw.get("head_key")
+        st.trackable = bool(raw.get("trackable", True))
+        st.glob = _StatsAcc.from_list(raw["global"])
+        st.by_source = {k: _StatsAcc.from_list(v) for k, v in raw["by_source"].items()}
+        st.by_side = {k: _StatsAcc.from_list(v) for k, v in raw["by_side"].items()}
+        st.by_stake = {k: _StatsAcc.from_list(v) for k, v in raw["by_stake"].items()}
+        st.by_league = {k: _StatsAcc.from_list(v) for k, v in raw["by_league"]}
+        st.contrib_sum = float(raw["contrib_sum"])
+        st.open = {k: list(v) for k, v in raw["open"].items()}
+        st.frozen = _SeriesState.from_list(raw["frozen"])
+        st.frozen_tail = [list(e) for e in raw["frozen_tail"]]
+        st.suffix = [list(e) for e in raw["suffix"]]
+        return st
+
+
+def load_aggregate_state(base: Path) -> Optional[RoiAggregateState]:
+    raw = _load_json(_state_path(base))
+    if not isinstance(raw, dict) or raw.get("version") != ROI_STATE_VERSION:
+        return None
+    try:
+        return RoiAggregateState.from_dict(raw)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def save_aggregate_state(base: Path, state: RoiAggregateState) -> None:
+    _save_json_atomic(_state_path(base), state.to_dict(), machine=True)
+
+
+def update_aggregate_state(
+    base: Path,
+    ledger: List[Dict[str, Any]],
+    created: List[Dict[str, Any]],
+    settled: List[Dict[str, Any]],
+    pruned: bool = False,
+) -> RoiAggregateState:
+    """
+    Aggiorna lo stato persistito con le pick create / settled nel ciclo.
+    Rebuild completo se lo stato manca, ha versione diversa, il ledger è stato
+    potato o i delta non sono coerenti.
+    """
+    s = get_settings()
+    state = None if pruned else load_aggregate_state(base)
+    reason = "pruned" if pruned else "missing"
+    if state is not None:
+        if state.tail_size < _tail_size(s):
+            reason = "tail_size"
+        elif state.apply(ledger, created, settled):
+            save_aggregate_state(base, state)
+            return state
+        else:
+            reason = "inconsistent"
+    state = RoiAggregateState.rebuild(ledger, s)
+    save_aggregate_state(base, state)
+    logger.info("roi_state_rebuilt", extra={"reason": reason, "picks": state.picks})
+    return state
+
+
+__all__ = [
+    "ROI_STATE_VERSION",
+    "RoiAggregateState",
+    "incremental_supported",
+    "load_aggregate_state",
+    "save_aggregate_state",
+    "update_aggregate_state",
+]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# ============================================================
+# Ledger ROI sintetico (benchmark / test di carico)
+#
+# Genera pick con la stessa forma di quelle create da build_or_update_roi:
+# mix di source, leghe con distribuzione sbilanciata, campi Kelly, snapshot
+# di mercato, CLV (closing odds) e settlement. created_at crescente come in
+# produzione (le pick vengono appese in ordine di ciclo); le pick degli
+# ultimi `open_days` giorni restano aperte. Deterministico dato `seed` (e il giorno,
+# se `start` non è fissato: l'età delle pick resta realistica per il pruning).
+# ============================================================
+
+_SOURCES = ("prediction", "consensus", "merged")
+_SOURCE_WEIGHTS = (0.55, 0.30, 0.15)
+_VALUE_TYPES = {"prediction": "prediction_value", "consensus": "consensus_value", "merged": "merged_value"}
+_SIDES = ("home_win", "draw", "away_win")
+_SIDE_WEIGHTS = (0.48, 0.22, 0.30)
+
+
+def generate_ledger(
+    n: int,
+    seed: int = 42,
+    start: Optional[datetime] = None,
+    days: int = 365,
+    leagues: int = 40,
+    open_days: int = 3,
+) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    if start is None:
+        # allineato alla mezzanotte UTC: stesso seed → stesso ledger per tutto il giorno
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=days)
+    span = days * 86400
+    open_from = start + timedelta(days=days - open_days)
+    # leghe: pesi ~ 1/rank (poche leghe concentrano la maggior parte delle pick)
+    league_ids = [39 + i * 7 for i in range(leagues)]
+    league_weights = [1.0 / (i + 1) for i in range(leagues)]
+    offsets = sorted(rnd.random() * span for _ in range(n))
+
+    ledger: List[Dict[str, Any]] = []
+    for i, off in enumerate(offsets):
+        created = start + timedelta(seconds=off)
+        source = rnd.choices(_SOURCES, _SOURCE_WEIGHTS)[0]
+        side = rnd.choices(_SIDES, _SIDE_WEIGHTS)[0]
+        odds = round(min(12.0, max(1.25, rnd.lognormvariate(0.95, 0.35))), 3)
+        fair = 1.0 / odds
+        edge = round(rnd.uniform(0.03, 0.18), 6)
+        model_prob = min(0.97, fair + edge)
+        b = odds - 1
+        pick: Dict[str, Any] = {
+            "created_at": created.isoformat(),
+            "fixture_id": 1_000_000 + i,
+            "source": source,
+            "value_type": _VALUE_TYPES[source],
+            "side": side,
+            "edge": edge,
+            "decimal_odds": odds,
+            "est_odds": odds,
+            "fair_prob": round(fair, 6),
+            "odds_source": "odds_latest" if rnd.random() < 0.9 else "predictions_odds",
+            "league_id": rnd.choices(league_ids, league_weights)[0],
+            "settled": False,
+        }
+        if rnd.random() < 0.6:
+            fraction = (odds * model_prob - 1) / b
+            capped = min(fraction, 0.1)
+            pick.update(
+                stake=round(min(capped * 1.0, 3.0), 6) or 0.0001,
+                stake_strategy="kelly",
+                kelly_fraction=round(fraction, 6),
+                kelly_fraction_capped=round(capped, 6),
+                kelly_prob=round(model_prob, 6),
+                kelly_b=round(b, 6),
+            )
+        else:
+            pick.update(
+                stake=1.0,
+                stake_strategy="fixed",
+                kelly_fraction=None,
+                kelly_fraction_capped=None,
+                kelly_prob=None,
+                kelly_b=None,
+            )
+        if rnd.random() < 0.8:
+            market = {s: round(odds if s == side else rnd.uniform(2.0, 5.0), 3) for s in _SIDES}
+            inv = {s: 1.0 / v for s, v in market.items()}
+            tot = sum(inv.values())
+            pick.update(
+                market_snapshot=market,
+                snapshot_implied={s: round(v / tot, 6) for s, v in inv.items()},
+                snapshot_overround=round(tot - 1.0, 6),
+                snapshot_provider="stub-book",
+                snapshot_at=pick["created_at"],
+            )
+        if created < open_from:
+            win = rnd.random() < model_prob * 0.93
+            stake = float(pick["stake"])
+            pick.update(
+                settled=True,
+                result="win" if win else "loss",
+                payout=round(odds * stake, 6) if win else 0.0,
+                settled_at=(created + timedelta(hours=rnd.uniform(2, 96))).isoformat(),
+            )
+            if rnd.random() < 0.7:
+                closing = round(odds * rnd.uniform(0.9, 1.08), 3)
+                pick["closing_decimal_odds"] = closing
+                pick["clv_pct"] = round((closing - odds) / odds, 6)
+        ledger.append(pick)
+    return ledger
+
+
+__all__ = ["generate_ledger"]
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import jsoncodec
+from core.config import get_settings
+from core.logging import get_logger
+from analytics.roi import _load_json, _save_json_atomic, _utc_day
+
+logger = get_logger("analytics.roi_timeline")
+
+# ============================================================
+# Timeline store ROI (roi_history.jsonl + indice sparso)
+#
+#   roi_history.jsonl        un record per run (append-only, ordinato per ts)
+#   roi_history.idx.json     ogni `every` record: [ts, byte offset]
+#   roi_daily.json           roll-up per giorno, riga del giorno corrente
+#                            aggiornata ad ogni run (file completo per i lettori)
+#
+# Le letture per range (start/end day) fanno bisect sull'indice e leggono
+# solo la finestra di byte interessata; le letture "ultimi N" scorrono la
+# finestra all'indietro a blocchi. L'indice registra la dimensione del file
+# coperta: se il jsonl cresce senza indice (scritture esterne) viene esteso
+# scansionando solo la coda, se si accorcia viene ricostruito.
+# Se un record arriva con ts < dell'ultimo, l'indice è marcato unsorted e le
+# query ripiegano su scansione completa + sort.
+# ============================================================
+
+TIMELINE_INDEX_VERSION = 1
+_TAIL_BLOCK = 64 * 1024
+
+
+def _index_path(history_path: Path) -> Path:
+    return history_path.with_suffix(".idx.json")
+
+
+def _current_daily_path(daily_path: Path) -> Path:
+    """Layout precedente: giorno corrente separato (solo lettura / migrazione)."""
+    return daily_path.with_suffix(".current.json")
+
+
+def _empty_index(every: int) -> Dict[str, Any]:
+    return {
+        "version": TIMELINE_INDEX_VERSION,
+        "every": every,
+        "size": 0,
+        "count": 0,
+        "last_ts": None,
+        "sorted": True,
+        "entries": [],
+    }
+
+
+def _parse_line(raw: bytes) -> Optional[Dict[str, Any]]:
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        rec = jsoncodec.loads(raw)
+    except Exception:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+def _index_record(idx: Dict[str, Any], rec: Optional[Dict[str, Any]], offset: int) -> None:
+    ts = rec.get("ts") if rec else None
+    if not isinstance(ts, str) or not ts:
+        return
+    last = idx["last_ts"]
+    if last is not None and ts < last:
+        idx["sorted"] = False
+    if idx["count"] % idx["every"] == 0:
+        idx["entries"].append([ts, offset])
+    idx["count"] += 1
+    if last is None or ts > last:
+        idx["last_ts"] = ts
+
+
+def _scan_into(path: Path, idx: Dict[str, Any]) -> None:
+    """Indicizza le righe complete da idx['size'] a EOF (una riga troncata in coda resta fuori)."""
+    with path.open("rb") as f:
+        f.seek(idx["size"])
+        offset = idx["size"]
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            _index_record(idx, _parse_line(line), offset)
+            offset += len(line)
+    idx["size"] = offset
+
+
+def load_timeline_index(history_path: Path) -> Dict[str, Any]:
+    """Indice allineato al file corrente (esteso o ricostruito se necessario, non salvato)."""
+    every = get_settings().roi_timeline_index_every
+    idx = _load_json(_index_path(history_path))
+    if (
+        not isinstance(idx, dict)
+        or idx.get("version") != TIMELINE_INDEX_VERSION
+        or idx.get("every") != every
+    ):
+        idx = _empty_index(every)
+    size = history_path.stat().st_size if history_path.exists() else 0
+    if size < idx["size"]:
+        idx = _empty_index(every)
+    if size > idx["size"]:
+        _scan_into(history_path, idx)
+    return idx
+
+
+def append_timeline_record(history_path: Path, record: Dict[str, Any]) -> None:
+    idx = load_timeline_index(history_path)
+    line = jsoncodec.dumps(record) + b"\n"
+    with history_path.open("ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        if offset > idx["size"]:
+            # coda troncata da una scrittura interrotta: chiude la riga
+            f.write(b"\n")
+            offset += 1
+        f.write(line)
+    _index_record(idx, record, offset)
+    idx["size"] = offset + len(line)
+    _save_json_atomic(_index_path(history_path), idx, machine=True)
+
+
+def _read_range(path: Path, lo: int, hi: Optional[int]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    with path.open("rb") as f:
+        f.seek(lo)
+        data = f.read() if hi is None else f.read(max(0, hi - lo))
+    for line in data.split(b"\n"):
+        rec = _parse_line(line)
+        if rec is not None:
+            out.append(rec)
+    return out
+
+
+def _read_tail(path: Path, lo: int, hi: int, keep) -> List[Dict[str, Any]]:
+    """Record in [lo, hi) che passano `keep`, letti all'indietro finché keep() lo consente."""
+    out: List[Dict[str, Any]] = []
+    pos = hi
+    rest = b""
+    with path.open("rb") as f:
+        while pos > lo:
+            step = min(_TAIL_BLOCK, pos - lo)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + rest
+            lines = chunk.split(b"\n")
+            # la prima riga può essere incompleta: la si completa col blocco precedente
+            rest = lines[0] if pos > lo else b""
+            body = lines[1:] if pos > lo else lines
+            for line in reversed(body):
+                rec = _parse_line(line)
+                if rec is not None and keep(rec, out):
+                    return out
+    return out
+
+
+def _day_ok(rec: Dict[str, Any], start_day: Optional[str], end_day: Optional[str]) -> bool:
+    ts = rec.get("ts")
+    if not ts or not isinstance(ts, str):
+        return False
+    day = ts[:10]
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+    except Exception:
+        return False
+    if start_day and day < start_day:
+        return False
+    if end_day and day > end_day:
+        return False
+    return True
+
+
+def _byte_window(idx: Dict[str, Any], start_day: Optional[str], end_day: Optional[str]) -> Tuple[int, int]:
+    entries = idx["entries"]
+    days = [e[0][:10] for e in entries]
+    lo, hi = 0, idx["size"]
+    if start_day and entries:
+        i = bisect_left(days, start_day)
+        lo = entries[i - 1][1] if i > 0 else 0
+    if end_day and entries:
+        j = bisect_right(days, end_day)
+        if j < len(entries):
+            hi = entries[j][1]
+    return lo, hi
+
+
+def query_timeline(
+    history_path: Path,
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Record timeline (ordinati per ts) con giorno in [start_day, end_day]
+    (YYYY-MM-DD, estremi opzionali); con `limit` solo gli ultimi N.
+    """
+    if not history_path.exists():
+        return []
+    idx = load_timeline_index(history_path)
+    if not idx["sorted"]:
+        raw = _read_range(history_path, 0, None)
+        raw.sort(key=lambda r: str(r.get("ts") or ""))
+        out = [r for r in raw if _day_ok(r, start_day, end_day)]
+        return out[-limit:] if limit is not None else out
+
+    lo, hi = _byte_window(idx, start_day, end_day)
+    if limit is None:
+        return [r for r in _read_range(history_path, lo, hi) if _day_ok(r, start_day, end_day)]
+
+    def keep(rec: Dict[str, Any], out: List[Dict[str, Any]]) -> bool:
+        if _day_ok(rec, start_day, end_day):
+            out.append(rec)
+        elif start_day and str(rec.get("ts") or "")[:10] < start_day and rec.get("ts"):
+            return True
+        return len(out) >= limit
+
+    out = _read_tail(history_path, lo, hi, keep)
+    out.reverse()
+    return out
+
+
+# ------------------------------------------------------------
+# Roll-up giornalieri
+# ------------------------------------------------------------
+
+def update_daily_rollup(daily_path: Path, record: Dict[str, Any]) -> None:
+    """
+    Aggiorna incrementalmente la riga del giorno corrente (first_ts, runs,
+    ultimi valori) senza ricalcolare dalla timeline. roi_daily.json resta
+    completo (giorni chiusi + giorno corrente): API e GUI lo leggono così com'è.
+    Un eventuale roi_daily.current.json del layout precedente viene assorbito.
+    """
+    day = _utc_day()
+    raw = _load_json(daily_path)
+    daily: Dict[str, Any] = raw if isinstance(raw, dict) else {}
+    current_path = _current_daily_path(daily_path)
+    legacy = _load_json(current_path)
+    if isinstance(legacy, dict) and legacy.get("day") and isinstance(legacy.get("entry"), dict):
+        daily[legacy["day"]] = legacy["entry"]
+
+    prev = daily.get(day)
+    entry = prev if isinstance(prev, dict) else {}
+    daily[day] = {
+        "first_ts": entry.get("first_ts") or record["ts"],
+        "last_ts": record["ts"],
+        "runs": int(entry.get("runs", 0)) + 1,
+        "total_picks": record["total_picks"],
+        "settled_picks": record["settled_picks"],
+        "profit_units": record["profit_units"],
+        "yield": record["yield"],
+        "hit_rate": record["hit_rate"],
+    }
+    _save_json_atomic(daily_path, daily)
+    current_path.unlink(missing_ok=True)
+
+
+def load_daily_rollup(daily_path: Path) -> Dict[str, Any]:
+    closed = _load_json(daily_path)
+    out = dict(closed) if isinstance(closed, dict) else {}
+    # data dir non ancora migrata (roi_daily.current.json del layout precedente)
+    current = _load_json(_current_daily_path(daily_path))
+    if isinstance(current, dict) and current.get("day") and isinstance(current.get("entry"), dict):
+        out[current["day"]] = current["entry"]
+    return out
+
+
+__all__ = [
+    "TIMELINE_INDEX_VERSION",
+    "append_timeline_record",
+    "load_daily_rollup",
+    "load_timeline_index",
+    "query_timeline",
+    "update_daily_rollup",
+]
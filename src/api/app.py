@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
+from core import generations
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -14,6 +15,8 @@ from api.routes.predictions import router as predictions_router
 from api.routes.consensus import router as consensus_router
 from api.routes.value_alerts import router as value_alerts_router
 from api.routes.roi import router as roi_router
+from api.routes.history import router as history_router
+from api.routes.stream import router as stream_router
 
 logger = get_logger("api.app")
 
@@ -25,6 +28,15 @@ def create_app() -> FastAPI:
     except Exception as exc:  # pragma: no cover
         logger.error("Impossibile caricare settings: %s", exc)
 
+    @app.middleware("http")
+    async def generation_header(request: Request, call_next):
+        # id della generazione corrente: chiave di cache per i client (ENABLE_GENERATIONS)
+        gen = generations.generation_id()
+        response = await call_next(request)
+        if gen:
+            response.headers["X-Data-Generation"] = gen
+        return response
+
     app.include_router(health_router)
     app.include_router(fixtures_router)
     app.include_router(delta_router)
@@ -34,6 +46,8 @@ def create_app() -> FastAPI:
     app.include_router(consensus_router)
     app.include_router(value_alerts_router)
     app.include_router(roi_router)
+    app.include_router(history_router)
+    app.include_router(stream_router)
     return app
 
 
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from core import changefeed
+from core.alerts import build_alerts
+from core.config import get_settings
+from core.logging import get_logger
+
+logger = get_logger("api.push")
+
+# ============================================================
+# Push live (SSE / WebSocket) dal change feed
+#
+# Un solo poller per processo API segue events/changes.jsonl (core.changefeed)
+# e distribuisce i nuovi record alle code dei client connessi: il costo di
+# lettura non cresce con il numero di dashboard. Ogni client ha un cursore seq
+# e una coda limitata (PUSH_CLIENT_QUEUE):
+#   - coda piena → i record in eccesso sono scartati per quel client, che è
+#     marcato in overflow;
+#   - svuotata la coda (o visto un buco nei seq) il client recupera dal file
+#     con read_changes dal proprio cursore (stesso percorso del replay
+#     iniziale con since / Last-Event-ID).
+# Nessun cambio perso, memoria limitata anche con client lenti.
+# Per ogni record modified sono derivati gli alert (core.alerts.build_alerts).
+# ============================================================
+
+_CATCH_UP_PAGE = 500
+
+
+class ClientFilter:
+    """Filtri per client: leghe, fixture id, tipi di evento (change / alert)."""
+
+    def __init__(
+        self,
+        league_ids: Optional[List[int]] = None,
+        fixture_ids: Optional[List[int]] = None,
+        types: Optional[List[str]] = None,
+    ) -> None:
+        self.league_ids: Optional[Set[int]] = set(league_ids) if league_ids else None
+        self.fixture_ids: Optional[Set[int]] = set(fixture_ids) if fixture_ids else None
+        self.types: Set[str] = set(types) if types else {"change", "alert"}
+
+    def match(self, rec: Dict[str, Any]) -> bool:
+        f = rec.get("fixture") or {}
+        if self.league_ids is not None and f.get("league_id") not in self.league_ids:
+            return False
+        if self.fixture_ids is not None and f.get("fixture_id") not in self.fixture_ids:
+            return False
+        return True
+
+
+def events_for(rec: Dict[str, Any], flt: ClientFilter) -> List[Dict[str, Any]]:
+    """Eventi push di un record del feed: il cambio e, per i modified, gli alert."""
+    if not flt.match(rec):
+        return []
+    out: List[Dict[str, Any]] = []
+    if "change" in flt.types:
+        out.append({"event": "change", "id": rec["seq"], "data": rec})
+    if "alert" in flt.types and rec.get("op") == "modified" and isinstance(rec.get("old"), dict):
+        for alert in build_alerts([{"old": rec["old"], "new": rec["fixture"]}]):
+            out.append({"event": "alert", "id": rec["seq"], "data": {"seq": rec["seq"], "ts": rec.get("ts"), **alert}})
+    return out
+
+
+class _Client:
+    __slots__ = ("queue", "overflowed")
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class PushHub:
+    def __init__(self) -> None:
+        self._clients: Set[_Client] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_seq = 0
+
+    def _base(self) -> Path:
+        return Path(get_settings().bet_data_dir or "data")
+
+    async def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        head = await asyncio.to_thread(changefeed.last_seq, self._base())
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return  # avviato da un altro client durante la lettura
+        self._loop = loop
+        self.last_seq = head
+        self._task = loop.create_task(self._poll())
+
+    async def _poll(self) -> None:
+        interval = get_settings().push_poll_interval
+        while self._clients:
+            try:
+                page = await asyncio.to_thread(changefeed.read_changes, self.last_seq, 1000, self._base())
+            except Exception as exc:  # pragma: no cover
+                logger.error("push poll fallito: %s", exc)
+                page = {"changes": [], "more": False}
+            for rec in page["changes"]:
+                self.last_seq = rec["seq"]
+                for client in list(self._clients):
+                    try:
+                        client.queue.put_nowait(rec)
+                    except asyncio.QueueFull:
+                        # client lento: recupera dal file appena svuotata la coda
+                        client.overflowed = True
+            if not page["more"]:
+                await asyncio.sleep(interval)
+        if self._task is asyncio.current_task():
+            self._task = None
+
+    async def subscribe(self, flt: ClientFilter, since: Optional[int] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Eventi per un client (None = heartbeat). `since`: replay dal feed dei
+        cambi con seq > since prima di passare al live.
+        """
+        settings = get_settings()
+        client = _Client(settings.push_client_queue)
+        queue = client.queue
+        self._clients.add(client)
+        try:
+            await self._ensure_started()
+            cursor = self.last_seq if since is None else since
+            lagging = since is not None
+            while True:
+                if lagging:
+                    page = await asyncio.to_thread(changefeed.read_changes, cursor, _CATCH_UP_PAGE, self._base())
+                    for rec in page["changes"]:
+                        cursor = rec["seq"]
+                        for ev in events_for(rec, flt):
+                            yield ev
+                    lagging = page["more"]
+                    continue
+                if client.overflowed and queue.empty():
+                    client.overflowed = False
+                    lagging = True
+                    continue
+                try:
+                    rec = await asyncio.wait_for(queue.get(), timeout=settings.push_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if rec["seq"] <= cursor:
+                    continue
+                if rec["seq"] > cursor + 1:
+                    # buco nei seq: recupero dal file
+                    lagging = True
+                    continue
+                cursor = rec["seq"]
+                for ev in events_for(rec, flt):
+                    yield ev
+        finally:
+            self._clients.discard(client)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+
+hub = PushHub()
+
+
+__all__ = ["ClientFilter", "PushHub", "events_for", "hub"]
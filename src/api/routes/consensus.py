@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Query, HTTPException
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -16,11 +16,11 @@ router = APIRouter(prefix="/consensus", tags=["consensus"])
 def _load_consensus() -> Optional[Dict[str, Any]]:
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
-    f = base / settings.consensus_dir / "consensus.json"
+    f = generations.current_snapshot(base).resolve(base / settings.consensus_dir / "consensus.json")
     if not f.exists():
         return None
     try:
-        return json.loads(f.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(f)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura consensus: %s", exc)
         raise HTTPException(status_code=500, detail="failed to read consensus") from exc
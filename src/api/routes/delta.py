@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 
+from core import changefeed, generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -33,18 +33,30 @@ def _default_delta() -> Dict[str, Any]:
     }
 
 
-@router.get("/delta", summary="Ultimo delta")
-def get_delta():
+@router.get("/delta", summary="Ultimo delta (o change feed con ?since=)")
+def get_delta(
+    since: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Cursore change feed: ritorna solo i cambi con seq > since (0 = dall'inizio)",
+    ),
+    limit: int = Query(1000, ge=1, le=10000, description="Max cambi per risposta (con since)"),
+):
     settings = get_settings()
+    if since is not None:
+        base = Path(settings.bet_data_dir or "data")
+        return changefeed.read_changes(since, limit=limit, base=base)
     base = Path(settings.bet_data_dir or "data")
-    delta_path = base / settings.events_dir / "last_delta.json"
-    metrics_path = base / settings.metrics_dir / "last_run.json"
+    # delta e last_run della stessa generazione
+    snap = generations.current_snapshot(base)
+    delta_path = snap.resolve(base / settings.events_dir / "last_delta.json")
+    metrics_path = snap.resolve(base / settings.metrics_dir / "last_run.json")
 
     payload = _default_delta()
 
     if delta_path.exists():
         try:
-            raw_delta = json.loads(delta_path.read_text(encoding="utf-8"))
+            raw_delta = jsoncodec.read_json(delta_path)
             if isinstance(raw_delta, dict):
                 payload["added"] = raw_delta.get("added", []) or []
                 payload["removed"] = raw_delta.get("removed", []) or []
@@ -56,7 +68,7 @@ def get_delta():
 
     if metrics_path.exists():
         try:
-            raw_metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+            raw_metrics = jsoncodec.read_json(metrics_path)
             if isinstance(raw_metrics, dict):
                 summary = raw_metrics.get("summary")
                 if isinstance(summary, dict):
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
 from fastapi import APIRouter
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -20,11 +20,11 @@ def get_fixtures():
     """
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / "fixtures_latest.json"
+    fpath = generations.current_snapshot(base).resolve(base / "fixtures_latest.json")
     if not fpath.exists():
         return []
     try:
-        data = json.loads(fpath.read_text(encoding="utf-8"))
+        data = jsoncodec.read_json(fpath)
         if not isinstance(data, list):
             return []
         return data
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from fastapi import APIRouter
+from core import generations
 from core.config import get_settings
 
 router = APIRouter(tags=["health"])
@@ -16,4 +17,5 @@ def health():
         "predictions_enabled": settings.enable_predictions,
         "odds_ingestion_enabled": settings.enable_odds_ingestion,
         "value_detection_enabled": settings.enable_value_detection,
+        "generation": generations.generation_id(),
     }
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from core import history_query
+from core.config import get_settings
+from core.logging import get_logger
+
+router = APIRouter(prefix="/history", tags=["history"])
+logger = get_logger("api.routes.history")
+
+_AT_DESCRIPTION = "Istante ISO 8601 (UTC se senza offset), es. 2026-01-10T12:30:00Z"
+
+
+def _base() -> Path:
+    settings = get_settings()
+    return Path(settings.bet_data_dir or "data")
+
+
+@router.get("/bounds", summary="Copertura temporale della history")
+def history_bounds():
+    return history_query.history_bounds(_base())
+
+
+@router.get("/fixtures", summary="Fixture com'erano a un istante (opz. una lega)")
+def history_fixtures(
+    at: str = Query(..., description=_AT_DESCRIPTION),
+    league_id: Optional[int] = Query(None, description="Filtra per lega"),
+):
+    try:
+        found = history_query.fixtures_at(at, league_id=league_id, base=_base())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid 'at' timestamp")
+    if found is None:
+        raise HTTPException(status_code=404, detail="no history at or before 'at'")
+    return {
+        "at": at,
+        "as_of": found["as_of"],
+        "source": found["source"],
+        "league_id": league_id,
+        "count": len(found["fixtures"]),
+        "fixtures": found["fixtures"],
+    }
+
+
+@router.get("/fixtures/{fixture_id}", summary="Stato di una fixture a un istante")
+def history_fixture(
+    fixture_id: int,
+    at: str = Query(..., description=_AT_DESCRIPTION),
+):
+    try:
+        found = history_query.fixture_at(fixture_id, at, base=_base())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid 'at' timestamp")
+    if found is None or found["fixture"] is None:
+        raise HTTPException(status_code=404, detail="fixture not in history at 'at'")
+    return {
+        "at": at,
+        "as_of": found["as_of"],
+        "source": found["source"],
+        "fixture": found["fixture"],
+    }
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -19,11 +19,11 @@ def get_metrics():
     """
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / settings.metrics_dir / "last_run.json"
+    fpath = generations.current_snapshot(base).resolve(base / settings.metrics_dir / "last_run.json")
     if not fpath.exists():
         raise HTTPException(status_code=404, detail="metrics file not found")
     try:
-        data = json.loads(fpath.read_text(encoding="utf-8"))
+        data = jsoncodec.read_json(fpath)
         if not isinstance(data, dict):
             raise HTTPException(status_code=500, detail="invalid metrics payload")
         return data
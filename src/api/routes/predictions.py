@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Query, HTTPException
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -16,13 +17,11 @@ router = APIRouter(prefix="/predictions", tags=["predictions"])
 def _load_predictions() -> Optional[Dict[str, Any]]:
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / settings.predictions_dir / "latest_predictions.json"
+    fpath = generations.current_snapshot(base).resolve(base / settings.predictions_dir / "latest_predictions.json")
     if not fpath.exists():
         return None
     try:
-        import json
-
-        return json.loads(fpath.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(fpath)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura predictions file: %s", exc)
         raise HTTPException(status_code=500, detail="Failed to read predictions file") from exc
@@ -10,14 +10,27 @@ from core.logging import get_logger
 from analytics.roi import (
     load_roi_summary,
     load_roi_ledger,
-    load_roi_timeline_raw,
+    query_roi_timeline,
     load_roi_daily,
+    _parse_numeric_range,
 )
+from analytics.roi_blocks import BASE_KEYS, SECTIONS, lazy_block_names, resolve_blocks
+from analytics.roi_quantiles import bucket_stats, load_quantile_index, quantiles
+from analytics.roi_rolling import load_rolling_index, rolling_windows
 
 logger = get_logger("api.routes.roi")
 
 router = APIRouter(prefix="/roi", tags=["roi"])
 
+_MAX_ROLLING_WINDOWS = 1000
+_MAX_BUCKET_RANGES = 1000
+# colonna API → colonna indice quantili, bucket configurati di default
+_BUCKET_COLUMNS = {
+    "edge": ("edge", "roi_edge_buckets"),
+    "clv": ("clv", "roi_clv_buckets"),
+    "profit": ("contrib", "roi_profit_buckets"),
+}
+
 
 @router.get("", summary="ROI summary e (opz.) picks ledger")
 def roi_summary(
@@ -28,6 +41,11 @@ def roi_summary(
     ),
     open_only: bool = Query(False, description="Mostra solo picks aperte (se detail=true)"),
     limit: Optional[int] = Query(None, ge=1, le=1000, description="Limite picks in elenco"),
+    blocks: Optional[str] = Query(
+        None,
+        description="Sezioni metriche separate da virgola (es. equity,clv,deciles; all = tutte). "
+        "Le sezioni lazy sono calcolate alla prima richiesta e messe in cache per versione ledger",
+    ),
 ):
     settings = get_settings()
     if not settings.enable_roi_tracking:
@@ -52,6 +70,14 @@ def roi_summary(
             "message": "metrics not available yet",
         }
 
+    if blocks:
+        names = list(SECTIONS) if blocks.strip().lower() == "all" else blocks.split(",")
+        try:
+            selected = resolve_blocks(names, metrics)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        metrics = {**{k: metrics[k] for k in BASE_KEYS if k in metrics}, **selected}
+
     items = []
     detail_included = False
     chosen_sources = [s.lower() for s in source] if source else None
@@ -78,6 +104,7 @@ def roi_summary(
             "sources": chosen_sources or [],
             "open_only": open_only,
             "limit": limit,
+            "blocks": [b.strip() for b in blocks.split(",") if b.strip()] if blocks else [],
         },
         "detail_included": detail_included,
     }
@@ -121,30 +148,11 @@ def roi_timeline(
     include_daily = mode in {"daily", "both"}
 
     if include_full:
-        raw = load_roi_timeline_raw()
-
-        def _ts(r: dict) -> str:
-            return str(r.get("ts") or "")
-
-        raw.sort(key=_ts)
-        filtered: List[dict] = []
-        for r in raw:
-            ts = r.get("ts")
-            if not ts:
-                continue
-            day_str = ts[:10]
-            try:
-                d_obj = datetime.strptime(day_str, "%Y-%m-%d")
-            except Exception:
-                continue
-            if sd and d_obj < sd:
-                continue
-            if ed and d_obj > ed:
-                continue
-            filtered.append(r)
-        if len(filtered) > limit:
-            filtered = filtered[-limit:]
-        items = filtered
+        items = query_roi_timeline(
+            start_day=sd.strftime("%Y-%m-%d") if sd else None,
+            end_day=ed.strftime("%Y-%m-%d") if ed else None,
+            limit=limit,
+        )
 
     if include_daily:
         daily = load_roi_daily()
@@ -180,6 +188,91 @@ def roi_timeline(
     }
 
 
+@router.get("/rolling", summary="Statistiche rolling su finestre arbitrarie (somme prefisse)")
+def roi_rolling(
+    windows: Optional[str] = Query(None, description="Finestre (n. pick settled) separate da virgola, es. 25,100,500"),
+    step: Optional[int] = Query(None, ge=1, description="In alternativa: finestre step, 2*step, ... fino a max_window"),
+    max_window: Optional[int] = Query(None, ge=1, description="Finestra massima con step"),
+    drawdown: bool = Query(False, description="Include picco e max drawdown (O(w) per finestra)"),
+):
+    settings = get_settings()
+    if not settings.enable_roi_tracking:
+        return {"enabled": False, "points": 0, "windows": {}}
+
+    sizes: List[int] = []
+    if windows:
+        try:
+            sizes = [int(w) for w in windows.split(",") if w.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid windows: {windows}")
+    elif step:
+        if not max_window:
+            raise HTTPException(status_code=400, detail="max_window required with step")
+        sizes = list(range(step, max_window + 1, step))
+    else:
+        sizes = list(settings.roi_rolling_windows)
+    if any(w < 1 for w in sizes):
+        raise HTTPException(status_code=400, detail="windows must be >= 1")
+    if len(sizes) > _MAX_ROLLING_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"too many windows (max {_MAX_ROLLING_WINDOWS})")
+
+    idx = load_rolling_index()
+    return {
+        "enabled": True,
+        "points": len(idx),
+        "windows": rolling_windows(idx, sizes, drawdown=drawdown),
+    }
+
+
+@router.get("/buckets", summary="Bucket e quantili su edge / clv / profit (indice ordinato, senza riscansione)")
+def roi_buckets(
+    column: str = Query("edge", description="Colonna: edge, clv, profit (contributo per pick)"),
+    ranges: Optional[str] = Query(
+        None,
+        description="Range [min-max) separati da virgola, estremi opzionali (es. 0-0.05,0.05-0.1,0.1-). "
+        "Default: bucket configurati per la colonna",
+    ),
+    q: Optional[str] = Query(None, description="Quantili in [0,1] separati da virgola (es. 0.1,0.5,0.9)"),
+):
+    settings = get_settings()
+    if not settings.enable_roi_tracking:
+        return {"enabled": False, "column": column, "points": 0, "buckets": [], "quantiles": {}}
+    if column not in _BUCKET_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Invalid column: {column}")
+    index_column, default_attr = _BUCKET_COLUMNS[column]
+
+    raw = ranges.split(",") if ranges else list(getattr(settings, default_attr))
+    specs = []
+    for spec in raw:
+        spec = spec.strip()
+        if not spec:
+            continue
+        bounds = _parse_numeric_range(spec) if "-" in spec else (None, None)
+        if bounds == (None, None) and ranges:
+            raise HTTPException(status_code=400, detail=f"Invalid range: {spec}")
+        if bounds != (None, None):
+            specs.append((spec, bounds))
+    if len(specs) > _MAX_BUCKET_RANGES:
+        raise HTTPException(status_code=400, detail=f"too many ranges (max {_MAX_BUCKET_RANGES})")
+    ps: List[float] = []
+    if q:
+        try:
+            ps = [float(x) for x in q.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid quantiles: {q}")
+        if any(not 0.0 <= p <= 1.0 for p in ps):
+            raise HTTPException(status_code=400, detail="quantiles must be in [0, 1]")
+
+    col = load_quantile_index().column(index_column)
+    return {
+        "enabled": True,
+        "column": column,
+        "points": len(col),
+        "buckets": bucket_stats(col, specs),
+        "quantiles": quantiles(col, ps),
+    }
+
+
 @router.get("/analytics", summary="Dettagli analitici avanzati (Batch 37 + Batch 38)")
 def roi_analytics():
     settings = get_settings()
@@ -224,6 +317,9 @@ def roi_analytics():
     if not metrics:
         empty["enabled"] = True
         return empty
+    lazy = lazy_block_names(settings)
+    if lazy:
+        metrics.update(resolve_blocks(lazy, metrics))
 
     rolling_single = {
         "window_size": metrics.get("rolling_window_size"),
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -18,11 +18,11 @@ def get_scoreboard():
     """
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / "scoreboard.json"
+    fpath = generations.current_snapshot(base).resolve(base / "scoreboard.json")
     if not fpath.exists():
         raise HTTPException(status_code=404, detail="scoreboard file not found")
     try:
-        return json.loads(fpath.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(fpath)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura scoreboard.json: %s", exc)
         raise HTTPException(status_code=500, detail="failed to read scoreboard")
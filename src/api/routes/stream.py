@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from api.push import ClientFilter, hub
+from core import jsoncodec
+from core.logging import get_logger
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+logger = get_logger("api.routes.stream")
+
+_TYPES_DESCRIPTION = "Tipi di evento: change, alert (ripetibile, default entrambi)"
+
+
+def _sse(ev: Optional[Dict[str, Any]]) -> bytes:
+    if ev is None:
+        return b": keep-alive\n\n"
+    return (
+        f"id: {ev['id']}\nevent: {ev['event']}\ndata: ".encode("utf-8")
+        + jsoncodec.dumps(ev["data"])
+        + b"\n\n"
+    )
+
+
+@router.get("/events", summary="Server-Sent Events: cambi fixtures e alert live")
+async def stream_events(
+    request: Request,
+    league_id: Optional[List[int]] = Query(None, description="Filtra per lega (ripetibile)"),
+    fixture_id: Optional[List[int]] = Query(None, description="Filtra per fixture (ripetibile)"),
+    types: Optional[List[str]] = Query(None, description=_TYPES_DESCRIPTION),
+    since: Optional[int] = Query(None, ge=0, description="Replay dei cambi con seq > since prima del live"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    flt = ClientFilter(league_id, fixture_id, types)
+    # riconnessione EventSource: riparte dall'ultimo id ricevuto
+    start = since if since is not None else last_event_id
+
+    async def body():
+        async for ev in hub.subscribe(flt, since=start):
+            if ev is None and await request.is_disconnected():
+                break
+            yield _sse(ev)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def stream_ws(
+    websocket: WebSocket,
+    league_id: Optional[List[int]] = Query(None),
+    fixture_id: Optional[List[int]] = Query(None),
+    types: Optional[List[str]] = Query(None),
+    since: Optional[int] = Query(None, ge=0),
+):
+    """Stessi eventi di /stream/events come messaggi JSON {event, id, data}; heartbeat {event: ping}."""
+    await websocket.accept()
+    flt = ClientFilter(league_id, fixture_id, types)
+    try:
+        async for ev in hub.subscribe(flt, since=since):
+            await websocket.send_text(jsoncodec.dumps_str(ev if ev is not None else {"event": "ping"}))
+    except WebSocketDisconnect:
+        pass
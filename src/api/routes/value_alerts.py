@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Query
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -18,11 +18,11 @@ def _load_value_alerts() -> Optional[Dict[str, Any]]:
     if not settings.enable_value_alerts:
         return None
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / settings.value_alerts_dir / "value_alerts.json"
+    fpath = generations.current_snapshot(base).resolve(base / settings.value_alerts_dir / "value_alerts.json")
     if not fpath.exists():
         return None
     try:
-        return json.loads(fpath.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(fpath)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura value_alerts: %s", exc)
         return None
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import json
-import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -12,12 +11,12 @@ logger = get_logger("consensus.pipeline")
 
 
 def _load_predictions(base: Path, predictions_dir: str) -> List[Dict[str, Any]]:
-    f = base / predictions_dir / "latest_predictions.json"
+    f = generations.artifact_path(base / predictions_dir / "latest_predictions.json")
     if not f.exists():
         logger.info("Predictions file non trovato per consensus.")
         return []
     try:
-        raw = json.loads(f.read_text(encoding="utf-8"))
+        raw = jsoncodec.read_json(f)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura predictions file: %s", exc)
         return []
@@ -102,10 +101,7 @@ def run_consensus_pipeline() -> Optional[Path]:
             "entries": [],
             "baseline_weight": settings.consensus_baseline_weight,
         }
-        tmp = target.with_suffix(".tmp")
-        with tmp.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, target)
+        generations.write_artifact(target, payload)
         logger.info("Consensus scritto (vuoto).")
         return target
 
@@ -141,10 +137,7 @@ def run_consensus_pipeline() -> Optional[Path]:
         "entries": entries,
     }
 
-    tmp = target.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
     logger.info(
         "Consensus scritto",
         extra={"count": len(entries), "baseline_weight": w},
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import json
-import os
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core import generations
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -114,10 +113,7 @@ def write_alerts(events: List[Dict[str, Any]]) -> Optional[Path]:
         "count": len(events),
     }
     target = alerts_dir / "last_alerts.json"
-    tmp = target.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
     return target
 
 
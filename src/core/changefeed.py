@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core import jsoncodec
+from core.config import get_settings
+from core.diff import fixture_key_str
+from core.logging import get_logger
+
+logger = get_logger("core.changefeed")
+
+# ============================================================
+# Change feed fixtures (events/changes.jsonl + indice sparso)
+#
+#   changes.jsonl      un record per fixture aggiunta / rimossa / modificata,
+#                      append-only, con `seq` crescente:
+#                      {"seq","ts","op":"added|removed|modified","key",
+#                       "fixture": stato nuovo (rimossa: ultimo stato),
+#                       "old", "change_type": solo per modified}
+#   changes.idx.json   ogni `every` record: [seq, byte offset]; size coperta,
+#                      primo e ultimo seq
+#
+# /delta?since=<seq> fa bisect sull'indice e legge dal primo offset utile:
+# i client sincronizzano solo i cambi successivi al proprio cursore invece di
+# rileggere /fixtures. L'indice è esteso scansionando solo la coda se il jsonl
+# è cresciuto senza indice, ricostruito se il file si è accorciato.
+#
+# Retention (CHANGE_FEED_RETENTION_DAYS, 0 = tutto): quando il record più
+# vecchio supera la retention di un giorno, l'append riscrive il file senza i
+# record più vecchi della retention (i seq restano invariati, offset
+# dell'indice ricalcolati). L'ultimo record non viene mai scartato: last_seq
+# resta ricavabile dal file anche se l'indice va perso. Un cursore precedente
+# al primo seq conservato riceve truncated=True (risincronizzare da /fixtures).
+# ============================================================
+
+FEED_FILE = "changes.jsonl"
+FEED_INDEX_VERSION = 2
+# la compattazione riscrive il file: al più una volta al giorno
+_COMPACT_SLACK = timedelta(days=1)
+
+_LOCK = threading.Lock()
+
+
+def feed_path(base: Optional[Path] = None) -> Path:
+    base = base or Path(os.getenv("BET_DATA_DIR") or "data")
+    return base / get_settings().events_dir / FEED_FILE
+
+
+def _index_path(path: Path) -> Path:
+    return path.with_suffix(".idx.json")
+
+
+def _empty_index(every: int) -> Dict[str, Any]:
+    return {
+        "version": FEED_INDEX_VERSION, "every": every, "size": 0, "count": 0,
+        "first_seq": 0, "last_seq": 0, "entries": [],
+    }
+
+
+def _parse_line(raw: bytes) -> Optional[Dict[str, Any]]:
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        rec = jsoncodec.loads(raw)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) and isinstance(rec.get("seq"), int) else None
+
+
+def _index_record(idx: Dict[str, Any], seq: int, offset: int) -> None:
+    if not idx["count"]:
+        idx["first_seq"] = seq
+    if idx["count"] % idx["every"] == 0:
+        idx["entries"].append([seq, offset])
+    idx["count"] += 1
+    idx["last_seq"] = max(idx["last_seq"], seq)
+
+
+def load_feed_index(path: Path) -> Dict[str, Any]:
+    """Indice allineato al file corrente (esteso o ricostruito se necessario, non salvato)."""
+    every = get_settings().change_feed_index_every
+    try:
+        idx = jsoncodec.read_json(_index_path(path))
+    except (OSError, ValueError):
+        idx = None
+    if not isinstance(idx, dict) or idx.get("version") != FEED_INDEX_VERSION or idx.get("every") != every:
+        idx = _empty_index(every)
+    size = path.stat().st_size if path.exists() else 0
+    if size < idx["size"]:
+        idx = _empty_index(every)
+    if size > idx["size"]:
+        with path.open("rb") as f:
+            f.seek(idx["size"])
+            offset = idx["size"]
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                rec = _parse_line(line)
+                if rec is not None:
+                    _index_record(idx, rec["seq"], offset)
+                offset += len(line)
+        idx["size"] = offset
+    return idx
+
+
+def _records(delta: Dict[str, Any], ts: str) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for op in ("added", "removed"):
+        for f in delta.get(op) or []:
+            if isinstance(f, dict):
+                out.append({"ts": ts, "op": op, "key": fixture_key_str(f), "fixture": f})
+    for m in delta.get("modified") or []:
+        new = m.get("new") if isinstance(m, dict) else None
+        if isinstance(new, dict):
+            out.append({
+                "ts": ts,
+                "op": "modified",
+                "key": fixture_key_str(new),
+                "fixture": new,
+                "old": m.get("old"),
+                "change_type": m.get("change_type", "other"),
+            })
+    return out
+
+
+def append_changes(delta: Dict[str, Any], ts: Optional[str] = None, base: Optional[Path] = None) -> List[int]:
+    """
+    Appende un record per ogni cambio del delta (formato diff_fixtures_detailed).
+    Ritorna [primo seq, ultimo seq] assegnati, [] se il delta è vuoto o il feed è disabilitato.
+    """
+    if not get_settings().enable_change_feed:
+        return []
+    records = _records(delta, ts or datetime.now(timezone.utc).isoformat())
+    if not records:
+        return []
+    path = feed_path(base)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _LOCK:
+        idx = load_feed_index(path)
+        first = idx["last_seq"] + 1
+        chunks: List[bytes] = []
+        for i, rec in enumerate(records):
+            chunks.append(jsoncodec.dumps({"seq": first + i, **rec}) + b"\n")
+        with path.open("ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            if offset > idx["size"]:
+                # coda troncata da una scrittura interrotta: chiude la riga
+                f.write(b"\n")
+                offset += 1
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        for i, chunk in enumerate(chunks):
+            _index_record(idx, first + i, offset)
+            offset += len(chunk)
+        idx["size"] = offset
+        retention = get_settings().change_feed_retention_days
+        if retention > 0:
+            idx = _apply_retention(path, idx, datetime.now(timezone.utc) - timedelta(days=retention))
+        jsoncodec.write_json_atomic(_index_path(path), idx, machine=True)
+    return [first, first + len(records) - 1]
+
+
+def _record_time(rec: Dict[str, Any]) -> Optional[datetime]:
+    try:
+        dt = datetime.fromisoformat(str(rec.get("ts")))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _apply_retention(path: Path, idx: Dict[str, Any], cutoff: datetime) -> Dict[str, Any]:
+    """
+    Riscrive il feed senza i record con ts < cutoff (prefisso: append in ordine
+    di tempo), mai l'ultimo. Solo se il più vecchio è oltre cutoff - _COMPACT_SLACK.
+    Ritorna l'indice del file risultante.
+    """
+    with path.open("rb") as f:
+        head = _parse_line(f.readline())
+    oldest = _record_time(head) if head is not None else None
+    if oldest is None or oldest >= cutoff - _COMPACT_SLACK or idx["count"] <= 1:
+        return idx
+    new = _empty_index(idx["every"])
+    new["last_seq"] = idx["last_seq"]
+    tmp = path.with_name(path.name + ".tmp")
+    dropped = 0
+    with path.open("rb") as src, tmp.open("wb") as dst:
+        pos = offset = 0
+        keeping = False
+        for line in src:
+            if pos >= idx["size"] or not line.endswith(b"\n"):
+                break
+            pos += len(line)
+            rec = _parse_line(line)
+            if rec is None:
+                continue
+            if not keeping:
+                ts = _record_time(rec)
+                if rec["seq"] < idx["last_seq"] and (ts is None or ts < cutoff):
+                    dropped += 1
+                    continue
+                keeping = True
+            dst.write(line)
+            _index_record(new, rec["seq"], offset)
+            offset += len(line)
+        dst.flush()
+        os.fsync(dst.fileno())
+    new["size"] = offset
+    os.replace(tmp, path)
+    logger.info("change_feed_compacted", extra={"dropped": dropped, "kept": new["count"], "first_seq": new["first_seq"]})
+    return new
+
+
+def last_seq(base: Optional[Path] = None) -> int:
+    path = feed_path(base)
+    return load_feed_index(path)["last_seq"] if path.exists() else 0
+
+
+def read_changes(since: int = 0, limit: int = 1000, base: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Cambi con seq > since (al più `limit`). `next` è il cursore da passare alla
+    richiesta successiva, `more` indica che ci sono altri cambi oltre `limit`,
+    `truncated` che parte dei cambi dopo `since` è già uscita dalla retention.
+    """
+    path = feed_path(base)
+    out: Dict[str, Any] = {
+        "since": since, "next": since, "last_seq": 0, "more": False, "truncated": False, "changes": [],
+    }
+    try:
+        # file aperto prima di leggere l'indice: una compattazione concorrente
+        # (os.replace) lascia offset dell'indice <= quelli del file aperto
+        f = path.open("rb")
+    except FileNotFoundError:
+        return out
+    changes: List[Dict[str, Any]] = out["changes"]
+    with f:
+        idx = load_feed_index(path)
+        out["last_seq"] = idx["last_seq"]
+        # cambi tra since e il primo seq conservato già scartati dalla retention
+        out["truncated"] = since + 1 < idx["first_seq"]
+        if since >= idx["last_seq"]:
+            return out
+        entries = idx["entries"]
+        # ultimo punto indicizzato con seq <= since + 1
+        i = bisect_right([e[0] for e in entries], since + 1)
+        offset = entries[i - 1][1] if i else 0
+        f.seek(offset)
+        pos = offset
+        for line in f:
+            if pos >= idx["size"] or not line.endswith(b"\n"):
+                break
+            pos += len(line)
+            rec = _parse_line(line)
+            if rec is None or rec["seq"] <= since:
+                continue
+            if len(changes) >= limit:
+                out["more"] = True
+                break
+            changes.append(rec)
+    if changes:
+        out["next"] = changes[-1]["seq"]
+    return out
+
+
+__all__ = [
+    "append_changes",
+    "feed_path",
+    "last_seq",
+    "load_feed_index",
+    "read_changes",
+]
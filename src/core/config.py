@@ -1,7 +1,7 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from functools import lru_cache
-from typing import Optional, List
+from typing import Any, List, Mapping, Optional
 
 
 def _parse_bool(value: Optional[str], default: bool) -> bool:
@@ -33,11 +33,15 @@ class Settings:
     api_football_backoff_factor: float
     api_football_backoff_jitter: float
     api_football_timeout: float
+    api_football_max_concurrency: int
+    api_football_rpm: int
+    api_football_league_ids: Optional[List[int]]
 
     persist_fixtures: bool
     bet_data_dir: str
 
     delta_compare_keys: Optional[List[str]]
+    enable_fingerprint_diff: bool
     fetch_abort_on_empty: bool
 
     enable_history: bool
@@ -47,6 +51,12 @@ class Settings:
     enable_events_file: bool
     metrics_dir: str
     events_dir: str
+    enable_change_feed: bool
+    change_feed_index_every: int
+    change_feed_retention_days: int
+    push_poll_interval: float
+    push_client_queue: int
+    push_heartbeat_seconds: float
 
     enable_alerts_file: bool
     alerts_dir: str
@@ -105,6 +115,8 @@ class Settings:
     enable_roi_timeline: bool
     roi_timeline_file: str
     roi_daily_file: str
+    enable_roi_timeline_store: bool
+    roi_timeline_index_every: int
 
     enable_kelly_staking: bool
     kelly_base_units: float
@@ -122,6 +134,10 @@ class Settings:
     roi_csv_include_open: bool
     roi_csv_sort: str
     roi_csv_limit: int
+    enable_roi_stream_export: bool
+    roi_export_dir: str
+    roi_export_format: str
+    roi_export_chunk_rows: int
 
     roi_max_new_picks_per_day: int
     roi_rate_limit_strict: bool
@@ -148,6 +164,11 @@ class Settings:
     roi_ledger_max_picks: int
     roi_ledger_max_age_days: int
     enable_roi_ledger_archive: bool
+    enable_roi_archive_partitions: bool
+    roi_archive_dir: str
+    enable_roi_ledger_journal: bool
+    roi_ledger_journal_file: str
+    roi_ledger_journal_max_bytes: int
     enable_roi_latency_metrics: bool
     enable_roi_league_breakdown: bool
     roi_league_max: int
@@ -190,8 +211,12 @@ class Settings:
     enable_roi_montecarlo: bool
     roi_mc_runs: int
     roi_mc_window: int
+    roi_mc_seed: Optional[int]
+    roi_mc_chunk: int
     enable_roi_archive_stats: bool
     enable_roi_compact_export: bool
+    roi_backtest_dir: str
+    roi_backtest_workers: int
 
     # Batch 39 stub + M1 regime
     enable_roi_regime: bool
@@ -208,6 +233,8 @@ class Settings:
     enable_roi_regime_persistence: bool
     roi_regime_state_file: str
     roi_regime_history_max: int
+    enable_roi_regime_online: bool
+    roi_regime_online_validate: bool
 
     enable_roi_adaptive_stake: bool
     roi_adaptive_stake_min: float
@@ -233,18 +260,30 @@ class Settings:
     roi_quality_max_odds: float
 
     enable_roi_incremental: bool
+    roi_state_file: str
     enable_roi_micro_cache: bool
 
     enable_roi_multi_market: bool
 
+    roi_metrics_engine: str
+
+    enable_roi_profiling: bool
+    enable_roi_profiling_alloc: bool
+
+    enable_roi_lazy_blocks: bool
+    roi_lazy_blocks: List[str]
+    roi_block_cache_dir: str
+
     @classmethod
-    def from_env(cls) -> "Settings":
-        key = os.getenv("API_FOOTBALL_KEY")
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "Settings":
+        # env: mapping alternativo a os.environ (es. override del backtest)
+        getenv = os.getenv if env is None else env.get
+        key = getenv("API_FOOTBALL_KEY")
         if not key:
             raise ValueError("API_FOOTBALL_KEY non impostata. Aggiungi a .env: API_FOOTBALL_KEY=LA_TUA_CHIAVE")
 
         def _opt_int(name: str) -> Optional[int]:
-            raw = os.getenv(name)
+            raw = getenv(name)
             if not raw:
                 return None
             try:
@@ -253,7 +292,7 @@ class Settings:
                 raise ValueError(f"{name} deve essere un intero (valore: {raw!r})") from e
 
         def _int(name: str, default: int) -> int:
-            raw = os.getenv(name)
+            raw = getenv(name)
             if not raw:
                 return default
             try:
@@ -262,7 +301,7 @@ class Settings:
                 raise ValueError(f"{name} deve essere un intero (valore: {raw!r})") from e
 
         def _float(name: str, default: float) -> float:
-            raw = os.getenv(name)
+            raw = getenv(name)
             if not raw:
                 return default
             try:
@@ -272,7 +311,15 @@ class Settings:
 
         league_id = _opt_int("API_FOOTBALL_DEFAULT_LEAGUE_ID")
         season = _opt_int("API_FOOTBALL_DEFAULT_SEASON")
-        log_level = os.getenv("BET_LOG_LEVEL", "INFO").upper()
+        log_level = getenv("BET_LOG_LEVEL", "INFO").upper()
+
+        max_concurrency = max(1, _int("API_FOOTBALL_MAX_CONCURRENCY", 8))
+        rpm = max(0, _int("API_FOOTBALL_RPM", 0))
+        league_ids_raw = _parse_list(getenv("API_FOOTBALL_LEAGUE_IDS"))
+        try:
+            league_ids = [int(x) for x in league_ids_raw] if league_ids_raw else None
+        except ValueError as e:
+            raise ValueError(f"API_FOOTBALL_LEAGUE_IDS deve essere una lista di interi (valore: {league_ids_raw!r})") from e
 
         max_attempts = _int("API_FOOTBALL_MAX_ATTEMPTS", 5)
         backoff_base = _float("API_FOOTBALL_BACKOFF_BASE", 0.5)
@@ -280,126 +327,141 @@ class Settings:
         backoff_jitter = _float("API_FOOTBALL_BACKOFF_JITTER", 0.2)
         timeout = _float("API_FOOTBALL_TIMEOUT", 10.0)
 
-        persist_fixtures = _parse_bool(os.getenv("API_FOOTBALL_PERSIST_FIXTURES"), True)
-        bet_data_dir = os.getenv("BET_DATA_DIR", "data")
+        persist_fixtures = _parse_bool(getenv("API_FOOTBALL_PERSIST_FIXTURES"), True)
+        bet_data_dir = getenv("BET_DATA_DIR", "data")
 
-        delta_compare_keys = _parse_list(os.getenv("DELTA_COMPARE_KEYS"))
-        fetch_abort_on_empty = _parse_bool(os.getenv("FETCH_ABORT_ON_EMPTY"), False)
+        delta_compare_keys = _parse_list(getenv("DELTA_COMPARE_KEYS"))
+        enable_fingerprint_diff = _parse_bool(getenv("ENABLE_FINGERPRINT_DIFF"), False)
+        fetch_abort_on_empty = _parse_bool(getenv("FETCH_ABORT_ON_EMPTY"), False)
 
-        enable_history = _parse_bool(os.getenv("ENABLE_HISTORY"), False)
+        enable_history = _parse_bool(getenv("ENABLE_HISTORY"), False)
         history_max = _int("HISTORY_MAX", 30)
 
-        enable_metrics_file = _parse_bool(os.getenv("ENABLE_METRICS_FILE"), True)
-        enable_events_file = _parse_bool(os.getenv("ENABLE_EVENTS_FILE"), True)
-        metrics_dir = os.getenv("METRICS_DIR", "metrics")
-        events_dir = os.getenv("EVENTS_DIR", "events")
-
-        enable_alerts_file = _parse_bool(os.getenv("ENABLE_ALERTS_FILE"), True)
-        alerts_dir = os.getenv("ALERTS_DIR", "alerts")
-        alert_status_sequence = _parse_list(os.getenv("ALERT_STATUS_SEQUENCE"))
-        alert_include_final = _parse_bool(os.getenv("ALERT_INCLUDE_FINAL"), True)
-
-        enable_predictions = _parse_bool(os.getenv("ENABLE_PREDICTIONS"), False)
-        predictions_dir = os.getenv("PREDICTIONS_DIR", "predictions")
-        model_baseline_version = os.getenv("MODEL_BASELINE_VERSION", "baseline-v1")
-        enable_predictions_use_odds = _parse_bool(os.getenv("ENABLE_PREDICTIONS_USE_ODDS"), False)
-
-        enable_consensus = _parse_bool(os.getenv("ENABLE_CONSENSUS"), False)
-        consensus_dir = os.getenv("CONSENSUS_DIR", "consensus")
+        enable_metrics_file = _parse_bool(getenv("ENABLE_METRICS_FILE"), True)
+        enable_events_file = _parse_bool(getenv("ENABLE_EVENTS_FILE"), True)
+        metrics_dir = getenv("METRICS_DIR", "metrics")
+        events_dir = getenv("EVENTS_DIR", "events")
+        enable_change_feed = _parse_bool(getenv("ENABLE_CHANGE_FEED"), True)
+        change_feed_index_every = max(1, _int("CHANGE_FEED_INDEX_EVERY", 256))
+        change_feed_retention_days = max(0, _int("CHANGE_FEED_RETENTION_DAYS", 14))
+        push_poll_interval = max(0.05, _float("PUSH_POLL_INTERVAL", 1.0))
+        push_client_queue = max(1, _int("PUSH_CLIENT_QUEUE", 256))
+        push_heartbeat_seconds = max(1.0, _float("PUSH_HEARTBEAT_SECONDS", 15.0))
+
+        enable_alerts_file = _parse_bool(getenv("ENABLE_ALERTS_FILE"), True)
+        alerts_dir = getenv("ALERTS_DIR", "alerts")
+        alert_status_sequence = _parse_list(getenv("ALERT_STATUS_SEQUENCE"))
+        alert_include_final = _parse_bool(getenv("ALERT_INCLUDE_FINAL"), True)
+
+        enable_predictions = _parse_bool(getenv("ENABLE_PREDICTIONS"), False)
+        predictions_dir = getenv("PREDICTIONS_DIR", "predictions")
+        model_baseline_version = getenv("MODEL_BASELINE_VERSION", "baseline-v1")
+        enable_predictions_use_odds = _parse_bool(getenv("ENABLE_PREDICTIONS_USE_ODDS"), False)
+
+        enable_consensus = _parse_bool(getenv("ENABLE_CONSENSUS"), False)
+        consensus_dir = getenv("CONSENSUS_DIR", "consensus")
         consensus_baseline_weight = _float("CONSENSUS_BASELINE_WEIGHT", 0.6)
         consensus_baseline_weight = max(0.0, min(consensus_baseline_weight, 1.0))
 
-        enable_telegram_parser = _parse_bool(os.getenv("ENABLE_TELEGRAM_PARSER"), False)
-        telegram_raw_dir = os.getenv("TELEGRAM_RAW_DIR", "telegram/raw")
-        telegram_parsed_dir = os.getenv("TELEGRAM_PARSED_DIR", "telegram/parsed")
+        enable_telegram_parser = _parse_bool(getenv("ENABLE_TELEGRAM_PARSER"), False)
+        telegram_raw_dir = getenv("TELEGRAM_RAW_DIR", "telegram/raw")
+        telegram_parsed_dir = getenv("TELEGRAM_PARSED_DIR", "telegram/parsed")
 
-        enable_prometheus_exporter = _parse_bool(os.getenv("ENABLE_PROMETHEUS_EXPORTER"), False)
+        enable_prometheus_exporter = _parse_bool(getenv("ENABLE_PROMETHEUS_EXPORTER"), False)
         prometheus_port = _int("PROMETHEUS_PORT", 9100)
 
-        enable_odds_ingestion = _parse_bool(os.getenv("ENABLE_ODDS_INGESTION"), False)
-        odds_dir = os.getenv("ODDS_DIR", "odds")
-        odds_provider = os.getenv("ODDS_PROVIDER", "stub")
-        odds_default_source = os.getenv("ODDS_DEFAULT_SOURCE", "stub-book")
+        enable_odds_ingestion = _parse_bool(getenv("ENABLE_ODDS_INGESTION"), False)
+        odds_dir = getenv("ODDS_DIR", "odds")
+        odds_provider = getenv("ODDS_PROVIDER", "stub")
+        odds_default_source = getenv("ODDS_DEFAULT_SOURCE", "stub-book")
 
-        enable_alert_dispatch = _parse_bool(os.getenv("ENABLE_ALERT_DISPATCH"), False)
-        alert_dispatch_mode = os.getenv("ALERT_DISPATCH_MODE", "stdout").lower()
-        alert_webhook_url = os.getenv("ALERT_WEBHOOK_URL")
-        alert_telegram_bot_token = os.getenv("ALERT_TELEGRAM_BOT_TOKEN")
-        alert_telegram_chat_id = os.getenv("ALERT_TELEGRAM_CHAT_ID")
+        enable_alert_dispatch = _parse_bool(getenv("ENABLE_ALERT_DISPATCH"), False)
+        alert_dispatch_mode = getenv("ALERT_DISPATCH_MODE", "stdout").lower()
+        alert_webhook_url = getenv("ALERT_WEBHOOK_URL")
+        alert_telegram_bot_token = getenv("ALERT_TELEGRAM_BOT_TOKEN")
+        alert_telegram_chat_id = getenv("ALERT_TELEGRAM_CHAT_ID")
 
-        enable_value_detection = _parse_bool(os.getenv("ENABLE_VALUE_DETECTION"), False)
+        enable_value_detection = _parse_bool(getenv("ENABLE_VALUE_DETECTION"), False)
         value_min_edge = _float("VALUE_MIN_EDGE", 0.05)
-        value_include_adjusted = _parse_bool(os.getenv("VALUE_INCLUDE_ADJUSTED"), True)
+        value_include_adjusted = _parse_bool(getenv("VALUE_INCLUDE_ADJUSTED"), True)
 
         value_alert_min_edge = _float("VALUE_ALERT_MIN_EDGE", value_min_edge)
-        enable_value_alerts = _parse_bool(os.getenv("ENABLE_VALUE_ALERTS"), False)
-        value_alerts_dir = os.getenv("VALUE_ALERTS_DIR", "value_alerts")
+        enable_value_alerts = _parse_bool(getenv("ENABLE_VALUE_ALERTS"), False)
+        value_alerts_dir = getenv("VALUE_ALERTS_DIR", "value_alerts")
 
-        enable_value_history = _parse_bool(os.getenv("ENABLE_VALUE_HISTORY"), False)
-        value_history_dir = os.getenv("VALUE_HISTORY_DIR", "value_history")
+        enable_value_history = _parse_bool(getenv("ENABLE_VALUE_HISTORY"), False)
+        value_history_dir = getenv("VALUE_HISTORY_DIR", "value_history")
         value_history_max_files = _int("VALUE_HISTORY_MAX_FILES", 30)
-        value_history_mode = os.getenv("VALUE_HISTORY_MODE", "daily").lower()
+        value_history_mode = getenv("VALUE_HISTORY_MODE", "daily").lower()
         if value_history_mode not in {"daily", "rolling"}:
             value_history_mode = "daily"
 
-        enable_model_adjust = _parse_bool(os.getenv("ENABLE_MODEL_ADJUST"), False)
+        enable_model_adjust = _parse_bool(getenv("ENABLE_MODEL_ADJUST"), False)
         model_adjust_weight = _float("MODEL_ADJUST_WEIGHT", 0.7)
         model_adjust_weight = max(0.0, min(model_adjust_weight, 1.0))
 
-        enable_roi_tracking = _parse_bool(os.getenv("ENABLE_ROI_TRACKING"), False)
-        roi_dir = os.getenv("ROI_DIR", "roi")
+        enable_roi_tracking = _parse_bool(getenv("ENABLE_ROI_TRACKING"), False)
+        roi_dir = getenv("ROI_DIR", "roi")
         roi_min_edge = _float("ROI_MIN_EDGE", 0.05)
-        roi_include_consensus = _parse_bool(os.getenv("ROI_INCLUDE_CONSENSUS"), True)
+        roi_include_consensus = _parse_bool(getenv("ROI_INCLUDE_CONSENSUS"), True)
         roi_stake_units = _float("ROI_STAKE_UNITS", 1.0)
 
-        enable_roi_timeline = _parse_bool(os.getenv("ENABLE_ROI_TIMELINE"), True)
-        roi_timeline_file = os.getenv("ROI_TIMELINE_FILE", "roi_history.jsonl")
-        roi_daily_file = os.getenv("ROI_DAILY_FILE", "roi_daily.json")
+        enable_roi_timeline = _parse_bool(getenv("ENABLE_ROI_TIMELINE"), True)
+        roi_timeline_file = getenv("ROI_TIMELINE_FILE", "roi_history.jsonl")
+        roi_daily_file = getenv("ROI_DAILY_FILE", "roi_daily.json")
+        enable_roi_timeline_store = _parse_bool(getenv("ENABLE_ROI_TIMELINE_STORE"), True)
+        roi_timeline_index_every = max(1, _int("ROI_TIMELINE_INDEX_EVERY", 64))
 
-        enable_kelly_staking = _parse_bool(os.getenv("ENABLE_KELLY_STAKING"), False)
+        enable_kelly_staking = _parse_bool(getenv("ENABLE_KELLY_STAKING"), False)
         kelly_base_units = _float("KELLY_BASE_UNITS", 1.0)
         kelly_max_units = _float("KELLY_MAX_UNITS", 3.0)
         kelly_edge_cap = _float("KELLY_EDGE_CAP", 0.5)
         kelly_edge_cap = max(0.0, min(kelly_edge_cap, 1.0))
 
-        enable_roi_odds_snapshot = _parse_bool(os.getenv("ENABLE_ROI_ODDS_SNAPSHOT"), True)
+        enable_roi_odds_snapshot = _parse_bool(getenv("ENABLE_ROI_ODDS_SNAPSHOT"), True)
 
-        enable_merged_value_alerts = _parse_bool(os.getenv("ENABLE_MERGED_VALUE_ALERTS"), False)
-        merged_value_edge_policy = os.getenv("MERGED_VALUE_EDGE_POLICY", "max").lower()
+        enable_merged_value_alerts = _parse_bool(getenv("ENABLE_MERGED_VALUE_ALERTS"), False)
+        merged_value_edge_policy = getenv("MERGED_VALUE_EDGE_POLICY", "max").lower()
         if merged_value_edge_policy not in {"max", "min", "avg"}:
             merged_value_edge_policy = "max"
-        roi_include_merged = _parse_bool(os.getenv("ROI_INCLUDE_MERGED"), True)
+        roi_include_merged = _parse_bool(getenv("ROI_INCLUDE_MERGED"), True)
 
-        enable_roi_csv_export = _parse_bool(os.getenv("ENABLE_ROI_CSV_EXPORT"), True)
-        roi_csv_file = os.getenv("ROI_CSV_FILE", "roi_export.csv")
-        roi_csv_include_open = _parse_bool(os.getenv("ROI_CSV_INCLUDE_OPEN"), True)
-        roi_csv_sort = os.getenv("ROI_CSV_SORT", "created_at")
+        enable_roi_csv_export = _parse_bool(getenv("ENABLE_ROI_CSV_EXPORT"), True)
+        roi_csv_file = getenv("ROI_CSV_FILE", "roi_export.csv")
+        roi_csv_include_open = _parse_bool(getenv("ROI_CSV_INCLUDE_OPEN"), True)
+        roi_csv_sort = getenv("ROI_CSV_SORT", "created_at")
         if roi_csv_sort not in {"created_at", "settled_at"}:
             roi_csv_sort = "created_at"
         roi_csv_limit = _int("ROI_CSV_LIMIT", 0)
+        enable_roi_stream_export = _parse_bool(getenv("ENABLE_ROI_STREAM_EXPORT"), False)
+        roi_export_dir = getenv("ROI_EXPORT_DIR", "exports")
+        roi_export_format = getenv("ROI_EXPORT_FORMAT", "auto").lower()
+        if roi_export_format not in {"auto", "parquet", "arrow", "csv.gz"}:
+            roi_export_format = "auto"
+        roi_export_chunk_rows = max(1, _int("ROI_EXPORT_CHUNK_ROWS", 50000))
 
         roi_max_new_picks_per_day = _int("ROI_MAX_NEW_PICKS_PER_DAY", 0)
-        roi_rate_limit_strict = _parse_bool(os.getenv("ROI_RATE_LIMIT_STRICT"), True)
+        roi_rate_limit_strict = _parse_bool(getenv("ROI_RATE_LIMIT_STRICT"), True)
 
-        value_alert_dynamic_enable = _parse_bool(os.getenv("VALUE_ALERT_DYNAMIC_ENABLE"), False)
+        value_alert_dynamic_enable = _parse_bool(getenv("VALUE_ALERT_DYNAMIC_ENABLE"), False)
         value_alert_dynamic_target_count = _int("VALUE_ALERT_DYNAMIC_TARGET_COUNT", 50)
         value_alert_dynamic_min_factor = _float("VALUE_ALERT_DYNAMIC_MIN_FACTOR", 1.0)
         value_alert_dynamic_max_factor = _float("VALUE_ALERT_DYNAMIC_MAX_FACTOR", 2.0)
         value_alert_dynamic_adjust_step = _float("VALUE_ALERT_DYNAMIC_ADJUST_STEP", 0.05)
 
-        enable_clv_capture = _parse_bool(os.getenv("ENABLE_CLV_CAPTURE"), True)
-        clv_odds_source = os.getenv("CLV_ODDS_SOURCE", "odds_latest").lower()
+        enable_clv_capture = _parse_bool(getenv("ENABLE_CLV_CAPTURE"), True)
+        clv_odds_source = getenv("CLV_ODDS_SOURCE", "odds_latest").lower()
 
-        merged_dedup_enable = _parse_bool(os.getenv("MERGED_DEDUP_ENABLE"), False)
+        merged_dedup_enable = _parse_bool(getenv("MERGED_DEDUP_ENABLE"), False)
 
         roi_rolling_window = _int("ROI_ROLLING_WINDOW", 30)
         if roi_rolling_window < 1:
             roi_rolling_window = 30
 
-        enable_roi_edge_deciles = _parse_bool(os.getenv("ENABLE_ROI_EDGE_DECILES"), True)
-        enable_roi_clv_aggregate = _parse_bool(os.getenv("ENABLE_ROI_CLV_AGGREGATE"), True)
+        enable_roi_edge_deciles = _parse_bool(getenv("ENABLE_ROI_EDGE_DECILES"), True)
+        enable_roi_clv_aggregate = _parse_bool(getenv("ENABLE_ROI_CLV_AGGREGATE"), True)
 
-        rolling_windows_raw = os.getenv("ROI_ROLLING_WINDOWS", "7,30,90")
+        rolling_windows_raw = getenv("ROI_ROLLING_WINDOWS", "7,30,90")
         rw_list: List[int] = []
         for token in rolling_windows_raw.split(","):
             t = token.strip()
@@ -414,22 +476,27 @@ class Settings:
         if not rw_list:
             rw_list = [7, 30, 90]
 
-        enable_roi_source_breakdown = _parse_bool(os.getenv("ENABLE_ROI_SOURCE_BREAKDOWN"), True)
-        enable_roi_risk_metrics = _parse_bool(os.getenv("ENABLE_ROI_RISK_METRICS"), True)
-        enable_roi_stake_breakdown = _parse_bool(os.getenv("ENABLE_ROI_STAKE_BREAKDOWN"), True)
+        enable_roi_source_breakdown = _parse_bool(getenv("ENABLE_ROI_SOURCE_BREAKDOWN"), True)
+        enable_roi_risk_metrics = _parse_bool(getenv("ENABLE_ROI_RISK_METRICS"), True)
+        enable_roi_stake_breakdown = _parse_bool(getenv("ENABLE_ROI_STAKE_BREAKDOWN"), True)
         roi_ledger_max_picks = _int("ROI_LEDGER_MAX_PICKS", 0)
         roi_ledger_max_age_days = _int("ROI_LEDGER_MAX_AGE_DAYS", 0)
-        enable_roi_ledger_archive = _parse_bool(os.getenv("ENABLE_ROI_LEDGER_ARCHIVE"), True)
-        enable_roi_latency_metrics = _parse_bool(os.getenv("ENABLE_ROI_LATENCY_METRICS"), True)
-        enable_roi_league_breakdown = _parse_bool(os.getenv("ENABLE_ROI_LEAGUE_BREAKDOWN"), False)
+        enable_roi_ledger_archive = _parse_bool(getenv("ENABLE_ROI_LEDGER_ARCHIVE"), True)
+        enable_roi_archive_partitions = _parse_bool(getenv("ENABLE_ROI_ARCHIVE_PARTITIONS"), True)
+        roi_archive_dir = getenv("ROI_ARCHIVE_DIR", "archive")
+        enable_roi_ledger_journal = _parse_bool(getenv("ENABLE_ROI_LEDGER_JOURNAL"), False)
+        roi_ledger_journal_file = getenv("ROI_LEDGER_JOURNAL_FILE", "ledger_journal.jsonl")
+        roi_ledger_journal_max_bytes = _int("ROI_LEDGER_JOURNAL_MAX_BYTES", 2_000_000)
+        enable_roi_latency_metrics = _parse_bool(getenv("ENABLE_ROI_LATENCY_METRICS"), True)
+        enable_roi_league_breakdown = _parse_bool(getenv("ENABLE_ROI_LEAGUE_BREAKDOWN"), False)
         roi_league_max = _int("ROI_LEAGUE_MAX", 10)
-        enable_roi_time_buckets = _parse_bool(os.getenv("ENABLE_ROI_TIME_BUCKETS"), False)
-        roi_edge_buckets_raw = os.getenv("ROI_EDGE_BUCKETS", "0.05-0.07,0.07-0.09,0.09-0.12,0.12-")
+        enable_roi_time_buckets = _parse_bool(getenv("ENABLE_ROI_TIME_BUCKETS"), False)
+        roi_edge_buckets_raw = getenv("ROI_EDGE_BUCKETS", "0.05-0.07,0.07-0.09,0.09-0.12,0.12-")
         roi_edge_buckets = [r.strip() for r in roi_edge_buckets_raw.split(",") if r.strip()]
 
         # Batch 37 core
-        enable_roi_equity_vol = _parse_bool(os.getenv("ENABLE_ROI_EQUITY_VOL"), True)
-        eq_vol_raw = os.getenv("ROI_EQUITY_VOL_WINDOWS", "30,100")
+        enable_roi_equity_vol = _parse_bool(getenv("ENABLE_ROI_EQUITY_VOL"), True)
+        eq_vol_raw = getenv("ROI_EQUITY_VOL_WINDOWS", "30,100")
         roi_equity_vol_windows: List[int] = []
         for t in eq_vol_raw.split(","):
             t = t.strip()
@@ -444,23 +511,23 @@ class Settings:
         if not roi_equity_vol_windows:
             roi_equity_vol_windows = [30, 100]
 
-        enable_roi_anomaly_flags = _parse_bool(os.getenv("ENABLE_ROI_ANOMALY_FLAGS"), True)
+        enable_roi_anomaly_flags = _parse_bool(getenv("ENABLE_ROI_ANOMALY_FLAGS"), True)
         roi_anomaly_dd_threshold = _float("ROI_ANOMALY_DD_THRESHOLD", 0.30)
         roi_anomaly_yield_drop = _float("ROI_ANOMALY_YIELD_DROP", 0.50)
         roi_anomaly_vol_mult = _float("ROI_ANOMALY_VOL_MULT", 2.0)
 
-        enable_roi_schema_export = _parse_bool(os.getenv("ENABLE_ROI_SCHEMA_EXPORT"), False)
-        enable_roi_profit_distribution = _parse_bool(os.getenv("ENABLE_ROI_PROFIT_DISTRIBUTION"), True)
-        enable_roi_ror = _parse_bool(os.getenv("ENABLE_ROI_ROR"), False)
-        enable_roi_source_efficiency = _parse_bool(os.getenv("ENABLE_ROI_SOURCE_EFFICIENCY"), True)
+        enable_roi_schema_export = _parse_bool(getenv("ENABLE_ROI_SCHEMA_EXPORT"), False)
+        enable_roi_profit_distribution = _parse_bool(getenv("ENABLE_ROI_PROFIT_DISTRIBUTION"), True)
+        enable_roi_ror = _parse_bool(getenv("ENABLE_ROI_ROR"), False)
+        enable_roi_source_efficiency = _parse_bool(getenv("ENABLE_ROI_SOURCE_EFFICIENCY"), True)
 
         # Batch 37 plus
-        enable_roi_edge_clv_corr = _parse_bool(os.getenv("ENABLE_ROI_EDGE_CLV_CORR"), False)
-        enable_roi_stake_advisory = _parse_bool(os.getenv("ENABLE_ROI_STAKE_ADVISORY"), False)
+        enable_roi_edge_clv_corr = _parse_bool(getenv("ENABLE_ROI_EDGE_CLV_CORR"), False)
+        enable_roi_stake_advisory = _parse_bool(getenv("ENABLE_ROI_STAKE_ADVISORY"), False)
         roi_stake_advisory_dd_pct = _float("ROI_STAKE_ADVISORY_DD_PCT", 0.25)
 
-        enable_roi_aging_buckets = _parse_bool(os.getenv("ENABLE_ROI_AGING_BUCKETS"), False)
-        aging_raw = os.getenv("ROI_AGING_BUCKETS", "1,2,3,5,7")
+        enable_roi_aging_buckets = _parse_bool(getenv("ENABLE_ROI_AGING_BUCKETS"), False)
+        aging_raw = getenv("ROI_AGING_BUCKETS", "1,2,3,5,7")
         roi_aging_buckets: List[int] = []
         for t in aging_raw.split(","):
             t = t.strip()
@@ -474,32 +541,36 @@ class Settings:
                 continue
         roi_aging_buckets = sorted(set(roi_aging_buckets))
 
-        enable_roi_side_breakdown = _parse_bool(os.getenv("ENABLE_ROI_SIDE_BREAKDOWN"), True)
-        enable_roi_clv_buckets = _parse_bool(os.getenv("ENABLE_ROI_CLV_BUCKETS"), False)
-        roi_clv_buckets_raw = os.getenv("ROI_CLV_BUCKETS", "-0.1--0.05,-0.05-0,0-0.05,0.05-0.1,0.1-")
+        enable_roi_side_breakdown = _parse_bool(getenv("ENABLE_ROI_SIDE_BREAKDOWN"), True)
+        enable_roi_clv_buckets = _parse_bool(getenv("ENABLE_ROI_CLV_BUCKETS"), False)
+        roi_clv_buckets_raw = getenv("ROI_CLV_BUCKETS", "-0.1--0.05,-0.05-0,0-0.05,0.05-0.1,0.1-")
         roi_clv_buckets = [r.strip() for r in roi_clv_buckets_raw.split(",") if r.strip()]
 
         # Batch 38 advanced
-        enable_roi_kelly_effect = _parse_bool(os.getenv("ENABLE_ROI_KELLY_EFFECT"), False)
-        enable_roi_payout_moments = _parse_bool(os.getenv("ENABLE_ROI_PAYOUT_MOMENTS"), False)
-        enable_roi_market_placeholder = _parse_bool(os.getenv("ENABLE_ROI_MARKET_PLACEHOLDER"), False)
-        enable_roi_profit_buckets = _parse_bool(os.getenv("ENABLE_ROI_PROFIT_BUCKETS"), False)
-        roi_profit_buckets_raw = os.getenv("ROI_PROFIT_BUCKETS", "-2--1,-1--0.5,-0.5-0,0-0.5,0.5-1,1-")
+        enable_roi_kelly_effect = _parse_bool(getenv("ENABLE_ROI_KELLY_EFFECT"), False)
+        enable_roi_payout_moments = _parse_bool(getenv("ENABLE_ROI_PAYOUT_MOMENTS"), False)
+        enable_roi_market_placeholder = _parse_bool(getenv("ENABLE_ROI_MARKET_PLACEHOLDER"), False)
+        enable_roi_profit_buckets = _parse_bool(getenv("ENABLE_ROI_PROFIT_BUCKETS"), False)
+        roi_profit_buckets_raw = getenv("ROI_PROFIT_BUCKETS", "-2--1,-1--0.5,-0.5-0,0-0.5,0.5-1,1-")
         roi_profit_buckets = [r.strip() for r in roi_profit_buckets_raw.split(",") if r.strip()]
-        enable_roi_montecarlo = _parse_bool(os.getenv("ENABLE_ROI_MONTECARLO"), False)
+        enable_roi_montecarlo = _parse_bool(getenv("ENABLE_ROI_MONTECARLO"), False)
         roi_mc_runs = _int("ROI_MC_RUNS", 150)
         roi_mc_window = _int("ROI_MC_WINDOW", 200)
-        enable_roi_archive_stats = _parse_bool(os.getenv("ENABLE_ROI_ARCHIVE_STATS"), False)
-        enable_roi_compact_export = _parse_bool(os.getenv("ENABLE_ROI_COMPACT_EXPORT"), False)
+        roi_mc_seed = _opt_int("ROI_MC_SEED")
+        roi_mc_chunk = max(1, _int("ROI_MC_CHUNK", 10_000))
+        enable_roi_archive_stats = _parse_bool(getenv("ENABLE_ROI_ARCHIVE_STATS"), False)
+        enable_roi_compact_export = _parse_bool(getenv("ENABLE_ROI_COMPACT_EXPORT"), False)
+        roi_backtest_dir = getenv("ROI_BACKTEST_DIR", "backtest")
+        roi_backtest_workers = max(0, _int("ROI_BACKTEST_WORKERS", 0))
 
         # Batch 39 regime + M1
-        enable_roi_regime = _parse_bool(os.getenv("ENABLE_ROI_REGIME"), False)
-        roi_regime_version = os.getenv("ROI_REGIME_VERSION", "stub").lower()
+        enable_roi_regime = _parse_bool(getenv("ENABLE_ROI_REGIME"), False)
+        roi_regime_version = getenv("ROI_REGIME_VERSION", "stub").lower()
         roi_regime_lookback = _int("ROI_REGIME_LOOKBACK", 150)
         roi_regime_dd_bear = _float("ROI_REGIME_DD_BEAR", 0.25)
         roi_regime_vol_high = _float("ROI_REGIME_VOL_HIGH", 0.20)
         roi_regime_min_points = _int("ROI_REGIME_MIN_POINTS", 30)
-        roi_regime_momentum_windows_raw = os.getenv("ROI_REGIME_MOMENTUM_WINDOWS", "10,30")
+        roi_regime_momentum_windows_raw = getenv("ROI_REGIME_MOMENTUM_WINDOWS", "10,30")
         mw_list: List[int] = []
         for t in roi_regime_momentum_windows_raw.split(","):
             t = t.strip()
@@ -516,37 +587,60 @@ class Settings:
         roi_regime_min_hold = _int("ROI_REGIME_MIN_HOLD", 8)
         roi_regime_smooth_alpha = _float("ROI_REGIME_SMOOTH_ALPHA", 0.4)
         roi_regime_mom_threshold = _float("ROI_REGIME_MOM_THRESHOLD", 0.002)
-        enable_roi_regime_persistence = _parse_bool(os.getenv("ENABLE_ROI_REGIME_PERSISTENCE"), False)
-        roi_regime_state_file = os.getenv("ROI_REGIME_STATE_FILE", "roi_regime_state.json")
+        enable_roi_regime_persistence = _parse_bool(getenv("ENABLE_ROI_REGIME_PERSISTENCE"), False)
+        roi_regime_state_file = getenv("ROI_REGIME_STATE_FILE", "roi_regime_state.json")
         roi_regime_history_max = _int("ROI_REGIME_HISTORY_MAX", 30)
+        enable_roi_regime_online = _parse_bool(getenv("ENABLE_ROI_REGIME_ONLINE"), False)
+        roi_regime_online_validate = _parse_bool(getenv("ROI_REGIME_ONLINE_VALIDATE"), False)
 
-        enable_roi_adaptive_stake = _parse_bool(os.getenv("ENABLE_ROI_ADAPTIVE_STAKE"), False)
+        enable_roi_adaptive_stake = _parse_bool(getenv("ENABLE_ROI_ADAPTIVE_STAKE"), False)
         roi_adaptive_stake_min = _float("ROI_ADAPTIVE_STAKE_MIN", 0.6)
         roi_adaptive_stake_max = _float("ROI_ADAPTIVE_STAKE_MAX", 1.25)
 
-        enable_roi_adaptive_edge = _parse_bool(os.getenv("ENABLE_ROI_ADAPTIVE_EDGE"), False)
+        enable_roi_adaptive_edge = _parse_bool(getenv("ENABLE_ROI_ADAPTIVE_EDGE"), False)
         roi_adaptive_edge_max_bonus = _float("ROI_ADAPTIVE_EDGE_MAX_BONUS", 0.02)
         roi_adaptive_edge_max_penalty = _float("ROI_ADAPTIVE_EDGE_MAX_PENALTY", 0.03)
 
-        enable_roi_portfolio = _parse_bool(os.getenv("ENABLE_ROI_PORTFOLIO"), False)
+        enable_roi_portfolio = _parse_bool(getenv("ENABLE_ROI_PORTFOLIO"), False)
         roi_portfolio_min_picks = _int("ROI_PORTFOLIO_MIN_PICKS", 60)
 
-        enable_roi_drift_monitor = _parse_bool(os.getenv("ENABLE_ROI_DRIFT_MONITOR"), False)
+        enable_roi_drift_monitor = _parse_bool(getenv("ENABLE_ROI_DRIFT_MONITOR"), False)
         roi_drift_edge_tol = _float("ROI_DRIFT_EDGE_TOL", 0.02)
         roi_drift_clv_tol = _float("ROI_DRIFT_CLV_TOL", 0.02)
 
-        enable_roi_stress_test = _parse_bool(os.getenv("ENABLE_ROI_STRESS_TEST"), False)
-        roi_stress_scenarios_raw = os.getenv("ROI_STRESS_SCENARIOS", "-1sigma,-2sigma")
+        enable_roi_stress_test = _parse_bool(getenv("ENABLE_ROI_STRESS_TEST"), False)
+        roi_stress_scenarios_raw = getenv("ROI_STRESS_SCENARIOS", "-1sigma,-2sigma")
         roi_stress_horizon_picks = _int("ROI_STRESS_HORIZON_PICKS", 50)
 
-        enable_roi_quality_guards = _parse_bool(os.getenv("ENABLE_ROI_QUALITY_GUARDS"), False)
+        enable_roi_quality_guards = _parse_bool(getenv("ENABLE_ROI_QUALITY_GUARDS"), False)
         roi_quality_max_stake_mult = _float("ROI_QUALITY_MAX_STAKE_MULT", 5.0)
         roi_quality_max_odds = _float("ROI_QUALITY_MAX_ODDS", 25.0)
 
-        enable_roi_incremental = _parse_bool(os.getenv("ENABLE_ROI_INCREMENTAL"), False)
-        enable_roi_micro_cache = _parse_bool(os.getenv("ENABLE_ROI_MICRO_CACHE"), False)
+        enable_roi_incremental = _parse_bool(getenv("ENABLE_ROI_INCREMENTAL"), False)
+        roi_state_file = getenv("ROI_STATE_FILE", "roi_state.json")
+        enable_roi_micro_cache = _parse_bool(getenv("ENABLE_ROI_MICRO_CACHE"), False)
+
+        enable_roi_multi_market = _parse_bool(getenv("ENABLE_ROI_MULTI_MARKET"), False)
+
+        # Motore assemblaggio metriche: fused (single-pass) | legacy (un helper per blocco)
+        roi_metrics_engine = getenv("ROI_METRICS_ENGINE", "fused").lower()
+        if roi_metrics_engine not in {"fused", "legacy"}:
+            roi_metrics_engine = "fused"
+
+        # Profiling (debug): tempi per stage/blocco in roi_metrics.json["_timings"]
+        enable_roi_profiling = _parse_bool(getenv("ENABLE_ROI_PROFILING"), False)
+        enable_roi_profiling_alloc = _parse_bool(getenv("ENABLE_ROI_PROFILING_ALLOC"), False)
 
-        enable_roi_multi_market = _parse_bool(os.getenv("ENABLE_ROI_MULTI_MARKET"), False)
+        # Blocchi metriche lazy: calcolati on-demand dall'API, cache per versione ledger
+        enable_roi_lazy_blocks = _parse_bool(getenv("ENABLE_ROI_LAZY_BLOCKS"), False)
+        roi_lazy_blocks = [
+            b.lower()
+            for b in (
+                _parse_list(getenv("ROI_LAZY_BLOCKS"))
+                or ["deciles", "edge_buckets", "clv_buckets", "profit_buckets", "league", "time_buckets", "edge_clv_corr"]
+            )
+        ]
+        roi_block_cache_dir = getenv("ROI_BLOCK_CACHE_DIR", "blocks")
 
         return cls(
             api_football_key=key,
@@ -558,9 +652,13 @@ class Settings:
             api_football_backoff_factor=backoff_factor,
             api_football_backoff_jitter=backoff_jitter,
             api_football_timeout=timeout,
+            api_football_max_concurrency=max_concurrency,
+            api_football_rpm=rpm,
+            api_football_league_ids=league_ids,
             persist_fixtures=persist_fixtures,
             bet_data_dir=bet_data_dir,
             delta_compare_keys=delta_compare_keys,
+            enable_fingerprint_diff=enable_fingerprint_diff,
             fetch_abort_on_empty=fetch_abort_on_empty,
             enable_history=enable_history,
             history_max=history_max,
@@ -568,6 +666,12 @@ class Settings:
             enable_events_file=enable_events_file,
             metrics_dir=metrics_dir,
             events_dir=events_dir,
+            enable_change_feed=enable_change_feed,
+            change_feed_index_every=change_feed_index_every,
+            change_feed_retention_days=change_feed_retention_days,
+            push_poll_interval=push_poll_interval,
+            push_client_queue=push_client_queue,
+            push_heartbeat_seconds=push_heartbeat_seconds,
             enable_alerts_file=enable_alerts_file,
             alerts_dir=alerts_dir,
             alert_status_sequence=alert_status_sequence,
@@ -613,6 +717,8 @@ class Settings:
             enable_roi_timeline=enable_roi_timeline,
             roi_timeline_file=roi_timeline_file,
             roi_daily_file=roi_daily_file,
+            enable_roi_timeline_store=enable_roi_timeline_store,
+            roi_timeline_index_every=roi_timeline_index_every,
             enable_kelly_staking=enable_kelly_staking,
             kelly_base_units=kelly_base_units,
             kelly_max_units=kelly_max_units,
@@ -626,6 +732,10 @@ class Settings:
             roi_csv_include_open=roi_csv_include_open,
             roi_csv_sort=roi_csv_sort,
             roi_csv_limit=roi_csv_limit,
+            enable_roi_stream_export=enable_roi_stream_export,
+            roi_export_dir=roi_export_dir,
+            roi_export_format=roi_export_format,
+            roi_export_chunk_rows=roi_export_chunk_rows,
             roi_max_new_picks_per_day=roi_max_new_picks_per_day,
             roi_rate_limit_strict=roi_rate_limit_strict,
             value_alert_dynamic_enable=value_alert_dynamic_enable,
@@ -646,6 +756,11 @@ class Settings:
             roi_ledger_max_picks=roi_ledger_max_picks,
             roi_ledger_max_age_days=roi_ledger_max_age_days,
             enable_roi_ledger_archive=enable_roi_ledger_archive,
+            enable_roi_archive_partitions=enable_roi_archive_partitions,
+            roi_archive_dir=roi_archive_dir,
+            enable_roi_ledger_journal=enable_roi_ledger_journal,
+            roi_ledger_journal_file=roi_ledger_journal_file,
+            roi_ledger_journal_max_bytes=roi_ledger_journal_max_bytes,
             enable_roi_latency_metrics=enable_roi_latency_metrics,
             enable_roi_league_breakdown=enable_roi_league_breakdown,
             roi_league_max=roi_league_max,
@@ -680,8 +795,12 @@ class Settings:
             enable_roi_montecarlo=enable_roi_montecarlo,
             roi_mc_runs=roi_mc_runs,
             roi_mc_window=roi_mc_window,
+            roi_mc_seed=roi_mc_seed,
+            roi_mc_chunk=roi_mc_chunk,
             enable_roi_archive_stats=enable_roi_archive_stats,
             enable_roi_compact_export=enable_roi_compact_export,
+            roi_backtest_dir=roi_backtest_dir,
+            roi_backtest_workers=roi_backtest_workers,
             enable_roi_regime=enable_roi_regime,
             roi_regime_version=roi_regime_version,
             roi_regime_lookback=roi_regime_lookback,
@@ -696,6 +815,8 @@ class Settings:
             enable_roi_regime_persistence=enable_roi_regime_persistence,
             roi_regime_state_file=roi_regime_state_file,
             roi_regime_history_max=roi_regime_history_max,
+            enable_roi_regime_online=enable_roi_regime_online,
+            roi_regime_online_validate=roi_regime_online_validate,
             enable_roi_adaptive_stake=enable_roi_adaptive_stake,
             roi_adaptive_stake_min=roi_adaptive_stake_min,
             roi_adaptive_stake_max=roi_adaptive_stake_max,
@@ -714,8 +835,15 @@ class Settings:
             roi_quality_max_stake_mult=roi_quality_max_stake_mult,
             roi_quality_max_odds=roi_quality_max_odds,
             enable_roi_incremental=enable_roi_incremental,
+            roi_state_file=roi_state_file,
             enable_roi_micro_cache=enable_roi_micro_cache,
             enable_roi_multi_market=enable_roi_multi_market,
+            roi_metrics_engine=roi_metrics_engine,
+            enable_roi_profiling=enable_roi_profiling,
+            enable_roi_profiling_alloc=enable_roi_profiling_alloc,
+            enable_roi_lazy_blocks=enable_roi_lazy_blocks,
+            roi_lazy_blocks=roi_lazy_blocks,
+            roi_block_cache_dir=roi_block_cache_dir,
         )
 
 
@@ -728,4 +856,21 @@ def _reset_settings_cache_for_tests() -> None:
     get_settings.cache_clear()
 
 
-__all__ = ["Settings", "get_settings", "_reset_settings_cache_for_tests"]
+def settings_with_overrides(overrides: Mapping[str, Any], base: Optional[Settings] = None) -> Settings:
+    """
+    Copia di Settings con override in forma ENV (nome variabile → valore),
+    parsati come in from_env. os.environ e la cache di get_settings non cambiano.
+    """
+    base = base or get_settings()
+    if not overrides:
+        return base
+    parsed = Settings.from_env({**os.environ, **{k: str(v) for k, v in overrides.items()}})
+    changes = {
+        f.name: getattr(parsed, f.name)
+        for f in fields(Settings)
+        if getattr(parsed, f.name) != getattr(base, f.name)
+    }
+    return replace(base, **changes)
+
+
+__all__ = ["Settings", "get_settings", "settings_with_overrides", "_reset_settings_cache_for_tests"]
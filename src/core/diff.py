@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from typing import Any, Callable, Dict, Iterable, List, Tuple, Literal
 
 Fixture = Dict[str, Any]
@@ -19,6 +20,21 @@ def _default_key(f: Fixture) -> Any:
         f.get("away_team"),
     )
 
+def fixture_key_str(f: Fixture) -> str | None:
+    """
+    Chiave di _default_key come stringa (chiave JSON per stati persistiti):
+    fixture_id → "123", fallback → lista JSON. None se chiave incompleta.
+    """
+    fid = f.get("fixture_id")
+    if fid is not None:
+        return str(fid)
+    k = _default_key(f)
+    if k is None or (isinstance(k, tuple) and any(part is None for part in k)):
+        return None
+    if isinstance(k, tuple):
+        return json.dumps(list(k), ensure_ascii=False, separators=(",", ":"))
+    return str(k)
+
 def _index(fixtures: Iterable[Fixture], key_fn: Callable[[Fixture], Any]) -> Dict[Any, Fixture]:
     idx: Dict[Any, Fixture] = {}
     for item in fixtures:
@@ -146,5 +162,6 @@ def summarize_delta(
 __all__ = [
     "diff_fixtures",
     "diff_fixtures_detailed",
+    "fixture_key_str",
     "summarize_delta",
 ]
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, cast
+
+from core import jsoncodec
+from core.diff import _classify_change, fixture_key_str
+from core.logging import get_logger
+from core.models import FixtureDataset
+
+logger = get_logger("core.fingerprints")
+
+# ============================================================
+# Diff fixtures a fingerprint (stato persistito tra un fetch e il successivo)
+#
+#   diff/fingerprints.json   {"version","compare_keys","records": "records-<n>.jsonl",
+#                             "entries": {chiave: [fingerprint, offset, length]}}
+#   diff/records-<n>.jsonl   una fixture per riga (JSON canonico, sort_keys)
+#
+# fingerprint = blake2b (64 bit) delle compare keys (DELTA_COMPARE_KEYS) o, se
+# non configurate, dell'intero record. Al fetch successivo ogni fixture nuova è
+# serializzata una volta (stessa riga del nuovo records file) e confrontata per
+# fingerprint: solo i record con hash diverso (modificati) o spariti (rimossi)
+# vengono riletti dal records precedente, per offset. Niente indici completi
+# del vecchio snapshot né decode di fixtures_previous.json.
+# Il nuovo records file è scritto prima dell'indice (os.replace): un crash
+# lascia valido lo stato precedente.
+# Attivo solo con ENABLE_FINGERPRINT_DIFF: la serializzazione di ogni record
+# per il records file costa più del decode di fixtures_latest + diff a dict
+# (core.diff) con un backend JSON veloce. Con il flag spento lo stato viene
+# scartato (discard_state), altrimenti riattivandolo il diff partirebbe da un
+# fetch vecchio.
+# ============================================================
+
+STATE_DIR = "diff"
+INDEX_FILE = "fingerprints.json"
+INDEX_VERSION = 1
+
+_LOCK = threading.Lock()
+
+
+def state_dir(base: Optional[Path] = None) -> Path:
+    base = base or Path(os.getenv("BET_DATA_DIR") or "data")
+    return base / STATE_DIR
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def fingerprint(f: Dict[str, Any], compare_keys: Optional[List[str]] = None) -> str:
+    """Hash delle compare keys (o dell'intero record) in JSON canonico."""
+    if compare_keys is None:
+        return _hash(jsoncodec.dumps(f, sort_keys=True, default=str))
+    return _hash(jsoncodec.dumps([f.get(k) for k in compare_keys], default=str))
+
+
+def _load_index(d: Path) -> Optional[Dict[str, Any]]:
+    try:
+        idx = jsoncodec.read_json(d / INDEX_FILE)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(idx, dict) or idx.get("version") != INDEX_VERSION or not isinstance(idx.get("entries"), dict):
+        return None
+    if not (d / str(idx.get("records"))).exists():
+        return None
+    return idx
+
+
+def _read_records(path: Path, spans: Iterable[Tuple[str, int, int]]) -> Dict[str, Dict[str, Any]]:
+    """Legge solo i record indicati (chiave, offset, length) in ordine di offset."""
+    out: Dict[str, Dict[str, Any]] = {}
+    ordered = sorted(spans, key=lambda s: s[1])
+    if not ordered:
+        return out
+    with path.open("rb") as fh:
+        for key, offset, length in ordered:
+            fh.seek(offset)
+            try:
+                rec = jsoncodec.loads(fh.read(length))
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                out[key] = rec
+    return out
+
+
+def _bootstrap(fixtures: FixtureDataset, compare_keys: Optional[List[str]]) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    fps: Dict[str, str] = {}
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for item in fixtures:
+        if not isinstance(item, dict):
+            continue
+        # FixtureRecord (TypedDict) → dict JSON generico delle helper di core.diff
+        f = cast(Dict[str, Any], item)
+        k = fixture_key_str(f)
+        if k is not None:
+            fps[k] = fingerprint(f, compare_keys)
+            by_key[k] = f
+    return fps, by_key
+
+
+def _rehash(path: Path, entries: Dict[str, List[Any]], compare_keys: Optional[List[str]]) -> Dict[str, str]:
+    """Compare keys cambiate: fingerprint ricalcolati dal records file (una volta)."""
+    recs = _read_records(path, ((k, e[1], e[2]) for k, e in entries.items()))
+    return {k: fingerprint(f, compare_keys) for k, f in recs.items()}
+
+
+def diff_with_fingerprints(
+    new: FixtureDataset,
+    *,
+    compare_keys: Optional[Iterable[str]] = None,
+    base: Optional[Path] = None,
+    previous: Optional[Callable[[], FixtureDataset]] = None,
+    classify: bool = True,
+    commit: bool = True,
+) -> Dict[str, Any]:
+    """
+    Diff del nuovo fetch contro lo stato a fingerprint persistito; stesso
+    formato di diff_fixtures_detailed. Senza stato (primo run / stato corrotto)
+    il confronto è con `previous()` (es. load_latest_fixtures), chiamato solo in quel caso.
+    `commit`: salva il nuovo stato (records + fingerprint) per il fetch successivo.
+    """
+    ck = list(compare_keys) if compare_keys else None
+    d = state_dir(base)
+    with _LOCK:
+        idx = _load_index(d)
+        old_entries: Dict[str, List[Any]] = {}
+        old_fps: Dict[str, str] = {}
+        old_loaded: Dict[str, Dict[str, Any]] = {}
+        old_records: Optional[Path] = None
+        if idx is not None:
+            old_entries = idx["entries"]
+            old_records = d / str(idx["records"])
+            if idx.get("compare_keys") == ck:
+                old_fps = {k: e[0] for k, e in old_entries.items()}
+            else:
+                old_fps = _rehash(old_records, old_entries, ck)
+        elif previous is not None:
+            old_fps, old_loaded = _bootstrap(previous() or [], ck)
+
+        # una serializzazione per fixture: riga del nuovo records file (scritta in
+        # streaming, niente copia in memoria) e, senza compare keys, fingerprint
+        seq = int(idx.get("seq", 0)) + 1 if idx else 1
+        name = f"records-{seq:08d}.jsonl"
+        tmp = d / (name + ".tmp")
+        sink = None
+        if commit:
+            d.mkdir(parents=True, exist_ok=True)
+            sink = tmp.open("wb")
+        new_entries: Dict[str, List[Any]] = {}
+        by_key: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        try:
+            for item in new:
+                if not isinstance(item, dict):
+                    continue
+                f = cast(Dict[str, Any], item)
+                k = fixture_key_str(f)
+                if k is None:
+                    continue
+                line = jsoncodec.dumps(f, sort_keys=True, default=str)
+                fp = _hash(line) if ck is None else fingerprint(f, ck)
+                # chiave duplicata nel payload: vince l'ultima (come core.diff._index)
+                by_key[k] = f
+                new_entries[k] = [fp, offset, len(line)]
+                if sink is not None:
+                    sink.write(line)
+                    sink.write(b"\n")
+                offset += len(line) + 1
+        except BaseException:
+            if sink is not None:
+                sink.close()
+                tmp.unlink(missing_ok=True)
+            raise
+        added_keys = [k for k in new_entries if k not in old_fps]
+        changed_keys = [k for k, e in new_entries.items() if k in old_fps and old_fps[k] != e[0]]
+        removed_keys = [k for k in old_fps if k not in new_entries]
+
+        # solo i record con fingerprint diverso o rimossi vengono riletti
+        wanted = changed_keys + removed_keys
+        if old_records is not None:
+            old_loaded = _read_records(old_records, ((k, old_entries[k][1], old_entries[k][2]) for k in wanted if k in old_entries))
+
+        modified: List[Dict[str, Any]] = []
+        breakdown = {"score_change": 0, "status_change": 0, "both": 0, "other": 0}
+        for k in changed_keys:
+            o = old_loaded.get(k)
+            n = by_key[k]
+            if o is None:
+                continue
+            ctype = _classify_change(o, n) if classify else "other"
+            if classify:
+                breakdown[ctype] += 1
+            modified.append({"old": o, "new": n, "change_type": ctype})
+        delta = {
+            "added": [by_key[k] for k in added_keys],
+            "removed": [old_loaded[k] for k in removed_keys if k in old_loaded],
+            "modified": modified,
+            "change_breakdown": breakdown,
+        }
+
+        if sink is not None:
+            _save_state(d, seq, name, sink, new_entries, ck)
+    logger.info(
+        "fingerprint_diff",
+        extra={"total_new": len(new_entries), "added": len(added_keys), "modified": len(modified),
+               "removed": len(removed_keys), "reread": len(wanted)},
+    )
+    return delta
+
+
+def discard_state(base: Optional[Path] = None) -> None:
+    """Rimuove lo stato a fingerprint (indice prima: senza indice i records sono ignorati)."""
+    d = state_dir(base)
+    if not d.exists():
+        return
+    with _LOCK:
+        (d / INDEX_FILE).unlink(missing_ok=True)
+        for p in d.glob("records-*.jsonl*"):
+            p.unlink(missing_ok=True)
+
+
+def _save_state(d: Path, seq: int, name: str, sink: BinaryIO,
+                entries: Dict[str, List[Any]], compare_keys: Optional[List[str]]) -> None:
+    with sink:
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(d / (name + ".tmp"), d / name)
+    jsoncodec.write_json_atomic(
+        d / INDEX_FILE,
+        {"version": INDEX_VERSION, "seq": seq, "compare_keys": compare_keys, "records": name, "entries": entries},
+        machine=True,
+        fsync=True,
+    )
+    for p in d.glob("records-*.jsonl"):
+        if p.name != name:
+            try:
+                p.unlink()
+            except OSError:
+                logger.warning("Impossibile rimuovere records diff: %s", p)
+
+
+__all__ = [
+    "diff_with_fingerprints",
+    "discard_state",
+    "fingerprint",
+    "state_dir",
+]
@@ -3,6 +3,12 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
+# Spazio id dei fixture_id per provider (campo "provider" delle fixture
+# normalizzate e delle pick ROI): lo stesso id numerico in due provider
+# indica partite diverse.
+API_FOOTBALL_PROVIDER = "api_football"
+FOOTBALL_DATA_PROVIDER = "football-data"
+
 
 @dataclass
 class FixtureRecord:
@@ -15,7 +21,7 @@ class FixtureRecord:
     status: Optional[str]
     home_score: Optional[int]
     away_score: Optional[int]
-    provider: str = "api_football"
+    provider: str = API_FOOTBALL_PROVIDER
 
     @classmethod
     def from_api(cls, raw: Dict[str, Any]) -> "FixtureRecord":
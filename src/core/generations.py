@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+try:  # POSIX: lock tra processi sulla costruzione delle generazioni
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+from core import jsoncodec
+from core.config import _parse_bool
+from core.logging import get_logger
+
+logger = get_logger("core.generations")
+
+# ============================================================
+# Generazioni degli artefatti (ENABLE_GENERATIONS)
+#
+# Un ciclo (fetch_fixtures, run_cycle) scrive i suoi artefatti pubblicati
+# (fixtures_latest, last_delta, last_run, scoreboard, predictions, consensus,
+# odds, value alerts, roi_metrics...) in una directory di generazione:
+#   <BET_DATA_DIR>/generations/gen-00000042/<stesso path relativo>
+#   <BET_DATA_DIR>/generations/gen-00000042/manifest.json
+#   <BET_DATA_DIR>/generations/CURRENT          id della generazione corrente
+# Gli artefatti non riscritti nel ciclo sono ripresi dalla generazione
+# precedente con hard link (nessuna copia). Commit: manifest, fsync dei soli
+# file scritti nel ciclo (nessun fsync per write) e delle directory toccate,
+# swap atomico di CURRENT e un fsync della directory. Un lettore risolve
+# CURRENT una volta per richiesta (current_snapshot) e legge tutti i file della
+# stessa generazione: mai un mix di vecchi e nuovi. L'id di generazione è una
+# chiave di cache economica.
+# Artefatti mai scritti in una generazione (o con il flag spento) restano ai
+# path legacy. Un solo writer alla volta: generations/.lock (fcntl.flock
+# esclusivo) è tenuto da begin_generation fino allo swap di CURRENT, così due
+# cron sovrapposti non costruiscono la stessa generazione.
+# ============================================================
+
+GENERATIONS_DIR = "generations"
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+_PREFIX = "gen-"
+
+_ACTIVE: contextvars.ContextVar[Optional["Generation"]] = contextvars.ContextVar("active_generation", default=None)
+
+
+def enabled() -> bool:
+    return _parse_bool(os.getenv("ENABLE_GENERATIONS"), False)
+
+
+def _keep() -> int:
+    try:
+        return max(2, int(os.getenv("GENERATIONS_KEEP") or 3))
+    except ValueError:
+        return 3
+
+
+def _data_dir() -> Path:
+    return Path(os.getenv("BET_DATA_DIR") or "data")
+
+
+def _root(base: Optional[Path] = None) -> Path:
+    return (base or _data_dir()) / GENERATIONS_DIR
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:  # pragma: no cover - piattaforme senza fsync su directory
+        return
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_file(path: Path) -> None:
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _build_lock(root: Path) -> Iterator[None]:
+    """Lock esclusivo tra processi sulla costruzione di una generazione."""
+    root.mkdir(parents=True, exist_ok=True)
+    with (root / LOCK_FILE).open("a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _rel(path: Path, base: Path) -> Optional[str]:
+    """Path relativo (posix) di `path` sotto `base`, None se esterno."""
+    try:
+        return Path(os.path.abspath(path)).relative_to(os.path.abspath(base)).as_posix()
+    except ValueError:
+        return None
+
+
+# ------------------------------------------------------------
+# Lettura
+# ------------------------------------------------------------
+
+class Snapshot:
+    """Vista coerente degli artefatti: generazione corrente (o path legacy)."""
+
+    __slots__ = ("base", "generation", "dir", "artifacts")
+
+    def __init__(self, base: Path, generation: Optional[str] = None,
+                 artifacts: Optional[Dict[str, Any]] = None) -> None:
+        self.base = base
+        self.generation = generation
+        self.dir = _root(base) / generation if generation else None
+        self.artifacts: Dict[str, Any] = artifacts or {}
+
+    def path(self, rel: str) -> Path:
+        if self.dir is not None and rel in self.artifacts:
+            return self.dir / rel
+        return self.base / rel
+
+    def resolve(self, path: Path) -> Path:
+        """Path legacy → file della generazione (se l'artefatto vi è pubblicato)."""
+        rel = _rel(path, self.base)
+        return self.path(rel) if rel is not None else path
+
+
+_CACHE: Dict[str, Tuple[Any, Snapshot]] = {}
+_LOCK = threading.Lock()
+
+
+def _read_pointer(root: Path) -> Tuple[Any, Optional[str]]:
+    ptr = root / POINTER_FILE
+    try:
+        st = ptr.stat()
+        sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+        return sig, ptr.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None, None
+
+
+def current_snapshot(base: Optional[Path] = None) -> Snapshot:
+    """Snapshot della generazione corrente (cache sullo stat di CURRENT)."""
+    base = base or _data_dir()
+    if not enabled():
+        return Snapshot(base)
+    root = _root(base)
+    key = str(root)
+    with _LOCK:
+        sig, gen = _read_pointer(root)
+        cached = _CACHE.get(key)
+        if cached is not None and sig is not None and cached[0] == sig:
+            return cached[1]
+        snap = Snapshot(base)
+        if gen:
+            manifest = _load_manifest(root / gen)
+            if manifest is not None:
+                snap = Snapshot(base, gen, manifest.get("artifacts"))
+            else:
+                logger.warning("generation_manifest_missing", extra={"generation": gen})
+        _CACHE[key] = (sig, snap)
+        return snap
+
+
+def generation_id(base: Optional[Path] = None) -> Optional[str]:
+    return current_snapshot(base).generation
+
+
+def artifact_path(path: Path) -> Path:
+    """
+    Path effettivo di un artefatto indicato col path legacy: prima la
+    generazione in scrittura (read-your-writes nel ciclo), poi quella corrente.
+    """
+    active = _ACTIVE.get()
+    if active is not None:
+        rel = _rel(path, active.base)
+        if rel is not None and (rel in active.written or rel in active.removed):
+            return active.dir / rel
+    if not enabled():
+        return path
+    return current_snapshot().resolve(path)
+
+
+def _load_manifest(gen_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        raw = jsoncodec.read_json(gen_dir / MANIFEST_FILE)
+    except (OSError, ValueError):
+        return None
+    return raw if isinstance(raw, dict) and isinstance(raw.get("artifacts"), dict) else None
+
+
+# ------------------------------------------------------------
+# Scrittura
+# ------------------------------------------------------------
+
+class Generation:
+    """Generazione in costruzione: i file diventano visibili solo al commit."""
+
+    def __init__(self, base: Path) -> None:
+        self.base = base
+        self.root = _root(base)
+        self.root.mkdir(parents=True, exist_ok=True)
+        _, self.parent = _read_pointer(self.root)
+        parent_manifest = _load_manifest(self.root / self.parent) if self.parent else None
+        self.parent_artifacts: Dict[str, Any] = (parent_manifest or {}).get("artifacts", {})
+        self.seq = int((parent_manifest or {}).get("seq", 0)) + 1
+        self.id = f"{_PREFIX}{self.seq:08d}"
+        self.dir = self.root / self.id
+        if self.dir.exists():
+            # residuo di un ciclo interrotto prima del commit
+            shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir.mkdir(parents=True)
+        self.written: Dict[str, Dict[str, Any]] = {}
+        self.removed: set = set()
+        self.created_at = datetime.now(timezone.utc).isoformat()
+
+    def write_json(self, rel: str, obj: Any, machine: bool = False) -> Path:
+        target = self.dir / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        data = jsoncodec.dumps(obj, pretty=not (machine and jsoncodec.compact_artifacts()))
+        # nessun fsync: i dati sono resi durevoli una sola volta al commit
+        target.write_bytes(data)
+        self.written[rel] = {"bytes": len(data)}
+        self.removed.discard(rel)
+        return target
+
+    def remove(self, rel: str) -> None:
+        """L'artefatto non passa alla nuova generazione."""
+        if self.written.pop(rel, None) is not None:
+            (self.dir / rel).unlink(missing_ok=True)
+        self.removed.add(rel)
+
+    def _carry_forward(self) -> Dict[str, Dict[str, Any]]:
+        artifacts: Dict[str, Dict[str, Any]] = {}
+        parent_dir = self.root / self.parent if self.parent else None
+        for rel, meta in self.parent_artifacts.items():
+            if rel in self.written or rel in self.removed or parent_dir is None:
+                continue
+            src = parent_dir / rel
+            dst = self.dir / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(src, dst)
+            except OSError:
+                try:
+                    shutil.copy2(src, dst)
+                except OSError:
+                    continue
+            artifacts[rel] = {**meta, "carried": True}
+        return artifacts
+
+    def commit(self) -> str:
+        artifacts = self._carry_forward()
+        artifacts.update(self.written)
+        manifest = {
+            "generation": self.id,
+            "seq": self.seq,
+            "parent": self.parent,
+            "created_at": self.created_at,
+            "committed_at": datetime.now(timezone.utc).isoformat(),
+            "artifacts": dict(sorted(artifacts.items())),
+        }
+        (self.dir / MANIFEST_FILE).write_bytes(jsoncodec.dumps(manifest, pretty=True))
+        self._flush(artifacts)
+        tmp = self.root / (POINTER_FILE + ".tmp")
+        tmp.write_text(self.id + "\n", encoding="utf-8")
+        os.replace(tmp, self.root / POINTER_FILE)
+        _fsync_dir(self.root)
+        logger.info(
+            "generation_committed",
+            extra={"generation": self.id, "written": len(self.written), "artifacts": len(artifacts)},
+        )
+        prune_generations(self.base, keep=_keep())
+        return self.id
+
+    def _flush(self, artifacts: Iterable[str]) -> None:
+        """
+        fsync dei file scritti nel ciclo e del manifest, poi delle directory
+        della generazione (voci dei file e dei link ripresi), dalle più profonde.
+        """
+        for rel in [*self.written, MANIFEST_FILE]:
+            _fsync_file(self.dir / rel)
+        dirs = {self.dir}
+        for rel in artifacts:
+            parent = (self.dir / rel).parent
+            while parent != self.dir and parent not in dirs:
+                dirs.add(parent)
+                parent = parent.parent
+        for d in sorted(dirs, key=lambda p: len(p.parts), reverse=True):
+            _fsync_dir(d)
+
+    def abort(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+@contextmanager
+def begin_generation(base: Optional[Path] = None) -> Iterator[Optional[Generation]]:
+    """
+    Generazione del ciclo: le write_artifact nel blocco finiscono nella nuova
+    generazione, pubblicata all'uscita. Flag spento: None (scritture legacy).
+    Eccezione: generazione scartata, la corrente resta invariata.
+    Un altro processo che apre una generazione attende il commit (generations/.lock).
+    """
+    if not enabled() or _ACTIVE.get() is not None:
+        yield _ACTIVE.get()
+        return
+    base = base or _data_dir()
+    # lock da prima di leggere CURRENT (parent / seq) fino allo swap del commit
+    with _build_lock(_root(base)):
+        gen = Generation(base)
+        token = _ACTIVE.set(gen)
+        try:
+            yield gen
+        except BaseException:
+            _ACTIVE.reset(token)
+            gen.abort()
+            raise
+        _ACTIVE.reset(token)
+        gen.commit()
+
+
+def write_artifact(path: Path, obj: Any, machine: bool = False, fsync: bool = False) -> Path:
+    """
+    Scrive un artefatto pubblicato nella generazione attiva. Flag attivo ma
+    nessun ciclo aperto (script singoli): generazione con il solo artefatto,
+    altrimenti i lettori continuerebbero a vedere la generazione precedente.
+    Flag spento: scrittura atomica al path legacy.
+    """
+    active = _ACTIVE.get()
+    if active is None and enabled() and _rel(path, _data_dir()) is not None:
+        with begin_generation() as gen:
+            return gen.write_json(_rel(path, gen.base), obj, machine=machine)
+    if active is not None:
+        rel = _rel(path, active.base)
+        if rel is not None:
+            return active.write_json(rel, obj, machine=machine)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    jsoncodec.write_json_atomic(path, obj, machine=machine, fsync=fsync)
+    return path
+
+
+def remove_artifact(path: Path) -> None:
+    """
+    Rimuove un artefatto dalla prossima generazione e dal path legacy (che
+    altrimenti tornerebbe visibile come fallback).
+    """
+    active = _ACTIVE.get()
+    if active is None and enabled() and _rel(path, _data_dir()) is not None:
+        with begin_generation() as gen:
+            gen.remove(_rel(path, gen.base))
+    elif active is not None and _rel(path, active.base) is not None:
+        active.remove(_rel(path, active.base))
+    path.unlink(missing_ok=True)
+
+
+def prune_generations(base: Optional[Path] = None, keep: int = 3) -> int:
+    """Rimuove le generazioni più vecchie oltre `keep` (mai la corrente)."""
+    root = _root(base)
+    if not root.exists():
+        return 0
+    _, current = _read_pointer(root)
+    gens = sorted(p.name for p in root.iterdir() if p.is_dir() and p.name.startswith(_PREFIX))
+    removed = 0
+    for name in gens[:-keep] if keep > 0 else gens:
+        if name == current:
+            continue
+        shutil.rmtree(root / name, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+__all__ = [
+    "Generation",
+    "Snapshot",
+    "artifact_path",
+    "begin_generation",
+    "current_snapshot",
+    "enabled",
+    "generation_id",
+    "prune_generations",
+    "remove_artifact",
+    "write_artifact",
+]
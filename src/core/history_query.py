@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import history_store, jsoncodec
+from core.logging import get_logger
+
+logger = get_logger("core.history_query")
+
+# ============================================================
+# Query point-in-time sulla history fixtures
+#
+# "Stato della fixture X all'istante T" / "fixture della lega L al tempo T"
+# senza aprire a mano gli snapshot:
+#   - HISTORY_MODE=full: indice (ts, file) degli snapshot history/fixtures_<ts>.json
+#     costruito dai nomi file (il timestamp è nel nome) e tenuto in memoria
+#     finché la directory non cambia (mtime); bisect → un solo file da leggere,
+#     decodificato una volta e indicizzato per chiave (cache LRU).
+#   - HISTORY_MODE=delta: core.history_store (keyframe + replay dei delta).
+# Si interroga prima la sorgente del modo configurato, poi l'altra (history
+# migrata da un modo all'altro resta interrogabile).
+# ============================================================
+
+_SNAPSHOT_RE = re.compile(r"^fixtures_(\d{8})_(\d{6})_(\d{6})(?:_(\d+))?\.json$")
+_SNAPSHOT_CACHE_SIZE = 8
+_MTIME_SETTLE_NS = 2_000_000_000
+
+_INDEX_LOCK = threading.Lock()
+_INDEX_CACHE: Dict[Path, Tuple[int, List[str], List[str]]] = {}
+
+
+def _data_dir(base: Optional[Path]) -> Path:
+    return base or Path(os.getenv("BET_DATA_DIR") or "data")
+
+
+def _snapshot_ts(name: str) -> Optional[str]:
+    m = _SNAPSHOT_RE.match(name)
+    if not m:
+        return None
+    # stesso formato di history_store.normalize_ts, senza strptime (decine di migliaia di nomi)
+    d, t, us = m.group(1), m.group(2), m.group(3)
+    return f"{d[:4]}-{d[4:6]}-{d[6:]}T{t[:2]}:{t[2:4]}:{t[4:]}.{us}+00:00"
+
+
+def snapshot_index(base: Optional[Path] = None) -> Tuple[List[str], List[str]]:
+    """
+    (timestamp ordinati, nomi file) degli snapshot full. Ricostruito solo se
+    l'mtime della directory history è cambiato (nuovo snapshot o rotazione).
+    """
+    hdir = _data_dir(base) / "history"
+    try:
+        mtime = hdir.stat().st_mtime_ns
+    except OSError:
+        return [], []
+    cached = _INDEX_CACHE.get(hdir)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], cached[2]
+    with _INDEX_LOCK:
+        entries = []
+        with os.scandir(hdir) as it:
+            for e in it:
+                ts = _snapshot_ts(e.name)
+                if ts is not None:
+                    entries.append((ts, e.name))
+        # a parità di timestamp il suffisso _<n> ordina come il nome
+        entries.sort()
+        stamps = [ts for ts, _ in entries]
+        names = [name for _, name in entries]
+        # mtime a granularità grossa: directory appena modificata non messa in cache
+        if time.time_ns() - mtime > _MTIME_SETTLE_NS:
+            _INDEX_CACHE[hdir] = (mtime, stamps, names)
+    return stamps, names
+
+
+@lru_cache(maxsize=_SNAPSHOT_CACHE_SIZE)
+def _load_snapshot(path: str, mtime_ns: int) -> Dict[str, Dict[str, Any]]:
+    """Snapshot full decodificato e indicizzato per chiave (cache per path+mtime)."""
+    data = jsoncodec.read_json(Path(path))
+    out: Dict[str, Dict[str, Any]] = {}
+    if isinstance(data, list):
+        for f in data:
+            if isinstance(f, dict):
+                k = history_store.fixture_key(f)
+                if k is not None:
+                    out[k] = f
+    return out
+
+
+def _full_state_at(t: str, base: Optional[Path]) -> Optional[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    stamps, names = snapshot_index(base)
+    i = bisect_right(stamps, t)
+    if i == 0:
+        return None
+    path = _data_dir(base) / "history" / names[i - 1]
+    try:
+        by_key = _load_snapshot(str(path), path.stat().st_mtime_ns)
+    except (OSError, ValueError) as exc:
+        # ruotato tra listing e lettura / file corrotto
+        logger.warning("Snapshot history non leggibile %s: %s", path.name, exc)
+        return None
+    return stamps[i - 1], by_key
+
+
+def _delta_state_at(t: str, keys: Optional[List[str]], base: Optional[Path]) -> Optional[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    found = history_store.snapshot_at(t, keys, base)
+    if found is None:
+        return None
+    as_of, fixtures = found
+    return as_of, {history_store.fixture_key(f): f for f in fixtures}
+
+
+def _sources() -> List[str]:
+    mode = (os.getenv("HISTORY_MODE") or "full").strip().lower()
+    return ["delta", "full"] if mode == "delta" else ["full", "delta"]
+
+
+def _state_at(t: str, keys: Optional[List[str]], base: Optional[Path]) -> Optional[Dict[str, Any]]:
+    for source in _sources():
+        if source == "full":
+            found = _full_state_at(t, base)
+        else:
+            found = _delta_state_at(t, keys, base)
+        if found is not None:
+            return {"source": source, "as_of": found[0], "by_key": found[1]}
+    return None
+
+
+def fixture_at(fixture_id: Any, ts: Any, base: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Stato della fixture all'istante `ts` (ultimo snapshot <= ts).
+    Ritorna {"source","as_of","fixture"}; fixture None se assente da quello snapshot,
+    None se `ts` precede tutta la history. ValueError se `ts` non è un timestamp.
+    """
+    t = history_store.normalize_ts(ts)
+    key = str(fixture_id)
+    state = _state_at(t, [key], base)
+    if state is None:
+        return None
+    return {"source": state["source"], "as_of": state["as_of"], "fixture": state["by_key"].get(key)}
+
+
+def fixtures_at(ts: Any, league_id: Optional[int] = None, base: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fixture all'istante `ts`, opzionalmente solo della lega `league_id`.
+    Ritorna {"source","as_of","fixtures"}, None se `ts` precede tutta la history.
+    """
+    t = history_store.normalize_ts(ts)
+    state = _state_at(t, None, base)
+    if state is None:
+        return None
+    fixtures = list(state["by_key"].values())
+    if league_id is not None:
+        fixtures = [f for f in fixtures if f.get("league_id") == league_id]
+    return {"source": state["source"], "as_of": state["as_of"], "fixtures": fixtures}
+
+
+def history_bounds(base: Optional[Path] = None) -> Dict[str, Any]:
+    """Copertura temporale di entrambe le sorgenti."""
+    stamps, _ = snapshot_index(base)
+    return {
+        "full": {
+            "snapshots": len(stamps),
+            "first_ts": stamps[0] if stamps else None,
+            "last_ts": stamps[-1] if stamps else None,
+        },
+        "delta": history_store.history_bounds(base),
+    }
+
+
+__all__ = [
+    "fixture_at",
+    "fixtures_at",
+    "history_bounds",
+    "snapshot_index",
+]
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, cast
+
+from core import jsoncodec
+from core.diff import diff_fixtures_detailed, fixture_key_str
+from core.logging import get_logger
+from core.models import FixtureDataset
+
+logger = get_logger("core.history_store")
+
+# ============================================================
+# History a delta con oggetti content-addressed (HISTORY_MODE=delta)
+#
+# Alternativa a history/fixtures_<ts>.json (lista completa ad ogni fetch):
+#   history/store/objects.jsonl     {"h": hash, "f": fixture} – ogni stato
+#                                   distinto di una fixture scritto una volta
+#   history/store/objects.idx.json  hash → byte offset (esteso dalla coda)
+#   history/store/log.jsonl         un record per snapshot:
+#       key    {"seq","ts","kind":"key","keys":{chiave: hash}}   stato completo
+#       delta  {"seq","ts","kind":"delta","set":{chiave: hash},"del":[chiave],
+#               "change_breakdown":{...}}                       solo i cambi
+#   history/store/log.idx.json      keyframe: [ts, byte offset, seq]
+#   history/store/head.json         chiave → hash dell'ultimo snapshot
+# Hash = blake2b (64 bit) del JSON canonico della fixture: le fixture invariate
+# non vengono riscritte né in objects né nel log. I cambi sono quelli di
+# diff_fixtures_detailed, calcolato solo sulle fixture con hash diverso.
+# Un keyframe ogni HISTORY_KEYFRAME_EVERY record limita il replay: lo stato a
+# un istante T = keyframe precedente + delta fino a T (bisect sull'indice).
+# Snapshot senza cambi non producono record (lo stato resta quello precedente).
+# ============================================================
+
+STORE_DIR = "store"
+OBJECTS_FILE = "objects.jsonl"
+LOG_FILE = "log.jsonl"
+HEAD_FILE = "head.json"
+INDEX_VERSION = 1
+
+_LOCK = threading.Lock()
+# indici già letti per processo (path jsonl → indice): le query point-in-time
+# non rileggono ogni volta objects.idx.json, che cresce con gli stati distinti
+_IDX_CACHE: Dict[Path, Dict[str, Any]] = {}
+
+
+def _keyframe_every() -> int:
+    try:
+        return max(1, int(os.getenv("HISTORY_KEYFRAME_EVERY") or 240))
+    except ValueError:
+        return 240
+
+
+def store_dir(base: Optional[Path] = None) -> Path:
+    base = base or Path(os.getenv("BET_DATA_DIR") or "data")
+    return base / "history" / STORE_DIR
+
+
+def fixture_key(f: Dict[str, Any]) -> Optional[str]:
+    """Chiave stringa (chiave JSON) da core.diff._default_key."""
+    return fixture_key_str(f)
+
+
+def content_hash(f: Dict[str, Any]) -> str:
+    return hashlib.blake2b(jsoncodec.dumps(f, sort_keys=True, default=str), digest_size=8).hexdigest()
+
+
+def normalize_ts(ts: Any) -> str:
+    """ISO UTC con microsecondi (ordinabile come stringa)."""
+    if isinstance(ts, datetime):
+        dt = ts
+    else:
+        dt = datetime.fromisoformat(str(ts).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+# ------------------------------------------------------------
+# Indici jsonl (estesi scansionando solo la coda)
+# ------------------------------------------------------------
+
+def _idx_path(path: Path) -> Path:
+    return path.with_suffix(".idx.json")
+
+
+def _load_idx(path: Path, empty: Dict[str, Any]) -> Dict[str, Any]:
+    size = path.stat().st_size if path.exists() else 0
+    idx = _IDX_CACHE.get(path)
+    if idx is None or size < idx["size"]:
+        try:
+            idx = jsoncodec.read_json(_idx_path(path))
+        except (OSError, ValueError):
+            idx = None
+    if not isinstance(idx, dict) or idx.get("version") != INDEX_VERSION:
+        idx = dict(empty)
+    if size < idx["size"]:
+        idx = dict(empty)
+    _IDX_CACHE[path] = idx
+    return idx
+
+
+def _iter_lines(path: Path, start: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, riga) delle righe complete da `start` (una riga troncata in coda resta fuori)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            yield offset, line
+            offset += len(line)
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        rec = jsoncodec.loads(line)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+def _objects_index(d: Path) -> Dict[str, Any]:
+    path = d / OBJECTS_FILE
+    idx = _load_idx(path, {"version": INDEX_VERSION, "size": 0, "offsets": {}})
+    if path.exists() and path.stat().st_size > idx["size"]:
+        offsets = idx["offsets"] = dict(idx["offsets"])
+        end = idx["size"]
+        for offset, line in _iter_lines(path, idx["size"]):
+            rec = _parse(line)
+            if rec is not None and isinstance(rec.get("h"), str):
+                offsets.setdefault(rec["h"], offset)
+            end = offset + len(line)
+        idx["size"] = end
+    return idx
+
+
+def _log_index(d: Path) -> Dict[str, Any]:
+    path = d / LOG_FILE
+    idx = _load_idx(path, {"version": INDEX_VERSION, "size": 0, "count": 0, "last_ts": None, "keyframes": []})
+    if path.exists() and path.stat().st_size > idx["size"]:
+        idx["keyframes"] = list(idx["keyframes"])
+        end = idx["size"]
+        for offset, line in _iter_lines(path, idx["size"]):
+            rec = _parse(line)
+            end = offset + len(line)
+            if rec is None or not isinstance(rec.get("ts"), str):
+                continue
+            if rec.get("kind") == "key":
+                idx["keyframes"].append([rec["ts"], offset, rec.get("seq")])
+            idx["count"] = max(idx["count"], int(rec.get("seq") or 0))
+            idx["last_ts"] = rec["ts"]
+        idx["size"] = end
+    return idx
+
+
+def _append(path: Path, data: bytes) -> int:
+    """Appende `data` (righe complete); ritorna l'offset di inizio."""
+    with path.open("ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        if offset and not _ends_with_newline(path, offset):
+            # riga troncata da un crash: chiusa prima di appendere
+            f.write(b"\n")
+            offset += 1
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset
+
+
+def _ends_with_newline(path: Path, size: int) -> bool:
+    with path.open("rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def _save(path: Path, obj: Any) -> None:
+    jsoncodec.write_json_atomic(path, obj, machine=True)
+
+
+# ------------------------------------------------------------
+# Scrittura
+# ------------------------------------------------------------
+
+def _load_head(d: Path) -> Dict[str, Any]:
+    try:
+        head = jsoncodec.read_json(d / HEAD_FILE)
+    except (OSError, ValueError):
+        head = None
+    if not isinstance(head, dict) or not isinstance(head.get("keys"), dict):
+        return {"seq": 0, "ts": None, "keys": {}, "since_key": 0}
+    return head
+
+
+def _read_objects(d: Path, hashes: List[str], offsets: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    path = d / OBJECTS_FILE
+    wanted = sorted({h for h in hashes if h in offsets}, key=offsets.__getitem__)
+    if not wanted:
+        return out
+    with path.open("rb") as f:
+        for h in wanted:
+            f.seek(offsets[h])
+            rec = _parse(f.readline())
+            if rec is not None and isinstance(rec.get("f"), dict):
+                out[h] = rec["f"]
+    return out
+
+
+def record_snapshot(fixtures: FixtureDataset, ts: Any = None, base: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Registra uno snapshot: nuovi stati in objects.jsonl, cambi (o keyframe) nel
+    log. Ritorna il record scritto, None se nulla è cambiato.
+    """
+    d = store_dir(base)
+    d.mkdir(parents=True, exist_ok=True)
+    ts = normalize_ts(ts or datetime.now(timezone.utc))
+    with _LOCK:
+        head = _load_head(d)
+        prev: Dict[str, str] = head["keys"]
+        new: Dict[str, str] = {}
+        by_key: Dict[str, Dict[str, Any]] = {}
+        for item in fixtures:
+            if not isinstance(item, dict):
+                continue
+            # FixtureRecord (TypedDict) → dict JSON generico
+            f = cast(Dict[str, Any], item)
+            k = fixture_key(f)
+            if k is None:
+                continue
+            new[k] = content_hash(f)
+            by_key[k] = f
+
+        changed = [k for k, h in new.items() if prev.get(k) != h]
+        removed = [k for k in prev if k not in new]
+        keyframe = not prev or head.get("since_key", 0) + 1 >= _keyframe_every()
+        if not changed and not removed and not keyframe:
+            return None
+
+        oidx = _objects_index(d)
+        offsets = oidx["offsets"]
+        # diff_fixtures_detailed solo sulle fixture con hash diverso
+        old_hashes = [prev[k] for k in changed + removed if k in prev]
+        old_objs = _read_objects(d, old_hashes, offsets)
+        old_subset = [old_objs[h] for h in old_hashes if h in old_objs]
+        delta = diff_fixtures_detailed(old_subset, [by_key[k] for k in changed])
+
+        # solo stati mai visti (una fixture tornata a uno stato precedente non si riscrive)
+        objects: Dict[str, bytes] = {}
+        for k in changed:
+            h = new[k]
+            if h not in offsets and h not in objects:
+                objects[h] = jsoncodec.dumps({"h": h, "f": by_key[k]}) + b"\n"
+        if objects:
+            obj_path = d / OBJECTS_FILE
+            pos = _append(obj_path, b"".join(objects.values()))
+            for h, line in objects.items():
+                offsets[h] = pos
+                pos += len(line)
+            oidx["size"] = obj_path.stat().st_size
+            _save(_idx_path(obj_path), oidx)
+
+        seq = int(head.get("seq", 0)) + 1
+        if keyframe:
+            rec: Dict[str, Any] = {"seq": seq, "ts": ts, "kind": "key", "keys": new}
+        else:
+            rec = {
+                "seq": seq,
+                "ts": ts,
+                "kind": "delta",
+                "set": {k: new[k] for k in changed},
+                "del": removed,
+            }
+        rec["change_breakdown"] = delta["change_breakdown"]
+        rec["counts"] = {"added": len(delta["added"]), "modified": len(delta["modified"]), "removed": len(removed)}
+
+        log_path = d / LOG_FILE
+        lidx = _log_index(d)
+        offset = _append(log_path, jsoncodec.dumps(rec) + b"\n")
+        if keyframe:
+            lidx["keyframes"].append([ts, offset, seq])
+        lidx["count"] = seq
+        lidx["last_ts"] = ts
+        lidx["size"] = log_path.stat().st_size
+        _save(_idx_path(log_path), lidx)
+        _save(d / HEAD_FILE, {
+            "seq": seq,
+            "ts": ts,
+            "keys": new,
+            "since_key": 0 if keyframe else int(head.get("since_key", 0)) + 1,
+        })
+    logger.info(
+        "history_snapshot_recorded",
+        extra={"kind": rec["kind"], "seq": seq, "changed": len(changed), "removed": len(removed),
+               "objects": len(objects)},
+    )
+    return rec
+
+
+# ------------------------------------------------------------
+# Lettura (stato a un istante)
+# ------------------------------------------------------------
+
+def state_at(ts: Any, base: Optional[Path] = None) -> Optional[Tuple[str, Dict[str, str]]]:
+    """(ts dell'ultimo record <= ts, chiave → hash), None se ts precede la history."""
+    d = store_dir(base)
+    log_path = d / LOG_FILE
+    if not log_path.exists():
+        return None
+    t = normalize_ts(ts)
+    lidx = _log_index(d)
+    kf = lidx["keyframes"]
+    i = bisect_right([e[0] for e in kf], t)
+    if i == 0:
+        return None
+    keys: Dict[str, str] = {}
+    at: Optional[str] = None
+    for _, line in _iter_lines(log_path, kf[i - 1][1]):
+        rec = _parse(line)
+        if rec is None:
+            continue
+        if rec.get("ts", "") > t:
+            break
+        if rec.get("kind") == "key":
+            keys = dict(rec.get("keys") or {})
+        else:
+            keys.update(rec.get("set") or {})
+            for k in rec.get("del") or []:
+                keys.pop(k, None)
+        at = rec["ts"]
+    return (at, keys) if at is not None else None
+
+
+def snapshot_at(ts: Any, keys: Optional[List[str]] = None, base: Optional[Path] = None) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """(ts dell'ultimo record <= ts, fixture a quell'istante; solo `keys` se indicato)."""
+    found = state_at(ts, base)
+    if found is None:
+        return None
+    at, state = found
+    if keys is not None:
+        state = {k: state[k] for k in keys if k in state}
+    d = store_dir(base)
+    objs = _read_objects(d, list(state.values()), _objects_index(d)["offsets"])
+    return at, [objs[h] for h in state.values() if h in objs]
+
+
+def fixtures_at(ts: Any, keys: Optional[List[str]] = None, base: Optional[Path] = None) -> Optional[List[Dict[str, Any]]]:
+    """Fixture com'erano all'istante `ts` (solo `keys` se indicato); None se prima della history."""
+    found = snapshot_at(ts, keys, base)
+    return found[1] if found is not None else None
+
+
+def history_bounds(base: Optional[Path] = None) -> Dict[str, Any]:
+    d = store_dir(base)
+    lidx = _log_index(d)
+    kf = lidx["keyframes"]
+    return {
+        "records": lidx["count"],
+        "first_ts": kf[0][0] if kf else None,
+        "last_ts": lidx["last_ts"],
+        "keyframes": len(kf),
+    }
+
+
+__all__ = [
+    "content_hash",
+    "fixture_key",
+    "fixtures_at",
+    "history_bounds",
+    "normalize_ts",
+    "record_snapshot",
+    "snapshot_at",
+    "state_at",
+    "store_dir",
+]
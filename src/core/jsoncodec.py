@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import os
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+try:  # opzionale: backend JSON veloce (preferito)
+    import orjson
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    orjson = None
+
+try:  # opzionale: backend alternativo
+    import msgspec
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    msgspec = None
+
+# ============================================================
+# Codec JSON degli artefatti
+#
+# Unico punto di (de)serializzazione per i file della pipeline (fixtures,
+# predizioni, consensus, ROI, metriche...). Backend scelto all'import:
+#   JSON_BACKEND=auto (default)  orjson → msgspec → stdlib
+#   JSON_BACKEND=orjson|msgspec|stdlib  forzato (se non installato: stdlib)
+# Output equivalente alla stdlib (UTF-8, ensure_ascii=False, indent=2 per i
+# file leggibili). Differenze note dei backend veloci: NaN / ±inf scritti come
+# null (JSON standard). Oggetti non supportati dal backend veloce (es. interi
+# oltre 64 bit) ricadono sulla stdlib; in lettura un errore del backend veloce
+# viene ripetuto con la stdlib (accetta anche NaN / Infinity) così le eccezioni
+# restano json.JSONDecodeError.
+# La decodifica lavora direttamente sui byte (niente read_text + decode).
+#
+# Compatto vs leggibile: gli artefatti letti solo dal codice (ledger, stato
+# ROI, cache blocchi, manifest...) sono scritti con machine=True e diventano
+# compatti con JSON_COMPACT_ARTIFACTS=1; quelli pensati per le persone restano
+# sempre indentati.
+# ============================================================
+
+BACKENDS = ("orjson", "msgspec", "stdlib")
+
+_Bytes = Union[bytes, bytearray, memoryview, str]
+
+
+def _available(name: str) -> bool:
+    if name == "orjson":
+        return orjson is not None
+    if name == "msgspec":
+        return msgspec is not None
+    return name == "stdlib"
+
+
+def resolve_backend(requested: Optional[str] = None) -> str:
+    """Backend effettivo per `requested` (auto / nome), con fallback a stdlib."""
+    req = (requested if requested is not None else os.getenv("JSON_BACKEND", "auto")).strip().lower()
+    if req in ("", "auto"):
+        return next(b for b in BACKENDS if _available(b))
+    if req == "json":
+        req = "stdlib"
+    return req if req in BACKENDS and _available(req) else "stdlib"
+
+
+_BACKEND = resolve_backend()
+
+
+def backend() -> str:
+    return _BACKEND
+
+
+def set_backend(name: Optional[str]) -> str:
+    """Cambia backend a runtime (benchmark / test); None = rilegge JSON_BACKEND."""
+    global _BACKEND
+    _BACKEND = resolve_backend(name)
+    return _BACKEND
+
+
+def compact_artifacts() -> bool:
+    return os.getenv("JSON_COMPACT_ARTIFACTS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# ------------------------------------------------------------
+# Encode
+# ------------------------------------------------------------
+
+def _dumps_stdlib(obj: Any, pretty: bool, sort_keys: bool, default: Optional[Callable[[Any], Any]]) -> bytes:
+    if pretty:
+        text = json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=sort_keys, default=default)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+    return text.encode("utf-8")
+
+
+def _dumps_orjson(obj: Any, pretty: bool, sort_keys: bool, default: Optional[Callable[[Any], Any]]) -> bytes:
+    opts = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        opts |= orjson.OPT_INDENT_2
+    if sort_keys:
+        opts |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=opts)
+
+
+def _dumps_msgspec(obj: Any, pretty: bool, sort_keys: bool, default: Optional[Callable[[Any], Any]]) -> bytes:
+    enc = msgspec.json.Encoder(enc_hook=default, order="sorted" if sort_keys else None)
+    raw = enc.encode(obj)
+    return msgspec.json.format(raw, indent=2) if pretty else raw
+
+
+_ENCODERS = {"orjson": _dumps_orjson, "msgspec": _dumps_msgspec, "stdlib": _dumps_stdlib}
+
+
+def dumps(
+    obj: Any,
+    *,
+    pretty: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """Serializza in byte UTF-8 (compatto, o indent=2 con `pretty`)."""
+    name = _BACKEND
+    if name != "stdlib":
+        try:
+            return _ENCODERS[name](obj, pretty, sort_keys, default)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return _dumps_stdlib(obj, pretty, sort_keys, default)
+
+
+def dumps_str(obj: Any, **kwargs: Any) -> str:
+    """Come dumps ma ritorna str (righe JSONL, log)."""
+    return dumps(obj, **kwargs).decode("utf-8")
+
+
+# ------------------------------------------------------------
+# Decode
+# ------------------------------------------------------------
+
+def loads(data: _Bytes) -> Any:
+    """Decodifica da bytes / str; errori sempre come json.JSONDecodeError."""
+    name = _BACKEND
+    if name == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    elif name == "msgspec":
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError:
+            pass
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def read_json(path: Path) -> Any:
+    """Legge e decodifica `path` come byte. Propaga OSError / JSONDecodeError."""
+    return loads(Path(path).read_bytes())
+
+
+def write_json_atomic(path: Path, obj: Any, *, machine: bool = False, fsync: bool = False) -> None:
+    """
+    Scrittura atomica (file .tmp + os.replace). `machine`: artefatto letto solo
+    dal codice, compatto se JSON_COMPACT_ARTIFACTS=1; altrimenti indent=2.
+    """
+    path = Path(path)
+    data = dumps(obj, pretty=not (machine and compact_artifacts()))
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+__all__ = [
+    "BACKENDS",
+    "JSONDecodeError",
+    "backend",
+    "compact_artifacts",
+    "dumps",
+    "dumps_str",
+    "loads",
+    "read_json",
+    "resolve_backend",
+    "set_backend",
+    "write_json_atomic",
+]
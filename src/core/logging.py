@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
 import logging
 import sys
 from datetime import datetime
 from typing import Any, Dict
 
+from core import jsoncodec
+
 
 EXTRA_WHITELIST = {"delta_summary", "fetch_stats", "change_breakdown"}
 
@@ -26,7 +27,7 @@ class JsonFormatter(logging.Formatter):
                 payload[key] = getattr(record, key)
         if record.exc_info:
             payload["exc"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=False)
+        return jsoncodec.dumps_str(payload)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
 from typing import Any, Dict
 
+from core import generations
+from core.changefeed import append_changes
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -26,27 +27,23 @@ def write_metrics_snapshot(payload: Dict[str, Any]) -> Path:
     if not settings.enable_metrics_file:
         return target
     _ensure_dir(target_dir)
-    tmp = target.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
     return target
 
 
 def write_last_delta_event(delta_payload: Dict[str, Any]) -> Path:
     """
     Scrive un file JSON 'last_delta.json' nel EVENTS_DIR se abilitato.
+    Ogni cambio è anche appeso al change feed (events/changes.jsonl, ENABLE_CHANGE_FEED).
     """
     settings = get_settings()
     target_dir = Path(os.getenv("BET_DATA_DIR", "data")) / settings.events_dir
     target = target_dir / "last_delta.json"
+    append_changes(delta_payload)
     if not settings.enable_events_file:
         return target
     _ensure_dir(target_dir)
-    tmp = target.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(delta_payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, delta_payload)
     return target
 
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import re
 from typing import Any, Dict, Optional
+from core.fixture_record import API_FOOTBALL_PROVIDER
 from core.logging import get_logger
 
 logger = get_logger("core.normalization")
@@ -56,7 +57,7 @@ def normalize_api_football_fixture(item: Dict[str, Any]) -> Dict[str, Any]:
         "status": ((fixture.get("status") or {}) or {}).get("short"),
         "home_score": _as_int(goals.get("home")),
         "away_score": _as_int(goals.get("away")),
-        "provider": "api_football",
+        "provider": API_FOOTBALL_PROVIDER,
     }
 
 
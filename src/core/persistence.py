@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 from datetime import datetime
-from json import JSONDecodeError
 from pathlib import Path
 from typing import Any
 
+from . import generations, jsoncodec
+from .jsoncodec import JSONDecodeError
 from .models import FixtureDataset
 
 LOGGER = logging.getLogger(__name__)
@@ -41,6 +41,12 @@ def _history_dir() -> Path:
     return _data_dir() / HISTORY_DIR_NAME
 
 
+def _history_mode() -> str:
+    """HISTORY_MODE: full (un file per snapshot) / delta (core.history_store)."""
+    mode = (os.getenv("HISTORY_MODE") or "full").strip().lower()
+    return mode if mode in ("full", "delta") else "full"
+
+
 # ---------------------------------------------------------------------------
 # Low level
 # ---------------------------------------------------------------------------
@@ -50,22 +56,16 @@ def _ensure_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def _write_json_atomic(path: Path, data: Any, indent: int = 2) -> None:
-    _ensure_dir(path)
-    tmp_path = path.with_suffix(path.suffix + ".tmp")
-    with tmp_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=indent)
-        f.flush()
-        os.fsync(f.fileno())
-    os.replace(tmp_path, path)
+def _write_json_atomic(path: Path, data: Any, machine: bool = False) -> None:
+    # nella generazione del ciclo (se attiva) il flush avviene una volta al commit
+    generations.write_artifact(path, data, machine=machine, fsync=True)
 
 
 def _load_json_list(path: Path) -> FixtureDataset:
     if not path.exists():
         return []
     try:
-        with path.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
+        raw = jsoncodec.read_json(path)
     except JSONDecodeError:
         LOGGER.warning("Invalid / corrupt fixtures JSON at %s", path)
         return []
@@ -97,7 +97,7 @@ def load_latest_fixtures() -> FixtureDataset:
         - Se BET_DATA_DIR è impostata ad un path diverso, NON fare fallback e ritorna [].
       Questo evita leakage tra test che ridefiniscono BET_DATA_DIR.
     """
-    dyn = _latest_dynamic_path()
+    dyn = generations.artifact_path(_latest_dynamic_path())
     if dyn.exists():
         return _load_json_list(dyn)
 
@@ -117,14 +117,13 @@ def save_latest_fixtures(fixtures: FixtureDataset) -> None:
     """
     dyn = _latest_dynamic_path()
     if not fixtures:
-        if dyn.exists():
-            dyn.unlink()
+        generations.remove_artifact(dyn)
         if LATEST_FIXTURES_FILE.exists():
             LATEST_FIXTURES_FILE.unlink()
         return
-    _write_json_atomic(dyn, fixtures)
+    _write_json_atomic(dyn, fixtures, machine=True)
     if dyn.resolve() != LATEST_FIXTURES_FILE.resolve():
-        _write_json_atomic(LATEST_FIXTURES_FILE, fixtures)
+        _write_json_atomic(LATEST_FIXTURES_FILE, fixtures, machine=True)
 
 
 def clear_latest_fixtures_file() -> None:
@@ -142,7 +141,7 @@ def load_previous_fixtures() -> FixtureDataset:
     """
     Carica lo snapshot previous (se esiste), altrimenti lista vuota.
     """
-    return _load_json_list(_previous_dynamic_path())
+    return _load_json_list(generations.artifact_path(_previous_dynamic_path()))
 
 
 def save_previous_fixtures(fixtures: FixtureDataset) -> None:
@@ -153,7 +152,7 @@ def save_previous_fixtures(fixtures: FixtureDataset) -> None:
     """
     if not fixtures:
         return
-    _write_json_atomic(_previous_dynamic_path(), fixtures)
+    _write_json_atomic(_previous_dynamic_path(), fixtures, machine=True)
 
 
 def save_fixtures_atomic(path: Path, fixtures: FixtureDataset) -> None:
@@ -176,10 +175,18 @@ def save_history_snapshot(fixtures: FixtureDataset) -> Path:
     Ritorna il path creato, oppure un path fittizio (history/empty-skip) se lista vuota.
     Usa timestamp con microsecondi per evitare collisioni nello stesso secondo.
     In caso (estremo) di collisione sul nome, aggiunge un contatore suffisso.
+    HISTORY_MODE=delta: registra solo i cambi nello store a delta e ritorna la
+    sua directory.
     """
     if not fixtures:
         return _history_dir() / "empty-skip"
 
+    if _history_mode() == "delta":
+        from .history_store import record_snapshot, store_dir
+
+        record_snapshot(fixtures, base=_data_dir())
+        return store_dir(_data_dir())
+
     # Assicura esistenza directory
     _ensure_dir(_history_dir() / "._probe")
 
@@ -197,7 +204,7 @@ def save_history_snapshot(fixtures: FixtureDataset) -> Path:
 def rotate_history(max_files: int) -> None:
     """
     Mantiene al più max_files snapshot nella cartella history (ordine alfabetico ≈ ordine temporale).
-    Rimuove i più vecchi se eccedenti.
+    Rimuove i più vecchi se eccedenti. Lo store a delta (history/store) non è toccato.
     """
     hdir = _history_dir()
     if not hdir.exists():
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+try:  # POSIX: lock tra processi; altrove resta il solo lock del file di stato
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+from core import jsoncodec
+from core.logging import get_logger
+
+logger = get_logger("core.ratelimit")
+
+# ============================================================
+# Rate limiter condiviso tra processi (token bucket su file + flock)
+#
+# Gli script di fetch, il fetcher quote e il ciclo girano come cron separati
+# sulle stesse quote provider: ogni processo prende un token dal bucket del
+# provider prima di ogni richiesta HTTP (retry compresi).
+#
+#   <RATE_LIMIT_DIR>/<provider>.json   {"tokens","limit","updated","reset_at",
+#                                       "exhausted_until"}
+#   <RATE_LIMIT_DIR>/<provider>.lock   fcntl.flock esclusivo per ogni lettura /
+#                                       scrittura dello stato
+#
+# Il bucket è riallineato dagli header di quota delle risposte (remaining,
+# limit, reset): tokens = richieste residue dichiarate dal provider. Senza
+# reset noto il bucket si ricarica a limit/60 s (limit dall'header o dal
+# *_RPM configurato). Un 429 con Retry-After sospende il provider per tutti i
+# processi. Quote lunghe esaurite (giornaliera API-Football, crediti
+# the-odds-api): acquire fallisce subito con QuotaExhausted invece di
+# consumare retry e sleep di backoff. Attesa oltre RATE_LIMIT_MAX_WAIT → QuotaExhausted.
+# Disattivato di default (ENABLE_SHARED_RATE_LIMIT): acquire / update sono no-op.
+# ============================================================
+
+WINDOW_SECONDS = 60.0
+_EXHAUSTED_PROBE_SECONDS = 3600.0
+
+
+class QuotaExhausted(RuntimeError):
+    """Quota del provider esaurita o attesa oltre RATE_LIMIT_MAX_WAIT."""
+
+    def __init__(self, provider: str, wait: Optional[float]) -> None:
+        self.provider = provider
+        self.wait = wait
+        hint = f"prossimo token tra {wait:.0f}s" if wait is not None else "quota esaurita"
+        super().__init__(f"Rate limit condiviso {provider}: {hint}")
+
+
+def _next_utc_midnight(now: float) -> float:
+    d = datetime.fromtimestamp(now, timezone.utc).date() + timedelta(days=1)
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp()
+
+
+class QuotaSpec:
+    """Header di quota di un provider (nomi case-insensitive) e budget configurato."""
+
+    def __init__(
+        self,
+        rpm_env: str,
+        remaining: str,
+        limit: Optional[str] = None,
+        reset: Optional[str] = None,
+        hard_remaining: Optional[str] = None,
+        hard_reset: Callable[[float], float] = lambda now: now + _EXHAUSTED_PROBE_SECONDS,
+    ) -> None:
+        self.rpm_env = rpm_env
+        self.remaining = remaining.lower()
+        self.limit = limit.lower() if limit else None
+        self.reset = reset.lower() if reset else None
+        self.hard_remaining = hard_remaining.lower() if hard_remaining else None
+        self.hard_reset = hard_reset
+
+    def rpm(self) -> int:
+        try:
+            return max(0, int(os.getenv(self.rpm_env, "0")))
+        except ValueError:
+            return 0
+
+
+PROVIDERS: Dict[str, QuotaSpec] = {
+    # per minuto + giornaliera (reset a mezzanotte UTC)
+    "api_football": QuotaSpec(
+        "API_FOOTBALL_RPM",
+        remaining="X-RateLimit-Remaining",
+        limit="X-RateLimit-Limit",
+        hard_remaining="x-ratelimit-requests-remaining",
+        hard_reset=_next_utc_midnight,
+    ),
+    # per minuto, reset in secondi
+    "football_data": QuotaSpec(
+        "FOOTBALL_DATA_RPM",
+        remaining="X-Requests-Available-Minute",
+        reset="X-RequestCounter-Reset",
+    ),
+    # solo crediti mensili: a quota finita nuovo tentativo dopo un'ora
+    "odds_api": QuotaSpec(
+        "ODDS_API_RPM",
+        remaining="x-requests-remaining",
+        hard_remaining="x-requests-remaining",
+    ),
+}
+
+
+def enabled() -> bool:
+    return (os.getenv("ENABLE_SHARED_RATE_LIMIT") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def state_dir() -> Path:
+    explicit = os.getenv("RATE_LIMIT_DIR")
+    if explicit:
+        return Path(explicit)
+    return Path(os.getenv("BET_DATA_DIR") or "data") / "ratelimit"
+
+
+def _max_wait() -> float:
+    try:
+        return max(0.0, float(os.getenv("RATE_LIMIT_MAX_WAIT", "60")))
+    except ValueError:
+        return 60.0
+
+
+@contextmanager
+def _locked(provider: str) -> Iterator[Path]:
+    d = state_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    with (d / f"{provider}.lock").open("a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield d / f"{provider}.json"
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    try:
+        st = jsoncodec.read_json(path)
+    except (OSError, ValueError):
+        st = None
+    return st if isinstance(st, dict) else {}
+
+
+def _refill(st: Dict[str, Any], spec: QuotaSpec, now: float) -> None:
+    limit = st.get("limit") or spec.rpm() or None
+    tokens = st.get("tokens")
+    reset_at = st.get("reset_at")
+    if reset_at is not None and now >= reset_at:
+        # finestra del provider ripartita: bucket pieno (o ignoto senza limit)
+        tokens, reset_at = limit, None
+    elif reset_at is None and limit:
+        if tokens is None:
+            tokens = limit
+        else:
+            elapsed = max(0.0, now - float(st.get("updated") or now))
+            tokens = min(float(limit), tokens + elapsed * limit / WINDOW_SECONDS)
+    st.update({"tokens": tokens, "limit": st.get("limit"), "reset_at": reset_at, "updated": now})
+
+
+def _take(provider: str, spec: QuotaSpec, now: float) -> Tuple[bool, Optional[float]]:
+    """Un token se disponibile: (True, None), altrimenti (False, secondi di attesa; None = quota esaurita)."""
+    with _locked(provider) as path:
+        st = _load(path)
+        _refill(st, spec, now)
+        exhausted_until = st.get("exhausted_until")
+        if exhausted_until is not None:
+            if now < exhausted_until:
+                jsoncodec.write_json_atomic(path, st, machine=True)
+                return False, None
+            # quota lunga forse ripartita: una richiesta di prova riallinea dagli header
+            del st["exhausted_until"]
+            st["tokens"], st["reset_at"] = None, None
+        tokens = st["tokens"]
+        if tokens is None or tokens >= 1:
+            if tokens is not None:
+                st["tokens"] = tokens - 1
+            jsoncodec.write_json_atomic(path, st, machine=True)
+            return True, None
+        limit = st.get("limit") or spec.rpm()
+        if st["reset_at"] is None and not limit:
+            # residuo a 0 senza limit né reset: bucket ignoto a fine finestra
+            st["reset_at"] = now + WINDOW_SECONDS
+        jsoncodec.write_json_atomic(path, st, machine=True)
+        if st["reset_at"] is not None:
+            return False, max(0.0, st["reset_at"] - now)
+        return False, (1 - tokens) * WINDOW_SECONDS / limit
+
+
+def acquire(
+    provider: str,
+    *,
+    clock: Optional[Callable[[], float]] = None,
+    sleep: Optional[Callable[[float], None]] = None,
+) -> float:
+    """
+    Attende un token del provider (bloccante, condiviso tra processi).
+    Ritorna i secondi attesi. QuotaExhausted se la quota è esaurita o
+    l'attesa supererebbe RATE_LIMIT_MAX_WAIT.
+    """
+    if not enabled():
+        return 0.0
+    spec = PROVIDERS[provider]
+    clock = clock or time.time
+    sleep = sleep or time.sleep
+    waited = 0.0
+    while True:
+        ok, wait = _take(provider, spec, clock())
+        if ok:
+            if waited > 0:
+                logger.info("rate limit condiviso %s: attesi %.2fs", provider, waited)
+            return waited
+        if wait is None or waited + wait > _max_wait():
+            raise QuotaExhausted(provider, wait)
+        sleep(wait)
+        waited += wait
+
+
+def _header(headers: Mapping[str, Any], name: Optional[str]) -> Optional[float]:
+    if not name:
+        return None
+    for k, v in headers.items():
+        if k.lower() == name:
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def update_from_headers(
+    provider: str,
+    headers: Optional[Mapping[str, Any]],
+    *,
+    retry_after: Optional[float] = None,
+    clock: Optional[Callable[[], float]] = None,
+) -> None:
+    """
+    Riallinea il bucket agli header di quota di una risposta. `retry_after`
+    (429): provider sospeso per tutti i processi per quei secondi.
+    Nessun accesso al disco se la risposta non porta header di quota.
+    """
+    if not enabled():
+        return
+    spec = PROVIDERS[provider]
+    headers = headers or {}
+    remaining = _header(headers, spec.remaining)
+    limit = _header(headers, spec.limit)
+    reset = _header(headers, spec.reset)
+    hard = _header(headers, spec.hard_remaining)
+    if remaining is None and hard is None and retry_after is None:
+        return
+    now = (clock or time.time)()
+    with _locked(provider) as path:
+        st = _load(path)
+        if limit:
+            st["limit"] = limit
+        _refill(st, spec, now)
+        if remaining is not None:
+            st["tokens"] = max(0.0, remaining)
+            if reset is not None:
+                st["reset_at"] = now + max(0.0, reset)
+        if retry_after is not None and retry_after > 0:
+            st["tokens"] = 0.0
+            st["reset_at"] = max(st.get("reset_at") or 0.0, now + retry_after)
+        if hard is not None and hard < 1:
+            st["exhausted_until"] = spec.hard_reset(now)
+            logger.warning("quota %s esaurita fino a %s", provider,
+                           datetime.fromtimestamp(st["exhausted_until"], timezone.utc).isoformat())
+        jsoncodec.write_json_atomic(path, st, machine=True)
+
+
+__all__ = [
+    "PROVIDERS",
+    "QuotaExhausted",
+    "QuotaSpec",
+    "acquire",
+    "enabled",
+    "state_dir",
+    "update_from_headers",
+]
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core import generations
 from core.logging import get_logger
 from core.config import get_settings
 
@@ -96,8 +96,5 @@ def write_scoreboard(scoreboard: Dict[str, Any]) -> Path:
     base = Path(settings.bet_data_dir or "data")
     base.mkdir(parents=True, exist_ok=True)
     target = base / "scoreboard.json"
-    tmp = target.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(scoreboard, f, ensure_ascii=False, indent=2)
-    tmp.replace(target)
+    generations.write_artifact(target, scoreboard)
     return target
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any, Dict, Optional
 
@@ -8,8 +7,10 @@ from prometheus_client import (
     CollectorRegistry,
     Counter,
     Gauge,
+    Histogram,
     generate_latest,
 )
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -34,16 +35,62 @@ FETCH_ATTEMPTS = Gauge("bet_fetch_attempts", "Numero tentativi ultimo fetch", re
 SCOREBOARD_LIVE = Gauge("bet_scoreboard_live", "Numero live fixtures scoreboard", registry=_REGISTRY)
 SCOREBOARD_UPCOMING_24H = Gauge("bet_scoreboard_upcoming_24h", "Upcoming entro 24h scoreboard", registry=_REGISTRY)
 
+# Profiling ROI (roi_metrics.json["_timings"], ENABLE_ROI_PROFILING)
+_ROI_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROI_STAGE_SECONDS = Histogram(
+    "bet_roi_stage_seconds", "Durata stage build_or_update_roi", ["stage"],
+    buckets=_ROI_TIME_BUCKETS, registry=_REGISTRY,
+)
+ROI_BLOCK_SECONDS = Histogram(
+    "bet_roi_block_seconds", "Durata blocco metriche ROI", ["block"],
+    buckets=_ROI_TIME_BUCKETS, registry=_REGISTRY,
+)
+ROI_STAGE_PEAK_BYTES = Gauge(
+    "bet_roi_stage_peak_bytes", "Picco allocazioni stage ROI (ultimo run)", ["stage"], registry=_REGISTRY
+)
+ROI_BLOCK_PEAK_BYTES = Gauge(
+    "bet_roi_block_peak_bytes", "Picco allocazioni blocco ROI (ultimo run)", ["block"], registry=_REGISTRY
+)
+
+# run_ts dell'ultimo _timings osservato: l'exporter rilegge il file ogni 15s
+_last_roi_timings_run: Optional[str] = None
+
 
 def _read_json(path: Path) -> Optional[Dict[str, Any]]:
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(path)
     except Exception:
         return None
 
 
+def observe_roi_timings(timings: Dict[str, Any]) -> bool:
+    """
+    Registra una sezione `_timings` negli istogrammi stage/blocco.
+    Ogni run (run_ts) è osservato una sola volta; ritorna True se osservato.
+    """
+    global _last_roi_timings_run
+    run_ts = timings.get("run_ts")
+    if not run_ts or run_ts == _last_roi_timings_run:
+        return False
+    _last_roi_timings_run = run_ts
+    for kind, hist, peak_gauge in (
+        ("stages", ROI_STAGE_SECONDS, ROI_STAGE_PEAK_BYTES),
+        ("blocks", ROI_BLOCK_SECONDS, ROI_BLOCK_PEAK_BYTES),
+    ):
+        for name, rec in (timings.get(kind) or {}).items():
+            if not isinstance(rec, dict):
+                continue
+            sec = rec.get("sec")
+            if isinstance(sec, (int, float)):
+                hist.labels(name).observe(sec)
+            peak = rec.get("peak_bytes")
+            if isinstance(peak, (int, float)):
+                peak_gauge.labels(name).set(peak)
+    return True
+
+
 def update_prom_metrics(base_dir: Optional[str] = None) -> None:
     """
     Legge i file prodotti dalla pipeline e aggiorna metriche.
@@ -62,9 +109,10 @@ def update_prom_metrics(base_dir: Optional[str] = None) -> None:
     bdir = Path(base_dir or settings.bet_data_dir or "data")
 
     # last_run metrics
-    metrics_path = bdir / settings.metrics_dir / "last_run.json"
-    delta_path = bdir / settings.events_dir / "last_delta.json"
-    scoreboard_path = bdir / "scoreboard.json"
+    snap = generations.current_snapshot(bdir)
+    metrics_path = snap.resolve(bdir / settings.metrics_dir / "last_run.json")
+    delta_path = snap.resolve(bdir / settings.events_dir / "last_delta.json")
+    scoreboard_path = snap.resolve(bdir / "scoreboard.json")
 
     metrics_data = _read_json(metrics_path) or {}
     delta_data = _read_json(delta_path) or {}
@@ -103,6 +151,12 @@ def update_prom_metrics(base_dir: Optional[str] = None) -> None:
     SCOREBOARD_LIVE.set(scoreboard_data.get("live_count", 0) or 0)
     SCOREBOARD_UPCOMING_24H.set(scoreboard_data.get("upcoming_count_next_24h", 0) or 0)
 
+    # Profiling ROI (presente solo con ENABLE_ROI_PROFILING nel processo pipeline)
+    roi_metrics = _read_json(snap.resolve(bdir / settings.roi_dir / "roi_metrics.json")) or {}
+    timings = roi_metrics.get("_timings")
+    if isinstance(timings, dict):
+        observe_roi_timings(timings)
+
     logger.debug("Prometheus metrics updated.")
 
 
@@ -110,4 +164,4 @@ def generate_prometheus_text() -> bytes:
     return generate_latest(_REGISTRY)
 
 
-__all__ = ["update_prom_metrics", "generate_prometheus_text", "_REGISTRY"]
+__all__ = ["update_prom_metrics", "observe_roi_timings", "generate_prometheus_text", "_REGISTRY"]
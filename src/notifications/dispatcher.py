@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
 import time
+from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 import requests
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -19,8 +20,7 @@ def load_alert_events(base_dir: Optional[str] = None) -> List[Dict[str, Any]]:
         base = base_dir
     path = f"{base}/{settings.alerts_dir}/last_alerts.json"
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = jsoncodec.read_json(generations.artifact_path(Path(path)))
         events = data.get("events") or []
         if not isinstance(events, list):
             return []
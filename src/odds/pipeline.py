@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Protocol
 
+from core import generations
 from core.config import get_settings
 from core.logging import get_logger
 from providers.odds.odds_provider_stub import StubOddsProvider
@@ -52,10 +52,7 @@ def run_odds_pipeline(fixtures: List[Dict[str, Any]], provider_name: Optional[st
         "count": len(odds_entries),
         "entries": odds_entries,
     }
-    tmp = target.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
 
     logger.info("odds_pipeline_written", extra={"count": len(odds_entries), "provider": p_name})
     return target
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core import generations, jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -27,12 +27,12 @@ def load_odds_map() -> Dict[int, Dict[str, Any]]:
     if not settings.enable_predictions_use_odds:
         return {}
     base = Path(settings.bet_data_dir or "data")
-    fpath = base / settings.odds_dir / "odds_latest.json"
+    fpath = generations.artifact_path(base / settings.odds_dir / "odds_latest.json")
     if not fpath.exists():
         logger.debug("Odds file non trovato: %s", fpath)
         return {}
     try:
-        raw = json.loads(fpath.read_text(encoding="utf-8"))
+        raw = jsoncodec.read_json(fpath)
     except Exception as exc:  # pragma: no cover
         logger.error("Errore lettura odds file: %s", exc)
         return {}
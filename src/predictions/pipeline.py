@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import json
-import os
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+from core import generations
 from core.config import get_settings
 from core.logging import get_logger
 from predictions.features import build_features
@@ -98,10 +97,7 @@ def run_baseline_predictions(fixtures: List[Dict[str, Any]]) -> Optional[Path]:
         "predictions": final_predictions,
     }
 
-    tmp_file = target.with_suffix(".tmp")
-    with tmp_file.open("w", encoding="utf-8") as fh:
-        json.dump(payload, fh, ensure_ascii=False, indent=2)
-    os.replace(tmp_file, target)
+    generations.write_artifact(target, payload)
 
     logger.info(
         "baseline_predictions_written",
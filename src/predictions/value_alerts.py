@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import json
-import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-from core.config import get_settings
+from core import generations, jsoncodec
+from core.config import Settings, get_settings
 from core.logging import get_logger
 
 logger = get_logger("predictions.value_alerts")
@@ -18,17 +17,17 @@ def _load_json(path: Path) -> Any:
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return jsoncodec.read_json(path)
     except Exception:
         return None
 
 
 def _load_predictions(base: Path, predictions_dir: str) -> List[Dict[str, Any]]:
-    f = base / predictions_dir / "latest_predictions.json"
+    f = generations.artifact_path(base / predictions_dir / "latest_predictions.json")
     if not f.exists():
         return []
     try:
-        raw = json.loads(f.read_text(encoding="utf-8"))
+        raw = jsoncodec.read_json(f)
     except Exception:  # pragma: no cover
         return []
     preds = raw.get("predictions")
@@ -38,11 +37,11 @@ def _load_predictions(base: Path, predictions_dir: str) -> List[Dict[str, Any]]:
 
 
 def _load_consensus(base: Path, consensus_dir: str) -> List[Dict[str, Any]]:
-    f = base / consensus_dir / "consensus.json"
+    f = generations.artifact_path(base / consensus_dir / "consensus.json")
     if not f.exists():
         return []
     try:
-        raw = json.loads(f.read_text(encoding="utf-8"))
+        raw = jsoncodec.read_json(f)
     except Exception:  # pragma: no cover
         return []
     entries = raw.get("entries")
@@ -59,14 +58,14 @@ def _policy_edge(pred_edge: float, cons_edge: float, policy: str) -> float:
     return max(pred_edge, cons_edge)  # default max
 
 
-def _dynamic_factor(alerts_count: int) -> float:
+def _dynamic_factor(alerts_count: int, settings: Optional[Settings] = None) -> float:
     """
     Calcola fattore dinamico:
     - Se count > target => aumenta
     - Se count < target/2 => diminuisce
     Stateless: ricalcolato ad ogni run (semplice e robusto).
     """
-    settings = get_settings()
+    settings = settings or get_settings()
     target = settings.value_alert_dynamic_target_count
     factor_min = settings.value_alert_dynamic_min_factor
     factor_max = settings.value_alert_dynamic_max_factor
@@ -94,10 +93,25 @@ def build_value_alerts() -> List[Dict[str, Any]]:
     settings = get_settings()
     base = Path(settings.bet_data_dir or "data")
 
-    base_threshold = settings.value_alert_min_edge
-
     preds = _load_predictions(base, settings.predictions_dir)
     consensus_entries = _load_consensus(base, settings.consensus_dir)
+    alerts, effective_threshold = compute_value_alerts(preds, consensus_entries)
+    _LAST_EFFECTIVE_THRESHOLD = effective_threshold  # salva per write_value_alerts
+    return alerts
+
+
+def compute_value_alerts(
+    preds: List[Dict[str, Any]],
+    consensus_entries: List[Dict[str, Any]],
+    settings: Optional[Settings] = None,
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Logica alert pura (nessun I/O) su predictions / consensus già caricati.
+    Ritorna (alerts, soglia effettiva). Usata anche dal backtest ROI
+    (settings con override per configurazione).
+    """
+    settings = settings or get_settings()
+    base_threshold = settings.value_alert_min_edge
 
     # Conteggio per dynamic threshold (solo candidati attivi sopra base threshold)
     if settings.value_alert_dynamic_enable:
@@ -120,12 +134,11 @@ def build_value_alerts() -> List[Dict[str, Any]]:
                     continue
                 if edge >= base_threshold:
                     prelim_count += 1
-        dynamic_factor = _dynamic_factor(prelim_count)
+        dynamic_factor = _dynamic_factor(prelim_count, settings)
     else:
         dynamic_factor = 1.0
 
     effective_threshold = base_threshold * dynamic_factor
-    _LAST_EFFECTIVE_THRESHOLD = effective_threshold  # salva per write_value_alerts
 
     alerts: List[Dict[str, Any]] = []
     pred_index: Dict[Tuple[int, str], float] = {}
@@ -226,7 +239,7 @@ def build_value_alerts() -> List[Dict[str, Any]]:
                 )
             ]
 
-    return alerts
+    return alerts, effective_threshold
 
 
 def write_value_alerts(alerts: List[Dict[str, Any]]) -> Optional[Path]:
@@ -271,10 +284,7 @@ def write_value_alerts(alerts: List[Dict[str, Any]]) -> Optional[Path]:
         "alerts": alerts,
     }
 
-    tmp = target.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
     logger.info(
         "value_alerts_written",
         extra={
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Dict, Any
 
+from core import jsoncodec
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -76,7 +76,7 @@ def append_value_history(alerts: List[Dict[str, Any]]) -> None:
             mv = a.get("model_version")
             if mv:
                 rec["model_version"] = mv
-            lines.append(json.dumps(rec, ensure_ascii=False))
+            lines.append(jsoncodec.dumps_str(rec))
         except Exception:
             continue
 
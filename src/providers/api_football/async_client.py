@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+try:  # opzionale: presente in requirements.txt, non nelle dipendenze minime
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore
+
+from core import ratelimit
+from core.config import get_settings
+from core.logging import get_logger
+from .exceptions import RateLimitError, TransientAPIError
+from .fixtures_provider import build_fixture_params, normalize_fixture_response
+from .http_client import _BASE_URL
+
+log = get_logger(__name__)
+
+# ============================================================
+# Fetch concorrente API-Football (asyncio + httpx)
+#
+# Stessa semantica di APIFootballHttpClient (retry/backoff su 429, 5xx ed
+# errori di rete, 4xx non retriable, telemetria attempts/retries/latency/
+# status) ma con molte richieste lega/data in volo insieme:
+#   - API_FOOTBALL_MAX_CONCURRENCY richieste contemporanee (semaforo);
+#   - API_FOOTBALL_RPM budget condiviso a finestra scorrevole di 60 s: ogni
+#     tentativo (retry compresi) consuma un posto; 0 = nessun limite;
+#   - un 429 con Retry-After sospende il budget per tutte le richieste, non
+#     solo per quella che l'ha ricevuto;
+#   - con ENABLE_SHARED_RATE_LIMIT anche il bucket condiviso tra processi
+#     (core.ratelimit, in un thread: lock su file bloccante).
+# Il fallback a 7 giorni e i fetch multi-lega durano ~ la richiesta più lenta.
+# ============================================================
+
+_sleep = asyncio.sleep
+
+
+class RequestBudget:
+    """Al più `rpm` richieste in ogni finestra di 60 s (0 = illimitato), condiviso tra task."""
+
+    def __init__(self, rpm: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self._rpm = rpm
+        self._clock = clock
+        self._sent: Deque[float] = deque()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = self._clock()
+                wait = self._paused_until - now
+                if self._rpm > 0:
+                    while self._sent and now - self._sent[0] >= 60.0:
+                        self._sent.popleft()
+                    if len(self._sent) >= self._rpm:
+                        wait = max(wait, 60.0 - (now - self._sent[0]))
+                if wait <= 0:
+                    if self._rpm > 0:
+                        self._sent.append(now)
+                    return
+                await _sleep(wait)
+
+
+class AsyncAPIFootballHttpClient:
+    """
+    Client asincrono con retry e backoff per API Football (httpx).
+    Telemetria: get_stats() come il client sincrono (ultima chiamata conclusa),
+    get_batch_stats() aggregata su tutte le chiamate dell'istanza.
+    """
+
+    def __init__(self, transport: Any = None) -> None:
+        if httpx is None:  # pragma: no cover
+            raise RuntimeError("httpx non installato: richiesto per il fetch concorrente")
+        self._settings = get_settings()
+        self._max_attempts = self._settings.api_football_max_attempts
+        self._base = self._settings.api_football_backoff_base
+        self._factor = self._settings.api_football_backoff_factor
+        self._jitter = self._settings.api_football_backoff_jitter
+        self._timeout = self._settings.api_football_timeout
+        self._transport = transport
+        self._client: Optional[Any] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.budget: Optional[RequestBudget] = None
+
+        self._last: Dict[str, Any] = {"attempts": 0, "retries": 0, "latency_ms": 0.0, "last_status": None}
+        self._batch: Dict[str, Any] = {"requests": 0, "attempts": 0, "retries": 0, "errors": 0, "max_latency_ms": 0.0}
+
+    async def __aenter__(self) -> "AsyncAPIFootballHttpClient":
+        self._client = httpx.AsyncClient(
+            headers={"x-apisports-key": self._settings.api_football_key, "Accept": "application/json"},
+            timeout=self._timeout,
+            transport=self._transport,
+        )
+        self._semaphore = asyncio.Semaphore(self._settings.api_football_max_concurrency)
+        self.budget = RequestBudget(self._settings.api_football_rpm)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _compute_delay(self, attempt: int) -> float:
+        # attempt parte da 1
+        delay = self._base * (self._factor ** (attempt - 1))
+        if self._jitter > 0:
+            delay *= random.uniform(1 - self._jitter, 1 + self._jitter)
+        return delay
+
+    def _record(self, attempt: int, start: float, status: Optional[int], ok: bool) -> None:
+        latency = (time.perf_counter() - start) * 1000
+        self._last = {"attempts": attempt, "retries": attempt - 1, "latency_ms": latency, "last_status": status}
+        b = self._batch
+        b["requests"] += 1
+        b["attempts"] += attempt
+        b["retries"] += attempt - 1
+        b["errors"] += 0 if ok else 1
+        b["max_latency_ms"] = max(b["max_latency_ms"], latency)
+
+    async def api_get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if self._client is None or self._semaphore is None or self.budget is None:
+            raise RuntimeError("AsyncAPIFootballHttpClient va usato come 'async with'")
+        async with self._semaphore:
+            return await self._get_with_retry(path, params)
+
+    async def _get_with_retry(self, path: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        log.info("api_football async GET %s params=%s", path, params)
+        url = _BASE_URL + path
+        start = time.perf_counter()
+        status: Optional[int] = None
+
+        for attempt in range(1, self._max_attempts + 1):
+            await self.budget.acquire()  # type: ignore[union-attr]
+            if ratelimit.enabled():
+                try:
+                    await asyncio.to_thread(ratelimit.acquire, "api_football")
+                except ratelimit.QuotaExhausted as e:
+                    self._record(attempt, start, status, ok=False)
+                    raise RateLimitError(str(e)) from e
+            try:
+                resp = await self._client.get(url, params=params or None)  # type: ignore[union-attr]
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                reason = f"network:{e.__class__.__name__}"
+                if attempt == self._max_attempts:
+                    self._record(attempt, start, None, ok=False)
+                    raise TransientAPIError(f"Errore di rete persistente dopo {attempt} tentativi: {e}") from e
+                wait = self._compute_delay(attempt)
+                log.warning("retry attempt=%s wait=%.2fs reason=%s", attempt, wait, reason)
+                await _sleep(wait)
+                continue
+
+            status = resp.status_code
+            if ratelimit.enabled():
+                retry_after = None
+                if status == 429:
+                    try:
+                        retry_after = float(resp.headers.get("Retry-After") or 0)
+                    except ValueError:
+                        pass
+                await asyncio.to_thread(ratelimit.update_from_headers, "api_football", resp.headers, retry_after=retry_after)
+
+            # Successo
+            if 200 <= status < 300:
+                try:
+                    data = resp.json()
+                except ValueError as e:
+                    self._record(attempt, start, status, ok=False)
+                    raise RuntimeError(f"Risposta non valida (non JSON) status={status}") from e
+                self._record(attempt, start, status, ok=True)
+                return data
+
+            # Rate limit 429: pausa condivisa sul budget
+            if status == 429:
+                if attempt == self._max_attempts:
+                    self._record(attempt, start, status, ok=False)
+                    raise RateLimitError(f"Rate limit dopo {attempt} tentativi (429).")
+                wait = self._compute_delay(attempt)
+                try:
+                    wait = max(wait, float(resp.headers.get("Retry-After") or 0))
+                except ValueError:
+                    pass
+                log.warning("retry attempt=%s wait=%.2fs reason=rate_limit", attempt, wait)
+                self.budget.pause(wait)  # type: ignore[union-attr]
+                continue
+
+            # Errori transitori server
+            if status in (500, 502, 503, 504):
+                if attempt == self._max_attempts:
+                    self._record(attempt, start, status, ok=False)
+                    raise TransientAPIError(f"Status {status} persistente dopo {attempt} tentativi.")
+                wait = self._compute_delay(attempt)
+                log.warning("retry attempt=%s wait=%.2fs reason=http_%s", attempt, wait, status)
+                await _sleep(wait)
+                continue
+
+            try:
+                payload = resp.json()
+            except Exception:
+                payload = {"raw": resp.text}
+            self._record(attempt, start, status, ok=False)
+            # Errori 4xx non recuperabili
+            if 400 <= status < 500:
+                raise ValueError(f"Richiesta API fallita (status={status}) non retriable: {payload}")
+            # Altri codici non gestiti
+            raise RuntimeError(f"Risposta inattesa (status={status}) non retriable: {payload}")
+
+        self._record(self._max_attempts, start, status, ok=False)  # pragma: no cover
+        raise RuntimeError(f"Fallimento imprevisto path={path} last_status={status}")  # pragma: no cover
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Telemetria dell'ultima chiamata conclusa (stesse chiavi del client sincrono)."""
+        return {**self._last, "latency_ms": round(self._last["latency_ms"], 2)}
+
+    def get_batch_stats(self) -> Dict[str, Any]:
+        return {**self._batch, "max_latency_ms": round(self._batch["max_latency_ms"], 2)}
+
+
+class AsyncApiFootballFixturesProvider:
+    """
+    Provider normalizzato concorrente: stessi parametri e normalizzazione di
+    ApiFootballFixturesProvider, molte richieste lega/data insieme.
+    """
+
+    def __init__(self, client: AsyncAPIFootballHttpClient) -> None:
+        self._client = client
+
+    async def fetch_fixtures(
+        self,
+        *,
+        date: Optional[str] = None,
+        league_id: Optional[int] = None,
+        season: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        params = build_fixture_params(date=date, league_id=league_id, season=season)
+        if params is None:
+            return []
+        raw = await self._client.api_get("/fixtures", params=params or None)
+        return normalize_fixture_response(raw, date=date, league_id=league_id)
+
+    async def fetch_many(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Una lista di fixture per query ({date, league_id, season}), nello stesso ordine."""
+        return list(await asyncio.gather(*(self.fetch_fixtures(**q) for q in queries)))
+
+
+def fetch_fixtures_concurrently(queries: List[Dict[str, Any]], transport: Any = None) -> Dict[str, Any]:
+    """
+    Esegue le query in parallelo (entry point sincrono per gli script).
+    Ritorna {"fixtures": fixture deduplicate per fixture_id nell'ordine delle
+    query, "stats": telemetria aggregata}.
+    """
+
+    async def run() -> Dict[str, Any]:
+        async with AsyncAPIFootballHttpClient(transport=transport) as client:
+            chunks = await AsyncApiFootballFixturesProvider(client).fetch_many(queries)
+            stats = client.get_batch_stats()
+        seen: Dict[Any, Dict[str, Any]] = {}
+        for chunk in chunks:
+            for rec in chunk or []:
+                fid = rec.get("fixture_id")
+                if fid is not None and fid not in seen:
+                    seen[fid] = rec
+        return {"fixtures": list(seen.values()), "stats": stats}
+
+    start = time.perf_counter()
+    out = asyncio.run(run())
+    out["stats"]["wall_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return out
+
+
+__all__ = [
+    "AsyncAPIFootballHttpClient",
+    "AsyncApiFootballFixturesProvider",
+    "RequestBudget",
+    "fetch_fixtures_concurrently",
+]
@@ -72,6 +72,72 @@ class APIFootballFixturesProvider:
         return self._client.get_stats()
 
 
+def build_fixture_params(
+    *,
+    date: Optional[str] = None,
+    league_id: Optional[int] = None,
+    season: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Parametri /fixtures del provider normalizzato (default lega/season sempre applicati).
+    None = richiesta da non eseguire (data senza lega: niente ALL-LEAGUES).
+    """
+    settings = get_settings()
+
+    # Costruzione parametri: applica SEMPRE i default se presenti
+    params: Dict[str, Any] = {}
+    if date:
+        params["date"] = date
+
+    if league_id is not None:
+        params["league"] = league_id
+    elif settings.default_league_id is not None:
+        params["league"] = settings.default_league_id
+
+    if season is not None:
+        params["season"] = season
+    elif settings.default_season is not None:
+        params["season"] = settings.default_season
+
+    # Con data ma senza lega, non fare ALL-LEAGUES → ritorna lista vuota
+    if date and "league" not in params:
+        log.info("Data specificata ma nessuna lega; skip ALL-LEAGUES (normalized). date=%s", date)
+        return None
+    return params
+
+
+def normalize_fixture_response(
+    raw: Dict[str, Any],
+    *,
+    date: Optional[str] = None,
+    league_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Normalizza la risposta /fixtures (con post-filtro di lega quando è indicata una data)."""
+    settings = get_settings()
+    response = raw.get("response", [])
+    if not isinstance(response, list):
+        log.warning("Formato inatteso: 'response' non è una lista")
+        return []
+
+    normalized = [normalize_api_football_fixture(item) for item in response]
+
+    # Post-filtro a prova di test: con data, tieni SOLO la lega target (se presente)
+    if date:
+        target_league: Optional[int] = None
+        if league_id is not None:
+            target_league = league_id
+        elif settings.default_league_id is not None:
+            target_league = settings.default_league_id
+
+        if target_league is None:
+            # per coerenza con la guardia sopra; qui non dovremmo arrivare,
+            # ma se succede, rimuovi comunque tutte le fixture extra
+            return []
+        normalized = [fx for fx in normalized if fx.get("league_id") == target_league]
+
+    return normalized
+
+
 class ApiFootballFixturesProvider:
     """
     Provider UNIFICATO normalizzato.
@@ -91,53 +157,14 @@ class ApiFootballFixturesProvider:
         league_id: Optional[int] = None,
         season: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
-        settings = get_settings()
-
-        # Costruzione parametri: applica SEMPRE i default se presenti
-        params: Dict[str, Any] = {}
-        if date:
-            params["date"] = date
-
-        if league_id is not None:
-            params["league"] = league_id
-        elif settings.default_league_id is not None:
-            params["league"] = settings.default_league_id
-
-        if season is not None:
-            params["season"] = season
-        elif settings.default_season is not None:
-            params["season"] = settings.default_season
-
-        # Con data ma senza lega, non fare ALL-LEAGUES → ritorna lista vuota
-        if date and "league" not in params:
-            log.info("Data specificata ma nessuna lega; skip ALL-LEAGUES (normalized). date=%s", date)
+        params = build_fixture_params(date=date, league_id=league_id, season=season)
+        if params is None:
             self._last_raw = {"response": []}
             return []
 
         raw = self._client.api_get("/fixtures", params=params or None)
         self._last_raw = raw
-        response = raw.get("response", [])
-        if not isinstance(response, list):
-            log.warning("Formato inatteso: 'response' non è una lista")
-            return []
-
-        normalized = [normalize_api_football_fixture(item) for item in response]
-
-        # Post-filtro a prova di test: con data, tieni SOLO la lega target (se presente)
-        if date:
-            target_league: Optional[int] = None
-            if league_id is not None:
-                target_league = league_id
-            elif settings.default_league_id is not None:
-                target_league = settings.default_league_id
-
-            if target_league is None:
-                # per coerenza con la guardia sopra; qui non dovremmo arrivare,
-                # ma se succede, rimuovi comunque tutte le fixture extra
-                return []
-            normalized = [fx for fx in normalized if fx.get("league_id") == target_league]
-
-        return normalized
+        return normalize_fixture_response(raw, date=date, league_id=league_id)
 
     def get_last_stats(self) -> Dict[str, Any]:
         return self._client.get_stats()
@@ -149,4 +176,6 @@ class ApiFootballFixturesProvider:
 __all__ = [
     "APIFootballFixturesProvider",
     "ApiFootballFixturesProvider",
+    "build_fixture_params",
+    "normalize_fixture_response",
 ]
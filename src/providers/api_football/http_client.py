@@ -7,6 +7,7 @@ from urllib.parse import urlencode
 
 import requests
 
+from core import ratelimit
 from core.config import get_settings
 from core.logging import get_logger
 from .exceptions import RateLimitError, TransientAPIError
@@ -20,6 +21,8 @@ class APIFootballHttpClient:
     """
     Client HTTP con retry e backoff per API Football (versione requests).
     Gestisce rate limit (429), errori transitori (5xx, network) e ritorna JSON.
+    Con ENABLE_SHARED_RATE_LIMIT ogni tentativo prende un token dal bucket
+    condiviso tra processi (core.ratelimit), riallineato dagli header di quota.
 
     Aggiunta telemetria minima:
       - _last_attempts: numero di tentativi effettuati nella ultima chiamata
@@ -80,6 +83,14 @@ class APIFootballHttpClient:
             url = base_url
             try_with_params = bool(params)
 
+            try:
+                ratelimit.acquire("api_football")
+            except ratelimit.QuotaExhausted as e:
+                self._last_attempts = attempt
+                self._last_retries = attempt - 1
+                self._last_latency_ms = (time.perf_counter() - start_overall) * 1000
+                raise RateLimitError(str(e)) from e
+
             try:
                 if try_with_params:
                     resp = self._session.get(
@@ -119,6 +130,7 @@ class APIFootballHttpClient:
 
             last_status = resp.status_code
             self._last_status = last_status  # aggiorniamo ogni volta che riceviamo risposta
+            ratelimit.update_from_headers("api_football", getattr(resp, "headers", None))
 
             # Successo
             if 200 <= resp.status_code < 300:
@@ -163,7 +175,11 @@ class APIFootballHttpClient:
                     attempt,
                     wait,
                 )
-                time.sleep(wait)
+                if ratelimit.enabled():
+                    # pausa condivisa: l'attesa la fa acquire() al prossimo tentativo
+                    ratelimit.update_from_headers("api_football", None, retry_after=wait)
+                else:
+                    time.sleep(wait)
                 continue
 
             # Errori transitori server
@@ -5,6 +5,8 @@ import re
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta, timezone
 
+from core.fixture_record import FOOTBALL_DATA_PROVIDER
+
 from .http_client import FootballDataClient
 
 
@@ -69,7 +71,7 @@ def _normalize(m: Dict[str, Any]) -> Dict[str, Any]:
         "status": status,
         "home_score": score["home"],
         "away_score": score["away"],
-        "provider": "football-data",
+        "provider": FOOTBALL_DATA_PROVIDER,
     }
 
 
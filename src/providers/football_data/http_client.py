@@ -2,6 +2,8 @@ import os
 from typing import Any, Dict, Optional
 import requests
 
+from core import ratelimit
+
 
 class FootballDataClient:
     BASE_URL = "https://api.football-data.org/v4"
@@ -16,8 +18,17 @@ class FootballDataClient:
     def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         url = f"{self.BASE_URL}{path}"
         headers = {"X-Auth-Token": self.api_key}
+        # bucket condiviso con gli altri processi (no-op se ENABLE_SHARED_RATE_LIMIT è off)
+        ratelimit.acquire("football_data")
         resp = requests.get(url, headers=headers, params=params or {}, timeout=self.timeout)
         self._last_status = resp.status_code
+        retry_after = None
+        if resp.status_code == 429:
+            try:
+                retry_after = float(resp.headers.get("Retry-After") or 0)
+            except ValueError:
+                pass
+        ratelimit.update_from_headers("football_data", resp.headers, retry_after=retry_after)
         resp.raise_for_status()
         return resp.json()
 
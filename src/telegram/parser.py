@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 import re
-import json
-import os
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from core import generations
 from core.config import get_settings
 from core.logging import get_logger
 
@@ -118,15 +117,12 @@ def write_parsed_events(events: List[Dict[str, Any]]) -> Optional[Path]:
     out_dir = base / settings.telegram_parsed_dir
     out_dir.mkdir(parents=True, exist_ok=True)
     target = out_dir / "last_parsed.json"
-    tmp = target.with_suffix(".tmp")
     payload = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "count": len(events),
         "events": events,
     }
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, target)
+    generations.write_artifact(target, payload)
     return target
 
 
@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from analytics.roi import _archive_stats, _compute_profit_and_stats, _prune_ledger, load_ledger_archive
+from analytics.roi_archive import (
+    archive_totals,
+    load_archive,
+    load_archive_manifest,
+    load_archive_partition,
+    migrate_legacy_archive,
+)
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_ARCHIVE_STATS", "1")
+    monkeypatch.setenv("ROI_LEDGER_MAX_AGE_DAYS", "30")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _pick(fid: int, days_ago: int, result=None):
+    created = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    p = {
+        "fixture_id": fid,
+        "source": "prediction",
+        "created_at": created.isoformat(),
+        "stake": 1.0,
+        "decimal_odds": 2.0,
+        "settled": result is not None,
+    }
+    if result:
+        p["result"] = result
+        p["payout"] = 2.0 if result == "win" else 0.0
+    return p
+
+
+def test_prune_writes_monthly_segments_and_manifest(tmp_path: Path):
+    base = tmp_path / "roi"
+    base.mkdir()
+    old = [_pick(1, 200, "win"), _pick(2, 170, "loss"), _pick(3, 120, "win"), _pick(4, 90)]
+    recent = [_pick(10, 1)]
+    kept = _prune_ledger(base, old + recent)
+    assert [p["fixture_id"] for p in kept] == [10]
+
+    manifest = load_archive_manifest(base)
+    months = sorted({p["created_at"][:7] for p in old})
+    assert sorted(manifest["partitions"]) == months
+    for month in months:
+        entry = manifest["partitions"][month]
+        assert entry["segments"] == ["seg-00001.json"]
+        rows = load_archive_partition(base, month)
+        assert entry["stats"]["picks"] == len(rows)
+
+    expected = _compute_profit_and_stats(old)
+    assert archive_totals(base) == expected
+    stats = _archive_stats(base)
+    assert stats["archived_picks"] == 4
+    assert stats["archived_profit_units"] == expected["profit_units"]
+
+    # secondo prune: nuovo segmento, i segmenti esistenti non vengono riscritti
+    first_month = months[0]
+    seg1 = base / "archive" / first_month / "seg-00001.json"
+    before = seg1.read_bytes()
+    extra = _pick(5, 200, "loss")
+    extra["created_at"] = load_archive_partition(base, first_month)[0]["created_at"]
+    _prune_ledger(base, kept + [extra])
+    entry = load_archive_manifest(base)["partitions"][first_month]
+    assert entry["segments"] == ["seg-00001.json", "seg-00002.json"]
+    assert seg1.read_bytes() == before
+    assert len(load_ledger_archive(base)) == 5
+
+
+def test_legacy_archive_is_migrated(tmp_path: Path):
+    base = tmp_path / "roi"
+    base.mkdir()
+    legacy = [_pick(7, 300, "win"), _pick(8, 260, "loss")]
+    (base / "ledger_archive.json").write_text(json.dumps(legacy), encoding="utf-8")
+    assert _archive_stats(base)["archived_picks"] == 2
+
+    _prune_ledger(base, [_pick(11, 2)])
+    assert not (base / "ledger_archive.json").exists()
+    assert (base / "ledger_archive.json.migrated").exists()
+    assert archive_totals(base)["picks"] == 2
+    assert _archive_stats(base)["archived_picks"] == 2
+
+
+def test_legacy_migration_rerun_after_crash_does_not_duplicate(tmp_path: Path, monkeypatch):
+    base = tmp_path / "roi"
+    base.mkdir()
+    legacy = [_pick(7, 300, "win"), _pick(8, 260, "loss")]
+    (base / "ledger_archive.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    # crash tra append dei segmenti e rename del file legacy
+    real_replace = Path.replace
+
+    def crash(self, target):
+        if self.name == "ledger_archive.json":
+            raise OSError("crash")
+        return real_replace(self, target)
+
+    monkeypatch.setattr(Path, "replace", crash)
+    with pytest.raises(OSError):
+        migrate_legacy_archive(base)
+    monkeypatch.setattr(Path, "replace", real_replace)
+    assert archive_totals(base)["picks"] == 2
+
+    assert migrate_legacy_archive(base) == 0
+    assert not (base / "ledger_archive.json").exists()
+    assert archive_totals(base)["picks"] == 2
+    assert len(load_archive(base)) == 2
+
+
+def test_legacy_archive_written_after_migration_is_migrated_again(tmp_path: Path, monkeypatch):
+    base = tmp_path / "roi"
+    base.mkdir()
+    (base / "ledger_archive.json").write_text(json.dumps([_pick(7, 300, "win")]), encoding="utf-8")
+    assert migrate_legacy_archive(base) == 1
+
+    # partizioni spente per un periodo: il prune riscrive il monolitico
+    monkeypatch.setenv("ENABLE_ROI_ARCHIVE_PARTITIONS", "0")
+    _reset_settings_cache_for_tests()
+    _prune_ledger(base, [_pick(8, 200, "loss"), _pick(12, 1)])
+    assert len(json.loads((base / "ledger_archive.json").read_text(encoding="utf-8"))) == 1
+
+    monkeypatch.setenv("ENABLE_ROI_ARCHIVE_PARTITIONS", "1")
+    _reset_settings_cache_for_tests()
+    assert migrate_legacy_archive(base) == 1
+    assert not (base / "ledger_archive.json").exists()
+    assert sorted(p["fixture_id"] for p in load_archive(base)) == [7, 8]
+    assert archive_totals(base)["picks"] == 2
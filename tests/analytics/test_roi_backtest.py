@@ -0,0 +1,117 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from analytics.roi_backtest import expand_grid, load_backtest_cycles, replay_cycles, run_backtest
+from core.config import _reset_settings_cache_for_tests, get_settings
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ROI_MIN_EDGE", "0.03")
+    monkeypatch.setenv("VALUE_ALERT_MIN_EDGE", "0.03")
+    monkeypatch.setenv("ENABLE_CLV_CAPTURE", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _fx(fid, status, home=None, away=None):
+    return {"fixture_id": fid, "league_id": 7, "status": status, "home_score": home, "away_score": away}
+
+
+def _write_history(tmp_path: Path):
+    hdir = tmp_path / "history"
+    hdir.mkdir()
+    snaps = {
+        "fixtures_20251001_100000_000000.json": [_fx(1, "NS"), _fx(2, "NS"), _fx(3, "NS")],
+        "fixtures_20251001_200000_000000.json": [_fx(1, "FT", 2, 0), _fx(2, "FT", 0, 1), _fx(3, "NS")],
+        "fixtures_20251002_200000_000000.json": [_fx(3, "FT", 1, 1)],
+    }
+    for name, fixtures in snaps.items():
+        (hdir / name).write_text(json.dumps(fixtures), encoding="utf-8")
+
+    vdir = tmp_path / "value_history"
+    vdir.mkdir()
+    rows = [
+        {"ts": "2025-10-01T09:00:00+00:00", "fixture_id": 1, "source": "prediction", "value_side": "home_win", "value_edge": 0.09},
+        {"ts": "2025-10-01T09:00:00+00:00", "fixture_id": 2, "source": "prediction", "value_side": "home_win", "value_edge": 0.04},
+        {"ts": "2025-10-01T09:00:00+00:00", "fixture_id": 3, "source": "prediction", "value_side": "draw", "value_edge": 0.06},
+    ]
+    (vdir / "value_history_2025-10-01.jsonl").write_text(
+        "\n".join(json.dumps(r) for r in rows) + "\n", encoding="utf-8"
+    )
+
+    odir = tmp_path / "odds"
+    odir.mkdir()
+    entries = [
+        {"fixture_id": 1, "fetched_at": "2025-10-01T08:00:00+00:00", "market": {"home_win": 2.5, "draw": 3.2, "away_win": 3.0}},
+        {"fixture_id": 2, "fetched_at": "2025-10-01T08:00:00+00:00", "market": {"home_win": 2.0, "draw": 3.4, "away_win": 3.8}},
+        {"fixture_id": 3, "fetched_at": "2025-10-01T08:00:00+00:00", "market": {"home_win": 2.2, "draw": 3.0, "away_win": 3.5}},
+        # quota di chiusura successiva al primo ciclo
+        {"fixture_id": 1, "fetched_at": "2025-10-01T15:00:00+00:00", "market": {"home_win": 2.2, "draw": 3.3, "away_win": 3.4}},
+    ]
+    (odir / "odds_latest.json").write_text(json.dumps({"entries": entries}), encoding="utf-8")
+
+
+def test_replay_alert_pick_settlement(tmp_path: Path):
+    _write_history(tmp_path)
+    cycles = load_backtest_cycles()
+    assert [c.ts[:13] for c in cycles] == ["2025-10-01T10", "2025-10-01T20", "2025-10-02T20"]
+    assert cycles[0].odds[1]["market"]["home_win"] == 2.5
+    assert cycles[1].odds[1]["market"]["home_win"] == 2.2
+
+    st = replay_cycles(cycles)
+    # 1 win @2.5, 2 loss, 3 draw win @3.0
+    assert st["picks"] == 3 and st["settled"] == 3 and st["wins"] == 2
+    assert st["profit_units"] == pytest.approx(1.5 + 2.0 - 1.0)
+    assert st["avg_clv_pct"] is not None
+
+    # soglia più alta: solo fixture 1 e 3
+    st = replay_cycles(cycles, {"ROI_MIN_EDGE": "0.05"})
+    assert st["picks"] == 2
+    assert st["profit_units"] == pytest.approx(3.5)
+
+    # override solo sulla copia di Settings: ambiente e cache invariati
+    assert os.environ["ROI_MIN_EDGE"] == "0.03"
+    assert get_settings().roi_min_edge == pytest.approx(0.03)
+    assert replay_cycles(cycles)["picks"] == 3
+
+
+def test_grid_parallel_matches_serial(tmp_path: Path):
+    _write_history(tmp_path)
+    grid = {"ROI_MIN_EDGE": ["0.03", "0.05", "0.1"], "ENABLE_KELLY_STAKING": ["0", "1"]}
+    assert len(expand_grid(grid)) == 6
+
+    serial = run_backtest(grid, workers=1, write=False)
+    parallel = run_backtest(grid, workers=2)
+    assert [r["params"] for r in serial["results"]] == [r["params"] for r in parallel["results"]]
+    assert [r["stats"] for r in serial["results"]] == [r["stats"] for r in parallel["results"]]
+    top = parallel["results"][0]["stats"]["profit_units"]
+    assert all(r["stats"]["profit_units"] <= top for r in parallel["results"])
+
+    with Path(parallel["table_path"]).open(encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6
+    assert rows[0]["rank"] == "1" and "ROI_MIN_EDGE" in rows[0] and "profit_units" in rows[0]
+
+
+def test_grid_below_recorded_threshold_is_flagged(tmp_path: Path, caplog):
+    _write_history(tmp_path)
+    grid = {"VALUE_ALERT_MIN_EDGE": ["0.01", "0.03"], "ROI_MIN_EDGE": ["0.01", "0.05"]}
+    with caplog.at_level("WARNING"):
+        report = run_backtest(grid, workers=1, write=False)
+    assert report["recorded_min_edge"] == 0.03
+    flagged = {
+        (r["params"]["VALUE_ALERT_MIN_EDGE"], r["params"]["ROI_MIN_EDGE"])
+        for r in report["results"]
+        if r["below_recorded_threshold"]
+    }
+    # solo la configurazione con entrambe le soglie sotto 0.03 scende sotto il registrato
+    assert flagged == {("0.01", "0.01")}
+    assert any(rec.getMessage() == "roi_backtest_below_recorded_threshold" for rec in caplog.records)
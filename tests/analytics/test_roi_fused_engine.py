@@ -0,0 +1,101 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.config import _reset_settings_cache_for_tests
+from analytics.roi import compute_metrics
+
+
+FLAGS = {
+    "ENABLE_ROI_TRACKING": "1",
+    "ENABLE_ROI_LEAGUE_BREAKDOWN": "1",
+    "ENABLE_ROI_TIME_BUCKETS": "1",
+    "ENABLE_ROI_ROR": "1",
+    "ENABLE_ROI_EDGE_CLV_CORR": "1",
+    "ENABLE_ROI_STAKE_ADVISORY": "1",
+    "ENABLE_ROI_AGING_BUCKETS": "1",
+    "ENABLE_ROI_CLV_BUCKETS": "1",
+    "ENABLE_ROI_KELLY_EFFECT": "1",
+    "ENABLE_ROI_PAYOUT_MOMENTS": "1",
+    "ENABLE_ROI_MARKET_PLACEHOLDER": "1",
+    "ENABLE_ROI_PROFIT_BUCKETS": "1",
+    "ENABLE_ROI_MONTECARLO": "1",
+    "ROI_MC_RUNS": "40",
+    "ROI_ROLLING_WINDOWS": "5,20,300",
+}
+
+
+def _ledger(n: int) -> list:
+    rnd = random.Random(7)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        created = base + timedelta(hours=rnd.randint(0, 2000))
+        settled = rnd.random() < 0.8
+        stake = round(rnd.uniform(0.5, 2.0), 3)
+        odds = round(rnd.uniform(1.5, 4.0), 3)
+        result = rnd.choice(["win", "loss", "loss", "push"]) if settled else None
+        p = {
+            "fixture_id": i,
+            "created_at": created.isoformat() if i % 17 else None,
+            "source": rnd.choice(["prediction", "consensus", "merged", "other"]),
+            "side": rnd.choice(["home_win", "draw", "away_win"]),
+            "stake": stake,
+            "stake_strategy": rnd.choice(["kelly", "fixed"]),
+            "decimal_odds": odds,
+            "edge": round(rnd.uniform(0.0, 0.2), 4) if i % 11 else None,
+            "settled": settled,
+            "league_id": rnd.choice([1, 2, 3, None]),
+        }
+        if settled:
+            p["result"] = result
+            p["payout"] = round(stake * odds, 6) if result == "win" else 0.0
+            p["settled_at"] = (created + timedelta(hours=rnd.randint(1, 200))).isoformat()
+            if i % 3:
+                p["clv_pct"] = round(rnd.uniform(-0.1, 0.15), 4)
+        out.append(p)
+    return out
+
+
+def _metrics(monkeypatch, engine: str, ledger: list) -> dict:
+    monkeypatch.setenv("ROI_METRICS_ENGINE", engine)
+    _reset_settings_cache_for_tests()
+    random.seed(123)
+    m = compute_metrics(ledger)
+    m.pop("generated_at")
+    return m
+
+
+@pytest.mark.parametrize("n", [0, 3, 8, 400])
+def test_fused_engine_matches_legacy(monkeypatch, tmp_path, n):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "dummy")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    for k, v in FLAGS.items():
+        monkeypatch.setenv(k, v)
+    ledger = _ledger(n)
+    legacy = _metrics(monkeypatch, "legacy", [dict(p) for p in ledger])
+    fused = _metrics(monkeypatch, "fused", [dict(p) for p in ledger])
+    assert fused.keys() == legacy.keys()
+    for key in legacy:
+        assert fused[key] == legacy[key], key
+
+
+def test_fused_engine_with_blocks_disabled(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "dummy")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    for flag in (
+        "ENABLE_ROI_CLV_AGGREGATE",
+        "ENABLE_ROI_EDGE_DECILES",
+        "ENABLE_ROI_RISK_METRICS",
+        "ENABLE_ROI_SOURCE_BREAKDOWN",
+        "ENABLE_ROI_SIDE_BREAKDOWN",
+        "ENABLE_ROI_LATENCY_METRICS",
+    ):
+        monkeypatch.setenv(flag, "0")
+    monkeypatch.setenv("ROI_EDGE_BUCKETS", "")
+    monkeypatch.setenv("ENABLE_ROI_MARKET_PLACEHOLDER", "1")
+    ledger = _ledger(60)
+    legacy = _metrics(monkeypatch, "legacy", [dict(p) for p in ledger])
+    fused = _metrics(monkeypatch, "fused", [dict(p) for p in ledger])
+    assert fused == legacy
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from analytics.roi import build_or_update_roi
+from core import generations
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_GENERATIONS", "1")
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_VALUE_ALERTS", "1")
+    monkeypatch.setenv("ENABLE_KELLY_STAKING", "1")
+    monkeypatch.setenv("ROI_INCLUDE_CONSENSUS", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+FIXTURES = [
+    {"fixture_id": 100, "home_team": "A", "away_team": "B", "status": "NS"},
+    {"fixture_id": 200, "home_team": "C", "away_team": "D", "status": "NS"},
+]
+
+
+def _publish_cycle(base: Path) -> None:
+    # predictions/consensus esistono solo nella generazione, mai al path legacy
+    with generations.begin_generation(base):
+        generations.write_artifact(
+            base / "predictions" / "latest_predictions.json",
+            {
+                "predictions": [
+                    {
+                        "fixture_id": 100,
+                        "prob": {"home_win": 0.55, "draw": 0.25, "away_win": 0.20},
+                        "odds": {"odds_original": {"home_win": 2.2, "draw": 3.4, "away_win": 4.0}},
+                    }
+                ]
+            },
+        )
+        generations.write_artifact(
+            base / "consensus" / "consensus.json",
+            {"entries": [{"fixture_id": 200, "blended_prob": {"home_win": 0.2, "draw": 0.3, "away_win": 0.5}}]},
+        )
+        generations.write_artifact(
+            base / "value_alerts" / "value_alerts.json",
+            {
+                "count": 2,
+                "alerts": [
+                    {"source": "prediction", "value_type": "prediction_value", "fixture_id": 100,
+                     "value_side": "home_win", "value_edge": 0.08},
+                    {"source": "consensus", "value_type": "consensus_value", "fixture_id": 200,
+                     "value_side": "away_win", "value_edge": 0.06},
+                ],
+            },
+        )
+
+
+def test_roi_reads_predictions_and_consensus_from_generation(tmp_path: Path):
+    _publish_cycle(tmp_path)
+    assert not (tmp_path / "predictions" / "latest_predictions.json").exists()
+    assert not (tmp_path / "consensus" / "consensus.json").exists()
+
+    build_or_update_roi(FIXTURES)
+
+    ledger = json.loads((tmp_path / "roi" / "ledger.json").read_text(encoding="utf-8"))
+    picks = {p["fixture_id"]: p for p in ledger}
+    assert set(picks) == {100, 200}
+    # probabilità del modello/consenso lette dalla generazione corrente
+    assert picks[100]["kelly_prob"] == pytest.approx(0.55)
+    assert picks[100]["odds_source"] == "predictions_odds"
+    assert picks[100]["decimal_odds"] == pytest.approx(2.2)
+    assert picks[200]["kelly_prob"] == pytest.approx(0.5)
@@ -0,0 +1,150 @@
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from core.config import _reset_settings_cache_for_tests, get_settings
+from analytics.roi import compute_metrics
+from analytics.roi_state import (
+    ROI_STATE_VERSION,
+    load_aggregate_state,
+    update_aggregate_state,
+)
+
+
+def _setup(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "dummy")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_INCREMENTAL", "1")
+    monkeypatch.setenv("ENABLE_ROI_LEAGUE_BREAKDOWN", "1")
+    monkeypatch.setenv("ENABLE_ROI_ROR", "1")
+    monkeypatch.setenv("ENABLE_ROI_MONTECARLO", "1")
+    monkeypatch.setenv("ENABLE_ROI_REGIME", "1")
+    monkeypatch.setenv("ROI_REGIME_VERSION", "m1")
+    monkeypatch.setenv("ENABLE_ROI_REGIME_PERSISTENCE", "0")
+    monkeypatch.setenv("ROI_MC_RUNS", "20")
+    monkeypatch.setenv("ROI_ROLLING_WINDOWS", "5,20")
+    _reset_settings_cache_for_tests()
+    base = tmp_path / "roi"
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def _assert_close(a, b, path="root"):
+    if isinstance(a, float) and isinstance(b, float):
+        assert math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6), path
+    elif isinstance(a, dict):
+        assert isinstance(b, dict) and a.keys() == b.keys(), path
+        for k in a:
+            _assert_close(a[k], b[k], f"{path}.{k}")
+    elif isinstance(a, list):
+        assert isinstance(b, list) and len(a) == len(b), path
+        for i, (x, y) in enumerate(zip(a, b)):
+            _assert_close(x, y, f"{path}[{i}]")
+    else:
+        assert a == b, path
+
+
+def _metrics(ledger, state=None):
+    random.seed(11)
+    m = compute_metrics(ledger, state=state)
+    m.pop("generated_at")
+    m["regime"].pop("changed_at", None)
+    return m
+
+
+def _run_cycles(base, cycles: int, rnd: random.Random, ledger=None, hour0: int = 0):
+    ledger = [] if ledger is None else ledger
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    fid = len(ledger)
+    state = None
+    for c in range(cycles):
+        now = (start + timedelta(hours=hour0 + c)).isoformat()
+        created = []
+        for _ in range(rnd.randint(0, 4)):
+            fid += 1
+            pick = {
+                "created_at": now,
+                "fixture_id": fid,
+                "source": rnd.choice(["prediction", "consensus", "merged"]),
+                "side": rnd.choice(["home_win", "draw", "away_win"]),
+                "stake": round(rnd.uniform(0.5, 2.0), 3),
+                "stake_strategy": rnd.choice(["kelly", "fixed"]),
+                "decimal_odds": round(rnd.uniform(1.5, 4.0), 3),
+                "edge": round(rnd.uniform(0.0, 0.2), 4),
+                "settled": False,
+                "league_id": rnd.choice([39, 135, 140]),
+            }
+            ledger.append(pick)
+            created.append(pick)
+        settled = []
+        for p in ledger:
+            if not p["settled"] and p not in created and rnd.random() < 0.3:
+                win = rnd.random() < 0.45
+                p["settled"] = True
+                p["result"] = "win" if win else "loss"
+                p["payout"] = round(p["stake"] * p["decimal_odds"], 6) if win else 0.0
+                p["settled_at"] = now
+                settled.append(p)
+        state = update_aggregate_state(base, ledger, created, settled)
+    return ledger, state
+
+
+def test_incremental_state_matches_full_recompute(monkeypatch, tmp_path):
+    base = _setup(monkeypatch, tmp_path)
+    rnd = random.Random(5)
+    ledger, state = _run_cycles(base, 60, rnd)
+    assert state.picks == len(ledger)
+    # settlement fuori ordine → parte della serie resta nel suffix
+    assert state.frozen.points + len(state.suffix) == sum(1 for p in ledger if p["settled"])
+    _assert_close(_metrics(ledger, state), _metrics(ledger))
+
+
+def test_incremental_state_persisted_and_resumed(monkeypatch, tmp_path):
+    base = _setup(monkeypatch, tmp_path)
+    rnd = random.Random(9)
+    ledger, _ = _run_cycles(base, 20, rnd)
+    loaded = load_aggregate_state(base)
+    assert loaded is not None and loaded.picks == len(ledger)
+    ledger, state = _run_cycles(base, 20, rnd, ledger=ledger, hour0=20)
+    _assert_close(_metrics(ledger, state), _metrics(ledger))
+
+
+def test_incremental_state_rebuild_on_version_mismatch(monkeypatch, tmp_path):
+    base = _setup(monkeypatch, tmp_path)
+    ledger, _ = _run_cycles(base, 10, random.Random(3))
+    path = base / get_settings().roi_state_file
+    raw = json.loads(path.read_text())
+    raw["version"] = ROI_STATE_VERSION + 1
+    raw["global"][0] = 999999
+    path.write_text(json.dumps(raw))
+    assert load_aggregate_state(base) is None
+
+    state = update_aggregate_state(base, ledger, [], [])
+    assert state.glob.picks == len(ledger)
+    _assert_close(_metrics(ledger, state), _metrics(ledger))
+
+
+def test_incremental_state_rebuild_when_ledger_diverges(monkeypatch, tmp_path):
+    base = _setup(monkeypatch, tmp_path)
+    ledger, _ = _run_cycles(base, 10, random.Random(4))
+    # pick rimossa fuori dal flusso del ciclo (es. edit manuale)
+    ledger.pop(0)
+    state = update_aggregate_state(base, ledger, [], [])
+    assert state.picks == len(ledger)
+    _assert_close(_metrics(ledger, state), _metrics(ledger))
+
+
+def test_incremental_state_rebuild_after_crash_between_saves(monkeypatch, tmp_path):
+    base = _setup(monkeypatch, tmp_path)
+    ledger, state = _run_cycles(base, 10, random.Random(6))
+    assert state.open
+    # ledger salvato con un settlement, stato non aggiornato (crash)
+    key = next(iter(state.open))
+    p = ledger[state.open[key][1]]
+    p.update({"settled": True, "result": "win", "payout": round(p["stake"] * p["decimal_odds"], 6),
+              "settled_at": p["created_at"]})
+    state = update_aggregate_state(base, ledger, [], [])
+    assert key not in state.open
+    _assert_close(_metrics(ledger, state), _metrics(ledger))
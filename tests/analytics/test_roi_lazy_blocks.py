@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import analytics.roi_blocks as rb
+from analytics.roi import build_or_update_roi, compute_metrics, settle_results_batch
+from analytics.roi_blocks import SECTIONS, resolve_blocks
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests
+
+LAZY = ["deciles", "edge_buckets", "clv_buckets", "profit_buckets", "league", "time_buckets", "edge_clv_corr"]
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_LAZY_BLOCKS", "1")
+    monkeypatch.setenv("ROI_LEDGER_MAX_AGE_DAYS", "0")
+    for flag in (
+        "ENABLE_ROI_EDGE_DECILES", "ENABLE_ROI_EDGE_BUCKETS", "ENABLE_ROI_CLV_BUCKETS",
+        "ENABLE_ROI_PROFIT_BUCKETS", "ENABLE_ROI_LEAGUE_BREAKDOWN", "ENABLE_ROI_TIME_BUCKETS",
+        "ENABLE_ROI_EDGE_CLV_CORR", "ENABLE_ROI_CLV_AGGREGATE", "ENABLE_ROI_MONTECARLO",
+    ):
+        monkeypatch.setenv(flag, "1")
+    rb._BLOCKS.clear()
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _seed(tmp_path: Path, n: int = 400):
+    ledger = generate_ledger(n, seed=5)
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+    return ledger
+
+
+def _metrics(tmp_path: Path):
+    return json.loads((tmp_path / "roi" / "roi_metrics.json").read_text(encoding="utf-8"))
+
+
+def _full(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("ENABLE_ROI_LAZY_BLOCKS", "0")
+    _reset_settings_cache_for_tests()
+    ledger = json.loads((tmp_path / "roi" / "ledger.json").read_text(encoding="utf-8"))
+    full = compute_metrics(ledger)
+    monkeypatch.setenv("ENABLE_ROI_LAZY_BLOCKS", "1")
+    _reset_settings_cache_for_tests()
+    return full
+
+
+def test_cycle_skips_lazy_and_api_resolves_same_values(monkeypatch, tmp_path: Path):
+    _seed(tmp_path)
+    build_or_update_roi([])
+    metrics = _metrics(tmp_path)
+    assert metrics["lazy_blocks"] == LAZY
+    assert metrics["ledger_version"]
+    for name in LAZY:
+        assert not any(k in metrics for k in SECTIONS[name])
+    assert "clv" in metrics and "peak_profit" in metrics
+
+    full = _full(monkeypatch, tmp_path)
+    got = resolve_blocks(LAZY + ["equity", "clv"])
+    for name in LAZY + ["equity", "clv"]:
+        for key in SECTIONS[name]:
+            assert got[key] == full[key], key
+    cached = json.loads((tmp_path / "roi" / "blocks" / "deciles.json").read_text(encoding="utf-8"))
+    assert cached["ledger_version"] == metrics["ledger_version"]
+
+
+def test_cache_reused_until_ledger_version_changes(monkeypatch, tmp_path: Path):
+    ledger = _seed(tmp_path)
+    build_or_update_roi([])
+    first = resolve_blocks(["deciles"])
+    version = _metrics(tmp_path)["ledger_version"]
+
+    # ciclo senza modifiche: stessa versione, nessun ricalcolo (né in memoria né da file)
+    build_or_update_roi([])
+    assert _metrics(tmp_path)["ledger_version"] == version
+    with monkeypatch.context() as m:
+        rb._BLOCKS.clear()
+        m.setattr(rb, "load_ledger", lambda base: pytest.fail("ricalcolo inatteso"))
+        assert resolve_blocks(["deciles"]) == first
+
+    open_ids = [p["fixture_id"] for p in ledger if not p["settled"]][:5]
+    settled = settle_results_batch(
+        [{"fixture_id": fid, "status": "FT", "home_score": 2, "away_score": 0} for fid in open_ids]
+    )
+    assert settled > 0
+    new_version = _metrics(tmp_path)["ledger_version"]
+    assert new_version != version
+    full = _full(monkeypatch, tmp_path)
+    assert resolve_blocks(["deciles"])["edge_deciles"] == full["edge_deciles"]
+    cached = json.loads((tmp_path / "roi" / "blocks" / "deciles.json").read_text(encoding="utf-8"))
+    assert cached["ledger_version"] == new_version
+
+
+def test_block_built_while_ledger_changes_is_not_cached(monkeypatch, tmp_path: Path):
+    _seed(tmp_path)
+    build_or_update_roi([])
+    ledger_path = tmp_path / "roi" / "ledger.json"
+    real_load = rb.load_ledger
+    calls = []
+
+    def load_then_concurrent_cycle(base):
+        rows = real_load(base)
+        calls.append(1)
+        if len(calls) == 1:
+            # un ciclo concorrente salva il ledger ma non ha ancora pubblicato la versione
+            ledger_path.write_text(json.dumps(rows[:-1]), encoding="utf-8")
+        return rows
+
+    monkeypatch.setattr(rb, "load_ledger", load_then_concurrent_cycle)
+    assert "edge_deciles" in resolve_blocks(["deciles"])
+    assert not (tmp_path / "roi" / "blocks" / "deciles.json").exists()
+
+    # blocco ricalcolato (non servito dalla cache con la versione vecchia)
+    resolve_blocks(["deciles"])
+    assert len(calls) == 2
+    assert not (tmp_path / "roi" / "blocks" / "deciles.json").exists()
+
+    # versione ripubblicata sul ledger salvato: la cache torna valida
+    build_or_update_roi([])
+    resolve_blocks(["deciles"])
+    resolve_blocks(["deciles"])
+    assert len(calls) == 3
+    cached = json.loads((tmp_path / "roi" / "blocks" / "deciles.json").read_text(encoding="utf-8"))
+    assert cached["ledger_version"] == _metrics(tmp_path)["ledger_version"]
+
+
+def test_unknown_block_rejected(tmp_path: Path):
+    _seed(tmp_path, 50)
+    build_or_update_roi([])
+    with pytest.raises(ValueError):
+        resolve_blocks(["equity", "nope"])
+
+
+def test_context_dependent_blocks_lazy(monkeypatch, tmp_path: Path):
+    # clv usa lo yield globale, aging il conteggio settled, montecarlo i contributi
+    lazy = ["clv", "montecarlo", "latency", "kelly", "source_efficiency"]
+    monkeypatch.setenv("ROI_LAZY_BLOCKS", ",".join(lazy))
+    monkeypatch.setenv("ENABLE_ROI_AGING_BUCKETS", "1")
+    monkeypatch.setenv("ENABLE_ROI_LATENCY_METRICS", "1")
+    monkeypatch.setenv("ROI_MC_SEED", "7")
+    _reset_settings_cache_for_tests()
+    _seed(tmp_path)
+    build_or_update_roi([])
+    metrics = _metrics(tmp_path)
+    assert "clv" not in metrics and "montecarlo" not in metrics
+    full = _full(monkeypatch, tmp_path)
+    got = resolve_blocks(lazy)
+    for name in lazy:
+        for key in SECTIONS[name]:
+            assert got[key] == full[key], key
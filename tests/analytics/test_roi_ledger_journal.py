@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from analytics.roi import build_or_update_roi, load_ledger
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_LEDGER_JOURNAL", "1")
+    monkeypatch.setenv("ROI_MIN_EDGE", "0.03")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _write_alerts(tmp_path: Path, fixture_ids):
+    alerts_dir = tmp_path / "value_alerts"
+    alerts_dir.mkdir(parents=True, exist_ok=True)
+    alerts = [
+        {
+            "source": "prediction",
+            "value_type": "prediction_value",
+            "fixture_id": fid,
+            "value_side": "home_win",
+            "value_edge": 0.08,
+        }
+        for fid in fixture_ids
+    ]
+    (alerts_dir / "value_alerts.json").write_text(
+        json.dumps({"count": len(alerts), "alerts": alerts}), encoding="utf-8"
+    )
+
+
+def _fx(fid, status, home=None, away=None):
+    return {"fixture_id": fid, "home_score": home, "away_score": away, "status": status}
+
+
+def _journal_ops(roi_dir: Path):
+    path = roi_dir / "ledger_journal.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(l)["op"] for l in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_journal_appends_deltas_and_replays(tmp_path: Path):
+    roi_dir = tmp_path / "roi"
+
+    # ciclo 1: nessun ledger.json → snapshot base completo
+    _write_alerts(tmp_path, [1, 2])
+    build_or_update_roi([_fx(1, "NS"), _fx(2, "NS")])
+    base_before = (roi_dir / "ledger.json").read_text(encoding="utf-8")
+    assert len(json.loads(base_before)) == 2
+    assert _journal_ops(roi_dir) == []
+
+    # ciclo 2: una pick nuova + un settlement → solo append, base intatta
+    _write_alerts(tmp_path, [3])
+    build_or_update_roi([_fx(1, "FT", 2, 0), _fx(2, "NS"), _fx(3, "NS")])
+    assert (roi_dir / "ledger.json").read_text(encoding="utf-8") == base_before
+    assert _journal_ops(roi_dir) == ["add", "settle"]
+
+    ledger = {p["fixture_id"]: p for p in load_ledger(roi_dir)}
+    assert set(ledger) == {1, 2, 3}
+    assert ledger[1]["settled"] is True and ledger[1]["result"] == "win"
+    assert ledger[2]["settled"] is False
+
+    metrics = json.loads((roi_dir / "roi_metrics.json").read_text(encoding="utf-8"))
+    assert metrics["total_picks"] == 3
+    assert metrics["settled_picks"] == 1
+
+
+def test_journal_compaction_and_torn_tail(tmp_path: Path, monkeypatch):
+    roi_dir = tmp_path / "roi"
+    _write_alerts(tmp_path, [1])
+    build_or_update_roi([_fx(1, "NS")])
+
+    _write_alerts(tmp_path, [2])
+    build_or_update_roi([_fx(1, "NS"), _fx(2, "NS")])
+    journal = roi_dir / "ledger_journal.jsonl"
+    # append interrotto a metà riga: ignorato in replay
+    with journal.open("a", encoding="utf-8") as f:
+        f.write('{"op": "add", "pick": {"fixture_id": 9')
+    assert [p["fixture_id"] for p in load_ledger(roi_dir)] == [1, 2]
+
+    # il record successivo non viene fuso con la riga troncata
+    build_or_update_roi([_fx(1, "FT", 0, 1), _fx(2, "NS")])
+    assert load_ledger(roi_dir)[0]["result"] == "loss"
+
+    monkeypatch.setenv("ROI_LEDGER_JOURNAL_MAX_BYTES", "1")
+    _reset_settings_cache_for_tests()
+    build_or_update_roi([_fx(1, "NS"), _fx(2, "FT", 1, 1)])
+    assert not journal.exists()
+    base = json.loads((roi_dir / "ledger.json").read_text(encoding="utf-8"))
+    assert [p["fixture_id"] for p in base] == [1, 2]
+    assert base[0]["result"] == "loss"
+    assert base[1]["result"] == "loss"
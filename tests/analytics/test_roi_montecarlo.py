@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from analytics.roi import compute_metrics
+from analytics.roi_montecarlo import simulate_equity_paths
+from core.config import _reset_settings_cache_for_tests
+
+
+CONTRIBS = [1.2, -1.0, -1.0, 0.8, -0.5, 2.1, -1.0, 0.0, 1.5, -1.0, -1.0, 0.9]
+
+
+def test_seeded_simulation_is_deterministic():
+    a = simulate_equity_paths(CONTRIBS, 500, seed=42)
+    b = simulate_equity_paths(CONTRIBS, 500, seed=42)
+    assert a == b
+    assert a["runs"] == 500 and a["sample_size"] == len(CONTRIBS)
+    assert a["p05_final_equity"] <= a["p50_final_equity"] <= a["p95_final_equity"]
+    dd = a["max_drawdown"]
+    assert 0.0 <= dd["p05"] <= dd["p50"] <= dd["p95"]
+    tuw = a["time_under_water"]
+    assert 0.0 <= tuw["pct"]["p05"] <= tuw["pct"]["p95"] <= 1.0
+    assert 0 <= tuw["longest"]["p95"] <= len(CONTRIBS)
+
+
+def test_path_statistics_on_constant_paths():
+    # tutti i passi in perdita: drawdown = -equity finale, sempre sott'acqua
+    res = simulate_equity_paths([-1.0] * 5, 20, seed=1)
+    assert res["p50_final_equity"] == -5.0
+    assert res["max_drawdown"]["p50"] == 5.0
+    assert res["time_under_water"]["pct"]["p50"] == 1.0
+    assert res["time_under_water"]["longest"]["p50"] == 5.0
+    # solo guadagni: mai sott'acqua
+    res = simulate_equity_paths([0.5] * 5, 20, seed=1)
+    assert res["max_drawdown"]["p95"] == 0.0
+    assert res["time_under_water"]["pct"]["p95"] == 0.0
+
+
+def test_numpy_chunking_does_not_change_results():
+    pytest.importorskip("numpy")
+    a = simulate_equity_paths(CONTRIBS, 1000, seed=7, chunk=1000)
+    b = simulate_equity_paths(CONTRIBS, 1000, seed=7, chunk=64)
+    assert a == b
+
+
+def test_metrics_montecarlo_block_uses_seed(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "dummy")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_MONTECARLO", "1")
+    monkeypatch.setenv("ROI_MC_RUNS", "200")
+    monkeypatch.setenv("ROI_MC_SEED", "123")
+    _reset_settings_cache_for_tests()
+    ledger = [
+        {
+            "fixture_id": i,
+            "created_at": f"2025-01-01T00:{i:02d}:00+00:00",
+            "source": "prediction",
+            "stake": 1.0,
+            "settled": True,
+            "result": "win" if i % 3 == 0 else "loss",
+            "payout": 2.5 if i % 3 == 0 else 0.0,
+        }
+        for i in range(30)
+    ]
+    random.seed(1)
+    first = compute_metrics(ledger)["montecarlo"]
+    random.seed(2)
+    second = compute_metrics(ledger)["montecarlo"]
+    assert first == second
+    assert first["runs"] == 200 and "max_drawdown" in first and "time_under_water" in first
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import monitoring.prometheus_exporter as pe
+from analytics.roi import build_or_update_roi, compute_metrics
+from analytics.roi_profiling import active_profiler, profiling_session
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests
+
+STAGES = {"load", "prune", "alerts", "settlement", "save", "metrics", "timeline", "exports"}
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_PROFILING", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _seed_ledger(tmp_path: Path, n: int = 300) -> None:
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(generate_ledger(n, seed=3)), encoding="utf-8")
+
+
+def test_cycle_writes_timings(tmp_path: Path):
+    _seed_ledger(tmp_path)
+    build_or_update_roi([])
+    metrics = json.loads((tmp_path / "roi" / "roi_metrics.json").read_text(encoding="utf-8"))
+    timings = metrics["_timings"]
+    assert STAGES <= set(timings["stages"])
+    assert timings["stages"]["save"]["calls"] == 2
+    blocks = timings["blocks"]
+    assert {"scan", "rows", "Core", "Contribs", "Series", "EdgeDeciles", "assemble"} <= set(blocks)
+    assert all(rec["sec"] >= 0 for rec in blocks.values())
+    assert timings["alloc_tracking"] is False
+    assert active_profiler() is None
+    # la timeline non vede _timings
+    history = (tmp_path / "roi" / "roi_history.jsonl").read_text(encoding="utf-8")
+    assert "_timings" not in history
+
+
+def test_disabled_leaves_metrics_untouched(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("ENABLE_ROI_PROFILING", "0")
+    _reset_settings_cache_for_tests()
+    _seed_ledger(tmp_path)
+    build_or_update_roi([])
+    metrics = json.loads((tmp_path / "roi" / "roi_metrics.json").read_text(encoding="utf-8"))
+    assert "_timings" not in metrics
+
+
+def test_profiling_does_not_change_metrics():
+    ledger = generate_ledger(400, seed=11)
+    with profiling_session() as prof:
+        assert prof is not None
+        profiled = compute_metrics(ledger)
+    plain = compute_metrics(ledger)
+    plain.pop("generated_at")
+    profiled.pop("generated_at")
+    assert plain == profiled
+
+
+def test_alloc_tracking_nested_peaks(monkeypatch):
+    monkeypatch.setenv("ENABLE_ROI_PROFILING_ALLOC", "1")
+    _reset_settings_cache_for_tests()
+    with profiling_session() as prof:
+        with prof.section("stages", "outer"):
+            with prof.section("blocks", "inner"):
+                buf = [bytes(1024) for _ in range(2000)]
+            del buf
+        res = prof.result()
+    inner = res["blocks"]["inner"]
+    outer = res["stages"]["outer"]
+    assert inner["peak_bytes"] >= 2_000_000
+    # il picco della sezione interna resta visibile a quella esterna
+    assert outer["peak_bytes"] >= inner["peak_bytes"]
+    assert outer["alloc_bytes"] < inner["alloc_bytes"]
+
+
+def test_exporter_observes_each_run_once(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("ENABLE_PROMETHEUS_EXPORTER", "1")
+    _reset_settings_cache_for_tests()
+    _seed_ledger(tmp_path)
+    build_or_update_roi([])
+    monkeypatch.setattr(pe, "_last_roi_timings_run", None)
+
+    def count(stage: str) -> float:
+        return pe._REGISTRY.get_sample_value("bet_roi_stage_seconds_count", {"stage": stage}) or 0.0
+
+    before = count("metrics")
+    pe.update_prom_metrics()
+    pe.update_prom_metrics()
+    assert count("metrics") == before + 1
+    text = pe.generate_prometheus_text().decode("utf-8")
+    assert 'bet_roi_block_seconds_bucket{block="Core"' in text
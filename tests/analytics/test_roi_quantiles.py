@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+import analytics.roi_quantiles as rq
+from analytics.roi import _compute_profit_and_stats, _profit_distribution
+from analytics.roi_engine import _Row
+from analytics.roi_quantiles import QuantileIndex
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_PROFIT_DISTRIBUTION", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _index(n: int = 800, seed: int = 4):
+    ledger = generate_ledger(n, seed=seed)
+    settled = [p for p in ledger if p.get("settled")]
+    return settled, QuantileIndex([_Row(p) for p in settled])
+
+
+@pytest.mark.parametrize("bounds", [(None, 0.05), (0.02, 0.08), (0.1, None), (0.3, 0.1), (None, None)])
+def test_range_totals_match_rescan(bounds):
+    settled, idx = _index()
+    col = idx.column("edge")
+    left, right = bounds
+    picks = [
+        p for p in settled
+        if isinstance(p.get("edge"), (int, float))
+        and (left is None or p["edge"] >= left)
+        and (right is None or p["edge"] < right)
+    ]
+    got = col.range_totals([bounds])[0].stats()
+    exp = _compute_profit_and_stats(picks)
+    assert got == exp
+
+
+def test_histogram_and_quantiles(monkeypatch):
+    settled, idx = _index()
+    col = idx.column("contrib")
+    edges = [-3.0, -1.0, 0.0, 0.5, 10.0]
+    expected = [
+        sum(1 for v in col.values if lo <= v < hi) for lo, hi in zip(edges, edges[1:])
+    ]
+    assert col.histogram(edges) == expected
+    # stesso risultato senza numpy (fallback bisect)
+    monkeypatch.setattr(rq, "np", None)
+    assert col.histogram(edges) == expected
+
+    dist = _profit_distribution([_Row(p).contrib for p in settled])
+    assert round(col.quantile(0.5), 6) == dist["median"]
+    assert round(col.quantile(0.9), 6) == dist["p90"]
+
+
+def test_decile_spans_follow_legacy_assignment():
+    rnd = random.Random(1)
+    # valori ripetuti: alcuni decili restano vuoti e vengono saltati
+    rows = [_Row({"settled": True, "result": "win", "stake": 1, "payout": 2, "edge": rnd.choice([0.01, 0.02, 0.05])})
+            for _ in range(40)]
+    col = QuantileIndex(rows).column("edge")
+    spans = col.decile_spans()
+    assert sum(j - i for _, i, j in spans) == 40
+    assert [d for d, _, _ in spans] == sorted({d for d, _, _ in spans})
+    assert len(spans) == 3
+    assert QuantileIndex(rows[:3]).column("edge").decile_spans() == [(1, 0, 3)]
+
+
+def test_load_index_cached_by_ledger_signature(tmp_path):
+    import json
+
+    roi = tmp_path / "roi"
+    roi.mkdir()
+    (roi / "ledger.json").write_text(json.dumps(generate_ledger(200, seed=1)), encoding="utf-8")
+    first = rq.load_quantile_index()
+    assert rq.load_quantile_index() is first
+    (roi / "ledger.json").write_text(json.dumps(generate_ledger(50, seed=1)), encoding="utf-8")
+    assert len(rq.load_quantile_index().rows) < len(first.rows)
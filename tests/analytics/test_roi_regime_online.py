@@ -0,0 +1,151 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+import analytics.roi_regime as rr
+from analytics.roi import _regime_features, build_or_update_roi, load_ledger, settle_results_batch
+from analytics.roi_engine import compute_blocks_fused
+from analytics.roi_regime import RegimeOnline, regime_drift, replay_regime
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests, get_settings
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_REGIME", "1")
+    monkeypatch.setenv("ROI_REGIME_VERSION", "m1")
+    monkeypatch.setenv("ENABLE_ROI_REGIME_ONLINE", "1")
+    monkeypatch.setenv("ENABLE_ROI_REGIME_PERSISTENCE", "1")
+    monkeypatch.setenv("ROI_REGIME_LOOKBACK", "40")
+    monkeypatch.setenv("ROI_REGIME_MIN_POINTS", "10")
+    monkeypatch.setenv("ROI_REGIME_MOMENTUM_WINDOWS", "5,30,60")
+    monkeypatch.setenv("ROI_LEDGER_MAX_AGE_DAYS", "0")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _curve(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    eq, e = [], 0.0
+    for _ in range(n):
+        e += rnd.choice([1.1, -1.0, -1.0, 0.0, 2.5])
+        eq.append(round(e, 6))
+    return eq
+
+
+def test_sliding_features_match_batch():
+    s = get_settings()
+    eq = _curve(300)
+    st = RegimeOnline(s)
+    for i, y in enumerate(eq, start=1):
+        st.push(y, s)
+        exp = _regime_features(eq[:i], s)
+        got = st.features()
+        assert got.keys() == exp.keys()
+        for k, v in exp.items():
+            if k == "momentum_windows":
+                for w, mv in v.items():
+                    assert got[k][w] == pytest.approx(mv, abs=1e-9)
+            else:
+                assert got[k] == pytest.approx(v, abs=1e-9), k
+
+
+def test_chunked_updates_equal_replay():
+    s = get_settings()
+    eq = _curve(400, seed=3)
+    rnd = random.Random(5)
+    st, pos = RegimeOnline(s), 0
+    while pos < len(eq):
+        k = rnd.randint(0, 25)
+        # ogni ciclo riparte dallo stato persistito
+        st = RegimeOnline.from_dict(json.loads(json.dumps(st.to_dict())), s)
+        for y in eq[pos:pos + k]:
+            st.push(y, s)
+        pos += k
+    assert regime_drift(st, replay_regime(eq, s)) == []
+    assert st.label is not None
+
+
+def _state(tmp_path: Path):
+    return json.loads((tmp_path / "roi" / "roi_regime_state.json").read_text(encoding="utf-8"))
+
+
+def test_pipeline_folds_only_new_settlements(monkeypatch, tmp_path: Path):
+    ledger = generate_ledger(300, seed=9)
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+
+    build_or_update_roi([])
+    first = _state(tmp_path)["online"]
+    settled = sum(1 for p in ledger if p["settled"])
+    assert first["points"] == settled
+
+    # ciclo senza nuovi settlement: stato invariato (nessun passo di smoothing)
+    build_or_update_roi([])
+    assert _state(tmp_path)["online"] == first
+
+    open_ids = [p["fixture_id"] for p in ledger if not p["settled"]]
+    with monkeypatch.context() as m:
+        m.setattr(rr, "replay_regime", lambda *a, **k: pytest.fail("replay inatteso"))
+        n = settle_results_batch(
+            [{"fixture_id": fid, "status": "FT", "home_score": 0, "away_score": 1} for fid in open_ids]
+        )
+    assert n > 0
+    state = _state(tmp_path)["online"]
+    assert state["points"] == settled + n
+
+    s = get_settings()
+    curve = compute_blocks_fused(load_ledger(roi))["equity_curve"]
+    loaded = RegimeOnline.from_dict(state, s)
+    assert regime_drift(loaded, replay_regime(curve, s)) == []
+    metrics = json.loads((roi / "roi_metrics.json").read_text(encoding="utf-8"))
+    assert metrics["regime"]["online"] is True
+    assert metrics["regime"]["points"] == settled + n
+
+
+def test_old_open_pick_settling_does_not_replay(monkeypatch, tmp_path: Path):
+    ledger = generate_ledger(300, seed=9)
+    settled_keys = sorted(p["created_at"] for p in ledger if p["settled"])
+    # pick aperta più vecchia di metà della serie settled
+    old = next(p for p in ledger if not p["settled"])
+    old["created_at"] = settled_keys[len(settled_keys) // 2]
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+
+    build_or_update_roi([])
+    settled = len(settled_keys)
+    frozen = sum(1 for c in settled_keys if c < old["created_at"])
+    state = _state(tmp_path)
+    assert state["online"]["points"] == frozen
+    metrics = json.loads((roi / "roi_metrics.json").read_text(encoding="utf-8"))
+    assert metrics["regime"]["points"] == settled
+    history, changed_at = state["history"], state["changed_at"]
+    assert history and changed_at == history[-1]["changed_at"]
+
+    # cicli senza cambi di label: history e changed_at fermi
+    build_or_update_roi([])
+    assert _state(tmp_path)["history"] == history
+    assert _state(tmp_path)["changed_at"] == changed_at
+
+    open_ids = [p["fixture_id"] for p in ledger if not p["settled"]]
+    with monkeypatch.context() as m:
+        m.setattr(rr, "replay_regime", lambda *a, **k: pytest.fail("replay inatteso"))
+        n = settle_results_batch(
+            [{"fixture_id": fid, "status": "FT", "home_score": 0, "away_score": 1} for fid in open_ids]
+        )
+    assert n == len(open_ids)
+    state = _state(tmp_path)
+    assert state["online"]["points"] == settled + n
+    s = get_settings()
+    curve = compute_blocks_fused(load_ledger(roi))["equity_curve"]
+    assert regime_drift(RegimeOnline.from_dict(state["online"], s), replay_regime(curve, s)) == []
+    labels = [h["label"] for h in state["history"]]
+    assert all(a != b for a, b in zip(labels, labels[1:]))
@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from analytics.roi import build_or_update_roi, load_ledger, save_ledger, settle_results_batch
+from core.config import _reset_settings_cache_for_tests
+from core.normalization import normalize_api_football_fixture
+from providers.football_data.fixtures_provider import _normalize
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ROI_MIN_EDGE", "0.03")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _seed_open_picks(tmp_path: Path, n: int, fixtures=None):
+    fixtures = fixtures or [{"fixture_id": fid, "status": "NS"} for fid in range(1, n + 1)]
+    alerts_dir = tmp_path / "value_alerts"
+    alerts_dir.mkdir(parents=True, exist_ok=True)
+    alerts = [
+        {
+            "source": "prediction",
+            "value_type": "prediction_value",
+            "fixture_id": fx["fixture_id"],
+            "value_side": "home_win",
+            "value_edge": 0.08,
+        }
+        for fx in fixtures
+    ]
+    (alerts_dir / "value_alerts.json").write_text(json.dumps({"alerts": alerts}), encoding="utf-8")
+    build_or_update_roi(fixtures)
+
+
+def _fd_match(mid: int, home: str, away: str, status: str, ft_home, ft_away) -> dict:
+    """Match come restituito da football-data.org /v4/matches."""
+    return {
+        "area": {"id": 2072, "name": "England", "code": "ENG"},
+        "competition": {"id": 2021, "name": "Premier League", "code": "PL", "type": "LEAGUE"},
+        "season": {"id": 2287, "startDate": "2024-08-16", "endDate": "2025-05-25", "currentMatchday": 1},
+        "id": mid,
+        "utcDate": "2024-08-16T19:00:00Z",
+        "status": status,
+        "matchday": 1,
+        "stage": "REGULAR_SEASON",
+        "lastUpdated": "2024-08-17T00:20:51Z",
+        "homeTeam": {"id": 66, "name": home, "shortName": home.replace(" FC", ""), "tla": home[:3].upper()},
+        "awayTeam": {"id": 63, "name": away, "shortName": away.replace(" FC", ""), "tla": away[:3].upper()},
+        "score": {
+            "winner": None,
+            "duration": "REGULAR",
+            "fullTime": {"home": ft_home, "away": ft_away},
+            "halfTime": {"home": None, "away": None},
+        },
+    }
+
+
+def _results_record(m: dict) -> dict:
+    """Riga di history/results.jsonl come scritta da scripts/fetch_results_football_data.py."""
+    return {
+        "id": m.get("id"),
+        "utcDate": m.get("utcDate"),
+        "competition": (m.get("competition") or {}).get("code"),
+        "home": (m.get("homeTeam") or {}).get("name"),
+        "away": (m.get("awayTeam") or {}).get("name"),
+        "fullTime": ((m.get("score") or {}).get("fullTime") or {}),
+        "status": m.get("status"),
+    }
+
+
+def test_settle_results_batch_from_football_data_records(tmp_path: Path):
+    matches = [
+        _fd_match(497410, "Manchester United FC", "Fulham FC", "TIMED", None, None),
+        _fd_match(497411, "Ipswich Town FC", "Liverpool FC", "TIMED", None, None),
+        _fd_match(497412, "Arsenal FC", "Wolverhampton Wanderers FC", "TIMED", None, None),
+    ]
+    # pick create dal feed football-data (PROVIDER_SOURCE=fd) e da API-Football
+    fd_fixtures = [_normalize(m) for m in matches]
+    _seed_open_picks(tmp_path, 0, fixtures=fd_fixtures + [{"fixture_id": 4, "status": "NS"}, {"fixture_id": 5, "status": "NS"}])
+
+    finished = [
+        _fd_match(497410, "Manchester United FC", "Fulham FC", "FINISHED", 1, 0),
+        _fd_match(497411, "Ipswich Town FC", "Liverpool FC", "FINISHED", 0, 2),
+        _fd_match(497412, "Arsenal FC", "Wolverhampton Wanderers FC", "IN_PLAY", None, None),
+        # id football-data che coincide con una pick API-Football: non va settled
+        _fd_match(4, "Everton FC", "Brighton & Hove Albion FC", "FINISHED", 0, 3),
+    ]
+    results = [_results_record(m) for m in finished]
+    # fixture normalizzata API-Football
+    results.append({"fixture_id": 5, "status": "FT", "home_score": 3, "away_score": 1})
+    assert settle_results_batch(results) == 3
+
+    ledger = {p["fixture_id"]: p for p in load_ledger(tmp_path / "roi")}
+    assert ledger[497410]["result"] == "win" and ledger[497410]["provider"] == "football-data"
+    assert ledger[497411]["result"] == "loss"
+    assert ledger[5]["result"] == "win" and ledger[5]["provider"] == "api_football"
+    assert not ledger[497412]["settled"] and not ledger[4]["settled"]
+
+    metrics = json.loads((tmp_path / "roi" / "roi_metrics.json").read_text(encoding="utf-8"))
+    assert metrics["settled_picks"] == 3
+    assert metrics["open_picks"] == 2
+
+    # ripetere lo stesso batch non risettla nulla
+    assert settle_results_batch(results) == 0
+
+
+def test_cycle_settlement_only_touches_finished_fixtures(tmp_path: Path):
+    _seed_open_picks(tmp_path, 3)
+    (tmp_path / "value_alerts" / "value_alerts.json").write_text(json.dumps({"alerts": []}), encoding="utf-8")
+    build_or_update_roi([
+        {"fixture_id": 1, "status": "FT", "home_score": 1, "away_score": 0},
+        {"fixture_id": 2, "status": "1H", "home_score": 1, "away_score": 0},
+    ])
+    ledger = {p["fixture_id"]: p for p in load_ledger(tmp_path / "roi")}
+    assert ledger[1]["settled"] and ledger[1]["result"] == "win"
+    assert not ledger[2]["settled"] and not ledger[3]["settled"]
+
+
+def _api_football_item(fid: int, short: str, home, away) -> dict:
+    """Item raw di API-Football /fixtures."""
+    return {
+        "fixture": {"id": fid, "date": "2024-08-16T19:00:00+00:00", "status": {"short": short}},
+        "league": {"id": 39, "season": 2024},
+        "teams": {"home": {"name": "Arsenal"}, "away": {"name": "Chelsea"}},
+        "goals": {"home": home, "away": away},
+    }
+
+
+def test_legacy_untagged_pick_settled_by_normalized_fixture(tmp_path: Path):
+    _seed_open_picks(tmp_path, 2)
+    base = tmp_path / "roi"
+    # ledger precedente al tag provider: nessun campo "provider"
+    ledger = load_ledger(base)
+    for p in ledger:
+        p.pop("provider", None)
+    save_ledger(base, ledger)
+
+    results = [
+        normalize_api_football_fixture(_api_football_item(1, "FT", 2, 0)),
+        # stesso id ma dal feed football-data: spazio id diverso
+        {"id": 2, "status": "FINISHED", "fullTime": {"home": 2, "away": 0}},
+    ]
+    assert settle_results_batch(results) == 1
+    by_id = {p["fixture_id"]: p for p in load_ledger(base)}
+    assert by_id[1]["settled"] and by_id[1]["result"] == "win"
+    assert not by_id[2]["settled"]
+
+    # anche nel ciclo completo la fixture normalizzata chiude la pick legacy
+    (tmp_path / "value_alerts" / "value_alerts.json").write_text(json.dumps({"alerts": []}), encoding="utf-8")
+    build_or_update_roi([normalize_api_football_fixture(_api_football_item(2, "FT", 0, 1))])
+    by_id = {p["fixture_id"]: p for p in load_ledger(base)}
+    assert by_id[2]["settled"] and by_id[2]["result"] == "loss"
@@ -0,0 +1,80 @@
+import math
+import random
+
+import pytest
+
+from analytics.roi_rolling import RollingIndex
+
+
+def _series(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    contribs, stakes, wins = [], [], []
+    for _ in range(n):
+        stake = rnd.choice([1.0, 0.5, 2.0])
+        win = rnd.random() < 0.45
+        contribs.append(stake * (rnd.uniform(0.3, 2.5) if win else -1.0))
+        stakes.append(stake)
+        wins.append(win)
+    return contribs, stakes, wins
+
+
+def _brute(contribs, stakes, wins, w):
+    c, st, wn = contribs[-w:], stakes[-w:], wins[-w:]
+    profit = sum(c)
+    equity, running = [], 0.0
+    for x in contribs:
+        running += x
+        equity.append(running)
+    inc = [equity[i] - equity[i - 1] for i in range(1, len(equity))]
+    inc = inc[-w:]
+    if len(inc) > 1:
+        m = sum(inc) / len(inc)
+        vol = math.sqrt(sum((x - m) ** 2 for x in inc) / len(inc))
+    else:
+        vol = 0.0
+    run = peak = mdd = 0.0
+    for x in c:
+        run += x
+        peak = max(peak, run)
+        mdd = max(mdd, peak - run)
+    return {
+        "picks": len(c),
+        "profit": profit,
+        "yield": profit / sum(st) if sum(st) > 0 else 0.0,
+        "hit_rate": sum(wn) / len(c) if c else 0.0,
+        "vol": vol,
+        "peak": peak,
+        "mdd": mdd,
+    }
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 7, 500])
+def test_windows_match_brute_force(n):
+    contribs, stakes, wins = _series(n)
+    idx = RollingIndex(contribs, stakes, wins)
+    assert len(idx) == n
+    for w in (1, 2, 3, 25, 100, 499, 500, 5000):
+        exp = _brute(contribs, stakes, wins, w)
+        k, profit, stake, won = idx.window(w)
+        assert k == exp["picks"]
+        assert profit == pytest.approx(exp["profit"], abs=1e-9)
+        stats = idx.window_stats(w)
+        assert stats["yield"] == pytest.approx(exp["yield"], abs=1e-6)
+        assert stats["hit_rate"] == pytest.approx(exp["hit_rate"], abs=1e-6)
+        assert idx.volatility(w) == pytest.approx(exp["vol"], abs=1e-9)
+        peak, mdd = idx.drawdown(w)
+        assert peak == pytest.approx(exp["peak"], abs=1e-9)
+        assert mdd == pytest.approx(exp["mdd"], abs=1e-9)
+
+
+def test_volatility_from_equity_only():
+    contribs, stakes, wins = _series(300, seed=4)
+    full = RollingIndex(contribs, stakes, wins)
+    equity, running = [], 0.0
+    for x in contribs:
+        running += x
+        equity.append(running)
+    vol_only = RollingIndex.from_equity(equity)
+    for w in (2, 30, 100, 1000):
+        assert vol_only.volatility(w) == full.volatility(w)
+    assert len(vol_only) == 0
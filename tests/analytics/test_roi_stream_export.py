@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from analytics.roi import build_or_update_roi, settle_results_batch
+from analytics.roi_export import COLUMN_NAMES, export_dir, iter_export_rows
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_STREAM_EXPORT", "1")
+    monkeypatch.setenv("ROI_EXPORT_FORMAT", "csv.gz")
+    monkeypatch.setenv("ROI_EXPORT_CHUNK_ROWS", "150")
+    monkeypatch.setenv("ROI_LEDGER_MAX_AGE_DAYS", "0")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _seed(tmp_path: Path, n: int = 400):
+    ledger = generate_ledger(n, seed=8)
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+    return ledger
+
+
+def _manifest():
+    return json.loads((export_dir() / "manifest.json").read_text(encoding="utf-8"))
+
+
+def _settle(ledger, k: int) -> int:
+    open_ids = [p["fixture_id"] for p in ledger if not p["settled"]][:k]
+    return settle_results_batch(
+        [{"fixture_id": fid, "status": "FT", "home_score": 1, "away_score": 0} for fid in open_ids]
+    )
+
+
+def test_full_then_incremental(monkeypatch, tmp_path: Path):
+    # coda quasi piena: i settlement la completano e aprono un nuovo part
+    monkeypatch.setenv("ROI_EXPORT_CHUNK_ROWS", "201")
+    _reset_settings_cache_for_tests()
+    ledger = _seed(tmp_path)
+    build_or_update_roi([])
+    m = _manifest()
+    assert m["format"] == "csv.gz" and m["columns"] == COLUMN_NAMES
+    assert m["rows"] == m["last_seq"] == len(ledger)
+    assert [p["rows"] for p in m["parts"]] == [201, 199]
+    # il CSV legacy non viene più riscritto
+    assert not (tmp_path / "roi" / "roi_export.csv").exists()
+
+    # ciclo senza modifiche: nessuna riga
+    build_or_update_roi([])
+    assert _manifest()["last_seq"] == len(ledger)
+
+    settled = _settle(ledger, 80)
+    assert settled > 0
+    m = _manifest()
+    assert m["last_seq"] == len(ledger) + settled
+    total = len(ledger) + settled
+    assert [p["rows"] for p in m["parts"]] == [min(201, total - i) for i in range(0, total, 201)]
+
+    rows = list(iter_export_rows())
+    assert [int(r["export_seq"]) for r in rows] == list(range(1, m["last_seq"] + 1))
+    latest = {}
+    for r in rows:
+        latest[(r["fixture_id"], r["source"])] = r
+    assert len(latest) == len(ledger)
+    assert sum(r["settled"] == "True" for r in latest.values()) == sum(p["settled"] for p in ledger) + settled
+
+
+def test_tail_repaired_after_interrupted_append(tmp_path: Path):
+    ledger = _seed(tmp_path, 200)
+    build_or_update_roi([])
+    tail = export_dir() / _manifest()["parts"][-1]["file"]
+    with tail.open("ab") as f:
+        f.write(b"\x1f\x8b\x08garbage")
+    settled = _settle(ledger, 5)
+    assert len(list(iter_export_rows())) == 200 + settled
+
+
+def test_out_of_band_ledger_change_rebuilds(tmp_path: Path):
+    ledger = _seed(tmp_path, 200)
+    build_or_update_roi([])
+    (tmp_path / "roi" / "ledger.json").write_text(json.dumps(ledger[:120]), encoding="utf-8")
+    build_or_update_roi([])
+    m = _manifest()
+    assert m["last_seq"] == 120
+    assert sorted(p.name for p in export_dir().glob("part-*")) == [p["file"] for p in m["parts"]]
+
+
+def test_parquet_when_pyarrow_available(monkeypatch, tmp_path: Path):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv("ROI_EXPORT_FORMAT", "auto")
+    _reset_settings_cache_for_tests()
+    ledger = _seed(tmp_path, 200)
+    build_or_update_roi([])
+    settled = _settle(ledger, 10)
+    m = _manifest()
+    assert m["format"] == "parquet"
+    rows = list(iter_export_rows())
+    assert len(rows) == 200 + settled
+    assert isinstance(rows[0]["export_seq"], int)
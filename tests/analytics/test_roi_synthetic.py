@@ -0,0 +1,45 @@
+import pytest
+
+from analytics.roi import _compute_profit_and_stats, compute_metrics
+from analytics.roi_synthetic import generate_ledger
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_LEAGUE_BREAKDOWN", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def test_generator_is_deterministic_and_realistic():
+    a = generate_ledger(2000, seed=3)
+    assert a == generate_ledger(2000, seed=3)
+    assert a != generate_ledger(2000, seed=4)
+
+    created = [p["created_at"] for p in a]
+    assert created == sorted(created)
+    assert {p["source"] for p in a} == {"prediction", "consensus", "merged"}
+    assert len({p["league_id"] for p in a}) > 10
+
+    settled = [p for p in a if p["settled"]]
+    assert 0.9 < len(settled) / len(a) < 1.0
+    assert all(p["result"] in ("win", "loss") and "settled_at" in p for p in settled)
+    assert any("clv_pct" in p for p in settled)
+    kelly = [p for p in a if p["stake_strategy"] == "kelly"]
+    assert kelly and all(0 < p["kelly_fraction_capped"] <= 0.1 for p in kelly)
+
+    stats = _compute_profit_and_stats(a)
+    assert stats["picks"] == 2000 and stats["settled"] == len(settled)
+
+
+def test_metrics_on_synthetic_ledger():
+    ledger = generate_ledger(500, seed=1)
+    m = compute_metrics(ledger)
+    assert m["total_picks"] == 500
+    assert m["settled_picks"] == sum(1 for p in ledger if p["settled"])
+    assert len(m["league_breakdown"]) > 1
@@ -0,0 +1,122 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+import analytics.roi_timeline as rt
+from analytics.roi_timeline import (
+    append_timeline_record,
+    load_daily_rollup,
+    load_timeline_index,
+    query_timeline,
+    update_daily_rollup,
+)
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ROI_TIMELINE_INDEX_EVERY", "4")
+    monkeypatch.setattr(rt, "_TAIL_BLOCK", 97)
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _records(n: int):
+    t0 = datetime(2025, 10, 1, tzinfo=timezone.utc)
+    return [
+        {"ts": (t0 + timedelta(hours=7 * i)).isoformat(), "total_picks": i, "profit_units": i * 0.1}
+        for i in range(n)
+    ]
+
+
+def _brute(records, start=None, end=None, limit=None):
+    out = [r for r in records if (not start or r["ts"][:10] >= start) and (not end or r["ts"][:10] <= end)]
+    return out[-limit:] if limit is not None else out
+
+
+def test_query_matches_full_scan(tmp_path: Path):
+    path = tmp_path / "roi_history.jsonl"
+    records = _records(60)
+    for r in records:
+        append_timeline_record(path, r)
+    idx = load_timeline_index(path)
+    assert idx["count"] == 60 and len(idx["entries"]) == 15 and idx["sorted"]
+
+    cases = [
+        (None, None, None),
+        (None, None, 5),
+        ("2025-10-05", None, None),
+        ("2025-10-05", "2025-10-09", None),
+        ("2025-10-05", "2025-10-09", 3),
+        (None, "2025-10-03", 200),
+        ("2025-12-01", None, 10),
+        ("2025-10-01", "2025-10-01", 1),
+    ]
+    for start, end, limit in cases:
+        assert query_timeline(path, start, end, limit) == _brute(records, start, end, limit), (start, end, limit)
+
+
+def test_index_catches_up_and_unsorted_fallback(tmp_path: Path):
+    path = tmp_path / "roi_history.jsonl"
+    records = _records(10)
+    for r in records[:6]:
+        append_timeline_record(path, r)
+    # righe scritte senza passare dallo store + coda troncata
+    with path.open("a", encoding="utf-8") as f:
+        for r in records[6:]:
+            f.write(json.dumps(r) + "\n")
+        f.write('{"ts": "2025-')
+    assert query_timeline(path, limit=4) == records[-4:]
+    assert load_timeline_index(path)["count"] == 10
+
+    late = {"ts": "2025-10-01T00:30:00+00:00", "total_picks": -1}
+    append_timeline_record(path, late)
+    assert load_timeline_index(path)["sorted"] is False
+    assert query_timeline(path, end_day="2025-10-01")[:2] == [records[0], late]
+
+
+def test_daily_rollup_current_and_rollover(tmp_path: Path, monkeypatch):
+    daily = tmp_path / "roi_daily.json"
+    rec = {"settled_picks": 1, "yield": 0.1, "hit_rate": 0.5}
+    monkeypatch.setattr(rt, "_utc_day", lambda: "2025-10-01")
+    update_daily_rollup(daily, {**rec, "ts": "2025-10-01T10:00:00Z", "total_picks": 1, "profit_units": 0.5})
+    update_daily_rollup(daily, {**rec, "ts": "2025-10-01T12:00:00Z", "total_picks": 2, "profit_units": 0.7})
+    # roi_daily.json completo: la riga del giorno corrente è già nel file
+    on_disk = json.loads(daily.read_text(encoding="utf-8"))
+    assert on_disk["2025-10-01"]["runs"] == 2
+    assert on_disk["2025-10-01"]["first_ts"] == "2025-10-01T10:00:00Z"
+    assert on_disk["2025-10-01"]["profit_units"] == 0.7
+    assert load_daily_rollup(daily) == on_disk
+
+    monkeypatch.setattr(rt, "_utc_day", lambda: "2025-10-02")
+    update_daily_rollup(daily, {**rec, "ts": "2025-10-02T08:00:00Z", "total_picks": 3, "profit_units": 0.9})
+    on_disk = json.loads(daily.read_text(encoding="utf-8"))
+    assert list(on_disk) == ["2025-10-01", "2025-10-02"]
+    assert on_disk["2025-10-01"]["runs"] == 2
+    assert on_disk["2025-10-02"]["runs"] == 1
+
+
+def test_daily_rollup_absorbs_legacy_current_file(tmp_path: Path, monkeypatch):
+    daily = tmp_path / "roi_daily.json"
+    daily.write_text(json.dumps({"2025-09-30": {"runs": 4}}), encoding="utf-8")
+    legacy = tmp_path / "roi_daily.current.json"
+    legacy.write_text(
+        json.dumps({"day": "2025-10-01", "entry": {"first_ts": "2025-10-01T09:00:00Z", "runs": 3}}),
+        encoding="utf-8",
+    )
+    assert load_daily_rollup(daily)["2025-10-01"]["runs"] == 3
+
+    monkeypatch.setattr(rt, "_utc_day", lambda: "2025-10-01")
+    rec = {"settled_picks": 1, "yield": 0.1, "hit_rate": 0.5, "total_picks": 1, "profit_units": 0.5}
+    update_daily_rollup(daily, {**rec, "ts": "2025-10-01T18:00:00Z"})
+    assert not legacy.exists()
+    on_disk = json.loads(daily.read_text(encoding="utf-8"))
+    assert on_disk["2025-09-30"]["runs"] == 4
+    assert on_disk["2025-10-01"]["runs"] == 4
+    assert on_disk["2025-10-01"]["first_ts"] == "2025-10-01T09:00:00Z"
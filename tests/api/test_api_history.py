@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from core import history_store
+from core.config import _reset_settings_cache_for_tests
+
+T0 = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def _fixtures(minute: int):
+    # fixture 1 (lega 10) segna al minuto 2, fixture 3 (lega 20) appare al minuto 3
+    out = [
+        {"fixture_id": 1, "league_id": 10, "status": "1H" if minute >= 2 else "NS", "home_score": 1 if minute >= 2 else None},
+        {"fixture_id": 2, "league_id": 10, "status": "NS", "home_score": None},
+    ]
+    if minute >= 3:
+        out.append({"fixture_id": 3, "league_id": 20, "status": "NS", "home_score": None})
+    return out
+
+
+def _write_full(tmp_path: Path, minutes):
+    hdir = tmp_path / "history"
+    hdir.mkdir(parents=True, exist_ok=True)
+    for m in minutes:
+        stamp = (T0 + timedelta(minutes=m)).strftime("%Y%m%d_%H%M%S_%f")
+        (hdir / f"fixtures_{stamp}.json").write_text(json.dumps(_fixtures(m)), encoding="utf-8")
+    (hdir / "README.txt").write_text("non uno snapshot", encoding="utf-8")
+
+
+def _at(minute: float) -> str:
+    return (T0 + timedelta(minutes=minute)).isoformat().replace("+00:00", "Z")
+
+
+def test_full_snapshots_point_in_time(client, tmp_path):
+    _write_full(tmp_path, [0, 2, 3])
+
+    r = client.get("/history/fixtures/1", params={"at": _at(1.5)})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["source"] == "full" and body["as_of"].startswith("2026-01-10T12:00:00")
+    assert body["fixture"]["status"] == "NS"
+    assert client.get("/history/fixtures/1", params={"at": _at(2)}).json()["fixture"]["status"] == "1H"
+
+    league = client.get("/history/fixtures", params={"at": _at(5), "league_id": 20}).json()
+    assert league["count"] == 1 and league["fixtures"][0]["fixture_id"] == 3
+    assert client.get("/history/fixtures", params={"at": _at(2.5)}).json()["count"] == 2
+
+    assert client.get("/history/fixtures/3", params={"at": _at(2.5)}).status_code == 404
+    assert client.get("/history/fixtures", params={"at": _at(-1)}).status_code == 404
+    assert client.get("/history/fixtures", params={"at": "ieri"}).status_code == 400
+
+    bounds = client.get("/history/bounds").json()
+    assert bounds["full"]["snapshots"] == 3 and bounds["delta"]["records"] == 0
+
+
+def test_delta_store_point_in_time(client, monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_MODE", "delta")
+    for m in (0, 2, 3):
+        history_store.record_snapshot(_fixtures(m), ts=T0 + timedelta(minutes=m), base=tmp_path)
+
+    body = client.get("/history/fixtures/1", params={"at": _at(2.5)}).json()
+    assert body["source"] == "delta" and body["fixture"]["home_score"] == 1
+    league = client.get("/history/fixtures", params={"at": _at(3), "league_id": 10}).json()
+    assert league["count"] == 2
+    assert client.get("/history/fixtures/3", params={"at": _at(1)}).status_code == 404
+
+
+def test_new_snapshot_visible_after_index_built(client, tmp_path):
+    _write_full(tmp_path, [0])
+    assert client.get("/history/fixtures", params={"at": _at(9)}).json()["count"] == 2
+    _write_full(tmp_path, [3])
+    assert client.get("/history/fixtures", params={"at": _at(9)}).json()["count"] == 3
@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import analytics.roi_blocks as rb
+from analytics.roi import build_or_update_roi
+from analytics.roi_synthetic import generate_ledger
+from api.app import create_app
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_LAZY_BLOCKS", "1")
+    monkeypatch.setenv("ROI_LEDGER_MAX_AGE_DAYS", "0")
+    monkeypatch.setenv("ENABLE_ROI_EDGE_DECILES", "1")
+    rb._BLOCKS.clear()
+    _reset_settings_cache_for_tests()
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(generate_ledger(200, seed=9)), encoding="utf-8")
+    build_or_update_roi([])
+    yield
+    _reset_settings_cache_for_tests()
+
+
+@pytest.fixture
+def client():
+    return TestClient(create_app())
+
+
+def test_roi_blocks_subset(client, tmp_path: Path):
+    r = client.get("/roi", params={"blocks": "equity,clv,deciles"})
+    assert r.status_code == 200
+    body = r.json()
+    metrics = body["metrics"]
+    assert body["filters"]["blocks"] == ["equity", "clv", "deciles"]
+    assert {"peak_profit", "clv", "edge_deciles", "ledger_version"} <= set(metrics)
+    assert "total_picks" not in metrics
+    assert len(metrics["edge_deciles"]) > 0
+    assert (tmp_path / "roi" / "blocks" / "deciles.json").exists()
+
+
+def test_roi_full_without_blocks_keeps_lazy_out(client):
+    metrics = client.get("/roi").json()["metrics"]
+    assert "edge_deciles" not in metrics
+    assert "deciles" in metrics["lazy_blocks"]
+
+
+def test_roi_blocks_unknown(client):
+    r = client.get("/roi", params={"blocks": "equity,bogus"})
+    assert r.status_code == 400
+
+
+def test_roi_analytics_resolves_lazy(client):
+    body = client.get("/roi/analytics").json()
+    assert len(body["edge_deciles"]) > 0
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from analytics.roi import compute_metrics
+from analytics.roi_synthetic import generate_ledger
+from api.app import create_app
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ENABLE_ROI_PROFIT_BUCKETS", "1")
+    monkeypatch.setenv("ENABLE_ROI_PROFIT_DISTRIBUTION", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+@pytest.fixture
+def client():
+    return TestClient(create_app())
+
+
+def _write_ledger(tmp_path: Path, ledger):
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+
+
+def test_default_buckets_match_metrics(client, tmp_path: Path):
+    ledger = generate_ledger(500, seed=6)
+    _write_ledger(tmp_path, ledger)
+    metrics = compute_metrics(ledger)
+
+    body = client.get("/roi/buckets", params={"column": "edge"}).json()
+    by_range = {b["range"]: b for b in body["buckets"]}
+    for exp in metrics["edge_buckets"]:
+        got = by_range[exp["range"]]
+        for field in ("picks", "profit_units", "yield", "hit_rate"):
+            assert got[field] == exp[field], (exp["range"], field)
+
+    body = client.get("/roi/buckets", params={"column": "profit", "q": "0.1,0.5,0.9"}).json()
+    assert [b["picks"] for b in body["buckets"]] == [b["picks"] for b in metrics["profit_buckets"]]
+    dist = metrics["profit_distribution"]
+    assert body["quantiles"] == {"p10": dist["p10"], "p50": dist["median"], "p90": dist["p90"]}
+
+
+def test_custom_ranges(client, tmp_path: Path):
+    ledger = generate_ledger(300, seed=2)
+    _write_ledger(tmp_path, ledger)
+    body = client.get("/roi/buckets", params={"column": "edge", "ranges": "-0.05-0.03,0.03-"}).json()
+    settled = [p for p in ledger if p.get("settled") and isinstance(p.get("edge"), (int, float))]
+    assert body["points"] == len(settled)
+    assert body["buckets"][0]["picks"] == sum(1 for p in settled if -0.05 <= p["edge"] < 0.03)
+    assert body["buckets"][1]["picks"] == sum(1 for p in settled if p["edge"] >= 0.03)
+
+
+def test_bad_params(client, tmp_path: Path):
+    _write_ledger(tmp_path, [])
+    assert client.get("/roi/buckets", params={"column": "odds"}).status_code == 400
+    assert client.get("/roi/buckets", params={"ranges": "abc"}).status_code == 400
+    assert client.get("/roi/buckets", params={"q": "1.5"}).status_code == 400
+    assert client.get("/roi/buckets", params={"q": "x"}).status_code == 400
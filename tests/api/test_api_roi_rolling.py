@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from analytics.roi import compute_metrics
+from analytics.roi_synthetic import generate_ledger
+from api.app import create_app
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_ROI_TRACKING", "1")
+    monkeypatch.setenv("ROI_ROLLING_WINDOWS", "25,100")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+@pytest.fixture
+def client():
+    return TestClient(create_app())
+
+
+def _write_ledger(tmp_path: Path, ledger):
+    roi = tmp_path / "roi"
+    roi.mkdir(parents=True, exist_ok=True)
+    (roi / "ledger.json").write_text(json.dumps(ledger), encoding="utf-8")
+
+
+def test_rolling_matches_metrics(client, tmp_path: Path):
+    ledger = generate_ledger(600, seed=2)
+    _write_ledger(tmp_path, ledger)
+    metrics = compute_metrics(ledger)
+    body = client.get("/roi/rolling", params={"drawdown": "true"}).json()
+    assert body["points"] == metrics["settled_picks"]
+    for key, exp in metrics["rolling_multi"].items():
+        got = body["windows"][key]
+        for field in ("picks", "profit_units", "yield", "hit_rate", "peak_profit", "max_drawdown"):
+            assert got[field] == pytest.approx(exp[field], abs=1e-6), (key, field)
+
+
+def test_rolling_step_windows_and_cache_refresh(client, tmp_path: Path):
+    ledger = generate_ledger(300, seed=3)
+    _write_ledger(tmp_path, ledger)
+    body = client.get("/roi/rolling", params={"step": 25, "max_window": 5000}).json()
+    assert len(body["windows"]) == 200
+    assert "max_drawdown" not in body["windows"]["w25"]
+    first = body["points"]
+
+    _write_ledger(tmp_path, ledger[:150])
+    assert client.get("/roi/rolling", params={"windows": "10"}).json()["points"] < first
+
+
+def test_rolling_bad_params(client, tmp_path: Path):
+    _write_ledger(tmp_path, [])
+    assert client.get("/roi/rolling", params={"windows": "10,x"}).status_code == 400
+    assert client.get("/roi/rolling", params={"windows": "0"}).status_code == 400
+    assert client.get("/roi/rolling", params={"step": 5}).status_code == 400
+    assert client.get("/roi/rolling", params={"step": 1, "max_window": 5000}).status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import create_app
+from api.push import ClientFilter, PushHub
+from api.routes.stream import _sse
+from core.changefeed import append_changes
+from core.config import _reset_settings_cache_for_tests
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("PUSH_POLL_INTERVAL", "0.05")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _goal(fid: int, league: int):
+    return {
+        "old": {"fixture_id": fid, "league_id": league, "status": "NS", "home_score": None, "away_score": None},
+        "new": {"fixture_id": fid, "league_id": league, "status": "1H", "home_score": 1, "away_score": 0},
+        "change_type": "both",
+    }
+
+
+def test_ws_replay_live_and_filters():
+    append_changes({"added": [{"fixture_id": 1, "league_id": 3}, {"fixture_id": 2, "league_id": 4}]})
+    client = TestClient(create_app())
+    with client.websocket_connect("/stream/ws?since=0&league_id=3") as ws:
+        first = ws.receive_json()
+        assert first["event"] == "change" and first["id"] == 1 and first["data"]["fixture"]["fixture_id"] == 1
+        # live: il cambio della lega 4 è filtrato, quello della lega 3 arriva con i suoi alert
+        append_changes({"modified": [_goal(2, 4), _goal(1, 3)]})
+        events = [ws.receive_json() for _ in range(3)]
+    assert [e["event"] for e in events] == ["change", "alert", "alert"]
+    assert {e["id"] for e in events} == {4}
+    assert {e["data"].get("type") for e in events[1:]} == {"score_update", "status_transition"}
+
+
+def test_ws_alerts_only_for_fixture():
+    client = TestClient(create_app())
+    with client.websocket_connect("/stream/ws?fixture_id=7&types=alert") as ws:
+        append_changes({"added": [{"fixture_id": 7, "league_id": 1}], "modified": [_goal(8, 1)]})
+        append_changes({"modified": [_goal(7, 1)]})
+        ev = ws.receive_json()
+    assert ev["event"] == "alert" and ev["data"]["fixture_id"] == 7 and ev["id"] == 3
+
+
+def test_slow_client_catches_up_from_feed(monkeypatch):
+    monkeypatch.setenv("PUSH_CLIENT_QUEUE", "2")
+    _reset_settings_cache_for_tests()
+    hub = PushHub()
+
+    async def run():
+        stream = hub.subscribe(ClientFilter(types=["change"]))
+        task = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.1)  # iscritto e poller avviato
+        for i in range(10):
+            append_changes({"added": [{"fixture_id": i}]})
+        await asyncio.sleep(0.3)  # coda da 2: la maggior parte dei record scartata per questo client
+        got = [(await task)["id"]]
+        while len(got) < 10:
+            ev = await stream.__anext__()
+            if ev is not None:
+                got.append(ev["id"])
+        await stream.aclose()
+        return got
+
+    assert asyncio.run(run()) == list(range(1, 11))
+    assert hub.client_count == 0
+
+
+def test_sse_framing():
+    ev = {"event": "change", "id": 5, "data": {"seq": 5, "op": "added"}}
+    assert _sse(ev) == b'id: 5\nevent: change\ndata: {"seq":5,"op":"added"}\n\n'
+    assert _sse(None) == b": keep-alive\n\n"
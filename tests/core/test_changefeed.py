@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import create_app
+from core import changefeed
+from core.config import _reset_settings_cache_for_tests
+from core.diff import diff_fixtures_detailed
+from core.metrics import write_last_delta_event
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("CHANGE_FEED_INDEX_EVERY", "4")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _snap(n: int, scored=()):
+    return [{"fixture_id": i, "status": "1H" if i in scored else "NS", "home_score": 1 if i in scored else None}
+            for i in range(n)]
+
+
+def _feed_cycles():
+    snaps = [_snap(5), _snap(6, scored={2}), _snap(6, scored={2, 4})[1:]]
+    prev = []
+    for cur in snaps:
+        write_last_delta_event(diff_fixtures_detailed(prev, cur))
+        prev = cur
+
+
+def test_sequenced_records_and_since_cursor(tmp_path: Path):
+    _feed_cycles()
+    # 5 aggiunte, poi 1 aggiunta + 1 modificata, poi 1 rimossa + 1 modificata
+    full = changefeed.read_changes(0)
+    assert [c["seq"] for c in full["changes"]] == list(range(1, 10))
+    assert full["last_seq"] == 9 and full["next"] == 9 and not full["more"]
+    assert [c["op"] for c in full["changes"][5:]] == ["added", "modified", "removed", "modified"]
+    assert full["changes"][6]["change_type"] == "both" and full["changes"][6]["key"] == "2"
+
+    tail = changefeed.read_changes(6)
+    assert [c["seq"] for c in tail["changes"]] == [7, 8, 9]
+    page = changefeed.read_changes(1, limit=3)
+    assert [c["seq"] for c in page["changes"]] == [2, 3, 4] and page["more"] and page["next"] == 4
+    assert changefeed.read_changes(9)["changes"] == []
+
+
+def test_index_rebuilt_from_tail(tmp_path: Path):
+    _feed_cycles()
+    path = changefeed.feed_path()
+    path.with_suffix(".idx.json").unlink()
+    with path.open("ab") as f:
+        f.write(b'{"seq": 10, "op"')  # riga troncata
+    idx = changefeed.load_feed_index(path)
+    assert idx["last_seq"] == 9 and [e[0] for e in idx["entries"]] == [1, 5, 9]
+    assert changefeed.append_changes({"added": [{"fixture_id": 77}]}) == [10, 10]
+    assert [c["seq"] for c in changefeed.read_changes(8)["changes"]] == [9, 10]
+
+
+def test_retention_drops_old_records_and_keeps_seq(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("CHANGE_FEED_RETENTION_DAYS", "0")
+    _reset_settings_cache_for_tests()
+    old_ts = "2020-01-01T00:00:00+00:00"
+    assert changefeed.append_changes({"added": _snap(5)}, ts=old_ts) == [1, 5]
+    assert changefeed.append_changes({"added": _snap(2)}, ts=old_ts) == [6, 7]
+    assert changefeed.read_changes(0)["changes"][0]["seq"] == 1
+    monkeypatch.setenv("CHANGE_FEED_RETENTION_DAYS", "7")
+    _reset_settings_cache_for_tests()
+
+    assert changefeed.append_changes({"removed": _snap(1)}) == [8, 8]
+    path = changefeed.feed_path()
+    idx = changefeed.load_feed_index(path)
+    assert idx["first_seq"] == 8 and idx["last_seq"] == 8 and idx["size"] == path.stat().st_size
+    stale = changefeed.read_changes(3)
+    assert stale["truncated"] and [c["seq"] for c in stale["changes"]] == [8]
+    assert not changefeed.read_changes(7)["truncated"]
+    # seq continuano dopo la compattazione, anche con l'indice perso
+    path.with_suffix(".idx.json").unlink()
+    assert changefeed.append_changes({"added": _snap(1)}) == [9, 9]
+
+
+def test_retention_never_drops_the_last_record(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("CHANGE_FEED_RETENTION_DAYS", "7")
+    _reset_settings_cache_for_tests()
+    changefeed.append_changes({"added": _snap(3)}, ts="2020-01-01T00:00:00+00:00")
+    assert [c["seq"] for c in changefeed.read_changes(0)["changes"]] == [3]
+    path = changefeed.feed_path()
+    path.with_suffix(".idx.json").unlink()
+    assert changefeed.last_seq() == 3
+
+
+def test_api_since_and_disabled(monkeypatch, tmp_path: Path):
+    _feed_cycles()
+    client = TestClient(create_app())
+    body = client.get("/delta", params={"since": 7}).json()
+    assert [c["seq"] for c in body["changes"]] == [8, 9] and body["last_seq"] == 9
+    # senza since: ultimo delta come prima
+    assert client.get("/delta").json()["counts"] == {"added": 0, "removed": 1, "modified": 1}
+
+    monkeypatch.setenv("ENABLE_CHANGE_FEED", "0")
+    _reset_settings_cache_for_tests()
+    assert changefeed.append_changes({"added": [{"fixture_id": 99}]}) == []
@@ -0,0 +1,107 @@
+import random
+from pathlib import Path
+
+from core import fingerprints
+from core.diff import diff_fixtures_detailed
+
+
+def _fixtures(n: int, seed: int):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        if rnd.random() < 0.1:
+            continue  # rimossa / non ancora presente
+        scored = rnd.random() < 0.2
+        out.append({
+            "fixture_id": i,
+            "league_id": i % 5,
+            "status": "1H" if scored else "NS",
+            "home_score": rnd.randint(0, 1) if scored else None,
+            "away_score": 0 if scored else None,
+            "venue": "A" if rnd.random() < 0.9 else "B",
+        })
+    return out
+
+
+def _norm(delta):
+    key = lambda f: f["fixture_id"]  # noqa: E731
+    return {
+        "added": sorted(delta["added"], key=key),
+        "removed": sorted(delta["removed"], key=key),
+        "modified": sorted(delta["modified"], key=lambda m: m["new"]["fixture_id"]),
+        "change_breakdown": delta["change_breakdown"],
+    }
+
+
+def test_matches_detailed_diff_across_fetches(tmp_path: Path):
+    for ck in (None, ["home_score", "away_score", "status"]):
+        base = tmp_path / ("ck" if ck else "full")
+        prev = []
+        for seed in range(6):
+            cur = _fixtures(200, seed)
+            got = fingerprints.diff_with_fingerprints(cur, compare_keys=ck, base=base)
+            assert _norm(got) == _norm(diff_fixtures_detailed(prev, cur, compare_keys=ck))
+            prev = cur
+        assert len(list(fingerprints.state_dir(base).glob("records-*.jsonl"))) == 1
+
+
+def test_only_changed_records_are_reread(monkeypatch, tmp_path: Path):
+    old = _fixtures(100, 1)
+    fingerprints.diff_with_fingerprints(old, base=tmp_path)
+    new = [dict(f) for f in old]
+    new[3]["status"] = "FT"
+    removed = new.pop(10)
+
+    spans = []
+    real = fingerprints._read_records
+
+    def spy(path, wanted):
+        wanted = list(wanted)
+        spans.extend(k for k, _, _ in wanted)
+        return real(path, wanted)
+
+    monkeypatch.setattr(fingerprints, "_read_records", spy)
+    delta = fingerprints.diff_with_fingerprints(new, base=tmp_path)
+    assert sorted(spans) == sorted([str(new[3]["fixture_id"]), str(removed["fixture_id"])])
+    assert delta["removed"] == [removed] and delta["modified"][0]["old"] == old[3]
+    assert delta["added"] == []
+
+
+def test_bootstrap_from_previous_and_compare_keys_change(tmp_path: Path):
+    prev = [{"fixture_id": 1, "status": "NS", "home_score": None, "venue": "A"}]
+    calls = []
+
+    def load_prev():
+        calls.append(1)
+        return prev
+
+    new = [{"fixture_id": 1, "status": "NS", "home_score": None, "venue": "B"}]
+    delta = fingerprints.diff_with_fingerprints(new, base=tmp_path, previous=load_prev)
+    assert calls == [1] and delta["modified"][0]["change_type"] == "other"
+
+    # stato presente: previous non più chiamato; compare keys nuove → fingerprint ricalcolati
+    delta = fingerprints.diff_with_fingerprints(
+        [{"fixture_id": 1, "status": "NS", "home_score": None, "venue": "C"}],
+        compare_keys=["status", "home_score"],
+        base=tmp_path,
+        previous=load_prev,
+    )
+    assert calls == [1] and delta["modified"] == []
+
+
+def test_commit_false_keeps_state(tmp_path: Path):
+    fingerprints.diff_with_fingerprints([{"fixture_id": 1, "status": "NS"}], base=tmp_path)
+    probe = fingerprints.diff_with_fingerprints([], base=tmp_path, commit=False)
+    assert [f["fixture_id"] for f in probe["removed"]] == [1]
+    again = fingerprints.diff_with_fingerprints([{"fixture_id": 1, "status": "NS"}], base=tmp_path)
+    assert again["added"] == [] and again["removed"] == [] and again["modified"] == []
+
+
+def test_discard_state_bootstraps_from_previous(tmp_path: Path):
+    fingerprints.diff_with_fingerprints([{"fixture_id": 1, "status": "NS"}], base=tmp_path)
+    fingerprints.discard_state(tmp_path)
+    assert list(fingerprints.state_dir(tmp_path).iterdir()) == []
+    # flag spento per qualche fetch: il confronto riparte dall'ultimo pubblicato
+    latest = [{"fixture_id": 1, "status": "FT"}, {"fixture_id": 2, "status": "NS"}]
+    delta = fingerprints.diff_with_fingerprints(list(latest), base=tmp_path, previous=lambda: latest)
+    assert delta["added"] == [] and delta["removed"] == [] and delta["modified"] == []
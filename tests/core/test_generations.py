@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import create_app
+from core import generations
+from core.config import _reset_settings_cache_for_tests
+from core.metrics import write_last_delta_event, write_metrics_snapshot
+from core.persistence import load_latest_fixtures, save_latest_fixtures
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("ENABLE_GENERATIONS", "1")
+    monkeypatch.setenv("ENABLE_METRICS_FILE", "1")
+    monkeypatch.setenv("ENABLE_EVENTS_FILE", "1")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def _cycle(tmp_path: Path, n: int, delta: bool = True):
+    fixtures = [{"fixture_id": i, "status": "NS"} for i in range(n)]
+    with generations.begin_generation(tmp_path) as gen:
+        save_latest_fixtures(fixtures)
+        write_metrics_snapshot({"summary": {"added": n, "removed": 0, "modified": 0, "total_new": n}})
+        if delta:
+            write_last_delta_event({"added": fixtures, "removed": [], "modified": []})
+        # read-your-writes dentro il ciclo
+        assert len(load_latest_fixtures()) == n
+    return gen
+
+
+def test_cycle_published_only_at_commit(tmp_path: Path):
+    fixtures = [{"fixture_id": 1, "status": "NS"}]
+    with generations.begin_generation(tmp_path) as gen:
+        save_latest_fixtures(fixtures)
+        assert generations.generation_id(tmp_path) is None
+    assert generations.generation_id(tmp_path) == gen.id
+    assert not (tmp_path / "fixtures_latest.json").exists()
+    assert load_latest_fixtures() == fixtures
+
+    manifest = json.loads((tmp_path / "generations" / gen.id / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["seq"] == 1 and manifest["parent"] is None
+    assert set(manifest["artifacts"]) == {"fixtures_latest.json"}
+
+
+def test_unchanged_artifacts_carried_forward(tmp_path: Path):
+    first = _cycle(tmp_path, 2)
+    second = _cycle(tmp_path, 3, delta=False)
+    root = tmp_path / "generations"
+    manifest = json.loads((root / second.id / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["parent"] == first.id
+    assert manifest["artifacts"]["events/last_delta.json"]["carried"] is True
+    assert "carried" not in manifest["artifacts"]["fixtures_latest.json"]
+    carried = root / second.id / "events" / "last_delta.json"
+    assert carried.stat().st_ino == (root / first.id / "events" / "last_delta.json").stat().st_ino
+
+    snap = generations.current_snapshot(tmp_path)
+    assert snap.generation == second.id
+    delta = json.loads(snap.path("events/last_delta.json").read_text(encoding="utf-8"))
+    assert len(delta["added"]) == 2
+
+
+def test_failed_cycle_keeps_current_and_prune(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("GENERATIONS_KEEP", "2")
+    gens = [_cycle(tmp_path, n).id for n in (1, 2, 3)]
+    with pytest.raises(RuntimeError):
+        with generations.begin_generation(tmp_path):
+            save_latest_fixtures([{"fixture_id": 99}])
+            raise RuntimeError("boom")
+    assert generations.generation_id(tmp_path) == gens[-1]
+    assert len(load_latest_fixtures()) == 3
+    names = sorted(p.name for p in (tmp_path / "generations").iterdir() if p.is_dir())
+    assert names == gens[-2:]
+
+
+def _slow_cycle(base, n, hold):
+    with generations.begin_generation(Path(base)):
+        save_latest_fixtures([{"fixture_id": i, "status": "NS"} for i in range(n)])
+        time.sleep(hold)
+
+
+def test_concurrent_cycles_are_serialised(tmp_path: Path):
+    ctx = multiprocessing.get_context("fork")
+    first = ctx.Process(target=_slow_cycle, args=(str(tmp_path), 1, 0.5))
+    first.start()
+    # il secondo ciclo parte mentre il primo sta ancora costruendo
+    deadline = time.monotonic() + 10
+    while not list((tmp_path / "generations").glob("gen-*")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second = ctx.Process(target=_slow_cycle, args=(str(tmp_path), 2, 0.0))
+    second.start()
+    for p in (first, second):
+        p.join(timeout=30)
+        assert p.exitcode == 0
+
+    root = tmp_path / "generations"
+    assert generations.generation_id(tmp_path) == "gen-00000002"
+    manifest = json.loads((root / "gen-00000002" / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["parent"] == "gen-00000001"
+    assert len(load_latest_fixtures()) == 2
+
+
+def test_write_outside_cycle_publishes_single_artifact(tmp_path: Path):
+    _cycle(tmp_path, 2)
+    write_metrics_snapshot({"summary": {"added": 7}})
+    snap = generations.current_snapshot(tmp_path)
+    last_run = json.loads(snap.path("metrics/last_run.json").read_text(encoding="utf-8"))
+    assert last_run["summary"]["added"] == 7
+    assert len(load_latest_fixtures()) == 2
+
+
+def test_api_reads_current_generation(tmp_path: Path):
+    gen = _cycle(tmp_path, 4)
+    client = TestClient(create_app())
+    r = client.get("/fixtures")
+    assert r.status_code == 200 and len(r.json()) == 4
+    assert r.headers["X-Data-Generation"] == gen.id
+    delta = client.get("/delta").json()
+    assert delta["counts"]["added"] == 4 and delta["summary"]["added"] == 4
+
+
+def test_disabled_uses_legacy_paths(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("ENABLE_GENERATIONS", "0")
+    with generations.begin_generation(tmp_path) as gen:
+        save_latest_fixtures([{"fixture_id": 1}])
+    assert gen is None
+    assert (tmp_path / "fixtures_latest.json").exists()
+    assert not (tmp_path / "generations").exists()
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from core import history_store as hs
+from core.persistence import save_history_snapshot
+
+T0 = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _fixtures(n: int, scored=()):
+    return [
+        {"fixture_id": i, "league_id": 1 + i % 3, "status": "1H" if i in scored else "NS",
+         "home_score": 1 if i in scored else None, "away_score": 0 if i in scored else None}
+        for i in range(n)
+    ]
+
+
+def _at(minutes: int) -> datetime:
+    return T0 + timedelta(minutes=minutes)
+
+
+def test_deltas_and_point_in_time(tmp_path: Path):
+    snaps = {
+        0: _fixtures(50),
+        1: _fixtures(50, scored={3}),
+        2: _fixtures(50, scored={3}),           # invariato: nessun record
+        3: _fixtures(51, scored={3, 7})[1:],    # 0 rimosso, 50 aggiunto, 7 segna
+    }
+    recs = {m: hs.record_snapshot(f, ts=_at(m), base=tmp_path) for m, f in snaps.items()}
+    assert recs[0]["kind"] == "key" and len(recs[0]["keys"]) == 50
+    assert recs[1]["kind"] == "delta" and list(recs[1]["set"]) == ["3"]
+    assert recs[1]["change_breakdown"]["both"] == 1
+    assert recs[2] is None
+    assert recs[3]["del"] == ["0"] and set(recs[3]["set"]) == {"7", "50"}
+    assert recs[3]["counts"] == {"added": 1, "modified": 1, "removed": 1}
+
+    # 50 stati iniziali + 3 cambi: le fixture invariate non vengono riscritte
+    objects = (hs.store_dir(tmp_path) / hs.OBJECTS_FILE).read_text(encoding="utf-8").splitlines()
+    assert len(objects) == 53
+
+    key = lambda f: f["fixture_id"]  # noqa: E731
+    for m, f in snaps.items():
+        got = hs.fixtures_at(_at(m) + timedelta(seconds=30), base=tmp_path)
+        assert sorted(got, key=key) == sorted(f, key=key)
+    assert hs.fixtures_at(_at(-1), base=tmp_path) is None
+    assert hs.fixtures_at(_at(1), keys=["3"], base=tmp_path) == [snaps[1][3]]
+
+
+def test_keyframes_bound_replay(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("HISTORY_KEYFRAME_EVERY", "3")
+    states = []
+    for m in range(8):
+        f = _fixtures(10, scored=set(range(m)))
+        states.append(f)
+        hs.record_snapshot(f, ts=_at(m), base=tmp_path)
+    bounds = hs.history_bounds(tmp_path)
+    assert bounds["records"] == 8 and bounds["keyframes"] == 3
+    for m in (0, 4, 7):
+        assert hs.fixtures_at(_at(m), base=tmp_path) == states[m]
+
+    # indice perso: ricostruito dal log
+    (hs.store_dir(tmp_path) / "log.idx.json").unlink()
+    (hs.store_dir(tmp_path) / "objects.idx.json").unlink()
+    assert hs.fixtures_at(_at(5), base=tmp_path) == states[5]
+
+
+def test_truncated_tail_ignored(tmp_path: Path):
+    hs.record_snapshot(_fixtures(5), ts=_at(0), base=tmp_path)
+    log = hs.store_dir(tmp_path) / hs.LOG_FILE
+    with log.open("ab") as f:
+        f.write(b'{"seq": 2, "ts": "2026')
+    rec = hs.record_snapshot(_fixtures(5, scored={1}), ts=_at(1), base=tmp_path)
+    assert rec["seq"] == 2
+    assert hs.fixtures_at(_at(1), base=tmp_path)[1]["status"] == "1H"
+
+
+def test_persistence_delta_mode(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("BET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("HISTORY_MODE", "delta")
+    path = save_history_snapshot(_fixtures(4))
+    assert path == hs.store_dir(tmp_path)
+    assert not list((tmp_path / "history").glob("fixtures_*.json"))
+    head = json.loads((path / hs.HEAD_FILE).read_text(encoding="utf-8"))
+    assert head["seq"] == 1 and len(head["keys"]) == 4
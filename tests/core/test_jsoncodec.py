@@ -0,0 +1,68 @@
+import json
+import math
+from pathlib import Path
+
+import pytest
+
+from core import jsoncodec
+
+PAYLOAD = {
+    "fixture_id": 123,
+    "team": "Città Società",
+    "odds": [1.91, 3.4, 4.2],
+    "nested": {"settled": True, "result": None},
+}
+
+BACKENDS = [b for b in jsoncodec.BACKENDS if jsoncodec.resolve_backend(b) == b]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    jsoncodec.set_backend(request.param)
+    yield request.param
+    jsoncodec.set_backend(None)
+
+
+def test_resolve_backend_fallbacks(monkeypatch):
+    assert jsoncodec.resolve_backend("stdlib") == "stdlib"
+    assert jsoncodec.resolve_backend("json") == "stdlib"
+    assert jsoncodec.resolve_backend("nope") == "stdlib"
+    monkeypatch.setenv("JSON_BACKEND", "stdlib")
+    assert jsoncodec.resolve_backend() == "stdlib"
+    assert jsoncodec.resolve_backend("auto") == BACKENDS[0]
+
+
+def test_output_matches_stdlib(backend):
+    pretty = json.dumps(PAYLOAD, ensure_ascii=False, indent=2).encode("utf-8")
+    compact = json.dumps(PAYLOAD, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert jsoncodec.dumps(PAYLOAD, pretty=True) == pretty
+    assert jsoncodec.dumps(PAYLOAD) == compact
+    assert jsoncodec.dumps_str(PAYLOAD) == compact.decode("utf-8")
+    assert jsoncodec.loads(pretty) == PAYLOAD
+    assert jsoncodec.loads(compact.decode("utf-8")) == PAYLOAD
+
+
+def test_stdlib_fallbacks(backend):
+    # interi oltre 64 bit e NaN scritti dalla stdlib restano leggibili
+    big = {"n": 2 ** 70}
+    assert jsoncodec.loads(jsoncodec.dumps(big)) == big
+    assert math.isnan(jsoncodec.loads(b'{"x": NaN}')["x"])
+    assert jsoncodec.dumps({"k": 1}, sort_keys=True, default=str) == b'{"k":1}'
+    with pytest.raises(json.JSONDecodeError):
+        jsoncodec.loads(b'{"x": ')
+
+
+def test_write_json_atomic_compact_only_for_machine(backend, monkeypatch, tmp_path: Path):
+    human = tmp_path / "human.json"
+    machine = tmp_path / "machine.json"
+    monkeypatch.setenv("JSON_COMPACT_ARTIFACTS", "1")
+    jsoncodec.write_json_atomic(human, PAYLOAD)
+    jsoncodec.write_json_atomic(machine, PAYLOAD, machine=True, fsync=True)
+    assert b"\n  " in human.read_bytes()
+    assert b"\n" not in machine.read_bytes()
+    assert jsoncodec.read_json(machine) == jsoncodec.read_json(human) == PAYLOAD
+    assert not list(tmp_path.glob("*.tmp"))
+
+    monkeypatch.setenv("JSON_COMPACT_ARTIFACTS", "0")
+    jsoncodec.write_json_atomic(machine, PAYLOAD, machine=True)
+    assert b"\n  " in machine.read_bytes()
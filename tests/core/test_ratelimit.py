@@ -0,0 +1,138 @@
+import multiprocessing
+
+import pytest
+import requests
+
+from core import ratelimit
+from core.config import _reset_settings_cache_for_tests
+from providers.api_football.exceptions import RateLimitError
+from providers.api_football.http_client import get_http_client
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, json_data=None, headers=None):
+        self.status_code = status_code
+        self._json_data = json_data
+        self.headers = headers or {}
+        self.text = ""
+
+    def json(self):
+        return self._json_data
+
+
+@pytest.fixture(autouse=True)
+def shared_limiter(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENABLE_SHARED_RATE_LIMIT", "1")
+    monkeypatch.setenv("RATE_LIMIT_DIR", str(tmp_path / "rl"))
+    monkeypatch.delenv("API_FOOTBALL_RPM", raising=False)
+    monkeypatch.delenv("FOOTBALL_DATA_RPM", raising=False)
+    monkeypatch.delenv("RATE_LIMIT_MAX_WAIT", raising=False)
+    yield tmp_path / "rl"
+
+
+def test_disabled_is_noop(monkeypatch, shared_limiter):
+    monkeypatch.setenv("ENABLE_SHARED_RATE_LIMIT", "0")
+    assert ratelimit.acquire("api_football") == 0.0
+    ratelimit.update_from_headers("api_football", {"X-RateLimit-Remaining": "0"})
+    assert not shared_limiter.exists()
+
+
+def test_rpm_bucket_and_header_reset(monkeypatch):
+    monkeypatch.setenv("API_FOOTBALL_RPM", "2")
+    clock = FakeClock()
+    assert ratelimit.acquire("api_football", clock=clock, sleep=clock.sleep) == 0.0
+    assert ratelimit.acquire("api_football", clock=clock, sleep=clock.sleep) == 0.0
+    # bucket vuoto: un token ogni 30 s
+    assert ratelimit.acquire("api_football", clock=clock, sleep=clock.sleep) == pytest.approx(30.0)
+
+    # football-data: residuo 0 con reset tra 5 s dichiarato dal provider
+    ratelimit.update_from_headers(
+        "football_data",
+        {"X-Requests-Available-Minute": "0", "X-RequestCounter-Reset": "5"},
+        clock=clock,
+    )
+    assert ratelimit.acquire("football_data", clock=clock, sleep=clock.sleep) == pytest.approx(5.0)
+    # limit ignoto dopo il reset: nessuna attesa fino al prossimo header
+    assert ratelimit.acquire("football_data", clock=clock, sleep=clock.sleep) == 0.0
+
+
+def test_exhausted_daily_quota_fails_fast():
+    clock = FakeClock()
+    ratelimit.update_from_headers(
+        "api_football",
+        {"x-ratelimit-requests-remaining": "0", "X-RateLimit-Remaining": "10"},
+        clock=clock,
+    )
+    with pytest.raises(ratelimit.QuotaExhausted):
+        ratelimit.acquire("api_football", clock=clock, sleep=clock.sleep)
+    assert clock.slept == []
+    # dopo mezzanotte UTC una richiesta di prova è di nuovo ammessa
+    clock.now = ratelimit._next_utc_midnight(clock.now) + 1
+    assert ratelimit.acquire("api_football", clock=clock, sleep=clock.sleep) == 0.0
+
+
+def _take_tokens(rl_dir, n, out):
+    import os
+
+    os.environ["ENABLE_SHARED_RATE_LIMIT"] = "1"
+    os.environ["RATE_LIMIT_DIR"] = rl_dir
+    os.environ["RATE_LIMIT_MAX_WAIT"] = "0"
+    ok = 0
+    for _ in range(n):
+        try:
+            ratelimit.acquire("football_data")
+            ok += 1
+        except ratelimit.QuotaExhausted:
+            pass
+    out.put(ok)
+
+
+def test_bucket_shared_across_processes(shared_limiter):
+    ratelimit.update_from_headers(
+        "football_data", {"X-Requests-Available-Minute": "5", "X-RequestCounter-Reset": "300"}
+    )
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_take_tokens, args=(str(shared_limiter), 4, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=30)
+    assert sum(out.get(timeout=5) for _ in procs) == 5
+
+
+def test_api_football_client_shares_429_pause(monkeypatch):
+    _reset_settings_cache_for_tests()
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY_KEY")
+    monkeypatch.setattr("providers.api_football.http_client.random.uniform", lambda a, b: 1.0)
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "time", clock)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    seq = iter([
+        FakeResponse(429, {"error": "rate"}, headers={"Retry-After": "3"}),
+        FakeResponse(200, {"response": []}, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Limit": "10"}),
+    ])
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, params=None, timeout=None: next(seq))
+    try:
+        assert get_http_client().api_get("/fixtures") == {"response": []}
+        # attesa fatta una sola volta, dal bucket condiviso
+        assert clock.slept == [pytest.approx(3.0)]
+        # residuo 0 su limit 10/min: prossimo token tra 6 s, oltre il max wait → errore
+        monkeypatch.setenv("RATE_LIMIT_MAX_WAIT", "1")
+        with pytest.raises(RateLimitError):
+            get_http_client().api_get("/fixtures")
+    finally:
+        _reset_settings_cache_for_tests()
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import providers.api_football.async_client as async_client
+from core.config import _reset_settings_cache_for_tests
+from providers.api_football.async_client import (
+    AsyncAPIFootballHttpClient,
+    RequestBudget,
+    fetch_fixtures_concurrently,
+)
+from providers.api_football.exceptions import RateLimitError
+
+
+def _fixture(fid: int, league: int, date: str):
+    return {
+        "fixture": {"id": fid, "date": f"{date}T18:00:00Z", "status": {"short": "NS"}},
+        "league": {"id": league, "season": 2026},
+        "teams": {"home": {"name": "A"}, "away": {"name": "B"}},
+        "goals": {"home": None, "away": None},
+    }
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.setenv("API_FOOTBALL_KEY", "DUMMY")
+    monkeypatch.setenv("API_FOOTBALL_BACKOFF_BASE", "0.01")
+    monkeypatch.setenv("API_FOOTBALL_BACKOFF_JITTER", "0")
+    _reset_settings_cache_for_tests()
+    yield
+    _reset_settings_cache_for_tests()
+
+
+def test_concurrent_fetch_takes_about_one_request(monkeypatch):
+    monkeypatch.setenv("API_FOOTBALL_MAX_CONCURRENCY", "8")
+    _reset_settings_cache_for_tests()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        league = int(request.url.params["league"])
+        date = request.url.params["date"]
+        # fixture 1 restituita da tutte le leghe: deduplicata
+        return httpx.Response(200, json={"response": [_fixture(1, league, date), _fixture(league * 10, league, date)]})
+
+    queries = [{"date": "2026-01-10", "league_id": lg, "season": 2026} for lg in range(1, 9)]
+    start = time.perf_counter()
+    out = fetch_fixtures_concurrently(queries, transport=httpx.MockTransport(handler))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.2 * 4  # sequenziale: 8 × 0.2 s
+    assert [f["fixture_id"] for f in out["fixtures"]] == [1] + [lg * 10 for lg in range(1, 9)]
+    assert out["stats"]["requests"] == 8 and out["stats"]["retries"] == 0
+
+
+def test_concurrency_limit_and_retry_semantics(monkeypatch):
+    monkeypatch.setenv("API_FOOTBALL_MAX_CONCURRENCY", "2")
+    _reset_settings_cache_for_tests()
+    in_flight = {"now": 0, "max": 0}
+    calls = {"n": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"response": []})
+
+    async def run():
+        async with AsyncAPIFootballHttpClient(transport=httpx.MockTransport(handler)) as client:
+            await asyncio.gather(*(client.api_get("/fixtures", {"league": i}) for i in range(6)))
+            return client.get_batch_stats()
+
+    stats = asyncio.run(run())
+    assert in_flight["max"] == 2
+    assert stats["requests"] == 6 and stats["attempts"] == 7 and stats["retries"] == 1
+
+
+def test_rate_limit_pauses_shared_budget(monkeypatch):
+    monkeypatch.setenv("API_FOOTBALL_MAX_ATTEMPTS", "2")
+    _reset_settings_cache_for_tests()
+    slept = []
+    now = {"t": 0.0}
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        now["t"] += seconds
+
+    monkeypatch.setattr(async_client, "_sleep", fake_sleep)
+    monkeypatch.setattr(async_client, "RequestBudget", lambda rpm: RequestBudget(rpm, clock=lambda: now["t"]))
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": "7"})
+
+    async def run():
+        async with AsyncAPIFootballHttpClient(transport=httpx.MockTransport(handler)) as client:
+            await client.api_get("/fixtures")
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(run())
+    # il secondo tentativo attende la pausa del budget (Retry-After > backoff)
+    assert slept == [7.0]
+
+
+def test_request_budget_sliding_window(monkeypatch):
+    now = {"t": 0.0}
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+        now["t"] += seconds
+
+    monkeypatch.setattr(async_client, "_sleep", fake_sleep)
+    budget = RequestBudget(rpm=3, clock=lambda: now["t"])
+
+    async def run():
+        for _ in range(7):
+            await budget.acquire()
+            now["t"] += 1.0
+
+    asyncio.run(run())
+    # 3 subito, poi si attende che il primo esca dalla finestra di 60 s
+    assert waits == [57.0, 57.0]
@@ -1,7 +1,10 @@
 import pytest
 
+import os
+
 from core.config import (
     get_settings,
+    settings_with_overrides,
     _reset_settings_cache_for_tests,
 )
 
@@ -18,3 +21,15 @@ def test_present_api_key_ok(monkeypatch) -> None:
     _reset_settings_cache_for_tests()
     s = get_settings()
     assert s.api_football_key == "TEST_KEY"
+
+
+def test_settings_with_overrides_leaves_env_untouched(monkeypatch) -> None:
+    monkeypatch.setenv("API_FOOTBALL_KEY", "TEST_KEY")
+    monkeypatch.delenv("ENABLE_KELLY_STAKING", raising=False)
+    _reset_settings_cache_for_tests()
+    base = get_settings()
+    s = settings_with_overrides({"ROI_MIN_EDGE": 0.08, "ENABLE_KELLY_STAKING": "1"})
+    assert s.roi_min_edge == 0.08 and s.enable_kelly_staking is True
+    assert s.api_football_key == "TEST_KEY"
+    assert "ENABLE_KELLY_STAKING" not in os.environ
+    assert get_settings() is base and base.enable_kelly_staking is False